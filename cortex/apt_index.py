@@ -0,0 +1,496 @@
+"""
+In-process index of the apt package lists.
+
+``apt-cache depends`` and ``apt-cache search`` start a process and load the
+whole apt cache for every query. ``AptIndex`` reads the ``*_Packages`` lists
+in ``/var/lib/apt/lists`` (plain or gzip/xz/bzip2/lz4 compressed) once and
+writes one compact segment file per list under ``~/.cortex/apt_index``.
+Segments are memory-mapped, so queries only touch the pages they need:
+
+- package lookups are a binary search over the sorted package names;
+- virtual packages are resolved through a sorted ``Provides`` table;
+- text search scans a lowercased ``name description`` region with
+  ``mmap.find``.
+
+Each segment records the modification time and size of its list file;
+after an ``apt update`` only the lists that changed are re-indexed.
+"""
+
+import bisect
+import bz2
+import gzip
+import io
+import logging
+import lzma
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from cortex.dpkg_status import iter_stanzas, parse_dependencies, parse_dependency_clauses
+
+logger = logging.getLogger(__name__)
+
+APT_LISTS_DIR = "/var/lib/apt/lists"
+DEFAULT_INDEX_DIR = Path.home() / ".cortex" / "apt_index"
+
+# Seconds between checks of the list files for changes
+DEFAULT_CHECK_INTERVAL = 5.0
+
+_LIST_SUFFIXES = ("_Packages", "_Packages.gz", "_Packages.xz", "_Packages.bz2", "_Packages.lz4")
+
+_FIELDS = {"Package", "Version", "Pre-Depends", "Depends", "Recommends", "Provides", "Description"}
+
+# Segment layout: magic, source mtime_ns and size, then three tables
+# (packages, provides, search), each as (count, offsets position, data position).
+# A table's offsets are count + 1 native uint32 values relative to its data
+# position, so they can be read in place through a memoryview.
+_MAGIC = b"CXAPTIX2"
+_HEADER = struct.Struct("<8sQQ" + "IQQ" * 3)
+_SEP = "\x1f"
+
+
+@dataclass(frozen=True)
+class AptPackage:
+    """A package version from the apt lists."""
+
+    name: str
+    version: str
+    # Pre-Depends and Depends, first alternative of each clause
+    depends: tuple[str, ...] = ()
+    # The same clauses with all their ``a | b`` alternatives
+    alternatives: tuple[tuple[str, ...], ...] = ()
+    recommends: tuple[str, ...] = ()
+    provides: tuple[str, ...] = ()
+    description: str = ""
+
+
+def _order(char: str) -> int:
+    if char.isdigit():
+        return 0
+    if char.isalpha():
+        return ord(char)
+    if char == "~":
+        return -1
+    return ord(char) + 256
+
+
+def _compare_part(a: str, b: str) -> int:
+    """dpkg's ``verrevcmp`` for upstream versions and revisions."""
+    i = j = 0
+    while i < len(a) or j < len(b):
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            ac = _order(a[i]) if i < len(a) else 0
+            bc = _order(b[j]) if j < len(b) else 0
+            if ac != bc:
+                return ac - bc
+            i += 1
+            j += 1
+        while i < len(a) and a[i] == "0":
+            i += 1
+        while j < len(b) and b[j] == "0":
+            j += 1
+        first_diff = 0
+        while i < len(a) and a[i].isdigit() and j < len(b) and b[j].isdigit():
+            if not first_diff:
+                first_diff = ord(a[i]) - ord(b[j])
+            i += 1
+            j += 1
+        if i < len(a) and a[i].isdigit():
+            return 1
+        if j < len(b) and b[j].isdigit():
+            return -1
+        if first_diff:
+            return first_diff
+    return 0
+
+
+def _split_version(version: str) -> tuple[int, str, str]:
+    epoch, _, rest = version.partition(":") if ":" in version else ("0", "", version)
+    upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "")
+    try:
+        return int(epoch), upstream, revision
+    except ValueError:
+        return 0, upstream, revision
+
+
+def compare_versions(a: str, b: str) -> int:
+    """Compare two Debian version strings like ``dpkg --compare-versions``.
+
+    Returns:
+        A negative number, zero or a positive number if ``a`` is older than,
+        equal to or newer than ``b``
+    """
+    epoch_a, upstream_a, revision_a = _split_version(a)
+    epoch_b, upstream_b, revision_b = _split_version(b)
+    if epoch_a != epoch_b:
+        return epoch_a - epoch_b
+    return _compare_part(upstream_a, upstream_b) or _compare_part(revision_a, revision_b)
+
+
+def _open_list(path: Path) -> io.TextIOBase:
+    if path.suffix == ".gz":
+        raw = gzip.open(path, "rb")
+    elif path.suffix == ".xz":
+        raw = lzma.open(path, "rb")
+    elif path.suffix == ".bz2":
+        raw = bz2.open(path, "rb")
+    elif path.suffix == ".lz4":
+        import lz4.frame  # optional: only needed for lz4 compressed lists
+
+        raw = lz4.frame.open(path, "rb")
+    else:
+        raw = open(path, "rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+
+def _pack_table(lines: list[bytes]) -> tuple[bytes, bytes]:
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return struct.pack(f"={len(offsets)}I", *offsets), b"".join(lines)
+
+
+def build_segment(source: Path, target: Path) -> int:
+    """Index one ``Packages`` list into a segment file.
+
+    Returns:
+        Number of packages indexed
+    """
+    stat = source.stat()
+    packages: list[tuple[bytes, bytes, bytes]] = []
+    provides: list[bytes] = []
+
+    with _open_list(source) as f:
+        for fields in iter_stanzas(f, _FIELDS):
+            name = fields.get("Package")
+            if not name:
+                continue
+            depends = parse_dependency_clauses(fields.get("Pre-Depends", ""))
+            depends += [
+                clause
+                for clause in parse_dependency_clauses(fields.get("Depends", ""))
+                if clause not in depends
+            ]
+            provided = parse_dependencies(fields.get("Provides", ""))
+            description = fields.get("Description", "").split("\n", 1)[0]
+            record = _SEP.join(
+                [
+                    name,
+                    fields.get("Version", ""),
+                    ",".join("|".join(clause) for clause in depends),
+                    ",".join(parse_dependencies(fields.get("Recommends", ""))),
+                    ",".join(provided),
+                    description,
+                ]
+            )
+            search_line = f"{name} {description}".lower() + "\n"
+            packages.append((name.encode(), record.encode(), search_line.encode()))
+            provides.extend(f"{virtual}{_SEP}{name}".encode() for virtual in provided)
+
+    packages.sort(key=lambda entry: entry[0])
+    provides.sort()
+
+    tables = [
+        _pack_table([record for _, record, _ in packages]),
+        _pack_table(provides),
+        _pack_table([search_line for _, _, search_line in packages]),
+    ]
+    counts = [len(packages), len(provides), len(packages)]
+
+    # Offset arrays are 4-byte aligned so they can be read as uint32 in place
+    header_fields: list[int] = []
+    padding: list[int] = []
+    position = _HEADER.size
+    for count, (offsets, data) in zip(counts, tables):
+        padding.append(-position % 4)
+        position += padding[-1]
+        header_fields += [count, position, position + len(offsets)]
+        position += len(offsets) + len(data)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(_MAGIC, stat.st_mtime_ns, stat.st_size, *header_fields))
+        for pad, (offsets, data) in zip(padding, tables):
+            out.write(b"\0" * pad)
+            out.write(offsets)
+            out.write(data)
+    os.replace(tmp, target)
+    return len(packages)
+
+
+class _Table:
+    """Read-only view of one table of a mapped segment."""
+
+    def __init__(self, mm: mmap.mmap, count: int, offsets_pos: int, data_pos: int):
+        self._mm = mm
+        self.count = count
+        self.data_pos = data_pos
+        self.offsets = memoryview(mm)[offsets_pos : offsets_pos + 4 * (count + 1)].cast("I")
+
+    def line(self, index: int) -> bytes:
+        return self._mm[
+            self.data_pos + self.offsets[index] : self.data_pos + self.offsets[index + 1]
+        ]
+
+    def key(self, index: int) -> bytes:
+        start = self.data_pos + self.offsets[index]
+        end = self._mm.find(_SEP.encode(), start, self.data_pos + self.offsets[index + 1])
+        return self._mm[start : end if end != -1 else self.data_pos + self.offsets[index + 1]]
+
+    def lookup(self, key: bytes) -> range:
+        """Indexes of the lines whose key is ``key``."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = lo
+        while end < self.count and self.key(end) == key:
+            end += 1
+        return range(lo, end)
+
+
+class _Segment:
+    """Memory-mapped index of one list file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header = _HEADER.unpack_from(self._mm)
+        except struct.error as e:
+            self._mm.close()
+            raise ValueError(f"Truncated index segment {path}") from e
+        if header[0] != _MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not an index segment: {path}")
+        self.source_mtime_ns, self.source_size = header[1], header[2]
+        self.packages, self.provides, self.search = (
+            _Table(self._mm, *header[3 + 3 * i : 6 + 3 * i]) for i in range(3)
+        )
+
+    def get(self, name: str) -> Iterator[AptPackage]:
+        for index in self.packages.lookup(name.encode()):
+            yield _package_from_record(self.packages.line(index))
+
+    def providers(self, virtual: str) -> Iterator[str]:
+        for index in self.provides.lookup(virtual.encode()):
+            yield self.provides.line(index).decode().split(_SEP, 1)[1]
+
+    def find(self, terms: list[bytes]) -> Iterator[int]:
+        """Indexes of the packages whose search line contains all ``terms``."""
+        anchor = max(terms, key=len)
+        table = self.search
+        position = table.data_pos
+        end = table.data_pos + table.offsets[table.count]
+        while True:
+            hit = self._mm.find(anchor, position, end)
+            if hit == -1:
+                return
+            index = bisect.bisect_right(table.offsets, hit - table.data_pos) - 1
+            line = table.line(index)
+            if all(term in line for term in terms):
+                yield index
+            position = table.data_pos + table.offsets[index + 1]
+
+
+def _package_from_record(record: bytes) -> AptPackage:
+    name, version, depends, recommends, provides, description = record.decode().split(_SEP)
+    alternatives = tuple(tuple(clause.split("|")) for clause in depends.split(",") if clause)
+    return AptPackage(
+        name=name,
+        version=version,
+        depends=tuple(clause[0] for clause in alternatives),
+        alternatives=alternatives,
+        recommends=tuple(filter(None, recommends.split(","))),
+        provides=tuple(filter(None, provides.split(","))),
+        description=description,
+    )
+
+
+class AptIndex:
+    """Memory-mapped index of the apt package lists.
+
+    Usage:
+        index = get_apt_index()
+        package = index.get("nginx")
+        package.depends  # -> ("nginx-common", "libc6", ...)
+        index.search("web server", limit=10)
+
+    An index can be shared between threads.
+    """
+
+    def __init__(
+        self,
+        lists_dir: str = APT_LISTS_DIR,
+        index_dir: str | Path = DEFAULT_INDEX_DIR,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+    ):
+        self.lists_dir = Path(lists_dir)
+        self.index_dir = Path(index_dir)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._segments: dict[str, _Segment] = {}
+        self._checked_at: float | None = None
+
+    def list_files(self) -> list[Path]:
+        """The ``Packages`` lists currently present in the lists directory."""
+        try:
+            return sorted(
+                entry
+                for entry in self.lists_dir.iterdir()
+                if entry.name.endswith(_LIST_SUFFIXES) and entry.is_file()
+            )
+        except OSError:
+            return []
+
+    def refresh(self) -> int:
+        """Re-index the list files that changed since they were last indexed.
+
+        Readers are never blocked: the new segments are swapped in as a
+        whole, and segments that were replaced are not closed but unmapped
+        once the last reader still iterating over them lets go of them.
+
+        Returns:
+            Number of list files that were (re-)indexed
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            rebuilt = 0
+            previous = dict(self._segments)
+            current: dict[str, _Segment] = {}
+
+            for source in self.list_files():
+                segment = previous.pop(source.name, None) or self._open_segment(source)
+                try:
+                    stat = source.stat()
+                except OSError:
+                    continue
+                if segment is not None and (
+                    segment.source_mtime_ns != stat.st_mtime_ns
+                    or segment.source_size != stat.st_size
+                ):
+                    segment = None
+                if segment is None:
+                    segment = self._build(source)
+                    rebuilt += segment is not None
+                if segment is not None:
+                    current[source.name] = segment
+
+            # Lists that disappeared (e.g. a removed repository); open
+            # mappings stay valid after the unlink
+            for name in previous:
+                (self.index_dir / f"{name}.idx").unlink(missing_ok=True)
+            self._segments = current
+
+            if rebuilt:
+                logger.info(f"Indexed {rebuilt} apt package list(s) in {self.index_dir}")
+            return rebuilt
+
+    def _open_segment(self, source: Path) -> _Segment | None:
+        path = self.index_dir / f"{source.name}.idx"
+        if not path.exists():
+            return None
+        try:
+            return _Segment(path)
+        except (OSError, ValueError, TypeError) as e:
+            logger.debug(f"Discarding unreadable index segment {path}: {e}")
+            return None
+
+    def _build(self, source: Path) -> _Segment | None:
+        target = self.index_dir / f"{source.name}.idx"
+        try:
+            count = build_segment(source, target)
+            logger.debug(f"Indexed {count} packages from {source.name}")
+            return _Segment(target)
+        except (OSError, EOFError, ValueError, ImportError, lzma.LZMAError) as e:
+            logger.warning(f"Could not index {source}: {e}")
+            return None
+
+    def _current_segments(self) -> list[_Segment]:
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        return list(self._segments.values())
+
+    @property
+    def available(self) -> bool:
+        """True if at least one package list is indexed."""
+        return bool(self._current_segments())
+
+    def versions(self, name: str) -> list[AptPackage]:
+        """All versions of ``name`` in the lists, newest first."""
+        found = [package for segment in self._current_segments() for package in segment.get(name)]
+        found.sort(key=_VersionKey, reverse=True)
+        return found
+
+    def get(self, name: str) -> AptPackage | None:
+        """Newest version of ``name`` (apt's candidate without pinning)."""
+        versions = self.versions(name)
+        return versions[0] if versions else None
+
+    def providers(self, virtual: str) -> list[str]:
+        """Packages that declare ``Provides: virtual``."""
+        found = {
+            provider
+            for segment in self._current_segments()
+            for provider in segment.providers(virtual)
+        }
+        return sorted(found)
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[str, str]]:
+        """Packages whose name or short description contains every word of ``query``.
+
+        Matching is case-insensitive, like ``apt-cache search``.
+
+        Returns:
+            (name, description) pairs sorted by name
+        """
+        terms = [term.encode() for term in re.split(r"\s+", query.lower().strip()) if term]
+        if not terms:
+            return []
+
+        results: dict[str, str] = {}
+        for segment in self._current_segments():
+            for index in segment.find(terms):
+                record = segment.packages.line(index).decode().split(_SEP)
+                results.setdefault(record[0], record[5])
+
+        names = sorted(results)
+        if limit is not None:
+            names = names[:limit]
+        return [(name, results[name]) for name in names]
+
+
+class _VersionKey:
+    """Sort key ordering packages by Debian version."""
+
+    def __init__(self, package: AptPackage):
+        self.version = package.version
+
+    def __lt__(self, other: "_VersionKey") -> bool:
+        return compare_versions(self.version, other.version) < 0
+
+
+_indexes: dict[tuple[str, str], AptIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_apt_index(
+    lists_dir: str = APT_LISTS_DIR, index_dir: str | Path = DEFAULT_INDEX_DIR
+) -> AptIndex:
+    """Shared index for a lists directory."""
+    key = (str(lists_dir), str(index_dir))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = AptIndex(lists_dir, index_dir)
+        return _indexes[key]
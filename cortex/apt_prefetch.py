@@ -0,0 +1,237 @@
+"""
+Speculative apt work that overlaps with installation planning.
+
+Waiting for the LLM to produce a plan takes seconds; so does refreshing
+the apt package lists and downloading ``.deb`` files. ``AptPrefetcher``
+lets the CLI overlap them:
+
+1. While the plan is being generated, ``refresh_index()`` starts
+   ``apt-get update`` in the background if the package lists are stale.
+2. As soon as the plan is known, ``prefetch(commands)`` downloads the
+   packages named by its ``apt install`` steps into the regular apt
+   archive cache (``--download-only``), so the real install later runs
+   mostly from local files.
+
+All of this is best effort: without root (or passwordless sudo) nothing is
+started, and failures are only logged. Before the plan itself runs,
+``wait()`` must be called so the plan's own apt commands do not contend
+with the background processes for the apt locks.
+
+Nothing here keeps the interpreter alive: the download waits for the
+refresh in a detached shell, so a preview exits at once and the apt work
+finishes on its own.
+"""
+
+import logging
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from cortex.apt_scheduler import AptCommand, parse_apt_command
+
+logger = logging.getLogger(__name__)
+
+APT_LISTS_DIR = "/var/lib/apt/lists"
+
+# Package lists younger than this are considered fresh (seconds)
+DEFAULT_INDEX_MAX_AGE = 3600
+
+# Upper bound for a single background apt-get invocation (seconds)
+DEFAULT_PREFETCH_TIMEOUT = 1800
+
+# Separators between commands in a single plan step
+_COMMAND_SEPARATORS = re.compile(r"\s*(?:&&|\|\||;)\s*")
+
+
+def _privilege_prefix() -> list[str] | None:
+    """Command prefix that runs apt-get as root without prompting.
+
+    Returns ``[]`` when already root, ``["sudo", "-n"]`` when passwordless
+    sudo works and None when apt-get cannot be run unattended.
+    """
+    if not shutil.which("apt-get"):
+        return None
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        return []
+    if not shutil.which("sudo"):
+        return None
+    try:
+        result = subprocess.run(["sudo", "-n", "true"], capture_output=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return ["sudo", "-n"] if result.returncode == 0 else None
+
+
+def install_commands(commands: list[str]) -> list[AptCommand]:
+    """apt install invocations contained in plan commands.
+
+    Steps chained with ``&&``, ``||`` or ``;`` are split; anything that is
+    not a plain apt/apt-get install is ignored.
+    """
+    found = []
+    for command in commands:
+        for part in _COMMAND_SEPARATORS.split(command):
+            apt_cmd = parse_apt_command(part)
+            if apt_cmd and apt_cmd.action == "install" and apt_cmd.packages:
+                found.append(apt_cmd)
+    return found
+
+
+class AptPrefetcher:
+    """Background apt index refresh and package download.
+
+    Usage:
+        prefetcher = AptPrefetcher()
+        prefetcher.refresh_index()
+        commands = interpreter.parse(request)
+        prefetcher.prefetch(commands)
+        ...
+        prefetcher.wait()  # before running the plan
+    """
+
+    def __init__(
+        self,
+        lists_dir: str = APT_LISTS_DIR,
+        max_age: float = DEFAULT_INDEX_MAX_AGE,
+        timeout: float = DEFAULT_PREFETCH_TIMEOUT,
+    ):
+        self.lists_dir = Path(lists_dir)
+        self.max_age = max_age
+        self.timeout = timeout
+        self._prefix: list[str] | None = None
+        self._prefix_checked = False
+        self._refresh: subprocess.Popen | None = None
+        # Read end of a pipe held open by the refresh until it exits
+        self._refresh_done: int | None = None
+        self._download: subprocess.Popen | None = None
+
+    @property
+    def available(self) -> bool:
+        """True if apt-get can be run without prompting for a password."""
+        if not self._prefix_checked:
+            self._prefix = _privilege_prefix()
+            self._prefix_checked = True
+        return self._prefix is not None
+
+    def index_age(self) -> float | None:
+        """Seconds since the package lists were last updated (None if never)."""
+        try:
+            mtimes = [
+                entry.stat().st_mtime
+                for entry in self.lists_dir.iterdir()
+                if entry.is_file() and entry.name != "lock"
+            ]
+        except OSError:
+            return None
+        if not mtimes:
+            return None
+        return max(0.0, time.time() - max(mtimes))
+
+    def _spawn(
+        self, args: list[str], stdin: int = subprocess.DEVNULL, pass_fds: tuple[int, ...] = ()
+    ) -> subprocess.Popen | None:
+        try:
+            # Own session: a prefetch started from a preview keeps running
+            # after the CLI exits.
+            return subprocess.Popen(
+                args,
+                stdin=stdin,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                pass_fds=pass_fds,
+            )
+        except OSError as e:
+            logger.debug(f"Could not start {args[0]}: {e}")
+            return None
+
+    def refresh_index(self) -> bool:
+        """Start ``apt-get update`` in the background if the lists are stale.
+
+        Returns:
+            True if a refresh was started
+        """
+        if self._refresh is not None or not self.available:
+            return False
+
+        age = self.index_age()
+        if age is not None and age < self.max_age:
+            return False
+
+        logger.debug("Package lists are stale, refreshing in the background")
+        read_fd, write_fd = os.pipe()
+        self._refresh = self._spawn(
+            [*self._prefix, "apt-get", "update", "-qq"], pass_fds=(write_fd,)
+        )
+        os.close(write_fd)
+        if self._refresh is None:
+            os.close(read_fd)
+            return False
+        self._refresh_done = read_fd
+        return True
+
+    def prefetch(self, commands: list[str]) -> list[str]:
+        """Download the packages installed by ``commands`` in the background.
+
+        All packages are fetched by one ``apt-get install --download-only``
+        that starts once a running index refresh has finished. The wait
+        happens in the spawned shell (end of file on a pipe the refresh
+        holds), not in this process.
+
+        Returns:
+            Names of the packages being prefetched
+        """
+        apt_cmds = install_commands(commands)
+        if not apt_cmds or self._download is not None or not self.available:
+            return []
+
+        # One invocation for the whole plan: concurrent downloads would
+        # contend for the archive cache lock.
+        packages = list(dict.fromkeys(pkg for apt_cmd in apt_cmds for pkg in apt_cmd.packages))
+        download = AptCommand(tool="apt-get", action="install", packages=packages)
+        for apt_cmd in apt_cmds:
+            download = download.with_options(*apt_cmd.options)
+        download = download.with_options("--download-only", "-y", "-qq")
+
+        command = shlex.join([*self._prefix, *shlex.split(download.to_command())])
+        if self._refresh_done is None:
+            self._download = self._spawn(shlex.split(command))
+        else:
+            # The pipe is the shell's stdin: cat returns once the refresh exits
+            self._download = self._spawn(
+                [
+                    "sh",
+                    "-c",
+                    f"timeout {int(self.timeout)} cat >/dev/null; exec {command} </dev/null",
+                ],
+                stdin=self._refresh_done,
+            )
+            self._close_refresh_pipe()
+        return packages if self._download is not None else []
+
+    def _close_refresh_pipe(self):
+        if self._refresh_done is not None:
+            os.close(self._refresh_done)
+            self._refresh_done = None
+
+    def _wait_process(self, process: subprocess.Popen | None):
+        if process is None:
+            return
+        try:
+            process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            logger.debug("Background apt-get timed out, terminating it")
+            process.kill()
+            process.wait()
+
+    def wait(self):
+        """Wait for all background apt work to finish."""
+        self._close_refresh_pipe()
+        self._wait_process(self._refresh)
+        self._wait_process(self._download)
+        if self._download is not None and self._download.returncode:
+            logger.debug(f"Prefetch exited with status {self._download.returncode}")
@@ -0,0 +1,305 @@
+"""
+dpkg/apt lock-aware scheduling for parallel installs.
+
+Only one process can hold the dpkg frontend lock, so running several
+``apt install`` steps side by side mostly produces "Could not get lock"
+failures. The scheduler in this module splits apt work into two phases:
+
+1. Fetch: ``apt-get install --download-only`` runs concurrently for every
+   apt install step, each into its own archive directory so the
+   downloads do not contend for ``/var/cache/apt/archives/lock``.
+2. Install: the real install runs serialized under a single asyncio lock,
+   reusing the downloaded ``.deb`` files. If another process (unattended
+   upgrades, a second terminal) holds the dpkg lock, the step waits and
+   retries instead of failing.
+
+Non-apt steps are not touched and keep running in parallel.
+"""
+
+import asyncio
+import logging
+import re
+import shlex
+import shutil
+import tempfile
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+APT_TOOLS = ("apt", "apt-get")
+
+# Actions that mutate the package database and therefore need the dpkg lock
+APT_LOCKING_ACTIONS = (
+    "install",
+    "reinstall",
+    "remove",
+    "purge",
+    "upgrade",
+    "dist-upgrade",
+    "full-upgrade",
+    "autoremove",
+    "update",
+)
+
+# apt/apt-get options that consume the following token as their value
+_OPTIONS_WITH_VALUE = {"-o", "--option", "-t", "--target-release", "-c", "--config-file", "-a"}
+
+# Shell metacharacters that make a command more than a single apt invocation
+_SHELL_METACHARS = re.compile(r"[;&|<>`$()\n]")
+
+_LOCKING_COMMAND_RE = re.compile(
+    r"(?:^|[\s;&|(])(?:apt|apt-get|aptitude)\s+(?:\S+\s+)*?(?:"
+    + "|".join(re.escape(a) for a in APT_LOCKING_ACTIONS)
+    + r")\b"
+    r"|(?:^|[\s;&|(])dpkg\s+(?:\S+\s+)*?(?:-i|--install|-r|--remove|-P|--purge|--configure|-a)\b",
+)
+
+# Messages apt/dpkg print when another process holds one of their locks
+LOCK_ERROR_PATTERNS = [
+    r"Could not get lock",
+    r"Unable to acquire the dpkg frontend lock",
+    r"Unable to lock the administration directory",
+    r"Unable to lock directory",
+    r"is another process using it\?",
+    r"dpkg status database is locked by another process",
+]
+
+_LOCK_ERROR_RE = re.compile("|".join(LOCK_ERROR_PATTERNS), re.IGNORECASE)
+
+
+@dataclass
+class AptCommand:
+    """A single, parsed ``[sudo] apt|apt-get <action> ...`` invocation."""
+
+    tool: str
+    action: str
+    packages: list[str] = field(default_factory=list)
+    options: list[str] = field(default_factory=list)
+    sudo: bool = False
+
+    def to_command(self) -> str:
+        """Render the invocation back to a shell command string."""
+        parts = ["sudo"] if self.sudo else []
+        parts += [self.tool, self.action, *self.options, *self.packages]
+        return " ".join(shlex.quote(part) for part in parts)
+
+    def with_options(self, *options: str) -> "AptCommand":
+        """Return a copy with extra options appended (existing flags are not repeated)."""
+        merged = list(self.options)
+        index = 0
+        while index < len(options):
+            opt = options[index]
+            if opt in _OPTIONS_WITH_VALUE and index + 1 < len(options):
+                merged += [opt, options[index + 1]]
+                index += 1
+            elif opt not in merged:
+                merged.append(opt)
+            index += 1
+        return replace(self, options=merged, packages=list(self.packages))
+
+
+def parse_apt_command(command: str) -> AptCommand | None:
+    """Parse a plain apt/apt-get command.
+
+    Only simple invocations are recognised; anything containing pipes,
+    redirects, command lists or substitutions returns None so callers can
+    treat it as an opaque shell command.
+
+    Args:
+        command: Shell command string
+
+    Returns:
+        Parsed AptCommand, or None if the command is not a plain apt call
+    """
+    if not command or _SHELL_METACHARS.search(command):
+        return None
+
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+
+    sudo = False
+    if tokens and tokens[0] == "sudo":
+        sudo = True
+        tokens = tokens[1:]
+
+    if not tokens or tokens[0] not in APT_TOOLS:
+        return None
+
+    tool = tokens[0]
+    action: str | None = None
+    options: list[str] = []
+    packages: list[str] = []
+
+    index = 1
+    while index < len(tokens):
+        token = tokens[index]
+        if token.startswith("-"):
+            options.append(token)
+            if token in _OPTIONS_WITH_VALUE and index + 1 < len(tokens):
+                options.append(tokens[index + 1])
+                index += 1
+        elif action is None:
+            action = token
+        else:
+            packages.append(token)
+        index += 1
+
+    if action is None:
+        return None
+
+    return AptCommand(tool=tool, action=action, packages=packages, options=options, sudo=sudo)
+
+
+def needs_dpkg_lock(command: str) -> bool:
+    """Return True if a shell command runs apt/dpkg in a way that takes the dpkg lock."""
+    return bool(_LOCKING_COMMAND_RE.search(command or ""))
+
+
+def is_lock_error(output: str) -> bool:
+    """Return True if apt/dpkg output reports lock contention."""
+    return bool(_LOCK_ERROR_RE.search(output or ""))
+
+
+# Runner used by the scheduler: takes a shell command and returns
+# (return_code, stdout, stderr). It may raise on timeout.
+CommandRunner = Callable[[str], Awaitable[tuple[int, str, str]]]
+
+
+class AptLockScheduler:
+    """Serializes dpkg-locking steps while letting downloads run concurrently.
+
+    One scheduler instance is shared by all tasks of a parallel run.
+
+    Usage:
+        scheduler = AptLockScheduler()
+        if scheduler.handles(command):
+            rc, out, err = await scheduler.run(command, runner)
+    """
+
+    def __init__(
+        self,
+        cache_root: str | Path | None = None,
+        lock_retries: int = 10,
+        lock_wait: float = 3.0,
+        prefetch: bool = True,
+    ):
+        """
+        Args:
+            cache_root: Directory for per-step archive directories
+                (default: <tmp>/cortex-apt)
+            lock_retries: How many times to retry a step that hit lock contention
+            lock_wait: Base delay in seconds between lock retries (grows linearly)
+            prefetch: Run ``--download-only`` concurrently before the locked install
+        """
+        self.cache_root = (
+            Path(cache_root) if cache_root else Path(tempfile.gettempdir()) / "cortex-apt"
+        )
+        self.lock_retries = lock_retries
+        self.lock_wait = lock_wait
+        self.prefetch = prefetch
+        self._install_lock = asyncio.Lock()
+
+    def handles(self, command: str) -> bool:
+        """Return True if the command must go through the scheduler."""
+        return needs_dpkg_lock(command)
+
+    def _make_archive_dir(self) -> Path:
+        self.cache_root.mkdir(parents=True, exist_ok=True)
+        archive_dir = Path(tempfile.mkdtemp(prefix="archives-", dir=self.cache_root))
+        # apt refuses to use an archive directory without a partial/ subdirectory
+        (archive_dir / "partial").mkdir(exist_ok=True)
+        return archive_dir
+
+    async def _prefetch(
+        self,
+        apt_cmd: AptCommand,
+        runner: CommandRunner,
+        log: Callable[[str, str], None] | None,
+    ) -> tuple[Path | None, str, str]:
+        """Download packages for an install step without taking the dpkg lock."""
+        archive_dir = self._make_archive_dir()
+        archives_opt = f"Dir::Cache::Archives={archive_dir}/"
+        download = apt_cmd.with_options("-y", "--download-only", "-o", archives_opt)
+
+        returncode, stdout, stderr = await runner(download.to_command())
+        if returncode != 0:
+            shutil.rmtree(archive_dir, ignore_errors=True)
+            if log:
+                log(
+                    f"Prefetch of {' '.join(apt_cmd.packages)} failed, "
+                    "downloading during install instead",
+                    "info",
+                )
+            return None, stdout, stderr
+
+        return archive_dir, stdout, stderr
+
+    async def run(
+        self,
+        command: str,
+        runner: CommandRunner,
+        log: Callable[[str, str], None] | None = None,
+    ) -> tuple[int, str, str]:
+        """Run an apt/dpkg step in two phases.
+
+        Args:
+            command: Shell command to run
+            runner: Coroutine function executing a shell command
+            log: Optional callback (message, level)
+
+        Returns:
+            (return_code, stdout, stderr) of the locked install phase, with
+            the prefetch output prepended
+        """
+        apt_cmd = parse_apt_command(command)
+        install_command = command
+        archive_dir: Path | None = None
+        prefix_out = prefix_err = ""
+
+        if self.prefetch and apt_cmd and apt_cmd.action == "install" and apt_cmd.packages:
+            archive_dir, prefix_out, prefix_err = await self._prefetch(apt_cmd, runner, log)
+            if archive_dir is not None:
+                install_command = apt_cmd.with_options(
+                    "-o", f"Dir::Cache::Archives={archive_dir}/"
+                ).to_command()
+
+        try:
+            async with self._install_lock:
+                returncode, stdout, stderr = await self._run_with_lock_retries(
+                    install_command, runner, log
+                )
+        finally:
+            if archive_dir is not None:
+                shutil.rmtree(archive_dir, ignore_errors=True)
+
+        return returncode, prefix_out + stdout, prefix_err + stderr
+
+    async def _run_with_lock_retries(
+        self,
+        command: str,
+        runner: CommandRunner,
+        log: Callable[[str, str], None] | None,
+    ) -> tuple[int, str, str]:
+        attempt = 0
+        while True:
+            returncode, stdout, stderr = await runner(command)
+            if returncode == 0 or not is_lock_error(stderr + stdout):
+                return returncode, stdout, stderr
+
+            if attempt >= self.lock_retries:
+                logger.warning(f"Giving up on dpkg lock after {attempt + 1} attempts: {command}")
+                return returncode, stdout, stderr
+
+            attempt += 1
+            delay = self.lock_wait * attempt
+            if log:
+                log(
+                    f"dpkg lock held by another process, retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{self.lock_retries})",
+                    "info",
+                )
+            await asyncio.sleep(delay)
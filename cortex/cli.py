@@ -1,12 +1,15 @@
 import argparse
 import logging
 import os
+import sqlite3
 import sys
 import time
+from collections.abc import Collection
 from datetime import datetime
 from typing import Any
 
 from cortex.api_key_detector import auto_detect_api_key, setup_api_key
+from cortex.apt_prefetch import AptPrefetcher
 from cortex.ask import AskHandler
 from cortex.branding import VERSION, console, cx_header, cx_print, show_banner
 from cortex.coordinator import InstallationCoordinator, InstallationStep, StepStatus
@@ -17,6 +20,7 @@ from cortex.dependency_importer import (
     ParseResult,
     format_package_list,
 )
+from cortex.dependency_resolver import DependencyResolver, MultiPackageGraph
 from cortex.env_manager import EnvironmentManager, get_env_manager
 from cortex.installation_history import InstallationHistory, InstallationStatus, InstallationType
 from cortex.llm.interpreter import CommandInterpreter
@@ -28,6 +32,7 @@ from cortex.validators import validate_api_key, validate_install_request
 # Suppress noisy log messages in normal operation
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("cortex.installation_history").setLevel(logging.ERROR)
+logging.getLogger("cortex.dependency_resolver").setLevel(logging.WARNING)
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
@@ -268,28 +273,89 @@ class CortexCLI:
             self._print_error(f"Stack '{suggested_name}' has no packages configured.")
             return 1
 
+        # One merged graph: shared dependencies resolved once, conflicts across packages
+        graph = manager.resolve_stack(suggested_name)
+
         if args.dry_run:
-            return self._handle_stack_dry_run(stack, packages)
+            return self._handle_stack_dry_run(stack, packages, graph)
+
+        return self._handle_stack_real_install(stack, packages, graph)
+
+    def _print_stack_conflicts(self, graph: MultiPackageGraph | None) -> None:
+        if graph and graph.conflicts:
+            cx_print("⚠️  Conflicts detected:", "warning")
+            for pkg1, pkg2 in graph.conflicts:
+                console.print(f"   - {pkg1} conflicts with {pkg2}")
 
-        return self._handle_stack_real_install(stack, packages)
+    def _stack_install_commands(
+        self, graph: MultiPackageGraph | None
+    ) -> list[dict[str, str]] | None:
+        """apt commands installing a stack level by level from its merged graph.
 
-    def _handle_stack_dry_run(self, stack: dict[str, Any], packages: list[str]) -> int:
+        The dependencies are marked as automatically installed afterwards,
+        so apt can still autoremove them. Returns None when the graph cannot
+        drive the install: no apt lists, stack entries that are not apt
+        packages, or dependency cycles.
+        """
+        if graph is None or not graph.indexed or graph.unresolved or graph.cycles:
+            return None
+
+        commands = [
+            {
+                "command": f"sudo apt-get install -y {' '.join(level)}",
+                "description": f"Install {', '.join(level)}",
+            }
+            for level in graph.installation_levels
+        ]
+        dependencies = [pkg for pkg in graph.installation_order if pkg not in graph.packages]
+        if dependencies:
+            commands.append(
+                {
+                    "command": f"sudo apt-mark auto {' '.join(dependencies)}",
+                    "description": "Mark dependencies as automatically installed",
+                }
+            )
+        return commands
+
+    def _handle_stack_dry_run(
+        self, stack: dict[str, Any], packages: list[str], graph: MultiPackageGraph | None = None
+    ) -> int:
         """Preview packages that would be installed without executing."""
         cx_print(f"\n📋 Stack: {stack['name']}", "info")
         console.print("\nPackages that would be installed:")
         for pkg in packages:
             console.print(f"  • {pkg}")
         console.print(f"\nTotal: {len(packages)} packages")
+
+        if graph:
+            missing = graph.missing_dependencies
+            console.print(
+                f"Dependencies: {len(graph.all_dependencies)} ({len(missing)} to install)"
+            )
+            if graph.installation_order:
+                console.print("\n[bold]Installation order:[/bold]")
+                for i, level in enumerate(graph.installation_levels, 1):
+                    console.print(f"  {i}. {', '.join(level)}")
+            self._print_stack_conflicts(graph)
+
         cx_print("\nDry run only - no commands executed", "warning")
         return 0
 
-    def _handle_stack_real_install(self, stack: dict[str, Any], packages: list[str]) -> int:
+    def _handle_stack_real_install(
+        self, stack: dict[str, Any], packages: list[str], graph: MultiPackageGraph | None = None
+    ) -> int:
         """Install all packages in the stack."""
         cx_print(f"\n🚀 Installing stack: {stack['name']}\n", "success")
+        self._print_stack_conflicts(graph)
 
-        # Batch into a single LLM request
-        packages_str = " ".join(packages)
-        result = self.install(software=packages_str, execute=True, dry_run=False)
+        commands = self._stack_install_commands(graph)
+        if commands is not None:
+            # In the installation order of the merged graph
+            result = self._execute_multi_install(commands) if commands else 0
+        else:
+            # Not all apt packages (pytorch, terraform, ...): batch into a single LLM request
+            packages_str = " ".join(packages)
+            result = self.install(software=packages_str, execute=True, dry_run=False)
 
         if result != 0:
             self._print_error(f"Failed to install stack '{stack['name']}'")
@@ -556,12 +622,19 @@ class CortexCLI:
         execute: bool = False,
         dry_run: bool = False,
         parallel: bool = False,
+        pipeline: bool = False,
     ):
         # Validate input first
         is_valid, error = validate_install_request(software)
         if not is_valid:
             self._print_error(error)
             return 1
+        if pipeline and not execute:
+            self._print_error("--pipeline requires --execute")
+            return 1
+        if pipeline and parallel:
+            self._print_error("--pipeline cannot be combined with --parallel")
+            return 1
 
         # Special-case the ml-cpu stack:
         # The LLM sometimes generates outdated torch==1.8.1+cpu installs
@@ -600,6 +673,14 @@ class CortexCLI:
                 self._animate_spinner("Analyzing system requirements...")
             self._clear_line()
 
+            if pipeline:
+                return self._install_pipelined(software, interpreter, history, start_time)
+
+            # Refresh stale apt lists while the plan is being generated
+            prefetcher = AptPrefetcher()
+            if prefetcher.refresh_index():
+                self._debug("Refreshing apt package lists in the background")
+
             commands = interpreter.parse(f"install {software}")
 
             if not commands:
@@ -608,6 +689,11 @@ class CortexCLI:
                 )
                 return 1
 
+            # Start downloading packages while the plan is reviewed
+            prefetched = prefetcher.prefetch(commands)
+            if prefetched:
+                self._debug(f"Prefetching {len(prefetched)} package(s): {', '.join(prefetched)}")
+
             # Extract packages from commands for tracking
             packages = history._extract_packages_from_commands(commands)
 
@@ -621,6 +707,7 @@ class CortexCLI:
             print("\nGenerated commands:")
             for i, cmd in enumerate(commands, 1):
                 print(f"  {i}. {cmd}")
+            self._print_plan_estimate(history, packages)
 
             if dry_run:
                 print("\n(Dry run mode - commands not executed)")
@@ -639,12 +726,20 @@ class CortexCLI:
                     print(f"\n[{current}/{total}] {status_emoji} {step.description}")
                     print(f"  Command: {step.command}")
 
+                def output_callback(step, stream, line):
+                    # Live command output is only echoed in verbose mode
+                    print(f"    {line}", file=sys.stderr if stream == "stderr" else sys.stdout)
+
+                # Background apt work must finish before the plan takes the apt locks
+                prefetcher.wait()
+
                 print("\nExecuting commands...")
 
                 if parallel:
                     import asyncio
 
                     from cortex.install_parallel import run_parallel_install
+                    from cortex.timing_analysis import analyze_parallel_run
 
                     def parallel_log_callback(message: str, level: str = "info"):
                         if level == "success":
@@ -678,6 +773,11 @@ class CortexCLI:
                             if max_end is not None and min_start is not None:
                                 total_duration = max_end - min_start
 
+                        if install_id:
+                            self._save_timing(
+                                history, install_id, analyze_parallel_run(parallel_tasks)
+                            )
+
                         if success:
                             self._print_success(f"{software} installed successfully!")
                             print(f"\nCompleted in {total_duration:.2f} seconds (parallel mode)")
@@ -728,15 +828,27 @@ class CortexCLI:
                             traceback.print_exc()
                         return 1
 
+                checkpoint_callback = None
+                if install_id:
+
+                    def checkpoint_callback(index, step):
+                        history.save_checkpoint(install_id, index, step.to_dict())
+
                 coordinator = InstallationCoordinator(
                     commands=commands,
                     descriptions=[f"Step {i + 1}" for i in range(len(commands))],
                     timeout=300,
                     stop_on_error=True,
                     progress_callback=progress_callback,
+                    optimize=True,
+                    stream_output=True,
+                    output_callback=output_callback if self.verbose else None,
+                    checkpoint_callback=checkpoint_callback,
                 )
 
                 result = coordinator.execute()
+                if install_id:
+                    self._save_timing(history, install_id, result.timing)
 
                 if result.success:
                     self._print_success(f"{software} installed successfully!")
@@ -766,6 +878,7 @@ class CortexCLI:
                     if install_id:
                         print(f"\n📝 Installation recorded (ID: {install_id})")
                         print(f"   View details: cortex history {install_id}")
+                        print(f"   To resume: cortex install --resume {install_id}")
                     return 1
             else:
                 print("\nTo execute these commands, run with --execute flag")
@@ -798,6 +911,132 @@ class CortexCLI:
                 traceback.print_exc()
             return 1
 
+    def _install_pipelined(
+        self,
+        software: str,
+        interpreter: CommandInterpreter,
+        history: InstallationHistory,
+        start_time: datetime,
+    ) -> int:
+        """Run each generated command as soon as the model has written it."""
+        install_id = history.record_installation(InstallationType.INSTALL, [], [], start_time)
+
+        def progress_callback(current, total, step):
+            print(f"\n[{current}] ⏳ {step.description}")
+            print(f"  Command: {step.command}")
+
+        def checkpoint_callback(index, step):
+            history.save_checkpoint(install_id, index, step.to_dict())
+
+        coordinator = InstallationCoordinator(
+            commands=[],
+            timeout=300,
+            stop_on_error=True,
+            progress_callback=progress_callback,
+            stream_output=True,
+            output_callback=(
+                (lambda step, stream, line: print(f"    {line}")) if self.verbose else None
+            ),
+            checkpoint_callback=checkpoint_callback,
+        )
+
+        self._print_status("⚙️", f"Installing {software} (pipelined)...")
+        result = coordinator.execute_stream(interpreter.parse_stream(f"install {software}"))
+
+        history.record_commands(install_id, [step.command for step in result.steps])
+        self._save_timing(history, install_id, result.timing)
+
+        if result.success and result.steps:
+            history.update_installation(install_id, InstallationStatus.SUCCESS)
+            self._print_success(f"{software} installed successfully!")
+            print(f"\nCompleted in {result.total_duration:.2f} seconds")
+            print(f"\n📝 Installation recorded (ID: {install_id})")
+            return 0
+
+        error_msg = result.error_message or "No commands generated"
+        history.update_installation(install_id, InstallationStatus.FAILED, error_msg)
+        if result.failed_step is not None:
+            self._print_error(f"Installation failed at step {result.failed_step + 1}")
+        else:
+            self._print_error("Installation failed")
+        print(f"  Error: {error_msg}", file=sys.stderr)
+        print(f"\n📝 Installation recorded (ID: {install_id})")
+        print(f"   View details: cortex history {install_id}")
+        return 1
+
+    def resume_install(self, install_id: str, verify: bool = True) -> int:
+        """Resume an interrupted or failed installation from its checkpoint.
+
+        Steps that completed in the earlier run are skipped (after checking
+        that their effect is still present unless ``verify`` is False); the
+        remaining steps run as usual.
+        """
+        history = InstallationHistory()
+
+        record = history.get_installation(install_id)
+        if record is None:
+            self._print_error(f"Installation {install_id} not found")
+            return 1
+        if record.status == InstallationStatus.SUCCESS:
+            self._print_success(f"Installation {install_id} already completed")
+            return 0
+
+        saved_steps = history.get_checkpoints(install_id)
+        if not saved_steps:
+            self._print_error(f"No checkpoint recorded for installation {install_id}")
+            return 1
+
+        def progress_callback(current, total, step):
+            status_emoji = "⏳"
+            if step.status == StepStatus.SUCCESS:
+                status_emoji = "✅"
+            elif step.status == StepStatus.FAILED:
+                status_emoji = "❌"
+            print(f"\n[{current}/{total}] {status_emoji} {step.description}")
+            print(f"  Command: {step.command}")
+
+        def checkpoint_callback(index, step):
+            history.save_checkpoint(install_id, index, step.to_dict())
+
+        try:
+            coordinator = InstallationCoordinator.from_checkpoint(
+                saved_steps,
+                verify_completed=verify,
+                timeout=300,
+                stop_on_error=True,
+                progress_callback=progress_callback,
+                checkpoint_callback=checkpoint_callback,
+            )
+            done = sum(1 for step in coordinator.steps if step.status == StepStatus.SUCCESS)
+            self._print_status(
+                "🔁", f"Resuming {install_id}: {done}/{len(coordinator.steps)} steps already done"
+            )
+
+            result = coordinator.execute()
+        except (ValueError, OSError) as e:
+            history.update_installation(install_id, InstallationStatus.FAILED, str(e))
+            self._print_error(f"Resume failed: {str(e)}")
+            return 1
+
+        self._save_timing(history, install_id, result.timing)
+
+        if result.success:
+            history.update_installation(install_id, InstallationStatus.SUCCESS)
+            self._print_success(f"Installation {install_id} resumed and completed")
+            print(f"\nCompleted in {result.total_duration:.2f} seconds")
+            return 0
+
+        history.update_installation(
+            install_id, InstallationStatus.FAILED, result.error_message or "Installation failed"
+        )
+        if result.failed_step is not None:
+            self._print_error(f"Installation failed at step {result.failed_step + 1}")
+        else:
+            self._print_error("Installation failed")
+        if result.error_message:
+            print(f"  Error: {result.error_message}", file=sys.stderr)
+        return 1
+
     def cache_stats(self) -> int:
         try:
             from cortex.semantic_cache import SemanticCache
@@ -823,7 +1062,65 @@ class CortexCLI:
                 traceback.print_exc()
             return 1
 
-    def history(self, limit: int = 20, status: str | None = None, show_id: str | None = None):
+    def _save_timing(self, history: InstallationHistory, install_id: str, report) -> None:
+        """Store the timing report of a run; failures only affect the report."""
+        if report is None:
+            return
+        try:
+            history.save_timing(install_id, report.to_dict())
+        except Exception as e:
+            self._debug(f"Could not store timing report: {e}")
+
+    def _print_timing(self, report: dict) -> None:
+        from cortex.timing_analysis import TimingReport
+
+        timing = TimingReport.from_dict(report)
+        print("\nTiming:")
+        print(f"  Wall time: {timing.wall_time:.2f}s")
+        print(f"  Step time: {timing.total_step_time:.2f}s")
+        print(f"  Parallel efficiency: {timing.parallel_efficiency:.2f}")
+        print(f"  Idle time: {timing.idle_time:.2f}s")
+
+        if timing.critical_path:
+            print(f"\n  Critical path ({timing.critical_path_time:.2f}s):")
+            for name in timing.critical_path:
+                step = timing.step(name)
+                print(f"    {name:<10} {step.duration:>9.2f}s  {step.description}")
+
+        if timing.slowest_steps:
+            print("\n  Slowest steps:")
+            for name in timing.slowest_steps:
+                step = timing.step(name)
+                print(f"    {name:<10} {step.duration:>9.2f}s  [{step.status}] {step.description}")
+
+        if timing.idle_gaps:
+            print("\n  Idle gaps:")
+            for gap in timing.idle_gaps:
+                print(f"    +{gap.start:.2f}s .. +{gap.end:.2f}s ({gap.duration:.2f}s)")
+
+    def _print_plan_estimate(self, history: InstallationHistory, packages: list[str]):
+        """Expected duration and failure risk of a plan, from past installations"""
+        try:
+            estimate = history.estimate_plan(packages)
+        except sqlite3.Error as e:
+            self._debug(f"No plan estimate: {e}")
+            return
+        if estimate is None:
+            return
+        eta = f"~{estimate.duration:.0f}s, " if estimate.duration is not None else ""
+        print(
+            f"\nEstimate: {eta}{estimate.failure_risk:.0%} failure risk "
+            f"(from up to {estimate.samples} past installations)"
+        )
+
+    def history(
+        self,
+        limit: int = 20,
+        status: str | None = None,
+        show_id: str | None = None,
+        timing: bool = False,
+        package: str | None = None,
+    ):
         """Show installation history"""
         history = InstallationHistory()
 
@@ -856,11 +1153,18 @@ class CortexCLI:
                         print(f"  {cmd}")
 
                 print(f"\nRollback available: {record.rollback_available}")
+
+                if timing:
+                    report = history.get_timing(show_id)
+                    if report:
+                        self._print_timing(report)
+                    else:
+                        print("\nNo timing data recorded for this installation.")
                 return 0
             else:
                 # List history
                 status_filter = InstallationStatus(status) if status else None
-                records = history.get_history(limit, status_filter)
+                records = history.get_history(limit, status_filter, package=package)
 
                 if not records:
                     print("No installation records found.")
@@ -893,6 +1197,104 @@ class CortexCLI:
                 traceback.print_exc()
             return 1
 
+    def history_search(self, query: str, limit: int = 20, sources: list[str] | None = None):
+        """Search installations, transactions and the sandbox audit log"""
+        from cortex.history_search import SOURCES, search_history
+
+        if not query.strip():
+            self._print_error('Usage: cortex history search "<query>"')
+            return 1
+
+        try:
+            hits = search_history(query, limit, sources or SOURCES)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            self._print_error(f"History search failed: {str(e)}")
+            return 1
+
+        if not hits:
+            print(f"No history records match: {query}")
+            return 0
+
+        print(f"\n{'Source':<14} {'Date':<20} {'ID':<32} Summary")
+        print("=" * 100)
+        for hit in hits:
+            date = hit.timestamp[:19].replace("T", " ")
+            print(f"{hit.source:<14} {date:<20} {hit.record_id:<32} {hit.summary}")
+            print(f"{'':<14} {hit.snippet}")
+        return 0
+
+    def history_stats(self, limit: int = 20, package: str | None = None):
+        """Show success rates and durations of past installations"""
+        try:
+            history = InstallationHistory()
+            if package:
+                sections = [("Package", history.get_outcome_stats("package", key=package))]
+            else:
+                sections = [
+                    ("Package", history.get_outcome_stats("package", limit)),
+                    ("Command", history.get_outcome_stats("pattern", limit)),
+                ]
+            overall = history.get_outcome_stats("all")
+        except (ValueError, OSError, sqlite3.Error) as e:
+            self._print_error(f"Failed to read history statistics: {str(e)}")
+            return 1
+
+        if not overall:
+            print("No finished installations recorded.")
+            return 0
+
+        def duration(seconds):
+            return f"{seconds:.1f}s" if seconds is not None else "-"
+
+        total = overall[0]
+        print(
+            f"\n{total.attempts} installations, {total.success_rate:.0%} successful, "
+            f"p50 {duration(total.p50_duration)}, p95 {duration(total.p95_duration)}"
+        )
+        for title, entries in sections:
+            if not entries:
+                print(f"\nNo installations of {package} recorded.")
+                continue
+            print(f"\n{title:<30} {'Runs':>6} {'Success':>8} {'p50':>8} {'p95':>8}  Failures")
+            print("=" * 100)
+            for s in entries:
+                failures = ", ".join(f"{c} {n}" for c, n in s.failure_categories.items())
+                print(
+                    f"{s.key[:30]:<30} {s.attempts:>6} {s.success_rate:>8.0%} "
+                    f"{duration(s.p50_duration):>8} {duration(s.p95_duration):>8}  {failures}"
+                )
+        return 0
+
+    def history_export(
+        self,
+        filepath: str | None,
+        format: str = "json",
+        status: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        compression: str | None = None,
+    ):
+        """Export installation history to a file"""
+        if not filepath:
+            self._print_error("Usage: cortex history export <file> [--format ndjson|csv|parquet]")
+            return 1
+
+        try:
+            count = InstallationHistory().export_history(
+                filepath,
+                format,
+                since=datetime.fromisoformat(since) if since else None,
+                until=datetime.fromisoformat(until) if until else None,
+                status_filter=InstallationStatus(status) if status else None,
+                compression=compression,
+            )
+        except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+            self._print_error(f"History export failed: {str(e)}")
+            return 1
+
+        cx_print(f"Exported {count} records to {filepath}", "success")
+        return 0
+
     def rollback(self, install_id: str, dry_run: bool = False):
         """Rollback an installation"""
         history = InstallationHistory()
@@ -1350,14 +1752,31 @@ class CortexCLI:
             self._print_error(f"Unknown ecosystem: {result.ecosystem.value}")
             return 1
 
+        # Missing toolchain packages (pip, npm, ...) are installed first
+        system_cmd = importer.get_system_install_command({file_path: result}, DependencyResolver())
+        if system_cmd and system_cmd.get("conflicts"):
+            cx_print(f"⚠️  Conflicts detected: {system_cmd['conflicts']}", "warning")
+
         # Dry run mode (default)
         if not execute:
+            if system_cmd:
+                console.print(f"\n[bold]System packages:[/bold] {system_cmd['command']}")
             console.print(f"\n[bold]Install command:[/bold] {install_cmd}")
             cx_print("\nTo install these packages, run with --execute flag", "info")
             cx_print(f"Example: cortex import {file_path} --execute", "info")
             return 0
 
         # Execute mode - run the install command
+        if system_cmd:
+            return self._execute_multi_install(
+                [
+                    system_cmd,
+                    {
+                        "command": install_cmd,
+                        "description": f"Install packages from {os.path.basename(file_path)}",
+                    },
+                ]
+            )
         return self._execute_install(install_cmd, result.ecosystem)
 
     def _import_all(self, importer: DependencyImporter, execute: bool, include_dev: bool) -> int:
@@ -1393,11 +1812,14 @@ class CortexCLI:
             return 0
 
         # Generate install commands
-        commands = importer.get_install_commands_for_results(results)
+        commands = importer.get_install_commands_for_results(results, resolver=DependencyResolver())
 
         if not commands:
             cx_print("No install commands generated", "info")
             return 0
+        for cmd_info in commands:
+            if cmd_info.get("conflicts"):
+                cx_print(f"⚠️  Conflicts detected: {cmd_info['conflicts']}", "warning")
 
         # Dry run mode (default)
         if not execute:
@@ -1516,6 +1938,7 @@ class CortexCLI:
             timeout=600,
             stop_on_error=True,
             progress_callback=progress_callback,
+            optimize=True,
         )
 
         console.print("\n[bold]Installing packages...[/bold]")
@@ -1589,6 +2012,20 @@ def shell_suggest(text: str) -> int:
         return 1
 
 
+def _expand_history_shorthand(argv: list[str], actions: Collection[str]) -> list[str]:
+    """Expand ``cortex history <id>`` to ``cortex history show <id>``."""
+    for index, arg in enumerate(argv):
+        if not arg.startswith("-"):
+            break
+    else:
+        return argv
+    if arg == "history" and index + 1 < len(argv):
+        target = argv[index + 1]
+        if not target.startswith("-") and target not in actions:
+            return [*argv[: index + 1], "show", *argv[index + 1 :]]
+    return argv
+
+
 def main():
     # Load environment variables from .env files BEFORE accessing any API keys
     # This must happen before any code that reads os.environ for API keys
@@ -1646,7 +2083,7 @@ def main():
 
     # Install command
     install_parser = subparsers.add_parser("install", help="Install software")
-    install_parser.add_argument("software", type=str, help="Software to install")
+    install_parser.add_argument("software", type=str, nargs="?", help="Software to install")
     install_parser.add_argument("--execute", action="store_true", help="Execute commands")
     install_parser.add_argument("--dry-run", action="store_true", help="Show commands only")
     install_parser.add_argument(
@@ -1654,6 +2091,21 @@ def main():
         action="store_true",
         help="Enable parallel execution for multi-step installs",
     )
+    install_parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="With --execute, start running commands while the plan is still being generated",
+    )
+    install_parser.add_argument(
+        "--resume",
+        metavar="ID",
+        help="Resume an interrupted installation from its checkpoint",
+    )
+    install_parser.add_argument(
+        "--skip-verify",
+        action="store_true",
+        help="With --resume, trust completed steps without re-checking them",
+    )
 
     # Import command - import dependencies from package manager files
     import_parser = subparsers.add_parser(
@@ -1688,7 +2140,55 @@ def main():
     history_parser = subparsers.add_parser("history", help="View history")
     history_parser.add_argument("--limit", type=int, default=20)
     history_parser.add_argument("--status", choices=["success", "failed"])
-    history_parser.add_argument("show_id", nargs="?")
+    history_parser.add_argument("--package", help="Only installations that touched this package")
+    history_subs = history_parser.add_subparsers(dest="history_action", help="History actions")
+
+    # history show <id> (or just: history <id>)
+    history_show_parser = history_subs.add_parser("show", help="Show one installation")
+    history_show_parser.add_argument("show_id", help="Installation ID")
+    history_show_parser.add_argument(
+        "--timing", action="store_true", help="Show critical path and timing breakdown"
+    )
+
+    # history search <query...>
+    history_search_parser = history_subs.add_parser(
+        "search", help="Full-text search of the history", allow_abbrev=False
+    )
+    history_search_parser.add_argument(
+        "query", nargs="*", help="Text to search for (words may start with a dash)"
+    )
+    history_search_parser.add_argument("--limit", type=int, default=20)
+    history_search_parser.add_argument(
+        "--source",
+        action="append",
+        choices=["installations", "transactions", "audit"],
+        help="Only search this store (repeatable)",
+    )
+
+    # history export <file>
+    history_export_parser = history_subs.add_parser("export", help="Export the history to a file")
+    history_export_parser.add_argument("file", help="Output file")
+    history_export_parser.add_argument(
+        "--format",
+        choices=["json", "ndjson", "csv", "parquet"],
+        default="json",
+        help="Export format",
+    )
+    history_export_parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        help="Compress the export (default: from a .gz/.zst suffix)",
+    )
+    history_export_parser.add_argument("--status", choices=["success", "failed"])
+    history_export_parser.add_argument("--since", help="Only records at or after (ISO date)")
+    history_export_parser.add_argument("--until", help="Only records before (ISO date)")
+
+    # history stats
+    history_stats_parser = history_subs.add_parser(
+        "stats", help="Success rates and durations of past installations"
+    )
+    history_stats_parser.add_argument("--limit", type=int, default=20)
+    history_stats_parser.add_argument("--package", help="Statistics of this package only")
 
     # Rollback command
     rollback_parser = subparsers.add_parser("rollback", help="Rollback installation")
@@ -1872,7 +2372,14 @@ def main():
     )
     # --------------------------
 
-    args = parser.parse_args()
+    argv = _expand_history_shorthand(sys.argv[1:], history_subs.choices)
+    args, extra_args = parser.parse_known_args(argv)
+    if extra_args:
+        if args.command == "history" and args.history_action == "search":
+            # Query words that look like options, e.g. `--fix-broken`
+            args.query += extra_args
+        else:
+            parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
 
     if not args.command:
         show_rich_help()
@@ -1890,16 +2397,36 @@ def main():
         elif args.command == "ask":
             return cli.ask(args.question)
         elif args.command == "install":
+            if args.resume:
+                return cli.resume_install(args.resume, verify=not args.skip_verify)
+            if not args.software:
+                parser.error("the following arguments are required: software")
             return cli.install(
                 args.software,
                 execute=args.execute,
                 dry_run=args.dry_run,
                 parallel=args.parallel,
+                pipeline=args.pipeline,
             )
         elif args.command == "import":
             return cli.import_deps(args)
+        elif args.command == "history" and args.history_action == "search":
+            return cli.history_search(" ".join(args.query), limit=args.limit, sources=args.source)
+        elif args.command == "history" and args.history_action == "stats":
+            return cli.history_stats(limit=args.limit, package=args.package)
+        elif args.command == "history" and args.history_action == "export":
+            return cli.history_export(
+                args.file,
+                format=args.format,
+                status=args.status,
+                since=args.since,
+                until=args.until,
+                compression=args.compress,
+            )
+        elif args.command == "history" and args.history_action == "show":
+            return cli.history(show_id=args.show_id, timing=args.timing)
         elif args.command == "history":
-            return cli.history(limit=args.limit, status=args.status, show_id=args.show_id)
+            return cli.history(limit=args.limit, status=args.status, package=args.package)
         elif args.command == "rollback":
             return cli.rollback(args.id, dry_run=args.dry_run)
         # Handle the new notify command
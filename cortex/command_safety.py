@@ -0,0 +1,220 @@
+"""
+Shared command safety engine.
+
+Several components check commands against lists of dangerous regular
+expressions before running them. Looping over the list with
+``re.search(pattern, command, re.IGNORECASE)`` costs one regex scan per
+rule per command, repeated for every command of every plan.
+``SafetyEngine`` compiles a rule list once and narrows down the rules that
+can possibly match before running any regex:
+
+- Every rule has some literal text that any match must contain (``chmod``,
+  ``/dev/``, ``eval``...). A rule whose literal does not occur in the
+  command is skipped with a plain substring test, so a typical command
+  only runs the two or three rules that share a word with it.
+- Verdicts are memoized per command string in an LRU cache, since the same
+  commands (``sudo apt update``...) recur across plans and retries.
+
+When a command is blocked, the rule reported is the first matching one in
+list order, exactly as with the old per-rule loop.
+"""
+
+import re
+from collections.abc import Sequence
+from functools import lru_cache
+
+from cortex.validators import DANGEROUS_PATTERNS
+
+# Number of distinct command strings whose verdict is remembered
+DEFAULT_CACHE_SIZE = 4096
+
+# Fixed length (backslash included) of the escapes that encode one character
+_CODE_ESCAPE_LENGTHS = {"x": 4, "u": 6, "U": 10}
+
+
+def _escape_end(pattern: str, index: int) -> int:
+    """Index just past the escape sequence whose backslash is at ``index``."""
+    escaped = pattern[index + 1]
+    if escaped in _CODE_ESCAPE_LENGTHS:
+        return min(index + _CODE_ESCAPE_LENGTHS[escaped], len(pattern))
+    if escaped == "N" and pattern.startswith("{", index + 2):
+        end = pattern.find("}", index)
+        return end + 1 if end != -1 else len(pattern)
+    if escaped.isdigit():
+        # Backreference or octal escape, at most three digits
+        end = index + 2
+        while end < min(index + 4, len(pattern)) and pattern[end].isdigit():
+            end += 1
+        return end
+    return index + 2
+
+
+def _skip_group(pattern: str, index: int, opening: str, closing: str) -> int:
+    """Index just past the bracket/parenthesis group starting at ``index``."""
+    depth = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\" and index + 1 < len(pattern):
+            index = _escape_end(pattern, index)
+            continue
+        if char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    return index
+
+
+def required_literal(pattern: str) -> str | None:
+    """Longest literal substring that every match of ``pattern`` contains.
+
+    Only the top-level sequence of the pattern is inspected; groups,
+    classes and optional characters break literal runs. Returns None when
+    no literal is required (for example with a top-level ``|``) or the
+    pattern sets inline flags.
+    """
+    if pattern.startswith("(?") and not pattern.startswith(("(?:", "(?=", "(?!", "(?<", "(?P")):
+        return None
+
+    segments: list[str] = []
+    current = ""
+    index = 0
+
+    def flush():
+        nonlocal current
+        if current:
+            segments.append(current)
+        current = ""
+
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\" and index + 1 < len(pattern):
+            escaped = pattern[index + 1]
+            if escaped.isalnum():
+                # A class (\d, \s...), position (\b...) or character code
+                # (\x41, \u0041, \N{...}): ends the literal run
+                flush()
+            else:
+                current += escaped
+            index = _escape_end(pattern, index)
+        elif char == "[":
+            flush()
+            index = _skip_group(pattern, index, "[", "]")
+        elif char == "(":
+            flush()
+            index = _skip_group(pattern, index, "(", ")")
+        elif char == "|":
+            return None
+        elif char in "*?{":
+            # The preceding character is optional (or repeated a variable
+            # number of times): it cannot be part of the required literal
+            current = current[:-1]
+            flush()
+            if char == "{":
+                index = pattern.find("}", index) + 1 or len(pattern)
+            else:
+                index += 1
+            # Lazy/possessive suffix
+            if index < len(pattern) and pattern[index] in "?+":
+                index += 1
+        elif char in ".^$+":
+            flush()
+            index += 1
+        else:
+            current += char
+            index += 1
+
+    flush()
+    if not segments:
+        return None
+    return max(segments, key=len)
+
+
+class SafetyEngine:
+    """Compiled, memoized matcher for a list of dangerous command patterns.
+
+    Usage:
+        engine = SafetyEngine([r"rm\\s+-rf\\s+/", r"mkfs\\."])
+        rule = engine.check("sudo mkfs.ext4 /dev/sdb1")  # -> r"mkfs\\."
+        engine.is_safe("sudo apt update")  # -> True
+    """
+
+    def __init__(
+        self,
+        patterns: Sequence[str],
+        flags: int = re.IGNORECASE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.patterns = list(patterns)
+        self.flags = flags
+        self._rules = [re.compile(pattern, flags) for pattern in self.patterns]
+        self._ignore_case = bool(flags & re.IGNORECASE)
+
+        # Literal each rule requires, in the case it is compared in. Verbose
+        # patterns and non-ASCII literals (Unicode case folding) are never
+        # used to skip a rule.
+        self._literals: list[str | None] = []
+        for pattern in self.patterns:
+            literal = None if flags & re.VERBOSE else required_literal(pattern)
+            if literal is not None and not literal.isascii():
+                literal = None
+            if literal is not None and self._ignore_case:
+                literal = literal.lower()
+            self._literals.append(literal)
+
+        self._check_cached = lru_cache(maxsize=cache_size)(self._check)
+
+    @classmethod
+    def from_literals(cls, literals: Sequence[str], **kwargs) -> "SafetyEngine":
+        """Engine for case-insensitive substring rules."""
+        return cls([re.escape(literal) for literal in literals], **kwargs)
+
+    def _check(self, command: str) -> str | None:
+        # Substring tests are only exact for ASCII commands: with IGNORECASE,
+        # some non-ASCII characters match ASCII letters (e.g. the Kelvin sign
+        # matches "k"), so every rule is run for other commands.
+        if not command.isascii():
+            haystack = None
+        elif self._ignore_case:
+            haystack = command.lower()
+        else:
+            haystack = command
+
+        for pattern, rule, literal in zip(self.patterns, self._rules, self._literals):
+            if haystack is not None and literal is not None and literal not in haystack:
+                continue
+            if rule.search(command):
+                return pattern
+        return None
+
+    def check(self, command: str) -> str | None:
+        """Return the first rule ``command`` matches, or None if it is safe."""
+        return self._check_cached(command)
+
+    def is_safe(self, command: str) -> bool:
+        return self.check(command) is None
+
+    def matches(self, command: str) -> list[str]:
+        """All rules ``command`` matches, in list order (not memoized)."""
+        return [
+            pattern for pattern, rule in zip(self.patterns, self._rules) if rule.search(command)
+        ]
+
+    def cache_info(self):
+        """Hit/miss statistics of the verdict cache (``functools`` format)."""
+        return self._check_cached.cache_info()
+
+    def clear_cache(self):
+        self._check_cached.cache_clear()
+
+
+# Engine for cortex.validators.DANGEROUS_PATTERNS, shared by the installers
+# and the sandbox
+default_engine = SafetyEngine(DANGEROUS_PATTERNS)
+
+
+def check_command(command: str) -> str | None:
+    """Return the dangerous pattern ``command`` matches, or None if it is safe."""
+    return default_engine.check(command)
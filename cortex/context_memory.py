@@ -9,15 +9,37 @@ remember preferences, suggest optimizations, and personalize the experience.
 
 import hashlib
 import json
+import logging
 import re
 import sqlite3
+import threading
+import time
 from collections import Counter
 from dataclasses import asdict, dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
 
 from cortex.utils.db_pool import SQLiteConnectionPool, get_connection_pool
+from cortex.utils.fts_index import FullTextIndex, fts_query
+
+logger = logging.getLogger(__name__)
+
+# Ranking of similar interactions: bm25 relevance, divided by 1 + age / RECENCY_DAYS
+# and weighted down for failed interactions
+RECENCY_DAYS = 30.0
+FAILURE_WEIGHT = 0.5
+
+# An action becomes a pattern once it was seen PATTERN_MIN_COUNT times in its
+# category within the last PATTERN_WINDOW_DAYS, and is dropped when it no longer is
+PATTERN_WINDOW_DAYS = 30
+PATTERN_MIN_COUNT = 3
+# Seconds between background refreshes of the patterns
+PATTERN_REFRESH_INTERVAL = 300.0
+
+# Background pattern refresh threads, by database path
+_pattern_jobs: dict[str, threading.Thread] = {}
+_pattern_jobs_lock = threading.Lock()
 
 
 @dataclass
@@ -86,6 +108,10 @@ class ContextMemory:
         self.db_path = Path(db_path).expanduser()
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._pool: SQLiteConnectionPool | None = None
+        # Full-text index of interactions, for get_similar_interactions
+        self.text_index = FullTextIndex(
+            "memory_entries_fts", "memory_entries", ["context", "action", "result"]
+        )
         self._init_database()
 
     def _init_database(self):
@@ -160,6 +186,51 @@ class ContextMemory:
             """
             )
 
+            # Occurrences of each action per category and day, maintained on insert
+            counts_exist = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'action_counts'"
+            ).fetchone()
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS action_counts (
+                    category TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    last_seen TEXT NOT NULL,
+                    PRIMARY KEY (category, action, day)
+                )
+            """
+            )
+
+            # Actions counted since the patterns were last refreshed
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_patterns (
+                    category TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    PRIMARY KEY (category, action)
+                )
+            """
+            )
+
+            if not counts_exist:
+                # Existing database: count the entries of the current window once
+                cursor.execute(
+                    """
+                    INSERT INTO action_counts
+                    SELECT category, action, substr(timestamp, 1, 10), COUNT(*), MAX(timestamp)
+                    FROM memory_entries
+                    WHERE timestamp >= ?
+                    GROUP BY category, action, substr(timestamp, 1, 10)
+                """,
+                    (self._window_start(),),
+                )
+                cursor.execute(
+                    "INSERT OR IGNORE INTO pending_patterns "
+                    "SELECT DISTINCT category, action FROM action_counts"
+                )
+
             # Create indexes for performance
             cursor.execute(
                 "CREATE INDEX IF NOT EXISTS idx_memory_category ON memory_entries(category)"
@@ -174,6 +245,12 @@ class ContextMemory:
 
             conn.commit()
 
+            self.text_index.create(conn)
+            conn.commit()
+            if not self.text_index.ready(conn):
+                # Existing database: index its entries in the background
+                self.text_index.start_backfill(self._pool.get_connection)
+
     def record_interaction(self, entry: MemoryEntry) -> int:
         """
         Record a user interaction in memory
@@ -207,10 +284,11 @@ class ContextMemory:
             )
 
             entry_id = cursor.lastrowid
+            self._count_action(conn, entry)
             conn.commit()
 
-        # Trigger pattern analysis
-        self._analyze_patterns(entry)
+        # Patterns are refreshed from the counters in the background
+        self._start_pattern_refresh()
 
         return entry_id
 
@@ -218,37 +296,65 @@ class ContextMemory:
         """
         Find similar past interactions based on context
 
+        Entries sharing keywords with ``context`` (in their context, action
+        or result) are ranked by bm25, favouring recent and successful ones.
+
         Args:
             context: Context string to match against
             limit: Maximum number of results
 
         Returns:
-            List of similar MemoryEntry objects
+            List of similar MemoryEntry objects, most similar first
         """
-        with self._pool.get_connection() as conn:
-            cursor = conn.cursor()
-
-            # Simple keyword-based similarity for now
-            keywords = self._extract_keywords(context)
+        keywords = list(dict.fromkeys(self._extract_keywords(context)))
+        if not keywords:
+            return []
 
-            results = []
-            for keyword in keywords:
-                cursor.execute(
-                    """
-                    SELECT * FROM memory_entries
-                    WHERE context LIKE ? OR action LIKE ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                """,
-                    (f"%{keyword}%", f"%{keyword}%", limit),
-                )
+        with self._pool.get_connection() as conn:
+            if not self.text_index.ready(conn):
+                # Entries not indexed yet (backfill running)
+                return self._similar_by_keyword(conn, keywords, limit)
+
+            fts = self.text_index.table
+            rows = conn.execute(
+                f"""
+                SELECT m.* FROM {fts}
+                CROSS JOIN memory_entries m ON m.id = {fts}.rowid
+                WHERE {fts} MATCH ?
+                ORDER BY -bm25({fts})
+                    * (CASE WHEN m.success THEN 1.0 ELSE ? END)
+                    / (1.0 + MAX(julianday('now') - julianday(m.timestamp), 0) / ?) DESC
+                LIMIT ?
+            """,
+                (
+                    fts_query(" ".join(f"{k}*" for k in keywords), any_term=True),
+                    FAILURE_WEIGHT,
+                    RECENCY_DAYS,
+                    limit,
+                ),
+            ).fetchall()
 
-                for row in cursor.fetchall():
-                    entry = self._row_to_memory_entry(row)
-                    if entry not in results:
-                        results.append(entry)
+        return [self._row_to_memory_entry(row) for row in rows]
 
-        return results[:limit]
+    def _similar_by_keyword(
+        self, conn: sqlite3.Connection, keywords: list[str], limit: int
+    ) -> list[MemoryEntry]:
+        """Newest entries containing any keyword, by scanning the table."""
+        results: dict[int, MemoryEntry] = {}
+        for keyword in keywords:
+            rows = conn.execute(
+                """
+                SELECT * FROM memory_entries
+                WHERE context LIKE ? OR action LIKE ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """,
+                (f"%{keyword}%", f"%{keyword}%", limit),
+            ).fetchall()
+            for row in rows:
+                if row[0] not in results:
+                    results[row[0]] = self._row_to_memory_entry(row)
+        return list(results.values())[:limit]
 
     def _row_to_memory_entry(self, row: tuple) -> MemoryEntry:
         """Convert database row to MemoryEntry object"""
@@ -286,57 +392,119 @@ class ContextMemory:
         words = re.findall(r"\b\w+\b", text.lower())
         return [w for w in words if w not in stopwords and len(w) > 2]
 
-    def _analyze_patterns(self, entry: MemoryEntry):
-        """
-        Analyze entry for patterns and update pattern database
+    @staticmethod
+    def _window_start() -> str:
+        """First day of the pattern window, as YYYY-MM-DD."""
+        return (datetime.now() - timedelta(days=PATTERN_WINDOW_DAYS)).date().isoformat()
 
-        This runs after each new entry to detect recurring patterns
-        """
-        with self._pool.get_connection() as conn:
-            cursor = conn.cursor()
+    def _count_action(self, conn: sqlite3.Connection, entry: MemoryEntry):
+        """Count an entry in its action's daily bucket (in the caller's transaction)."""
+        conn.execute(
+            """
+            INSERT INTO action_counts VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT (category, action, day) DO UPDATE SET
+                count = count + 1,
+                last_seen = MAX(last_seen, excluded.last_seen)
+        """,
+            (entry.category, entry.action, entry.timestamp[:10], entry.timestamp),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO pending_patterns VALUES (?, ?)", (entry.category, entry.action)
+        )
 
-            # Look for similar actions in recent history
-            cursor.execute(
-                """
-                SELECT action, COUNT(*) as count
-                FROM memory_entries
-                WHERE category = ?
-                AND timestamp > datetime('now', '-30 days')
-                GROUP BY action
-                HAVING count >= 3
-            """,
-                (entry.category,),
-            )
+    def refresh_patterns(self) -> int:
+        """Promote and demote patterns from the action counters
 
-            for row in cursor.fetchall():
-                action, frequency = row
-                pattern_id = self._generate_pattern_id(entry.category, action)
+        Actions counted since the last refresh and the current patterns are
+        re-evaluated against the window: an action seen at least
+        PATTERN_MIN_COUNT times becomes (or stays) a pattern, with a
+        confidence growing with its frequency; a pattern whose actions
+        aged out of the window is dropped.
 
-                # Update or create pattern
-                cursor.execute(
+        Returns:
+            Number of patterns updated or removed
+        """
+        window_start = self._window_start()
+        with self._pool.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM action_counts WHERE day < ?", (window_start,))
+                keys = conn.execute(
                     """
-                    INSERT INTO patterns (pattern_id, pattern_type, description, frequency, last_seen, confidence, actions, context)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(pattern_id) DO UPDATE SET
-                        frequency = ?,
-                        last_seen = ?,
-                        confidence = MIN(1.0, confidence + 0.1)
-                """,
-                    (
-                        pattern_id,
-                        entry.category,
-                        f"Recurring pattern: {action}",
-                        frequency,
-                        entry.timestamp,
-                        min(1.0, frequency / 10.0),  # Confidence increases with frequency
-                        json.dumps([action]),
-                        json.dumps({"category": entry.category}),
-                        frequency,
-                        entry.timestamp,
-                    ),
-                )
-
-            conn.commit()
+                    SELECT category, action FROM pending_patterns
+                    UNION
+                    SELECT pattern_type, json_extract(actions, '$[0]') FROM patterns
+                """
+                ).fetchall()
+
+                for category, action in keys:
+                    frequency, last_seen = conn.execute(
+                        """
+                        SELECT IFNULL(SUM(count), 0), MAX(last_seen) FROM action_counts
+                        WHERE category = ? AND action = ?
+                    """,
+                        (category, action),
+                    ).fetchone()
+                    pattern_id = self._generate_pattern_id(category, action)
+
+                    if frequency < PATTERN_MIN_COUNT:
+                        conn.execute("DELETE FROM patterns WHERE pattern_id = ?", (pattern_id,))
+                        continue
+
+                    conn.execute(
+                        """
+                        INSERT INTO patterns (pattern_id, pattern_type, description, frequency, last_seen, confidence, actions, context)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(pattern_id) DO UPDATE SET
+                            frequency = excluded.frequency,
+                            last_seen = excluded.last_seen,
+                            confidence = excluded.confidence
+                    """,
+                        (
+                            pattern_id,
+                            category,
+                            f"Recurring pattern: {action}",
+                            frequency,
+                            last_seen,
+                            min(1.0, frequency / 10.0),  # Confidence increases with frequency
+                            json.dumps([action]),
+                            json.dumps({"category": category}),
+                        ),
+                    )
+
+                conn.execute("DELETE FROM pending_patterns")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+        return len(keys)
+
+    def _refresh_pending_patterns(self):
+        """Bring the patterns up to date if actions were counted since the last refresh."""
+        with self._pool.get_connection() as conn:
+            pending = conn.execute("SELECT 1 FROM pending_patterns LIMIT 1").fetchone()
+        if pending:
+            self.refresh_patterns()
+
+    def _start_pattern_refresh(self):
+        """Run refresh_patterns every PATTERN_REFRESH_INTERVAL seconds in the background."""
+        key = str(self.db_path)
+        with _pattern_jobs_lock:
+            if key in _pattern_jobs and _pattern_jobs[key].is_alive():
+                return
+
+            def run():
+                while True:
+                    try:
+                        self.refresh_patterns()
+                    except (sqlite3.Error, TimeoutError) as e:
+                        logger.warning(f"Pattern refresh failed, retrying later: {e}")
+                    time.sleep(PATTERN_REFRESH_INTERVAL)
+
+            thread = threading.Thread(target=run, name="pattern-refresh", daemon=True)
+            _pattern_jobs[key] = thread
+            thread.start()
 
     def _generate_pattern_id(self, category: str, action: str) -> str:
         """Generate unique pattern ID"""
@@ -356,6 +524,9 @@ class ContextMemory:
         Returns:
             List of Pattern objects
         """
+        # Cheap when the background refresh is current: only pending actions are read
+        self._refresh_pending_patterns()
+
         with self._pool.get_connection() as conn:
             cursor = conn.cursor()
 
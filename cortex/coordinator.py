@@ -1,15 +1,24 @@
+import asyncio
 import json
 import logging
+import queue
 import re
 import subprocess
+import threading
 import time
-from collections.abc import Callable
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+from pathlib import Path
 from typing import Any
 
-from cortex.validators import DANGEROUS_PATTERNS
+from cortex.apt_scheduler import parse_apt_command
+from cortex.command_safety import check_command
+from cortex.error_parser import ErrorParser
+from cortex.plan_optimizer import failed_packages, optimize_plan
+from cortex.timing_analysis import TimingReport, analyze_coordinator_run
+from cortex.utils.streaming import OutputBuffer, run_streaming
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +41,57 @@ class InstallationStep:
     start_time: float | None = None
     end_time: float | None = None
     return_code: int | None = None
+    # Packages handled by this step; merged apt steps cover several packages
+    packages: list[str] = field(default_factory=list)
+    # Original plan commands folded into this step by the plan optimizer
+    merged_commands: list[str] = field(default_factory=list)
+    # Compressed full output, written when output overflowed the in-memory buffer
+    output_log: str | None = None
+    error_log: str | None = None
+    # First error category detected while the step was running (streaming mode)
+    error_category: str | None = None
+    # Completed in an earlier run and restored from a checkpoint (times are from that run)
+    resumed: bool = False
 
     def duration(self) -> float | None:
         if self.start_time and self.end_time:
             return self.end_time - self.start_time
         return None
 
+    def to_dict(self) -> dict[str, Any]:
+        """Serializable state of the step, used for checkpoints."""
+        return {
+            "command": self.command,
+            "description": self.description,
+            "status": self.status.value,
+            "output": self.output,
+            "error": self.error,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "return_code": self.return_code,
+            "packages": list(self.packages),
+        }
+
+    def package_results(self) -> dict[str, str]:
+        """Per-package outcome of the step.
+
+        Successful and skipped steps report their status for every package.
+        When an apt transaction fails, packages named in apt's error output
+        are reported as failed and the rest as skipped, since apt aborts the
+        whole transaction.
+        """
+        if self.status != StepStatus.FAILED:
+            return dict.fromkeys(self.packages, self.status.value)
+
+        culprits = failed_packages(f"{self.output}\n{self.error}", self.packages)
+        if not culprits:
+            return dict.fromkeys(self.packages, StepStatus.FAILED.value)
+
+        return {
+            pkg: StepStatus.FAILED.value if pkg in culprits else StepStatus.SKIPPED.value
+            for pkg in self.packages
+        }
+
 
 @dataclass
 class InstallationResult:
@@ -46,6 +100,7 @@ class InstallationResult:
     total_duration: float
     failed_step: int | None = None
     error_message: str | None = None
+    timing: TimingReport | None = None
 
 
 class InstallationCoordinator:
@@ -60,22 +115,60 @@ class InstallationCoordinator:
         enable_rollback: bool = False,
         log_file: str | None = None,
         progress_callback: Callable[[int, int, InstallationStep], None] | None = None,
+        optimize: bool = False,
+        stream_output: bool = False,
+        output_callback: Callable[[InstallationStep, str, str], None] | None = None,
+        output_log_dir: str | None = None,
+        checkpoint_callback: Callable[[int, InstallationStep], None] | None = None,
     ):
-        """Initialize an installation run with optional logging and rollback."""
+        """Initialize an installation run with optional logging and rollback.
+
+        With ``optimize=True`` adjacent compatible apt install/remove commands
+        are merged into single steps (see :mod:`cortex.plan_optimizer`).
+
+        With ``stream_output=True`` (implied by ``output_callback``) commands
+        run as asyncio subprocesses and ``output_callback(step, stream, line)``
+        is called for every line as it is produced. In both modes only the
+        head and tail of each step's output are kept in memory; the complete
+        output is spilled to gzip files under ``output_log_dir``
+        (default: ``~/.cortex/logs``).
+
+        ``checkpoint_callback(index, step)`` is called for every step when the
+        run starts and again whenever a step reaches a final state, so the run
+        can be persisted and resumed later (see :meth:`from_checkpoint`).
+        """
         self.timeout = timeout
         self.stop_on_error = stop_on_error
         self.enable_rollback = enable_rollback
         self.log_file = log_file
         self.progress_callback = progress_callback
+        self.stream_output = stream_output or output_callback is not None
+        self.output_callback = output_callback
+        self.output_log_dir = (
+            Path(output_log_dir) if output_log_dir else Path.home() / ".cortex" / "logs"
+        )
+        self._run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self._error_parser: ErrorParser | None = None
+        self.checkpoint_callback = checkpoint_callback
 
         if descriptions and len(descriptions) != len(commands):
             raise ValueError("Number of descriptions must match number of commands")
 
+        plan = [
+            {"command": cmd, "description": descriptions[i] if descriptions else f"Step {i + 1}"}
+            for i, cmd in enumerate(commands)
+        ]
+        if optimize:
+            plan = optimize_plan(plan)
+
         self.steps = [
             InstallationStep(
-                command=cmd, description=descriptions[i] if descriptions else f"Step {i + 1}"
+                command=step["command"],
+                description=step["description"],
+                packages=list(step.get("packages", [])),
+                merged_commands=list(step.get("merged_commands", [])),
             )
-            for i, cmd in enumerate(commands)
+            for step in plan
         ]
 
         self.rollback_commands: list[str] = []
@@ -83,8 +176,9 @@ class InstallationCoordinator:
     @classmethod
     def from_plan(
         cls,
-        plan: list[dict[str, str]],
+        plan: list[dict[str, Any]],
         *,
+        optimize: bool = False,
         timeout: int = 300,
         stop_on_error: bool = True,
         enable_rollback: bool | None = None,
@@ -94,10 +188,16 @@ class InstallationCoordinator:
         """Create a coordinator from a structured plan produced by an LLM.
 
         Each plan entry should contain at minimum a ``command`` key and
-        optionally ``description`` and ``rollback`` fields. Rollback commands are
-        registered automatically when present.
+        optionally ``description`` and ``rollback`` fields. Rollback commands
+        (a string or a list of strings) are registered automatically when
+        present. With ``optimize=True`` the plan is first rewritten by
+        :func:`cortex.plan_optimizer.optimize_plan`, which merges adjacent apt
+        install/remove steps into single transactions.
         """
 
+        if optimize:
+            plan = optimize_plan(plan)
+
         commands: list[str] = []
         descriptions: list[str] = []
         rollback_commands: list[str] = []
@@ -111,8 +211,10 @@ class InstallationCoordinator:
             descriptions.append(step.get("description", f"Step {index + 1}"))
 
             rollback_cmd = step.get("rollback")
-            if rollback_cmd:
+            if isinstance(rollback_cmd, str):
                 rollback_commands.append(rollback_cmd)
+            elif rollback_cmd:
+                rollback_commands.extend(rollback_cmd)
 
         coordinator = cls(
             commands,
@@ -129,8 +231,103 @@ class InstallationCoordinator:
         for rollback_cmd in rollback_commands:
             coordinator.add_rollback_command(rollback_cmd)
 
+        for step, plan_step in zip(coordinator.steps, plan):
+            step.packages = list(plan_step.get("packages", []))
+            step.merged_commands = list(plan_step.get("merged_commands", []))
+
+        return coordinator
+
+    @classmethod
+    def from_checkpoint(
+        cls,
+        saved_steps: list[dict[str, Any]],
+        *,
+        verify_completed: bool = True,
+        **kwargs: Any,
+    ) -> "InstallationCoordinator":
+        """Rebuild a coordinator from a checkpointed run.
+
+        Steps that completed successfully keep their recorded state and are
+        skipped by :meth:`execute`. With ``verify_completed=True`` each
+        completed apt step is checked against the package database first and
+        re-run if its effect is no longer present.
+
+        Args:
+            saved_steps: Step dicts as produced by ``InstallationStep.to_dict``
+            verify_completed: Run the idempotency check for completed steps
+            **kwargs: Passed through to the constructor
+
+        Returns:
+            Coordinator ready to execute the remaining steps
+        """
+        coordinator = cls(
+            [saved["command"] for saved in saved_steps],
+            [saved.get("description") or f"Step {i + 1}" for i, saved in enumerate(saved_steps)],
+            **kwargs,
+        )
+
+        for step, saved in zip(coordinator.steps, saved_steps):
+            step.packages = list(saved.get("packages") or [])
+            if saved.get("status") != StepStatus.SUCCESS.value:
+                continue
+
+            if verify_completed and not coordinator._step_still_applied(step):
+                coordinator._log(f"Completed step no longer applied, will re-run: {step.command}")
+                continue
+
+            step.status = StepStatus.SUCCESS
+            step.output = saved.get("output") or ""
+            step.error = saved.get("error") or ""
+            step.start_time = saved.get("start_time")
+            step.end_time = saved.get("end_time")
+            step.return_code = saved.get("return_code")
+            step.resumed = True
+
         return coordinator
 
+    def _step_still_applied(self, step: InstallationStep) -> bool:
+        """Idempotency check for a step that completed in an earlier run.
+
+        apt install steps are verified by checking that their packages are
+        still installed, remove/purge steps that they are still absent. Other
+        commands cannot be checked generically and are trusted.
+        """
+        apt_cmd = parse_apt_command(step.command)
+        if not apt_cmd or apt_cmd.action not in ("install", "remove", "purge"):
+            return True
+
+        packages = [re.split(r"[=/]", pkg, maxsplit=1)[0] for pkg in apt_cmd.packages]
+        if not packages:
+            return True
+
+        try:
+            result = subprocess.run(
+                ["dpkg-query", "-W", "-f=${Package} ${Status}\\n", *packages],
+                capture_output=True,
+                text=True,
+                timeout=30,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return True
+
+        installed = {
+            line.split()[0]
+            for line in result.stdout.splitlines()
+            if line.strip().endswith(" installed")
+        }
+        if apt_cmd.action == "install":
+            return all(pkg in installed for pkg in packages)
+        return not any(pkg in installed for pkg in packages)
+
+    def _checkpoint(self, index: int, step: InstallationStep):
+        if not self.checkpoint_callback:
+            return
+        try:
+            self.checkpoint_callback(index, step)
+        except Exception as e:
+            # Persisting progress must never break the installation itself
+            logger.warning(f"Failed to checkpoint step {index + 1}: {e}")
+
     def _log(self, message: str):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
@@ -152,10 +349,10 @@ class InstallationCoordinator:
             return False, "Empty command"
 
         # Check for dangerous patterns
-        for pattern in DANGEROUS_PATTERNS:
-            if re.search(pattern, command, re.IGNORECASE):
-                logger.warning(f"Dangerous command pattern blocked: {pattern}")
-                return False, "Command blocked: matches dangerous pattern"
+        pattern = check_command(command)
+        if pattern:
+            logger.warning(f"Dangerous command pattern blocked: {pattern}")
+            return False, "Command blocked: matches dangerous pattern"
 
         return True, None
 
@@ -175,28 +372,36 @@ class InstallationCoordinator:
             return False
 
         try:
-            # Use shell=True carefully - commands are validated first
-            # For complex shell commands (pipes, redirects), shell=True is needed
-            # Simple commands could use shlex.split() with shell=False
-            result = subprocess.run(
-                step.command, shell=True, capture_output=True, text=True, timeout=self.timeout
-            )
-
-            step.return_code = result.returncode
-            step.output = result.stdout
-            step.error = result.stderr
+            if self.stream_output:
+                return_code = self._run_streaming(step)
+            else:
+                # Use shell=True carefully - commands are validated first
+                # For complex shell commands (pipes, redirects), shell=True is needed
+                # Simple commands could use shlex.split() with shell=False
+                result = subprocess.run(
+                    step.command, shell=True, capture_output=True, text=True, timeout=self.timeout
+                )
+                return_code = result.returncode
+                stdout, stderr = self._output_buffers(step)
+                try:
+                    stdout.feed(result.stdout or "")
+                    stderr.feed(result.stderr or "")
+                finally:
+                    self._store_output(step, stdout, stderr)
+
+            step.return_code = return_code
             step.end_time = time.time()
 
-            if result.returncode == 0:
+            if return_code == 0:
                 step.status = StepStatus.SUCCESS
                 self._log(f"Success: {step.command}")
                 return True
             else:
                 step.status = StepStatus.FAILED
-                self._log(f"Failed: {step.command} (exit code: {result.returncode})")
+                self._log(f"Failed: {step.command} (exit code: {return_code})")
                 return False
 
-        except subprocess.TimeoutExpired:
+        except (subprocess.TimeoutExpired, asyncio.TimeoutError):
             step.status = StepStatus.FAILED
             step.error = f"Command timed out after {self.timeout} seconds"
             step.end_time = time.time()
@@ -210,6 +415,56 @@ class InstallationCoordinator:
             self._log(f"Error: {step.command} - {str(e)}")
             return False
 
+    def _spill_path(self, step: InstallationStep, stream: str) -> Path:
+        index = self.steps.index(step) + 1
+        return self.output_log_dir / f"{self._run_id}-step{index}.{stream}.log.gz"
+
+    def _output_buffers(self, step: InstallationStep) -> tuple[OutputBuffer, OutputBuffer]:
+        return (
+            OutputBuffer(spill_path=self._spill_path(step, "stdout")),
+            OutputBuffer(spill_path=self._spill_path(step, "stderr")),
+        )
+
+    def _store_output(self, step: InstallationStep, stdout: OutputBuffer, stderr: OutputBuffer):
+        stdout.close()
+        stderr.close()
+        step.output = stdout.getvalue()
+        step.error = stderr.getvalue()
+        step.output_log = str(stdout.spill_path) if stdout.spilled else None
+        step.error_log = str(stderr.spill_path) if stderr.spilled else None
+
+    def _run_streaming(self, step: InstallationStep) -> int:
+        """Run a step as an asyncio subprocess, streaming output line by line."""
+        stdout, stderr = self._output_buffers(step)
+
+        def on_line(stream: str, line: str):
+            self._detect_error(step, stream, line)
+            if self.output_callback:
+                self.output_callback(step, stream, line)
+
+        try:
+            return run_streaming(
+                step.command, stdout, stderr, timeout=self.timeout, on_line=on_line
+            )
+        finally:
+            self._store_output(step, stdout, stderr)
+
+    def _detect_error(self, step: InstallationStep, stream: str, line: str):
+        """Categorize the first recognizable error line while the step runs."""
+        if step.error_category is not None:
+            return
+        if stream != "stderr" and not line.startswith(("E:", "dpkg: error", "ERROR")):
+            return
+
+        if self._error_parser is None:
+            self._error_parser = ErrorParser()
+
+        for pattern_def in self._error_parser.compiled_patterns:
+            if pattern_def["regex"].search(line):
+                step.error_category = pattern_def["category"].value
+                self._log(f"Detected {step.error_category} in: {step.command}")
+                return
+
     def _rollback(self):
         if not self.enable_rollback or not self.rollback_commands:
             return
@@ -234,17 +489,28 @@ class InstallationCoordinator:
 
         self._log(f"Starting installation with {len(self.steps)} steps")
 
+        # Record the full plan up front so a crash mid-step can be resumed
+        for i, step in enumerate(self.steps):
+            self._checkpoint(i, step)
+
         for i, step in enumerate(self.steps):
             if self.progress_callback:
                 self.progress_callback(i + 1, len(self.steps), step)
 
+            if step.status == StepStatus.SUCCESS:
+                # Completed in an earlier run that is being resumed
+                self._log(f"Skipping completed step: {step.command}")
+                continue
+
             success = self._execute_command(step)
+            self._checkpoint(i, step)
 
             if not success:
                 failed_step_index = i
                 if self.stop_on_error:
-                    for remaining_step in self.steps[i + 1 :]:
+                    for j, remaining_step in enumerate(self.steps[i + 1 :], start=i + 1):
                         remaining_step.status = StepStatus.SKIPPED
+                        self._checkpoint(j, remaining_step)
 
                     if self.enable_rollback:
                         self._rollback()
@@ -258,6 +524,7 @@ class InstallationCoordinator:
                         total_duration=total_duration,
                         failed_step=i,
                         error_message=step.error or "Command failed",
+                        timing=analyze_coordinator_run(self.steps),
                     )
 
         total_duration = time.time() - start_time
@@ -276,6 +543,83 @@ class InstallationCoordinator:
             error_message=(
                 self.steps[failed_step_index].error if failed_step_index is not None else None
             ),
+            timing=analyze_coordinator_run(self.steps),
+        )
+
+    def execute_stream(self, commands: Iterable[str]) -> InstallationResult:
+        """Run commands as they are produced instead of from a fixed plan.
+
+        ``commands`` is consumed on a background thread (typically
+        ``CommandInterpreter.parse_stream``), and every command is appended as
+        a step and run as soon as it arrives. Step 1 can therefore run while
+        later steps are still being generated. If the source raises (for
+        example because a generated command failed validation), no further
+        steps are started and the run fails with the source's error.
+        Already completed steps are rolled back when rollback is enabled.
+        """
+        start_time = time.time()
+        pending: queue.Queue = queue.Queue()
+        end_of_plan = object()
+
+        def produce():
+            try:
+                for command in commands:
+                    pending.put(command)
+            except Exception as e:
+                pending.put(e)
+            finally:
+                pending.put(end_of_plan)
+
+        threading.Thread(target=produce, name="plan-stream", daemon=True).start()
+        self._log("Starting pipelined installation")
+
+        failed_step_index = None
+        error_message = None
+
+        while True:
+            item = pending.get()
+            if item is end_of_plan:
+                break
+            if isinstance(item, Exception):
+                error_message = f"Plan generation aborted: {item}"
+                self._log(error_message)
+                break
+
+            index = len(self.steps)
+            step = InstallationStep(command=item, description=f"Step {index + 1}")
+            self.steps.append(step)
+            if self.progress_callback:
+                self.progress_callback(index + 1, len(self.steps), step)
+
+            success = self._execute_command(step)
+            self._checkpoint(index, step)
+
+            if not success and failed_step_index is None:
+                failed_step_index = index
+                error_message = step.error or "Command failed"
+                if self.stop_on_error:
+                    self._log(f"Installation failed at step {index + 1}")
+                    break
+
+        aborted = error_message is not None and failed_step_index is None
+        success = error_message is None and all(
+            step.status == StepStatus.SUCCESS for step in self.steps
+        )
+        if not success and self.enable_rollback and (self.stop_on_error or aborted):
+            self._rollback()
+
+        if success:
+            self._log("Installation completed successfully")
+        else:
+            self._log("Installation completed with errors")
+
+        return InstallationResult(
+            success=success,
+            steps=self.steps,
+            total_duration=time.time() - start_time,
+            failed_step=failed_step_index,
+            error_message=error_message,
+            timing=analyze_coordinator_run(self.steps),
         )
 
     def verify_installation(self, verify_commands: list[str]) -> dict[str, bool]:
@@ -314,6 +658,10 @@ class InstallationCoordinator:
                     "status": s.status.value,
                     "duration": s.duration(),
                     "return_code": s.return_code,
+                    "packages": s.package_results(),
+                    "error_category": s.error_category,
+                    "output_log": s.output_log,
+                    "error_log": s.error_log,
                 }
                 for s in self.steps
             ],
@@ -0,0 +1,124 @@
+"""
+Persistent cache of resolved dependency graphs.
+
+Resolving a package walks the apt index and the dpkg database; the result
+only changes when one of them does. ``DependencyCache`` stores resolved
+graphs in SQLite next to a fingerprint of that system state (path,
+modification time and size of the dpkg status file and of every apt
+``Packages`` list). A cached graph is used only while the fingerprint is
+unchanged, so installing a package or running ``apt update`` invalidates
+every entry, and nothing else does.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from cortex.utils.db_pool import SQLiteConnectionPool, get_connection_pool
+
+logger = logging.getLogger(__name__)
+
+# Bump when the stored graph format changes
+CACHE_FORMAT_VERSION = 1
+
+
+def default_cache_path() -> Path:
+    return Path.home() / ".cortex" / "dependency_cache.db"
+
+
+def system_fingerprint(paths: Iterable[str | Path]) -> str:
+    """Fingerprint of the package state files at ``paths``.
+
+    Missing files are part of the fingerprint too, so a list that
+    disappears changes it.
+    """
+    digest = hashlib.sha256(f"format={CACHE_FORMAT_VERSION}\n".encode())
+    for path in sorted(str(p) for p in paths):
+        try:
+            stat = Path(path).stat()
+            digest.update(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode())
+        except OSError:
+            digest.update(f"{path}\0missing\n".encode())
+    return digest.hexdigest()
+
+
+class DependencyCache:
+    """SQLite store of resolved dependency graphs, keyed by package and fingerprint.
+
+    Usage:
+        cache = DependencyCache()
+        graph = cache.get("nginx", fingerprint)
+        if graph is None:
+            graph = resolve("nginx")
+            cache.put("nginx", fingerprint, graph)
+    """
+
+    def __init__(self, db_path: str | Path | None = None):
+        self.db_path = Path(db_path) if db_path else default_cache_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._pool: SQLiteConnectionPool = get_connection_pool(str(self.db_path), pool_size=2)
+        # Fingerprint whose stale entries were already pruned by this process
+        self._pruned_for: str | None = None
+        self._init_database()
+
+    def _init_database(self):
+        with self._pool.get_connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dependency_graphs (
+                    package TEXT NOT NULL,
+                    recursive INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    graph TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (package, recursive)
+                )
+            """
+            )
+            conn.commit()
+
+    def get(self, package: str, fingerprint: str, recursive: bool = True) -> dict | None:
+        """Cached graph of ``package`` if it was resolved in the same system state."""
+        with self._pool.get_connection() as conn:
+            row = conn.execute(
+                """
+                SELECT graph FROM dependency_graphs
+                WHERE package = ? AND recursive = ? AND fingerprint = ?
+            """,
+                (package, int(recursive), fingerprint),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, package: str, fingerprint: str, graph: dict, recursive: bool = True):
+        """Store a resolved graph, dropping entries of other system states."""
+        with self._pool.get_connection() as conn:
+            if self._pruned_for != fingerprint:
+                conn.execute("DELETE FROM dependency_graphs WHERE fingerprint != ?", (fingerprint,))
+                self._pruned_for = fingerprint
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO dependency_graphs
+                (package, recursive, fingerprint, graph, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """,
+                (package, int(recursive), fingerprint, json.dumps(graph), time.time()),
+            )
+            conn.commit()
+
+    def clear(self):
+        with self._pool.get_connection() as conn:
+            conn.execute("DELETE FROM dependency_graphs")
+            conn.commit()
+        self._pruned_for = None
+
+    def __len__(self) -> int:
+        with self._pool.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM dependency_graphs").fetchone()[0]
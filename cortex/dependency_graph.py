@@ -0,0 +1,226 @@
+"""
+Transitive dependency closure and levelized install order.
+
+``DependencyClosure`` walks the apt dependency index from a set of root
+packages and returns every package that has to be installed with them:
+
+- ``a | b`` alternatives are satisfied by an installed (or already chosen)
+  alternative when there is one, otherwise by the first real package;
+- virtual packages are replaced by a provider, preferring installed ones;
+- installed packages end the walk, their dependencies are already met.
+
+The resulting graph is condensed into strongly connected components
+(dependency cycles, which apt configures together) and ordered into
+levels: every package of a level only depends on packages of earlier
+levels, so each level can be installed concurrently.
+"""
+
+import logging
+from collections import deque
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+
+from cortex.apt_index import AptIndex
+
+logger = logging.getLogger(__name__)
+
+
+def strongly_connected_components(graph: Mapping[str, Iterable[str]]) -> list[list[str]]:
+    """Tarjan's algorithm, iterative so deep chains do not hit the recursion limit.
+
+    Args:
+        graph: Node -> nodes it depends on. Edges to nodes that are not keys
+               of ``graph`` are ignored.
+
+    Returns:
+        Components in dependency order: a component comes after all the
+        components it depends on.
+    """
+    index_of: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[str] = []
+    components: list[list[str]] = []
+    counter = 0
+
+    for start in graph:
+        if start in index_of:
+            continue
+        # (node, iterator over its successors)
+        work = [(start, iter(graph[start]))]
+        index_of[start] = lowlink[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in graph:
+                    continue
+                if successor not in index_of:
+                    index_of[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(graph[successor])))
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+
+    return components
+
+
+def topological_levels(
+    graph: Mapping[str, Iterable[str]],
+) -> tuple[list[list[str]], list[list[str]]]:
+    """Order a dependency graph into levels of independent packages.
+
+    Args:
+        graph: Package -> packages it depends on
+
+    Returns:
+        (levels, cycles). Level 0 holds packages without dependencies in the
+        graph; every package of level n depends on at least one package of
+        level n - 1 and none of later levels. Members of a dependency cycle
+        share a level. ``cycles`` lists those cycles (self-dependencies
+        included).
+    """
+    components = strongly_connected_components(graph)
+    component_of = {node: i for i, component in enumerate(components) for node in component}
+
+    level_of: list[int] = []
+    cycles: list[list[str]] = []
+    for i, component in enumerate(components):
+        level = 0
+        for node in component:
+            for dep in graph[node]:
+                j = component_of.get(dep)
+                if j is not None and j != i:
+                    level = max(level, level_of[j] + 1)
+        level_of.append(level)
+        if len(component) > 1 or component[0] in graph[component[0]]:
+            cycles.append(component)
+
+    levels: list[list[str]] = [[] for _ in range(max(level_of, default=-1) + 1)]
+    for component, level in zip(components, level_of):
+        levels[level].extend(component)
+    return [sorted(level) for level in levels], cycles
+
+
+@dataclass
+class Closure:
+    """Packages needed to install a set of root packages."""
+
+    roots: list[str]
+    # Package -> packages of the closure it depends on
+    graph: dict[str, set[str]] = field(default_factory=dict)
+    levels: list[list[str]] = field(default_factory=list)
+    cycles: list[list[str]] = field(default_factory=list)
+    # Dependencies no package in the index satisfies
+    unresolved: list[str] = field(default_factory=list)
+
+    @property
+    def packages(self) -> list[str]:
+        """All packages of the closure in install order."""
+        return [package for level in self.levels for package in level]
+
+
+class DependencyClosure:
+    """Memoized transitive dependency walker over an ``AptIndex``.
+
+    Usage:
+        closure = DependencyClosure(get_apt_index(), is_installed).resolve(["nginx"])
+        for level in closure.levels:
+            install_concurrently(level)
+    """
+
+    def __init__(self, apt_index: AptIndex, is_installed: Callable[[str], bool]):
+        self.apt_index = apt_index
+        self.is_installed = is_installed
+        # Memoized per instance: package -> dependency clauses, virtual -> providers
+        self._clauses: dict[str, tuple[tuple[str, ...], ...] | None] = {}
+        self._providers: dict[str, list[str]] = {}
+
+    def _dependency_clauses(self, name: str) -> tuple[tuple[str, ...], ...] | None:
+        """Dependency clauses of ``name``, None if it is not a real package."""
+        if name not in self._clauses:
+            package = self.apt_index.get(name)
+            self._clauses[name] = package.alternatives if package is not None else None
+        return self._clauses[name]
+
+    def _providers_of(self, name: str) -> list[str]:
+        if name not in self._providers:
+            self._providers[name] = self.apt_index.providers(name)
+        return self._providers[name]
+
+    def _choose(self, clause: tuple[str, ...], chosen: Mapping[str, object]) -> str | None:
+        """Package satisfying a dependency clause, or None if nothing does."""
+        # Already satisfied by an installed or chosen package (real or provider)
+        for name in clause:
+            if self.is_installed(name) or name in chosen:
+                return name
+            for provider in self._providers_of(name):
+                if self.is_installed(provider) or provider in chosen:
+                    return provider
+
+        for name in clause:
+            if self._dependency_clauses(name) is not None:
+                return name
+        for name in clause:
+            providers = self._providers_of(name)
+            if providers:
+                return providers[0]
+        return None
+
+    def resolve(self, roots: Iterable[str]) -> Closure:
+        """Transitive closure of ``roots`` that is not installed yet."""
+        roots = list(dict.fromkeys(roots))
+        result = Closure(roots=roots)
+        graph = result.graph
+        unresolved: dict[str, None] = {}
+        pending = deque(root for root in roots if not self.is_installed(root))
+
+        for root in pending:
+            graph.setdefault(root, set())
+
+        while pending:
+            name = pending.popleft()
+            clauses = self._dependency_clauses(name)
+            if clauses is None:
+                # A root that is only provided by other packages
+                providers = self._providers_of(name)
+                if not providers:
+                    unresolved[name] = None
+                clauses = (tuple(providers),) if providers else ()
+            for clause in clauses:
+                dep = self._choose(clause, graph)
+                if dep is None:
+                    unresolved[" | ".join(clause)] = None
+                    continue
+                if dep == name or self.is_installed(dep):
+                    continue
+                graph[name].add(dep)
+                if dep not in graph:
+                    graph[dep] = set()
+                    pending.append(dep)
+
+        result.levels, result.cycles = topological_levels(graph)
+        result.unresolved = list(unresolved)
+        if result.cycles:
+            logger.debug(f"Dependency cycles in closure of {roots}: {result.cycles}")
+        return result
@@ -10,10 +10,13 @@ Supports: requirements.txt (Python), package.json (Node), Gemfile (Ruby),
 import json
 import os
 import re
+import shutil
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
 
+from cortex.dependency_resolver import DependencyResolver
+
 
 class PackageEcosystem(Enum):
     """Supported package ecosystems."""
@@ -97,6 +100,28 @@ INSTALL_COMMANDS = {
     PackageEcosystem.GO: "go mod download",
 }
 
+# System (apt) packages providing the toolchain each install command needs
+SYSTEM_PACKAGES = {
+    PackageEcosystem.PYTHON: ["python3", "python3-pip"],
+    PackageEcosystem.NODE: ["nodejs", "npm"],
+    PackageEcosystem.RUBY: ["ruby", "ruby-bundler"],
+    PackageEcosystem.RUST: ["cargo"],
+    PackageEcosystem.GO: ["golang-go"],
+}
+
+# Command each system package provides; a toolchain installed another way
+# (rustup, nvm, a Go tarball) is found on PATH and not installed again
+SYSTEM_PACKAGE_COMMANDS = {
+    "python3": "python3",
+    "python3-pip": "pip",
+    "nodejs": "node",
+    "npm": "npm",
+    "ruby": "ruby",
+    "ruby-bundler": "bundle",
+    "cargo": "cargo",
+    "golang-go": "go",
+}
+
 
 class DependencyImporter:
     """Parses and imports dependencies from various package manager files."""
@@ -843,13 +868,72 @@ class DependencyImporter:
             return cmd.format(file=file_path)
         return cmd
 
+    def get_system_packages(self, results: dict[str, ParseResult]) -> list[str]:
+        """Get the system packages the install commands of the results need.
+
+        Args:
+            results: Dict of file paths to ParseResults.
+
+        Returns:
+            Toolchain packages of every ecosystem with packages to install.
+        """
+        packages: dict[str, None] = {}
+        for result in results.values():
+            if result.errors or not (result.packages or result.dev_packages):
+                continue
+            for package in SYSTEM_PACKAGES.get(result.ecosystem, []):
+                packages[package] = None
+        return list(packages)
+
+    def get_system_install_command(
+        self, results: dict[str, ParseResult], resolver: DependencyResolver
+    ) -> dict[str, str] | None:
+        """Generate one apt command for the missing toolchains of all results.
+
+        Only the toolchain packages themselves are listed, so apt marks
+        their dependencies as automatically installed. The toolchains are
+        resolved together to order them and check them for conflicts.
+
+        Args:
+            results: Dict of file paths to ParseResults.
+            resolver: Resolver for the system packages.
+
+        Returns:
+            Dict with 'command' and 'description' keys (and 'conflicts'
+            if the resolver found any), or None if every toolchain is
+            available.
+        """
+        system_packages = self.get_system_packages(results)
+        missing = [
+            pkg
+            for pkg in system_packages
+            if not shutil.which(SYSTEM_PACKAGE_COMMANDS.get(pkg, pkg))
+            and not resolver.is_package_installed(pkg)
+        ]
+        if not missing:
+            return None
+
+        graph = resolver.resolve_many(missing)
+        position = {pkg: i for i, pkg in enumerate(graph.installation_order)}
+        missing.sort(key=lambda pkg: position.get(pkg, len(position)))
+
+        command = {
+            "command": f"sudo apt-get install -y {' '.join(missing)}",
+            "description": f"Install system packages ({', '.join(missing)})",
+        }
+        if graph.conflicts:
+            command["conflicts"] = ", ".join(f"{a} conflicts with {b}" for a, b in graph.conflicts)
+        return command
+
     def get_install_commands_for_results(
-        self, results: dict[str, ParseResult]
+        self, results: dict[str, ParseResult], resolver: DependencyResolver | None = None
     ) -> list[dict[str, str]]:
         """Generate install commands for multiple parse results.
 
         Args:
             results: Dict of file paths to ParseResults.
+            resolver: If given, the commands start with the installation of
+                      the missing system packages the ecosystems need.
 
         Returns:
             List of dicts with 'command' and 'description' keys.
@@ -857,6 +941,11 @@ class DependencyImporter:
         commands: list[dict[str, str]] = []
         seen_ecosystems: set[PackageEcosystem] = set()
 
+        if resolver is not None:
+            system_command = self.get_system_install_command(results, resolver)
+            if system_command:
+                commands.append(system_command)
+
         for file_path, result in results.items():
             if result.errors:
                 continue
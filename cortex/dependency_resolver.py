@@ -7,9 +7,16 @@ Detects and resolves package dependencies using AI assistance
 import json
 import logging
 import re
+import sqlite3
 import subprocess
 import threading
-from dataclasses import asdict, dataclass
+from collections.abc import Collection, Iterable
+from dataclasses import asdict, dataclass, field
+
+from cortex.apt_index import AptIndex, get_apt_index
+from cortex.dependency_cache import DependencyCache, system_fingerprint
+from cortex.dependency_graph import DependencyClosure, topological_levels
+from cortex.dpkg_status import DpkgStatus, get_status_index
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,6 +42,32 @@ class DependencyGraph:
     all_dependencies: list[Dependency]
     conflicts: list[tuple[str, str]]  # (package1, package2)
     installation_order: list[str]
+    # installation_order grouped into levels that can be installed concurrently
+    installation_levels: list[list[str]] = field(default_factory=list)
+    cycles: list[list[str]] = field(default_factory=list)
+
+
+@dataclass
+class MultiPackageGraph:
+    """Merged dependency graph of several packages installed together"""
+
+    packages: list[str]
+    # Package -> its direct dependencies
+    direct_dependencies: dict[str, list[Dependency]]
+    # Dependencies of all packages, shared ones listed once
+    all_dependencies: list[Dependency]
+    conflicts: list[tuple[str, str]]  # (package1, package2)
+    installation_order: list[str]
+    installation_levels: list[list[str]] = field(default_factory=list)
+    cycles: list[list[str]] = field(default_factory=list)
+    # Dependencies no package in the apt lists satisfies
+    unresolved: list[str] = field(default_factory=list)
+    # Whether the closure was walked over the apt lists (complete edges)
+    indexed: bool = False
+
+    @property
+    def missing_dependencies(self) -> list[Dependency]:
+        return [dep for dep in self.all_dependencies if not dep.is_satisfied]
 
 
 class DependencyResolver:
@@ -64,13 +97,47 @@ class DependencyResolver:
         },
     }
 
-    def __init__(self):
+    def __init__(
+        self,
+        persistent_cache: bool = True,
+        cache_path: str | None = None,
+        apt_index: AptIndex | None = None,
+        dpkg_status: DpkgStatus | None = None,
+    ):
+        """
+        Args:
+            persistent_cache: Reuse graphs resolved by earlier runs while the
+                              dpkg/apt state is unchanged (see cortex.dependency_cache)
+            cache_path: SQLite file of the persistent cache
+            apt_index: Package list index (default: the system's)
+            dpkg_status: dpkg database (default: the system's)
+        """
+        self._apt_index = apt_index
+        self._dpkg_status = dpkg_status
         self._cache_lock = threading.Lock()  # Protect dependency_cache
         self._packages_lock = threading.Lock()  # Protect installed_packages
         self.dependency_cache: dict[str, DependencyGraph] = {}
         self.installed_packages: set[str] = set()
+        self._closure: DependencyClosure | None = None
+        self.persistent_cache: DependencyCache | None = None
+        if persistent_cache:
+            try:
+                self.persistent_cache = DependencyCache(cache_path)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Persistent dependency cache unavailable: {e}")
+        # State the installed packages and resolved graphs reflect; taken
+        # before the state is read, so a change in between is seen later
+        self._fingerprint = self.state_fingerprint()
         self._refresh_installed_packages()
 
+    @property
+    def apt_index(self) -> AptIndex:
+        return self._apt_index if self._apt_index is not None else get_apt_index()
+
+    @property
+    def dpkg_status(self) -> DpkgStatus:
+        return self._dpkg_status if self._dpkg_status is not None else get_status_index()
+
     def _run_command(self, cmd: list[str]) -> tuple[bool, str, str]:
         """Execute command and return success, stdout, stderr"""
         try:
@@ -84,15 +151,10 @@ class DependencyResolver:
     def _refresh_installed_packages(self) -> None:
         """Refresh cache of installed packages"""
         logger.info("Refreshing installed packages cache...")
-        success, stdout, _ = self._run_command(["dpkg", "-l"])
+        dpkg_status = self.dpkg_status
 
-        if success:
-            new_packages = set()
-            for line in stdout.split("\n"):
-                if line.startswith("ii"):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        new_packages.add(parts[1])
+        if dpkg_status.available:
+            new_packages = dpkg_status.installed_packages()
 
             with self._packages_lock:
                 self.installed_packages = new_packages
@@ -108,12 +170,68 @@ class DependencyResolver:
         if not self.is_package_installed(package_name):
             return None
 
-        success, stdout, _ = self._run_command(["dpkg-query", "-W", "-f=${Version}", package_name])
+        return self.dpkg_status.version(package_name)
+
+    def get_apt_dependencies(
+        self, package_name: str, preferred: Collection[str] = ()
+    ) -> list[Dependency]:
+        """Get dependencies from the apt package lists
+
+        Args:
+            package_name: Package to get the dependencies of
+            preferred: Providers to choose for virtual dependencies, after
+                       installed ones (e.g. packages installed alongside)
+        """
+        apt_index = self.apt_index
+        if not apt_index.available:
+            return self._apt_cache_dependencies(package_name)
 
-        return stdout.strip() if success else None
+        package = apt_index.get(package_name)
+        if package is None:
+            logger.warning(f"Could not get dependencies for {package_name}: not in apt lists")
+            return []
 
-    def get_apt_dependencies(self, package_name: str) -> list[Dependency]:
-        """Get dependencies from apt-cache"""
+        dependencies = []
+        for dep_name in package.depends:
+            dep_name = self._concrete_package(apt_index, dep_name, preferred)
+            is_installed = self.is_package_installed(dep_name)
+            dependencies.append(
+                Dependency(
+                    name=dep_name,
+                    reason="Required dependency",
+                    is_satisfied=is_installed,
+                    installed_version=(
+                        self.get_installed_version(dep_name) if is_installed else None
+                    ),
+                )
+            )
+
+        for dep_name in package.recommends:
+            dependencies.append(
+                Dependency(
+                    name=dep_name,
+                    reason="Recommended package",
+                    is_satisfied=self.is_package_installed(dep_name),
+                )
+            )
+
+        return dependencies
+
+    def _concrete_package(self, apt_index, name: str, preferred: Collection[str] = ()) -> str:
+        """Resolve a virtual package to a provider, preferring installed ones"""
+        if apt_index.get(name) is not None:
+            return name
+        providers = apt_index.providers(name)
+        for provider in providers:
+            if self.is_package_installed(provider):
+                return provider
+        for provider in providers:
+            if provider in preferred:
+                return provider
+        return providers[0] if providers else name
+
+    def _apt_cache_dependencies(self, package_name: str) -> list[Dependency]:
+        """Get dependencies from apt-cache (when the lists cannot be indexed)"""
         dependencies = []
 
         success, stdout, stderr = self._run_command(["apt-cache", "depends", package_name])
@@ -215,6 +333,7 @@ class DependencyResolver:
             recursive: Whether to resolve transitive dependencies
         """
         logger.info(f"Resolving dependencies for {package_name}...")
+        fingerprint = self._sync_state()
 
         # Check cache (thread-safe)
         with self._cache_lock:
@@ -222,26 +341,40 @@ class DependencyResolver:
                 logger.info(f"Using cached dependencies for {package_name}")
                 return self.dependency_cache[package_name]
 
-        # Get dependencies from multiple sources
-        apt_deps = self.get_apt_dependencies(package_name)
-        predefined_deps = self.get_predefined_dependencies(package_name)
-
-        # Merge dependencies (prefer predefined for known packages)
-        all_deps: dict[str, Dependency] = {}
-
-        for dep in predefined_deps + apt_deps:
-            if dep.name not in all_deps:
-                all_deps[dep.name] = dep
+        if self.persistent_cache is not None:
+            cached = self._load_cached_graph(package_name, fingerprint, recursive)
+            if cached is not None:
+                logger.info(f"Using persisted dependencies for {package_name}")
+                with self._cache_lock:
+                    self.dependency_cache[package_name] = cached
+                return cached
 
-        direct_dependencies = list(all_deps.values())
+        direct_dependencies = self._direct_dependencies(package_name)
+        all_deps = {dep.name: dep for dep in direct_dependencies}
 
         # Resolve transitive dependencies if recursive
         transitive_deps: dict[str, Dependency] = {}
-        if recursive:
+        # Package -> packages it depends on, for the installation order
+        edges: dict[str, set[str]] = {package_name: set(all_deps)}
+        apt_index = self.apt_index
+        if recursive and apt_index.available:
+            closure = self._closure_walker(apt_index).resolve(
+                [package_name, *(dep.name for dep in direct_dependencies if not dep.is_satisfied)]
+            )
+            for name, deps in closure.graph.items():
+                edges.setdefault(name, set()).update(deps)
+                if name != package_name and name not in all_deps:
+                    transitive_deps[name] = Dependency(
+                        name=name, reason="Transitive dependency", is_satisfied=False
+                    )
+            if closure.unresolved:
+                logger.warning(f"Unresolved dependencies: {', '.join(closure.unresolved)}")
+        elif recursive:
             for dep in direct_dependencies:
                 if not dep.is_satisfied:
                     # Get dependencies of this dependency
                     sub_deps = self.get_apt_dependencies(dep.name)
+                    edges[dep.name] = {sub_dep.name for sub_dep in sub_deps}
                     for sub_dep in sub_deps:
                         if sub_dep.name not in all_deps and sub_dep.name not in transitive_deps:
                             transitive_deps[sub_dep.name] = sub_dep
@@ -252,7 +385,10 @@ class DependencyResolver:
         conflicts = self._detect_conflicts(all_dependencies)
 
         # Calculate installation order
-        installation_order = self._calculate_installation_order(package_name, all_dependencies)
+        installation_levels, cycles = self._calculate_installation_levels(
+            package_name, all_dependencies, edges
+        )
+        installation_order = [pkg for level in installation_levels for pkg in level]
 
         graph = DependencyGraph(
             package_name=package_name,
@@ -260,14 +396,108 @@ class DependencyResolver:
             all_dependencies=all_dependencies,
             conflicts=conflicts,
             installation_order=installation_order,
+            installation_levels=installation_levels,
+            cycles=cycles,
         )
 
         # Cache result (thread-safe)
         with self._cache_lock:
             self.dependency_cache[package_name] = graph
+        # Not if the state changed while resolving: the graph may mix both
+        if self.persistent_cache is not None and self.state_fingerprint() == fingerprint:
+            self._store_graph(package_name, fingerprint, recursive, graph)
 
         return graph
 
+    def resolve_many(self, packages: Iterable[str]) -> MultiPackageGraph:
+        """
+        Resolve the dependencies of several packages as one graph
+
+        Dependencies the packages share are resolved once, conflicts are
+        checked across all of them in one pass and everything that is
+        missing gets a single installation order.
+
+        Args:
+            packages: Packages that will be installed together
+        """
+        roots = list(dict.fromkeys(packages))
+        logger.info(f"Resolving dependencies for {len(roots)} packages...")
+        self._sync_state()
+
+        direct: dict[str, list[Dependency]] = {}
+        all_deps: dict[str, Dependency] = {}
+        # Package -> packages it depends on, for the installation order
+        edges: dict[str, set[str]] = {}
+        # The requested packages can provide each other's virtual dependencies
+        preferred = set(roots)
+        for root in roots:
+            direct[root] = self._direct_dependencies(root, preferred)
+            edges[root] = {dep.name for dep in direct[root]}
+            for dep in direct[root]:
+                all_deps.setdefault(dep.name, dep)
+
+        unresolved: list[str] = []
+        apt_index = self.apt_index
+        if apt_index.available:
+            # One walk over the union of the missing dependencies
+            closure = self._closure_walker(apt_index).resolve(
+                [*roots, *(dep.name for dep in all_deps.values() if not dep.is_satisfied)]
+            )
+            for name, deps in closure.graph.items():
+                edges.setdefault(name, set()).update(deps)
+                if name not in all_deps:
+                    all_deps[name] = Dependency(
+                        name=name, reason="Transitive dependency", is_satisfied=False
+                    )
+            unresolved = closure.unresolved
+        else:
+            for dep in list(all_deps.values()):
+                if not dep.is_satisfied and dep.name not in edges:
+                    sub_deps = self.get_apt_dependencies(dep.name)
+                    edges[dep.name] = {sub_dep.name for sub_dep in sub_deps}
+                    for sub_dep in sub_deps:
+                        all_deps.setdefault(sub_dep.name, sub_dep)
+
+        # The requested packages are not dependencies, even of each other
+        all_dependencies = [dep for name, dep in all_deps.items() if name not in direct]
+        conflicts = self._detect_conflicts(
+            [Dependency(name=root) for root in roots] + all_dependencies
+        )
+
+        missing = {dep.name for dep in all_dependencies if not dep.is_satisfied}
+        missing.update(roots)
+        installation_levels, cycles = topological_levels(
+            {name: edges.get(name, set()) & missing for name in missing}
+        )
+
+        return MultiPackageGraph(
+            packages=roots,
+            direct_dependencies=direct,
+            all_dependencies=all_dependencies,
+            conflicts=conflicts,
+            installation_order=[pkg for level in installation_levels for pkg in level],
+            installation_levels=installation_levels,
+            cycles=cycles,
+            unresolved=unresolved,
+            indexed=apt_index.available,
+        )
+
+    def _direct_dependencies(
+        self, package_name: str, preferred: Collection[str] = ()
+    ) -> list[Dependency]:
+        """Direct dependencies from the predefined patterns and the apt lists"""
+        apt_deps = self.get_apt_dependencies(package_name, preferred)
+        predefined_deps = self.get_predefined_dependencies(package_name)
+
+        # Merge dependencies (prefer predefined for known packages)
+        all_deps: dict[str, Dependency] = {}
+
+        for dep in predefined_deps + apt_deps:
+            if dep.name not in all_deps:
+                all_deps[dep.name] = dep
+
+        return list(all_deps.values())
+
     def _detect_conflicts(self, dependencies: list[Dependency]) -> list[tuple[str, str]]:
         """Detect conflicting packages"""
         conflicts = []
@@ -290,32 +520,88 @@ class DependencyResolver:
 
         return conflicts
 
-    def _calculate_installation_order(
-        self, package_name: str, dependencies: list[Dependency]
-    ) -> list[str]:
-        """Calculate optimal installation order"""
-        # Simple topological sort based on dependency levels
+    def state_fingerprint(self) -> str:
+        """Fingerprint of the dpkg status file and apt lists the resolution depends on"""
+        return system_fingerprint([self.dpkg_status.path, *self.apt_index.list_files()])
+
+    def _sync_state(self) -> str:
+        """Current state fingerprint, re-reading the package state if it changed
 
-        # Packages with no dependencies first
-        no_deps = []
-        has_deps = []
+        Drops the graphs resolved against the previous state and the closure
+        walker's lookups, so nothing resolved from stale installed packages or
+        package lists is returned or persisted under the new fingerprint.
+        """
+        fingerprint = self.state_fingerprint()
+        with self._cache_lock:
+            if fingerprint != self._fingerprint:
+                logger.info("Package state changed, re-reading installed packages")
+                self._refresh_installed_packages()
+                self.apt_index.refresh()
+                self.dependency_cache.clear()
+                self._closure = None
+                self._fingerprint = fingerprint
+        return fingerprint
+
+    def _load_cached_graph(
+        self, package_name: str, fingerprint: str, recursive: bool
+    ) -> DependencyGraph | None:
+        try:
+            data = self.persistent_cache.get(package_name, fingerprint, recursive)
+        except (sqlite3.Error, TimeoutError) as e:
+            logger.debug(f"Could not read dependency cache: {e}")
+            return None
+        if data is None:
+            return None
+        try:
+            return DependencyGraph(
+                package_name=data["package_name"],
+                direct_dependencies=[Dependency(**dep) for dep in data["direct_dependencies"]],
+                all_dependencies=[Dependency(**dep) for dep in data["all_dependencies"]],
+                conflicts=[tuple(pair) for pair in data["conflicts"]],
+                installation_order=data["installation_order"],
+                installation_levels=data.get("installation_levels", []),
+                cycles=data.get("cycles", []),
+            )
+        except (KeyError, TypeError) as e:
+            logger.debug(f"Ignoring malformed cached graph for {package_name}: {e}")
+            return None
 
-        for dep in dependencies:
-            if not dep.is_satisfied:
-                # Simple heuristic: system packages first, then others
-                if "lib" in dep.name or dep.name in ["ca-certificates", "curl", "gnupg"]:
-                    no_deps.append(dep.name)
-                else:
-                    has_deps.append(dep.name)
+    def _store_graph(
+        self, package_name: str, fingerprint: str, recursive: bool, graph: DependencyGraph
+    ):
+        try:
+            self.persistent_cache.put(package_name, fingerprint, asdict(graph), recursive)
+        except (sqlite3.Error, TimeoutError) as e:
+            logger.debug(f"Could not write dependency cache: {e}")
 
-        # Build installation order
-        order = no_deps + has_deps
+    def _closure_walker(self, apt_index) -> DependencyClosure:
+        """Closure walker shared by all resolutions (memoizes index lookups)
 
-        # Add main package last
-        if package_name not in order:
-            order.append(package_name)
+        Rebuilt when the package state changes, see _sync_state().
+        """
+        with self._cache_lock:
+            if self._closure is None or self._closure.apt_index is not apt_index:
+                self._closure = DependencyClosure(apt_index, self.is_package_installed)
+            return self._closure
+
+    def _calculate_installation_levels(
+        self,
+        package_name: str,
+        dependencies: list[Dependency],
+        edges: dict[str, set[str]],
+    ) -> tuple[list[list[str]], list[list[str]]]:
+        """Topological installation levels of the missing packages
+
+        Every package comes after the packages it depends on; the packages
+        of a level are independent of each other. The main package comes last.
+        """
+        missing = {dep.name for dep in dependencies if not dep.is_satisfied}
+        missing.add(package_name)
+        graph = {name: edges.get(name, set()) & missing for name in missing}
+        # Installed last even where the edges are incomplete (no apt lists)
+        graph[package_name] = missing - {package_name}
 
-        return order
+        return topological_levels(graph)
 
     def get_missing_dependencies(self, package_name: str) -> list[Dependency]:
         """Get list of dependencies that need to be installed"""
@@ -334,12 +620,31 @@ class DependencyResolver:
             "satisfied_dependencies": len(graph.all_dependencies) - len(missing),
             "conflicts": graph.conflicts,
             "installation_order": graph.installation_order,
+            "installation_levels": graph.installation_levels,
             "install_commands": self._generate_install_commands(graph.installation_order),
             "estimated_time_minutes": len(missing) * 0.5,  # Rough estimate
         }
 
         return plan
 
+    def generate_batch_install_plan(self, packages: Iterable[str]) -> dict:
+        """Generate one installation plan for several packages"""
+        graph = self.resolve_many(packages)
+        missing = graph.missing_dependencies
+
+        return {
+            "packages": graph.packages,
+            "total_dependencies": len(graph.all_dependencies),
+            "missing_dependencies": len(missing),
+            "satisfied_dependencies": len(graph.all_dependencies) - len(missing),
+            "conflicts": graph.conflicts,
+            "unresolved": graph.unresolved,
+            "installation_order": graph.installation_order,
+            "installation_levels": graph.installation_levels,
+            "install_commands": self._generate_install_commands(graph.installation_order),
+            "estimated_time_minutes": len(missing) * 0.5,  # Rough estimate
+        }
+
     def _generate_install_commands(self, packages: list[str]) -> list[str]:
         """Generate apt install commands"""
         commands = []
@@ -378,6 +683,8 @@ class DependencyResolver:
             "all_dependencies": [asdict(dep) for dep in graph.all_dependencies],
             "conflicts": graph.conflicts,
             "installation_order": graph.installation_order,
+            "installation_levels": graph.installation_levels,
+            "cycles": graph.cycles,
         }
 
         with open(filepath, "w") as f:
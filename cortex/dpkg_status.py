@@ -0,0 +1,279 @@
+"""
+Direct reader for the dpkg status database.
+
+Everything dpkg knows about installed packages lives in
+``/var/lib/dpkg/status``: one RFC 822 style stanza per package with its
+status, version, dependencies and conffiles. Reading it directly replaces
+``dpkg -l`` and per-package ``dpkg-query`` calls with a single parse.
+
+``DpkgStatus`` keeps the parsed index in memory and re-reads the file only
+when its modification time or size changes, so callers can query it freely.
+Use ``get_status_index()`` to share one index per status file.
+
+``DpkgStatus.capture()`` takes the current state without parsing it, for
+snapshots that must reflect the state before a change but can be built
+while the change runs.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections.abc import Callable, Container, Iterable, Iterator
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+DPKG_STATUS_PATH = "/var/lib/dpkg/status"
+
+_DEPENDENCY_FIELDS = ("Pre-Depends", "Depends")
+
+# Fields kept from each stanza; the rest (descriptions...) is skipped
+_FIELDS = {"Package", "Status", "Version", "Architecture", "Conffiles", *_DEPENDENCY_FIELDS}
+
+# Version constraint and architecture qualifier of a dependency
+_DEPENDENCY_QUALIFIERS = re.compile(r"\s*\(.*?\)|:\S+")
+
+
+@dataclass(frozen=True)
+class DpkgPackage:
+    """A package entry of the dpkg status database."""
+
+    name: str
+    status: str = "unknown ok not-installed"
+    version: str = ""
+    architecture: str = ""
+    depends: tuple[str, ...] = field(default_factory=tuple)
+    conffiles: tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def state(self) -> str:
+        """Package state, the last word of the status (``installed``, ``config-files``...)."""
+        return self.status.rsplit(None, 1)[-1] if self.status else "unknown"
+
+    @property
+    def installed(self) -> bool:
+        return self.state == "installed"
+
+
+def parse_dependency_clauses(value: str) -> list[list[str]]:
+    """Package names of a ``Depends`` field, one list of alternatives per clause.
+
+    ``"a (>= 1) | b, c:any"`` becomes ``[["a", "b"], ["c"]]``: version
+    constraints and architecture qualifiers are dropped.
+    """
+    clauses = []
+    for clause in value.split(","):
+        names = [_DEPENDENCY_QUALIFIERS.sub("", alt).strip() for alt in clause.split("|")]
+        names = [name for name in names if name]
+        if names:
+            clauses.append(names)
+    return clauses
+
+
+def parse_dependencies(value: str) -> list[str]:
+    """Package names of a ``Depends`` field.
+
+    Version constraints and architecture qualifiers are dropped, and only
+    the first package of each ``a | b`` alternative is kept.
+    """
+    return [clause[0] for clause in parse_dependency_clauses(value)]
+
+
+def _package_from_fields(fields: dict[str, str]) -> DpkgPackage | None:
+    name = fields.get("Package")
+    if not name:
+        return None
+
+    depends: list[str] = []
+    for key in _DEPENDENCY_FIELDS:
+        if key in fields:
+            depends.extend(dep for dep in parse_dependencies(fields[key]) if dep not in depends)
+
+    # "Conffiles:" continuation lines are "<path> <md5sum> [obsolete]"
+    conffiles = tuple(
+        line.split()[0] for line in fields.get("Conffiles", "").splitlines() if line.strip()
+    )
+
+    return DpkgPackage(
+        name=name,
+        status=fields.get("Status", "unknown ok not-installed"),
+        version=fields.get("Version", ""),
+        architecture=fields.get("Architecture", ""),
+        depends=tuple(depends),
+        conffiles=conffiles,
+    )
+
+
+def iter_stanzas(lines: Iterable[str], fields: Container[str]) -> Iterator[dict[str, str]]:
+    """Stanzas of a deb822 file (dpkg status, apt ``Packages`` lists).
+
+    Only the keys in ``fields`` are kept; continuation lines of multi-line
+    fields are joined with newlines.
+    """
+    stanza: dict[str, str] = {}
+    key = None
+    for line in lines:
+        if not line.strip():
+            if stanza:
+                yield stanza
+            stanza = {}
+            key = None
+        elif line[0] in " \t":
+            # Continuation of a multi-line field
+            if key is not None:
+                stanza[key] += "\n" + line.strip()
+        else:
+            name, _, value = line.partition(":")
+            if name in fields:
+                key = name
+                stanza[key] = value.strip()
+            else:
+                key = None
+    if stanza:
+        yield stanza
+
+
+def parse_status(text: str) -> dict[str, DpkgPackage]:
+    """Parse the contents of a dpkg status file.
+
+    Returns:
+        Packages keyed by name. For Multi-Arch packages present for several
+        architectures, the plain name maps to an installed instance and each
+        instance is also available as ``name:arch``.
+    """
+    packages: dict[str, DpkgPackage] = {}
+
+    for fields in iter_stanzas(text.splitlines(), _FIELDS):
+        package = _package_from_fields(fields)
+        if package is None:
+            continue
+        existing = packages.get(package.name)
+        if existing is None or (package.installed and not existing.installed):
+            packages[package.name] = package
+        if existing is not None or package.architecture not in ("", "all"):
+            packages[f"{package.name}:{package.architecture}"] = package
+
+    return packages
+
+
+class DpkgStatus:
+    """Cached index of a dpkg status file.
+
+    Usage:
+        status = get_status_index()
+        if status.is_installed("nginx"):
+            print(status.version("nginx"))
+    """
+
+    def __init__(self, path: str = DPKG_STATUS_PATH, info_dir: str | None = None):
+        self.path = path
+        # Per-package control files (<package>.conffiles, <package>.list...)
+        self.info_dir = info_dir or os.path.join(os.path.dirname(path), "info")
+        self._lock = threading.Lock()
+        self._signature: tuple[int, int] | None = None
+        self._packages: dict[str, DpkgPackage] = {}
+
+    def _current_signature(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def packages(self) -> dict[str, DpkgPackage]:
+        """All package entries, re-read if the status file changed."""
+        signature = self._current_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._packages = self._load() if signature else {}
+                self._signature = signature
+            return self._packages
+
+    def _read(self) -> str:
+        try:
+            with open(self.path, encoding="utf-8", errors="replace") as f:
+                return f.read()
+        except OSError as e:
+            logger.debug(f"Could not read {self.path}: {e}")
+            return ""
+
+    def _load(self) -> dict[str, DpkgPackage]:
+        packages = parse_status(self._read())
+        logger.debug(f"Indexed {len(packages)} dpkg status entries from {self.path}")
+        return packages
+
+    def capture(self) -> Callable[[], dict[str, DpkgPackage]]:
+        """Capture the current package state, deferring the parse.
+
+        Only the status file is read now (nothing at all if the index is
+        current). The returned function parses it when called, possibly
+        from another thread, and gives the state as it was at capture time.
+        """
+        signature = self._current_signature()
+        with self._lock:
+            if signature == self._signature:
+                packages = self._packages
+                return lambda: packages
+        text = self._read() if signature else ""
+
+        def load() -> dict[str, DpkgPackage]:
+            packages = parse_status(text)
+            with self._lock:
+                # Keep the parse if the file has not changed since
+                if self._signature != signature and self._current_signature() == signature:
+                    self._packages = packages
+                    self._signature = signature
+            return packages
+
+        return load
+
+    @property
+    def available(self) -> bool:
+        """True if the status file exists (i.e. this is a dpkg based system)."""
+        return self._current_signature() is not None
+
+    def get(self, name: str) -> DpkgPackage | None:
+        return self.packages().get(name)
+
+    def is_installed(self, name: str) -> bool:
+        package = self.get(name)
+        return package is not None and package.installed
+
+    def version(self, name: str) -> str | None:
+        """Installed version of ``name``, or None if it is not installed."""
+        package = self.get(name)
+        return package.version if package is not None and package.installed else None
+
+    def conffiles(self, package: DpkgPackage) -> tuple[str, ...]:
+        """Conffiles of a package.
+
+        From its status entry, or from ``<info_dir>/<package>.conffiles``
+        for entries written without a ``Conffiles`` field.
+        """
+        if package.conffiles or not package.installed:
+            return package.conffiles
+        for name in (package.name, f"{package.name}:{package.architecture}"):
+            try:
+                with open(os.path.join(self.info_dir, f"{name}.conffiles"), encoding="utf-8") as f:
+                    return tuple(line.split()[0] for line in f if line.strip())
+            except OSError:
+                continue
+        return ()
+
+    def installed_packages(self) -> set[str]:
+        """Names of all installed packages (without architecture qualifiers)."""
+        return {package.name for package in self.packages().values() if package.installed}
+
+
+_indexes: dict[str, DpkgStatus] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_status_index(path: str | None = None) -> DpkgStatus:
+    """Shared index for a status file (``DPKG_STATUS_PATH`` by default)."""
+    path = path or DPKG_STATUS_PATH
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = DpkgStatus(path)
+        return _indexes[path]
@@ -9,21 +9,48 @@ Issue: #257
 
 import hashlib
 import logging
+import math
 import os
+import random
+import re
 import sqlite3
 import threading
 import time
+from collections import deque
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 from pathlib import Path
 from typing import Any
 
+from cortex.history_retention import (
+    MonthlyArchive,
+    archive_rows,
+    default_archive_dir,
+    enable_incremental_vacuum,
+    start_incremental_vacuum,
+)
 from cortex.utils.db_pool import SQLiteConnectionPool, get_connection_pool
 
 logger = logging.getLogger(__name__)
 
+_TOKEN = re.compile(r"\w+")
+
+# Probe results kept per provider by the health monitor
+HEALTH_WINDOW = 20
+# First retry delay after a failed probe, doubled on each further failure
+HEALTH_BACKOFF_BASE = 1.0
+
+# Postings read to gather candidates before ranking the whole index
+_CANDIDATE_POSTINGS = 5000
+
+
+def query_terms(query: str) -> set[str]:
+    """Terms a cached query is indexed under (lowercase words)."""
+    return set(_TOKEN.findall(query.lower()))
+
 
 class APIStatus(Enum):
     """Current status of the LLM API connection."""
@@ -69,18 +96,28 @@ class CachedResponse:
 
 
 class ResponseCache:
-    """SQLite-based cache for LLM responses."""
+    """SQLite-based cache for LLM responses.
+
+    Queries are indexed in an inverted index (``response_cache_terms``, one
+    posting per term and entry), so ``get_similar`` reads only the postings
+    of the query's terms instead of scanning the cache.
+    """
 
     def __init__(self, db_path: Path | None = None):
         self.db_path = db_path or Path.home() / ".cortex" / "response_cache.db"
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._pool: SQLiteConnectionPool | None = None
+        # Monthly segments of entries past retention (see clear_old_entries)
+        self.archive = MonthlyArchive(default_archive_dir(self.db_path), "response_cache")
         self._init_db()
 
     def _init_db(self):
         """Initialize the cache database."""
         self._pool = get_connection_pool(str(self.db_path), pool_size=5)
         with self._pool.get_connection() as conn:
+            if not conn.execute("SELECT 1 FROM sqlite_master").fetchone():
+                # New database: free pages are returned by incremental vacuum
+                enable_incremental_vacuum(conn)
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS response_cache (
@@ -100,6 +137,77 @@ class ResponseCache:
             """
             )
             conn.commit()
+            self._init_term_index(conn)
+
+    def _init_term_index(self, conn: sqlite3.Connection):
+        """Create the inverted index of cached queries, indexing existing entries once."""
+
+        def exists():
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'response_cache_terms'"
+            ).fetchone()
+
+        if exists():
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have created it while we waited for the lock
+            if exists():
+                conn.commit()
+                return
+
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache_terms (
+                    term TEXT NOT NULL,
+                    query_hash TEXT NOT NULL,
+                    PRIMARY KEY (term, query_hash)
+                ) WITHOUT ROWID
+            """
+            )
+            # Number of cached entries, for the inverse document frequencies
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS response_cache_terms_after_insert
+                AFTER INSERT ON response_cache BEGIN
+                    UPDATE response_cache_size SET entries = entries + 1;
+                END
+            """
+            )
+            # Entries are removed by expiry and archiving; put() deletes before replacing
+            conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS response_cache_terms_after_delete
+                AFTER DELETE ON response_cache BEGIN
+                    DELETE FROM response_cache_terms WHERE query_hash = old.query_hash;
+                    UPDATE response_cache_size SET entries = entries - 1;
+                END
+            """
+            )
+            conn.execute("INSERT INTO response_cache_size SELECT 0, COUNT(*) FROM response_cache")
+
+            cursor = conn.execute("SELECT query_hash, query FROM response_cache")
+            while rows := cursor.fetchmany(1000):
+                conn.executemany(
+                    "INSERT INTO response_cache_terms VALUES (?, ?)",
+                    [
+                        (term, query_hash)
+                        for query_hash, query in rows
+                        for term in query_terms(query)
+                    ],
+                )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
 
     def _hash_query(self, query: str) -> str:
         """Generate a hash for a query."""
@@ -145,14 +253,20 @@ class ResponseCache:
         query_hash = self._hash_query(query)
 
         with self._pool.get_connection() as conn:
+            # A replaced entry is deleted first, so the triggers drop its postings
+            conn.execute("DELETE FROM response_cache WHERE query_hash = ?", (query_hash,))
             conn.execute(
                 """
-                INSERT OR REPLACE INTO response_cache
+                INSERT INTO response_cache
                 (query_hash, query, response, created_at, hit_count, last_used)
                 VALUES (?, ?, ?, CURRENT_TIMESTAMP, 0, NULL)
             """,
                 (query_hash, query, response),
             )
+            conn.executemany(
+                "INSERT INTO response_cache_terms VALUES (?, ?)",
+                [(term, query_hash) for term in query_terms(query)],
+            )
             conn.commit()
 
         return CachedResponse(
@@ -160,45 +274,143 @@ class ResponseCache:
         )
 
     def get_similar(self, query: str, limit: int = 5) -> list[CachedResponse]:
-        """Get similar cached responses using simple keyword matching."""
-        keywords = set(query.lower().split())
-        results = []
+        """Get cached responses to the queries sharing the most words with ``query``.
+
+        Shared words are weighted by their inverse document frequency, so
+        a rare word such as a package name counts for more than "install".
+        Ties go to the most used entry. Only the postings of the query's
+        words are read, whatever the size of the cache.
+        """
+        terms = sorted(query_terms(query))
+        if not terms:
+            return []
 
+        placeholders = ", ".join("?" * len(terms))
         with self._pool.get_connection() as conn:
             conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM response_cache ORDER BY hit_count DESC LIMIT 100")
-
-            for row in cursor:
-                cached_keywords = set(row["query"].lower().split())
-                overlap = len(keywords & cached_keywords)
-                if overlap > 0:
-                    results.append(
-                        (
-                            overlap,
-                            CachedResponse(
-                                query_hash=row["query_hash"],
-                                query=row["query"],
-                                response=row["response"],
-                                created_at=datetime.fromisoformat(row["created_at"]),
-                                hit_count=row["hit_count"],
-                            ),
-                        )
-                    )
-
-        # Sort by overlap score and return top matches
-        results.sort(key=lambda x: x[0], reverse=True)
-        return [r[1] for r in results[:limit]]
-
-    def clear_old_entries(self, days: int = 30) -> int:
-        """Remove entries older than specified days."""
+            entries = conn.execute("SELECT entries FROM response_cache_size").fetchone()[0]
+            frequencies = conn.execute(
+                f"""
+                SELECT term, COUNT(*) FROM response_cache_terms
+                WHERE term IN ({placeholders})
+                GROUP BY term
+            """,
+                terms,
+            ).fetchall()
+            if not frequencies:
+                return []
+
+            # Inverse document frequency of each term found in the cache,
+            # rarest first
+            weights = sorted(
+                ((term, math.log(1 + entries / df), df) for term, df in frequencies),
+                key=lambda weight: weight[1],
+                reverse=True,
+            )
+
+            # Rank only the entries holding one of the rare terms. An entry
+            # without them scores at most the sum of the common terms, so
+            # the whole index is ranked only when that could reach the top.
+            rare, postings = [], 0
+            for term, _, df in weights:
+                if rare and postings + df > _CANDIDATE_POSTINGS:
+                    break
+                rare.append(term)
+                postings += df
+            bound = sum(idf for _, idf, _ in weights[len(rare) :])
+
+            rows = self._rank(conn, weights, limit, rare if bound else None)
+            if bound and (len(rows) < limit or rows[-1]["score"] <= bound):
+                rows = self._rank(conn, weights, limit)
+
+        return [
+            CachedResponse(
+                query_hash=row["query_hash"],
+                query=row["query"],
+                response=row["response"],
+                created_at=datetime.fromisoformat(row["created_at"]),
+                hit_count=row["hit_count"],
+            )
+            for row in rows
+        ]
+
+    @staticmethod
+    def _rank(
+        conn: sqlite3.Connection,
+        weights: list[tuple[str, float, int]],
+        limit: int,
+        candidate_terms: list[str] | None = None,
+    ) -> list[sqlite3.Row]:
+        """Entries scored by the summed IDF of their terms, optionally only those
+        holding one of ``candidate_terms``."""
+        values = ", ".join("(?, ?)" for _ in weights)
+        params = [value for term, idf, _ in weights for value in (term, idf)]
+        if candidate_terms is None:
+            return conn.execute(
+                f"""
+                WITH weights(term, idf) AS (VALUES {values})
+                SELECT c.*, SUM(w.idf) AS score
+                FROM weights w
+                JOIN response_cache_terms p ON p.term = w.term
+                JOIN response_cache c ON c.query_hash = p.query_hash
+                GROUP BY c.query_hash
+                ORDER BY score DESC, c.hit_count DESC
+                LIMIT ?
+            """,
+                params + [limit],
+            ).fetchall()
+
+        placeholders = ", ".join("?" * len(candidate_terms))
+        return conn.execute(
+            f"""
+            WITH weights(term, idf) AS (VALUES {values}),
+            candidates(query_hash) AS (
+                SELECT DISTINCT query_hash FROM response_cache_terms
+                WHERE term IN ({placeholders})
+            )
+            SELECT c.*, SUM(w.idf) AS score
+            FROM candidates k
+            CROSS JOIN weights w
+            JOIN response_cache_terms p ON p.term = w.term AND p.query_hash = k.query_hash
+            JOIN response_cache c ON c.query_hash = k.query_hash
+            GROUP BY c.query_hash
+            ORDER BY score DESC, c.hit_count DESC
+            LIMIT ?
+        """,
+            params + candidate_terms + [limit],
+        ).fetchall()
+
+    def clear_old_entries(self, days: int = 30, archive: bool = True) -> int:
+        """Remove entries older than specified days.
+
+        Entries are moved to monthly archive segments, whole months at a
+        time (see cortex.history_retention), unless ``archive`` is False.
+        """
         cutoff = datetime.now() - timedelta(days=days)
 
         with self._pool.get_connection() as conn:
-            cursor = conn.execute(
-                "DELETE FROM response_cache WHERE created_at < ?", (cutoff.isoformat(),)
-            )
-            conn.commit()
-            return cursor.rowcount
+            if archive:
+                removed = archive_rows(
+                    conn,
+                    "response_cache",
+                    self.archive,
+                    cutoff,
+                    timestamp_column="created_at",
+                    id_column="query_hash",
+                )
+            else:
+                removed = conn.execute(
+                    "DELETE FROM response_cache WHERE created_at < ?", (cutoff.isoformat(),)
+                ).rowcount
+                conn.commit()
+
+            try:
+                if not enable_incremental_vacuum(conn):
+                    start_incremental_vacuum(self._pool.get_connection, name="vacuum-cache")
+            except sqlite3.OperationalError as e:
+                # VACUUM needs the database to itself; try again next time
+                logger.warning(f"Could not enable incremental vacuum: {e}")
+            return removed
 
     def get_stats(self) -> dict[str, Any]:
         """Get cache statistics."""
@@ -313,6 +525,19 @@ class PatternMatcher:
         return None
 
 
+def _api_key_configured() -> bool:
+    """Default health check: an LLM API key is configured."""
+    return bool(os.environ.get("ANTHROPIC_API_KEY") or os.environ.get("OPENAI_API_KEY"))
+
+
+def default_health_probes() -> dict[str, Callable[[], bool]]:
+    """Health probes of the providers, checking that their API key is configured."""
+    return {
+        "anthropic": lambda: bool(os.environ.get("ANTHROPIC_API_KEY")),
+        "openai": lambda: bool(os.environ.get("OPENAI_API_KEY")),
+    }
+
+
 class GracefulDegradation:
     """
     Main class for handling graceful degradation when API is unavailable.
@@ -321,6 +546,9 @@ class GracefulDegradation:
     1. Response caching - Use previously cached LLM responses
     2. Pattern matching - Local regex-based command generation
     3. Manual mode - Direct apt command passthrough
+
+    The mode follows API health, checked on demand with check_api_health
+    or kept current in the background with start_health_monitor.
     """
 
     def __init__(
@@ -339,6 +567,19 @@ class GracefulDegradation:
         self._api_failures = 0
         self._max_failures_before_fallback = 3
 
+        # Background health monitor (see start_health_monitor)
+        self._lock = threading.RLock()
+        self._monitor: threading.Thread | None = None
+        self._stop_monitor = threading.Event()
+        self._wake_monitor = threading.Event()
+        self._probes: dict[str, Callable[[], bool]] = {}
+        self._health: dict[str, deque[HealthCheckResult]] = {}
+        # Consecutive failed LLM calls, and when the LLM may be tried again.
+        # Probes cannot clear these: a probe only sees that a provider
+        # answers (or has a key), not that queries to it succeed.
+        self._llm_failures = 0
+        self._llm_retry_at = 0.0
+
     @property
     def current_mode(self) -> FallbackMode:
         """Get the current operating mode."""
@@ -351,36 +592,160 @@ class GracefulDegradation:
         Args:
             api_check_fn: Optional function that returns True if API is healthy
         """
+        result = self._probe(api_check_fn or _api_key_configured)
+
+        with self._lock:
+            if result.status == APIStatus.UNAVAILABLE:
+                self._api_failures += 1
+            else:
+                self._api_failures = 0
+            self._last_health_check = result
+            self._update_mode()
+
+        return result
+
+    @staticmethod
+    def _probe(api_check_fn: Callable[[], bool]) -> HealthCheckResult:
+        """Run one health check, timing it."""
         start_time = time.time()
 
         try:
-            if api_check_fn:
-                is_healthy = api_check_fn()
-            else:
-                # Default: check if API key is configured
-                is_healthy = bool(
-                    os.environ.get("ANTHROPIC_API_KEY") or os.environ.get("OPENAI_API_KEY")
-                )
+            is_healthy = api_check_fn()
+        except Exception as e:
+            return HealthCheckResult(status=APIStatus.UNAVAILABLE, error_message=str(e))
 
-            latency = (time.time() - start_time) * 1000
+        latency = (time.time() - start_time) * 1000
+        if not is_healthy:
+            return HealthCheckResult(status=APIStatus.UNAVAILABLE, latency_ms=latency)
+        status = APIStatus.AVAILABLE if latency < 1000 else APIStatus.DEGRADED
+        return HealthCheckResult(status=status, latency_ms=latency)
 
-            if is_healthy:
-                status = APIStatus.AVAILABLE if latency < 1000 else APIStatus.DEGRADED
-                self._api_failures = 0
-            else:
-                status = APIStatus.UNAVAILABLE
-                self._api_failures += 1
+    def start_health_monitor(
+        self, probes: dict[str, Callable[[], bool]] | None = None
+    ) -> threading.Thread:
+        """
+        Probe the API providers in the background and keep the mode current.
 
-            result = HealthCheckResult(status=status, latency_ms=latency)
+        Each provider is probed every ``health_check_interval`` seconds.
+        After a failure it is probed again sooner, backing off
+        exponentially with jitter, so an outage is confirmed within
+        seconds without hammering a provider that is down. Probes taking
+        longer than ``api_timeout`` count as failures. The mode follows
+        the healthiest provider, so ``process_query`` never waits on a
+        probe.
 
-        except Exception as e:
-            self._api_failures += 1
-            result = HealthCheckResult(status=APIStatus.UNAVAILABLE, error_message=str(e))
+        A failed LLM call in ``process_query`` degrades the mode whatever
+        the probes report, and the LLM is only tried again after the same
+        jittered backoff, growing with each consecutive failed call.
 
-        self._last_health_check = result
-        self._update_mode()
+        Args:
+            probes: Provider name -> function returning True if it is
+                healthy (default: whether its API key is configured)
 
-        return result
+        Returns:
+            The monitor thread (the running one if already started)
+        """
+        with self._lock:
+            if self._monitor and self._monitor.is_alive():
+                return self._monitor
+
+            self._probes = probes or default_health_probes()
+            self._health = {name: deque(maxlen=HEALTH_WINDOW) for name in self._probes}
+            self._stop_monitor.clear()
+            self._monitor = threading.Thread(
+                target=self._run_monitor, name="api-health-monitor", daemon=True
+            )
+            self._monitor.start()
+            return self._monitor
+
+    def stop_health_monitor(self, timeout: float | None = None):
+        """Stop the background health monitor, waiting up to ``timeout`` seconds."""
+        self._stop_monitor.set()
+        self._wake_monitor.set()
+        if self._monitor:
+            self._monitor.join(timeout)
+            self._monitor = None
+
+    def _run_monitor(self):
+        """Probe each provider when due until stopped."""
+        due = dict.fromkeys(self._probes, 0.0)
+        executor = ThreadPoolExecutor(
+            max_workers=len(self._probes), thread_name_prefix="api-health-probe"
+        )
+        try:
+            while not self._stop_monitor.is_set():
+                if self._wake_monitor.is_set():
+                    self._wake_monitor.clear()
+                    due = dict.fromkeys(due, 0.0)
+
+                # Wake up when the LLM may be tried again after failed calls
+                now = time.monotonic()
+                retry_at = self._llm_retry_at if self._llm_retry_at > now else float("inf")
+                futures = {
+                    name: executor.submit(self._probe, self._probes[name])
+                    for name, at in due.items()
+                    if at <= now
+                }
+                if futures:
+                    wait(futures.values(), timeout=self.api_timeout)
+                    for name, future in futures.items():
+                        if future.done():
+                            result = future.result()
+                        else:
+                            result = HealthCheckResult(
+                                status=APIStatus.UNAVAILABLE,
+                                error_message=f"No answer within {self.api_timeout}s",
+                            )
+                        due[name] = time.monotonic() + self._record_health(name, result)
+                self._update_mode_from_health()
+
+                next_at = min(*due.values(), retry_at)
+                self._wake_monitor.wait(max(0.0, next_at - time.monotonic()))
+        except Exception as e:
+            logger.warning(f"API health monitor stopped: {e}")
+        finally:
+            # A hung probe must not keep the monitor alive
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _record_health(self, provider: str, result: HealthCheckResult) -> float:
+        """Add a probe result to the provider's window; return the delay to its next probe."""
+        with self._lock:
+            self._health[provider].append(result)
+            failures = self._trailing_failures(self._health[provider])
+        return self._backoff(failures)
+
+    def _backoff(self, failures: int) -> float:
+        """Jittered delay before retrying after ``failures`` consecutive failures."""
+        delay = self.health_check_interval
+        if failures:
+            delay = min(delay, HEALTH_BACKOFF_BASE * 2 ** (failures - 1))
+        return random.uniform(delay / 2, delay)
+
+    @staticmethod
+    def _trailing_failures(window: deque) -> int:
+        """Consecutive failed probes at the end of a window."""
+        failures = 0
+        for result in reversed(window):
+            if result.status != APIStatus.UNAVAILABLE:
+                break
+            failures += 1
+        return failures
+
+    def _update_mode_from_health(self):
+        """Set the failure count and mode from the healthiest provider's window.
+
+        Failed LLM calls count until their retry time, whatever the probes
+        say; then the next query tries the LLM again.
+        """
+        with self._lock:
+            windows = [window for window in self._health.values() if window]
+            if not windows:
+                return
+            best = min(windows, key=self._trailing_failures)
+            llm_failures = self._llm_failures if time.monotonic() < self._llm_retry_at else 0
+            self._api_failures = max(self._trailing_failures(best), llm_failures)
+            self._last_health_check = best[-1]
+            self._update_mode()
 
     def _update_mode(self):
         """Update operating mode based on API health."""
@@ -421,6 +786,8 @@ class GracefulDegradation:
         if self._current_mode == FallbackMode.FULL_AI and llm_fn:
             try:
                 response = llm_fn(query)
+                with self._lock:
+                    self._llm_failures = 0
                 result["response"] = response
                 result["source"] = "llm"
                 result["confidence"] = 1.0
@@ -431,8 +798,13 @@ class GracefulDegradation:
                 return result
             except Exception as e:
                 logger.warning(f"LLM call failed: {e}")
-                self._api_failures += 1
-                self._update_mode()
+                with self._lock:
+                    self._api_failures += 1
+                    self._llm_failures += 1
+                    self._llm_retry_at = time.monotonic() + self._backoff(self._llm_failures)
+                    self._update_mode()
+                # Let the monitor probe the providers now
+                self._wake_monitor.set()
 
         # Strategy 2: Check cache
         cached = self.cache.get(query)
@@ -478,6 +850,17 @@ class GracefulDegradation:
     def get_status(self) -> dict[str, Any]:
         """Get current degradation status."""
         cache_stats = self.cache.get_stats()
+        with self._lock:
+            providers = {
+                name: {
+                    "status": window[-1].status.value,
+                    "latency_ms": window[-1].latency_ms,
+                    "success_rate": sum(r.is_healthy() for r in window) / len(window),
+                    "consecutive_failures": self._trailing_failures(window),
+                }
+                for name, window in self._health.items()
+                if window
+            }
 
         return {
             "mode": self._current_mode.value,
@@ -485,11 +868,14 @@ class GracefulDegradation:
                 self._last_health_check.status.value if self._last_health_check else "unknown"
             ),
             "api_failures": self._api_failures,
+            "llm_failures": self._llm_failures,
             "cache_entries": cache_stats["total_entries"],
             "cache_hits": cache_stats["total_hits"],
             "last_check": (
                 self._last_health_check.checked_at.isoformat() if self._last_health_check else None
             ),
+            "monitor_running": bool(self._monitor and self._monitor.is_alive()),
+            "providers": providers,
         }
 
     def force_mode(self, mode: FallbackMode):
@@ -498,9 +884,14 @@ class GracefulDegradation:
 
     def reset(self):
         """Reset to default state."""
-        self._api_failures = 0
-        self._current_mode = FallbackMode.FULL_AI
-        self._last_health_check = None
+        with self._lock:
+            self._api_failures = 0
+            self._llm_failures = 0
+            self._llm_retry_at = 0.0
+            self._current_mode = FallbackMode.FULL_AI
+            self._last_health_check = None
+            for window in self._health.values():
+                window.clear()
 
 
 # CLI Integration
@@ -0,0 +1,199 @@
+"""
+Streaming export of history records.
+
+Records are written as they are read, one chunk at a time, so memory use
+does not depend on the size of the history. Supported formats are a JSON
+array, newline-delimited JSON, CSV and Parquet (with pyarrow), each
+optionally compressed with gzip or zstd (with zstandard).
+"""
+
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import logging
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any
+
+# Optional libraries, only imported when an export needs them: every
+# command imports this module through installation_history
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+ZSTD_AVAILABLE = importlib.util.find_spec("zstandard") is not None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "ndjson", "csv", "parquet")
+COMPRESSIONS = ("gzip", "zstd")
+
+# Exported fields: (record key, CSV header)
+FIELDS = [
+    ("id", "ID"),
+    ("timestamp", "Timestamp"),
+    ("operation", "Operation"),
+    ("packages", "Packages"),
+    ("status", "Status"),
+    ("duration", "Duration"),
+    ("error", "Error"),
+]
+
+
+def compression_for(path: str | Path) -> str | None:
+    """Compression implied by the file suffix (``.gz`` or ``.zst``)."""
+    suffix = Path(path).suffix
+    return {".gz": "gzip", ".zst": "zstd"}.get(suffix)
+
+
+def _chunks(records: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _zstandard():
+    """The zstandard module, imported on first use."""
+    if not ZSTD_AVAILABLE:
+        raise RuntimeError("zstd compression requires zstandard: pip install zstandard")
+    import zstandard
+
+    return zstandard
+
+
+@contextmanager
+def _open_binary(path: str | Path, compression: str | None) -> Iterator[IO[bytes]]:
+    if compression == "gzip":
+        with gzip.open(path, "wb") as f:
+            yield f
+    elif compression == "zstd":
+        compressor = _zstandard().ZstdCompressor()
+        with open(path, "wb") as raw, compressor.stream_writer(raw) as f:
+            yield f
+    else:
+        with open(path, "wb") as f:
+            yield f
+
+
+def _write_text(f: IO[str], format: str, chunks: Iterable[list[dict[str, Any]]]) -> int:
+    count = 0
+    if format == "csv":
+        writer = csv.writer(f)
+        writer.writerow([header for _, header in FIELDS])
+        for chunk in chunks:
+            writer.writerows(
+                [
+                    ", ".join(r["packages"]) if key == "packages" else r[key] or ""
+                    for key, _ in FIELDS
+                ]
+                for r in chunk
+            )
+            count += len(chunk)
+    elif format == "ndjson":
+        for chunk in chunks:
+            f.writelines(json.dumps(r) + "\n" for r in chunk)
+            count += len(chunk)
+    else:
+        # A JSON array written element by element
+        f.write("[")
+        for chunk in chunks:
+            for r in chunk:
+                f.write(",\n  " if count else "\n  ")
+                f.write(json.dumps(r))
+                count += 1
+        f.write("\n]\n" if count else "]\n")
+    return count
+
+
+def _write_parquet(
+    path: str | Path, compression: str | None, chunks: Iterable[list[dict[str, Any]]]
+) -> int:
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet export requires pyarrow: pip install pyarrow")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("id", pa.string()),
+            ("timestamp", pa.string()),
+            ("operation", pa.string()),
+            ("packages", pa.list_(pa.string())),
+            ("status", pa.string()),
+            ("duration", pa.float64()),
+            ("error", pa.string()),
+        ]
+    )
+    count = 0
+    # Parquet compresses per column chunk; one row group per chunk of records
+    with pq.ParquetWriter(str(path), schema, compression=compression or "snappy") as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def read_records(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Stream the records of an NDJSON file (compression from the suffix)."""
+    compression = compression_for(path)
+    if compression == "gzip":
+        f = gzip.open(path, "rt", encoding="utf-8")
+    elif compression == "zstd":
+        f = io.TextIOWrapper(
+            _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+            encoding="utf-8",
+        )
+    else:
+        f = open(path, encoding="utf-8")
+    with f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_records(
+    records: Iterable[dict[str, Any]],
+    path: str | Path,
+    format: str = "json",
+    compression: str | None = None,
+    chunk_size: int = 1000,
+) -> int:
+    """Write ``records`` to ``path``.
+
+    CSV and Parquet take the keys of ``FIELDS``; the JSON formats write
+    records as they are.
+
+    Args:
+        records: Records to export, consumed lazily
+        path: Output file
+        format: One of ``FORMATS``
+        compression: None, "gzip" or "zstd"
+        chunk_size: Records buffered (and, for Parquet, per row group)
+
+    Returns:
+        Number of records written
+
+    Raises:
+        ValueError: If the format or compression is unknown
+        RuntimeError: If the optional library the format or compression needs is missing
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format} (choose from {', '.join(FORMATS)})")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression: {compression} (choose from {', '.join(COMPRESSIONS)})"
+        )
+
+    chunks = _chunks(records, chunk_size)
+    if format == "parquet":
+        return _write_parquet(path, compression, chunks)
+
+    with _open_binary(path, compression) as binary:
+        text = io.TextIOWrapper(binary, encoding="utf-8", newline="" if format == "csv" else None)
+        try:
+            return _write_text(text, format, chunks)
+        finally:
+            # Flush into the compressor without closing it twice
+            text.flush()
+            text.detach()
@@ -0,0 +1,250 @@
+"""
+Retention for the Cortex history databases.
+
+Records past the retention age are not deleted outright: they are moved
+into compressed, immutable archive segments, one NDJSON file per calendar
+month, which ``MonthlyArchive`` can still read. A month is archived once
+all of it is older than the cutoff, so each segment is written exactly
+once.
+
+The live databases use ``auto_vacuum=INCREMENTAL``. Archiving frees
+pages inside the database file; ``start_incremental_vacuum`` returns them
+to the file system in small steps from a background thread, so the hot
+database shrinks without a blocking ``VACUUM``.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractContextManager
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from cortex.history_export import ZSTD_AVAILABLE, read_records, write_records
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA auto_vacuum value of INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+_SEGMENT = re.compile(
+    r"^(?P<prefix>.+)-(?P<month>\d{4}-\d{2})(?:\.(?P<part>\d+))?\.ndjson\.(gz|zst)$"
+)
+
+
+def default_archive_dir(db_path: str | Path) -> Path:
+    """Archive directory of a database: ``<name>-archive`` next to it."""
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}-archive"
+
+
+class MonthlyArchive:
+    """Compressed, read-only monthly segments of archived rows.
+
+    Usage:
+        archive = MonthlyArchive(default_archive_dir(db_path), "installations")
+        archive.write("2024-01", rows)
+        for row in archive.iter_records(since="2024-01-01"):
+            ...
+    """
+
+    def __init__(self, directory: str | Path, prefix: str):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.suffix = ".ndjson.zst" if ZSTD_AVAILABLE else ".ndjson.gz"
+
+    def segments(self) -> list[tuple[str, Path]]:
+        """(month, path) of every segment, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        found = []
+        for path in self.directory.iterdir():
+            match = _SEGMENT.match(path.name)
+            if match and match["prefix"] == self.prefix:
+                found.append((match["month"], int(match["part"] or 0), path))
+        return [(month, path) for month, _, path in sorted(found)]
+
+    def write(self, month: str, rows: Iterable[dict[str, Any]]) -> Path | None:
+        """Write the rows of ``month`` (YYYY-MM) as a new segment.
+
+        The segment appears atomically and is made read-only. A month that
+        already has a segment gets an additional part.
+
+        Returns:
+            The segment, or None if there were no rows
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        parts = sum(1 for m, _ in self.segments() if m == month)
+        name = f"{self.prefix}-{month}" + (f".{parts}" if parts else "")
+        path = self.directory / f"{name}{self.suffix}"
+        tmp = self.directory / f".{name}{self.suffix}.tmp"
+
+        count = write_records(rows, tmp, "ndjson", "zstd" if ZSTD_AVAILABLE else "gzip")
+        if not count:
+            tmp.unlink()
+            return None
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+        return path
+
+    def ids(self, month: str, id_column: str) -> set:
+        """IDs already archived for ``month``."""
+        return {
+            row[id_column]
+            for m, path in self.segments()
+            if m == month
+            for row in read_records(path)
+        }
+
+    def iter_records(
+        self,
+        since: str | None = None,
+        until: str | None = None,
+        timestamp_column: str = "timestamp",
+    ) -> Iterator[dict[str, Any]]:
+        """Stream archived rows with ``since <= timestamp < until``, by segment.
+
+        Only the segments of the months in the range are read.
+        """
+        for month, path in self.segments():
+            if (since and month < since[:7]) or (until and month > until[:7]):
+                continue
+            for row in read_records(path):
+                timestamp = row.get(timestamp_column) or ""
+                if (since and timestamp < since) or (until and timestamp >= until):
+                    continue
+                yield row
+
+
+def archive_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    archive: MonthlyArchive,
+    cutoff: datetime,
+    timestamp_column: str = "timestamp",
+    id_column: str = "id",
+    chunk_size: int = 1000,
+) -> int:
+    """Move the rows of every month that ended before ``cutoff`` into ``archive``.
+
+    Each month is archived in its own write transaction: the segment is
+    written, then the rows are deleted. Rows of a month already found in
+    the archive (an earlier run interrupted before its delete) are only
+    deleted.
+
+    Returns:
+        Number of rows removed from ``table``
+    """
+    boundary = cutoff.strftime("%Y-%m")
+    months = [
+        row[0]
+        for row in conn.execute(
+            f"""
+            SELECT DISTINCT substr({timestamp_column}, 1, 7) FROM {table}
+            WHERE {timestamp_column} < ?
+            ORDER BY 1
+        """,
+            (boundary,),
+        )
+    ]
+
+    total = 0
+    for month in months:
+        year, number = map(int, month.split("-"))
+        next_month = f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+        archived = archive.ids(month, id_column)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                f"""
+                SELECT * FROM {table}
+                WHERE {timestamp_column} >= ? AND {timestamp_column} < ?
+                ORDER BY {timestamp_column}
+            """,
+                (month, next_month),
+            )
+            columns = [column[0] for column in cursor.description]
+
+            def rows(cursor=cursor, columns=columns, archived=archived):
+                while chunk := cursor.fetchmany(chunk_size):
+                    for row in chunk:
+                        record = dict(zip(columns, row))
+                        if record[id_column] not in archived:
+                            yield record
+
+            archive.write(month, rows())
+            deleted = conn.execute(
+                f"DELETE FROM {table} WHERE {timestamp_column} >= ? AND {timestamp_column} < ?",
+                (month, next_month),
+            ).rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        total += deleted
+        logger.info(f"Archived {deleted} rows of {table} from {month}")
+    return total
+
+
+def auto_vacuum(conn: sqlite3.Connection) -> int:
+    """Current ``auto_vacuum`` mode of the database.
+
+    The pragma reports the header as last read by this connection, which
+    is stale after another connection converted the database; a read
+    refreshes it.
+    """
+    conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """Switch a database to ``auto_vacuum=INCREMENTAL``.
+
+    An existing database is converted by a full ``VACUUM``, which may
+    renumber implicit rowids: callers must rebuild rowid-keyed indexes
+    (see ``FullTextIndex.rebuild``) when this returns True.
+
+    Returns:
+        True if the database was rewritten
+    """
+    if auto_vacuum(conn) == AUTO_VACUUM_INCREMENTAL:
+        return False
+    conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+    conn.execute("VACUUM")
+    return True
+
+
+def start_incremental_vacuum(
+    connect: Callable[[], AbstractContextManager[sqlite3.Connection]],
+    pages_per_step: int = 256,
+    name: str = "incremental-vacuum",
+) -> threading.Thread:
+    """Return the free pages of a database to the file system in the background.
+
+    Each step frees at most ``pages_per_step`` pages in a short write
+    transaction, so writers are only briefly delayed.
+    """
+
+    def run():
+        try:
+            while True:
+                with connect() as conn:
+                    if not conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                        break
+                    # Each result row is one freed page; fetch them all to run the step
+                    conn.execute(f"PRAGMA incremental_vacuum({pages_per_step})").fetchall()
+                    conn.commit()
+            logger.debug(f"{name} complete")
+        except (sqlite3.Error, TimeoutError) as e:
+            logger.warning(f"{name} interrupted: {e}")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,63 @@
+"""
+Full-text search across the Cortex history stores.
+
+Searches the commands and error messages of installations and package
+transactions and the sandbox audit log, each through its FTS5 index,
+and merges the results by bm25 score.
+"""
+
+import logging
+from collections.abc import Iterable
+
+from cortex.installation_history import InstallationHistory
+from cortex.sandbox.audit_log import SandboxAuditLog, default_audit_db_path
+from cortex.transaction_history import TransactionHistory
+from cortex.utils.fts_index import SearchHit
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("installations", "transactions", "audit")
+
+
+def search_history(
+    query: str,
+    limit: int = 20,
+    sources: Iterable[str] = SOURCES,
+    installation_history: InstallationHistory | None = None,
+    transaction_history: TransactionHistory | None = None,
+    audit_log: SandboxAuditLog | None = None,
+) -> list[SearchHit]:
+    """Best matches of ``query`` across the history stores.
+
+    bm25 scores of different stores are computed against different
+    document sets, so the merged order is approximate across stores and
+    exact within each.
+
+    Args:
+        query: Free text; records must contain every term (``term*`` for a prefix)
+        limit: Maximum number of results
+        sources: Stores to search (see ``SOURCES``)
+        installation_history, transaction_history, audit_log: Stores to use
+            instead of the default databases
+    """
+    sources = set(sources)
+    unknown = sources - set(SOURCES)
+    if unknown:
+        raise ValueError(f"Unknown history source(s): {', '.join(sorted(unknown))}")
+
+    stores = []
+    if "installations" in sources:
+        stores.append(installation_history or InstallationHistory())
+    if "transactions" in sources:
+        stores.append(transaction_history or TransactionHistory())
+    if "audit" in sources:
+        if audit_log is None and default_audit_db_path().exists():
+            audit_log = SandboxAuditLog()
+        if audit_log is not None:
+            stores.append(audit_log)
+
+    hits = []
+    for store in stores:
+        hits.extend(store.search_text(query, limit))
+    hits.sort(key=lambda hit: hit.score)
+    return hits[:limit]
@@ -1,14 +1,17 @@
 import asyncio
-import concurrent.futures
-import re
-import subprocess
 import time
+from collections import deque
 from collections.abc import Callable
-from concurrent.futures import Executor
 from dataclasses import dataclass, field
 from enum import Enum
 
-from cortex.validators import DANGEROUS_PATTERNS
+from cortex.apt_scheduler import AptLockScheduler
+from cortex.command_safety import check_command
+from cortex.utils.streaming import OutputBuffer, stream_command
+
+# Default number of tasks allowed to run at the same time. Install steps are
+# mostly network- and disk-bound, so this is not tied to the CPU count.
+DEFAULT_MAX_CONCURRENCY = 8
 
 
 class TaskStatus(Enum):
@@ -41,17 +44,23 @@ class ParallelTask:
 
 async def run_single_task(
     task: ParallelTask,
-    executor: Executor,
     timeout: int,
     log_callback: Callable[[str, str], None] | None = None,
+    apt_scheduler: AptLockScheduler | None = None,
+    line_callback: Callable[[ParallelTask, str, str], None] | None = None,
 ) -> bool:
     """Run a single task asynchronously.
 
+    The command runs as a native asyncio subprocess in the terminal's session
+    (so sudo can prompt); on timeout it is killed with all its descendants.
+
     Args:
         task: Task to run
-        executor: Thread pool executor for running blocking subprocess calls
         timeout: Command timeout in seconds
         log_callback: Optional callback for logging messages
+        apt_scheduler: Optional scheduler that serializes dpkg-locking commands
+        line_callback: Optional callback (task, stream, line) called for every
+                       line of output as it is produced
 
     Returns:
         True if task succeeded, False otherwise
@@ -64,39 +73,40 @@ async def run_single_task(
         log_callback(f"Starting {task.name}…", "info")
 
     # Validate command for dangerous patterns
-    for pattern in DANGEROUS_PATTERNS:
-        if re.search(pattern, task.command, re.IGNORECASE):
-            task.status = TaskStatus.FAILED
-            task.error = "Command blocked: matches dangerous pattern"
-            task.end_time = time.time()
-            if log_callback:
-                log_callback(f"Finished {task.name} (failed)", "error")
-            return False
+    if check_command(task.command):
+        task.status = TaskStatus.FAILED
+        task.error = "Command blocked: matches dangerous pattern"
+        task.end_time = time.time()
+        if log_callback:
+            log_callback(f"Finished {task.name} (failed)", "error")
+        return False
+
+    on_line = None
+    if line_callback is not None:
+
+        def on_line(stream: str, line: str):
+            line_callback(task, stream, line)
+
+    async def run_shell(command: str) -> tuple[int, str, str]:
+        # Commands are validated against dangerous patterns above; a shell is
+        # required to support pipes and redirects in plan steps.
+        stdout, stderr = OutputBuffer(), OutputBuffer()
+        returncode = await stream_command(command, stdout, stderr, timeout=timeout, on_line=on_line)
+        return returncode, stdout.getvalue(), stderr.getvalue()
 
     try:
-        # Run command in executor (thread pool) to avoid blocking the event loop
-        loop = asyncio.get_running_loop()
-        result = await asyncio.wait_for(
-            loop.run_in_executor(
-                executor,
-                # Use shell=True carefully - commands are validated against dangerous patterns above.
-                # shell=True is required to support complex shell commands (e.g., pipes, redirects).
-                lambda: subprocess.run(
-                    task.command,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout,
-                ),
-            ),
-            timeout=timeout + 5,  # Slight buffer for asyncio overhead
-        )
+        if apt_scheduler and apt_scheduler.handles(task.command):
+            returncode, stdout, stderr = await apt_scheduler.run(
+                task.command, run_shell, log_callback
+            )
+        else:
+            returncode, stdout, stderr = await run_shell(task.command)
 
-        task.output = result.stdout
-        task.error = result.stderr
+        task.output = stdout
+        task.error = stderr
         task.end_time = time.time()
 
-        if result.returncode == 0:
+        if returncode == 0:
             task.status = TaskStatus.SUCCESS
             if log_callback:
                 log_callback(f"Finished {task.name} (ok)", "success")
@@ -131,6 +141,10 @@ async def run_parallel_install(
     timeout: int = 300,
     stop_on_error: bool = True,
     log_callback: Callable[[str, str], None] | None = None,
+    apt_aware: bool = True,
+    apt_scheduler: AptLockScheduler | None = None,
+    line_callback: Callable[[ParallelTask, str, str], None] | None = None,
+    max_concurrency: int | None = None,
 ) -> tuple[bool, list[ParallelTask]]:
     """Execute installation tasks in parallel based on dependency graph.
 
@@ -140,8 +154,14 @@ async def run_parallel_install(
         dependencies: Optional dict mapping command index to list of dependent indices
                      e.g., {0: [], 1: [0]} means task 1 depends on task 0
         timeout: Timeout per command in seconds
-        stop_on_error: If True, cancel dependent tasks when a task fails
+        stop_on_error: If True, skip tasks that (transitively) depend on a failed task
         log_callback: Optional callback for logging (called with message and level)
+        apt_aware: If True, apt/dpkg steps download concurrently but install one at
+                   a time under the dpkg lock, retrying on lock contention
+        apt_scheduler: Optional pre-configured scheduler (implies apt_aware)
+        line_callback: Optional callback (task, stream, line) for live output
+        max_concurrency: Maximum number of commands running at once
+                         (default: DEFAULT_MAX_CONCURRENCY)
 
     Returns:
         tuple[bool, list[ParallelTask]]: Success status and list of all tasks
@@ -152,19 +172,24 @@ async def run_parallel_install(
     if descriptions and len(descriptions) != len(commands):
         raise ValueError("Number of descriptions must match number of commands")
 
+    if max_concurrency is None:
+        max_concurrency = DEFAULT_MAX_CONCURRENCY
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
     # Create tasks
     tasks: dict[str, ParallelTask] = {}
     for i, command in enumerate(commands):
         task_name = f"Task {i + 1}"
         desc = descriptions[i] if descriptions else f"Step {i + 1}"
 
-        # Get dependencies for this task (if any commands depend on it, don't use that)
-        # Instead, find which tasks this task depends on
+        # Dependencies format: key=task_index -> list of indices it depends on
         task_deps: list[str] = []
         if dependencies:
-            # Dependencies format: key=task_index -> list of indices it depends on
             for dep_idx in dependencies.get(i, []):
-                task_deps.append(f"Task {dep_idx + 1}")
+                dep_name = f"Task {dep_idx + 1}"
+                if dep_name not in task_deps:
+                    task_deps.append(dep_name)
 
         tasks[task_name] = ParallelTask(
             name=task_name,
@@ -173,104 +198,90 @@ async def run_parallel_install(
             dependencies=task_deps,
         )
 
-    # Execution tracking
-    completed = set()
-    running = {}
-    pending = set(tasks.keys())
-    failed = set()
-
-    # Thread pool for subprocess calls
-    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    # Reverse edges and in-degree counts. Dependencies on unknown tasks are
+    # counted but never released, so such tasks end up skipped.
+    dependents: dict[str, list[str]] = {name: [] for name in tasks}
+    in_degree: dict[str, int] = {}
+    for name, task in tasks.items():
+        in_degree[name] = len(task.dependencies)
+        for dep in task.dependencies:
+            if dep in dependents:
+                dependents[dep].append(name)
+
+    ready: deque[str] = deque(name for name in tasks if in_degree[name] == 0)
+    running: dict[asyncio.Task, str] = {}
+    failed: set[str] = set()
+
+    if apt_scheduler is None and apt_aware:
+        apt_scheduler = AptLockScheduler()
+
+    def release_dependents(task_name: str):
+        for dependent in dependents[task_name]:
+            in_degree[dependent] -= 1
+            if in_degree[dependent] == 0 and tasks[dependent].status == TaskStatus.PENDING:
+                ready.append(dependent)
+
+    def skip_dependents(task_name: str):
+        queue = deque(dependents[task_name])
+        while queue:
+            dependent = queue.popleft()
+            task = tasks[dependent]
+            if task.status != TaskStatus.PENDING:
+                continue
+            task.status = TaskStatus.SKIPPED
+            task.error = f"Task cancelled due to dependency failure ({task_name})"
+            failed.add(dependent)
+            if log_callback:
+                log_callback(f"{dependent} skipped because {task_name} failed", "error")
+            queue.extend(dependents[dependent])
 
     try:
-        while pending or running:
-            # Start tasks whose dependencies are met
-            ready_to_start = []
-            for task_name in pending.copy():
-                task = tasks[task_name]
-                # When stop_on_error=False, accept both completed and failed dependencies
-                if stop_on_error:
-                    deps_met = all(dep in completed for dep in task.dependencies)
-                else:
-                    deps_met = all(dep in completed or dep in failed for dep in task.dependencies)
-
-                if deps_met:
-                    ready_to_start.append(task_name)
-                    pending.remove(task_name)
-
-            # If no tasks can be started and none are running, we're stuck (deadlock/cycle detection)
-            if not ready_to_start and not running and pending:
-                # Mark remaining tasks as skipped - they have unresolvable dependencies
-                for task_name in pending:
-                    task = tasks[task_name]
-                    if task.status == TaskStatus.PENDING:
-                        task.status = TaskStatus.SKIPPED
-                        task.error = "Task could not run because dependencies never completed"
-                        if log_callback:
-                            log_callback(
-                                f"{task_name} skipped due to unresolved dependencies", "error"
-                            )
-                failed.update(pending)
-                break
-
-            # Create tasks for ready items
-            for task_name in ready_to_start:
-                coro = run_single_task(tasks[task_name], executor, timeout, log_callback)
-                running[task_name] = asyncio.create_task(coro)
-
-            # If nothing is running and nothing is pending, we're done
-            if not running and not pending:
-                break
-
-            # Wait for at least one task to finish
-            if running:
-                done, _ = await asyncio.wait(
-                    running.values(),
-                    return_when=asyncio.FIRST_COMPLETED,
+        while ready or running:
+            # Start ready tasks up to the concurrency limit
+            while ready and len(running) < max_concurrency:
+                task_name = ready.popleft()
+                coro = run_single_task(
+                    tasks[task_name], timeout, log_callback, apt_scheduler, line_callback
                 )
+                running[asyncio.create_task(coro)] = task_name
 
-                # Process completed tasks
-                for task_coro in done:
-                    # Find which task this is
-                    for task_name, running_coro in running.items():
-                        if running_coro is task_coro:
-                            task = tasks[task_name]
-
-                            # Handle cancelled tasks
-                            try:
-                                success = task_coro.result()
-                            except asyncio.CancelledError:
-                                # Task was cancelled due to stop_on_error
-                                task.status = TaskStatus.SKIPPED
-                                task.error = "Task cancelled due to dependency failure"
-                                failed.add(task_name)
-                                del running[task_name]
-                                break
-
-                            if success:
-                                completed.add(task_name)
-                            else:
-                                failed.add(task_name)
-
-                                # If stop_on_error, skip dependent tasks
-                                if stop_on_error:
-                                    dependent_tasks = [
-                                        name
-                                        for name, t in tasks.items()
-                                        if task_name in t.dependencies
-                                    ]
-                                    for dep_task_name in dependent_tasks:
-                                        if dep_task_name in pending:
-                                            pending.remove(dep_task_name)
-                                            tasks[dep_task_name].status = TaskStatus.SKIPPED
-                                        elif dep_task_name in running:
-                                            running[dep_task_name].cancel()
-
-                            del running[task_name]
-                            break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+            for finished in done:
+                task_name = running.pop(finished)
+                task = tasks[task_name]
+
+                try:
+                    success = finished.result()
+                except asyncio.CancelledError:
+                    task.status = TaskStatus.SKIPPED
+                    task.error = "Task cancelled"
+                    success = False
+
+                if not success:
+                    failed.add(task_name)
+                    if stop_on_error:
+                        skip_dependents(task_name)
+                        continue
+
+                # When stop_on_error=False, failed dependencies also count as met
+                release_dependents(task_name)
 
     finally:
-        executor.shutdown(wait=True)
+        # Make sure no subprocess outlives the run (e.g. if we were cancelled)
+        for pending_task in running:
+            pending_task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    # Anything still pending has dependencies that never completed (cycle or unknown task)
+    for task_name, task in tasks.items():
+        if task.status == TaskStatus.PENDING:
+            task.status = TaskStatus.SKIPPED
+            task.error = "Task could not run because dependencies never completed"
+            failed.add(task_name)
+            if log_callback:
+                log_callback(f"{task_name} skipped due to unresolved dependencies", "error")
 
     # Check overall success
     all_success = len(failed) == 0
@@ -13,11 +13,25 @@ import re
 import sqlite3
 import subprocess
 import sys
+import threading
+from collections.abc import Iterator, Mapping
 from dataclasses import asdict, dataclass
 from enum import Enum
 from pathlib import Path
 
+from cortex.dpkg_status import DpkgPackage, DpkgStatus, get_status_index
+from cortex.history_export import FORMATS, compression_for, write_records
+from cortex.history_retention import (
+    MonthlyArchive,
+    archive_rows,
+    default_archive_dir,
+    enable_incremental_vacuum,
+    start_incremental_vacuum,
+)
 from cortex.utils.db_pool import SQLiteConnectionPool, get_connection_pool
+from cortex.utils.fts_index import FullTextIndex, SearchHit, fts_query
+from cortex.utils.history_stats import HistoryStats, KeyStats, Outcome, PlanEstimate, estimate_plan
+from cortex.utils.package_index import PackageIndex
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -77,6 +91,19 @@ class InstallationHistory:
         self.db_path = db_path
         self._ensure_db_directory()
         self._pool: SQLiteConnectionPool | None = None
+        # Before-snapshots still being built, by installation ID
+        self._snapshot_threads: dict[str, threading.Thread] = {}
+        self._snapshot_lock = threading.Lock()
+        # One row per installation and package, for package lookups
+        self.package_index = PackageIndex("installation_packages", source="installations")
+        # Full-text index of commands and errors, for `cortex history search`
+        self.text_index = FullTextIndex(
+            "installations_fts", "installations", ["commands_executed", "error_message"]
+        )
+        # Success rates and durations per package and command pattern
+        self.stats = HistoryStats("installation", "installations", outcome_of=self._outcome)
+        # Monthly segments of records past retention (see cleanup_old_records)
+        self.archive = MonthlyArchive(default_archive_dir(self.db_path), "installations")
         self._init_database()
 
     def _ensure_db_directory(self):
@@ -97,6 +124,10 @@ class InstallationHistory:
             self._pool = get_connection_pool(self.db_path, pool_size=5)
 
             with self._pool.get_connection() as conn:
+                if not conn.execute("SELECT 1 FROM sqlite_master").fetchone():
+                    # New database: free pages are returned by incremental vacuum
+                    enable_incremental_vacuum(conn)
+
                 cursor = conn.cursor()
 
                 # Create installations table
@@ -126,8 +157,45 @@ class InstallationHistory:
                 """
                 )
 
+                # Per-step coordinator state, used to resume interrupted runs
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS install_checkpoints (
+                        install_id TEXT NOT NULL,
+                        step_index INTEGER NOT NULL,
+                        command TEXT NOT NULL,
+                        description TEXT,
+                        status TEXT NOT NULL,
+                        output TEXT,
+                        error TEXT,
+                        return_code INTEGER,
+                        start_time REAL,
+                        end_time REAL,
+                        packages TEXT,
+                        PRIMARY KEY (install_id, step_index)
+                    )
+                """
+                )
+
+                # Timing analysis of each run (see cortex.timing_analysis)
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS install_timing (
+                        install_id TEXT PRIMARY KEY,
+                        report TEXT NOT NULL
+                    )
+                """
+                )
+
                 conn.commit()
 
+                for index in (self.package_index, self.text_index, self.stats):
+                    index.create(conn)
+                    conn.commit()
+                    if not index.ready(conn):
+                        # Existing database: index its records in the background
+                        index.start_backfill(self._pool.get_connection)
+
             logger.info(f"Database initialized at {self.db_path}")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
@@ -146,13 +214,14 @@ class InstallationHistory:
             return (False, "", str(e))
 
     def _get_package_info(self, package_name: str) -> PackageSnapshot | None:
-        """Get current state of a package"""
-        # Check if package is installed
-        success, stdout, _ = self._run_command(
-            ["dpkg-query", "-W", "-f=${Status}|${Version}", package_name]
-        )
-
-        if not success:
+        """Get current state of a package from the dpkg status database"""
+        status = get_status_index()
+        return self._package_snapshot(package_name, status.get(package_name), status)
+
+    def _package_snapshot(
+        self, package_name: str, package: DpkgPackage | None, status: DpkgStatus
+    ) -> PackageSnapshot:
+        if package is None:
             return PackageSnapshot(
                 package_name=package_name,
                 version="not-installed",
@@ -161,55 +230,67 @@ class InstallationHistory:
                 config_files=[],
             )
 
-        # Parse status and version
-        parts = stdout.strip().split("|")
-        if len(parts) != 2:
-            return None
-
-        status_parts = parts[0].split()
-        status = status_parts[-1] if status_parts else "unknown"
-        version = parts[1]
-
-        # Get dependencies
-        dependencies = []
-        dep_success, dep_stdout, _ = self._run_command(["apt-cache", "depends", package_name])
-        if dep_success:
-            for line in dep_stdout.split("\n"):
-                if line.strip().startswith("Depends:"):
-                    dep = line.split(":", 1)[1].strip()
-                    # Clean up dependency string
-                    dep = re.sub(r"\s*\(.*?\)", "", dep)  # Remove version constraints
-                    dep = dep.split("|")[0].strip()  # Take first alternative
-                    if dep:
-                        dependencies.append(dep)
-
-        # Get config files
-        config_files = []
-        conf_success, conf_stdout, _ = self._run_command(["dpkg-query", "-L", package_name])
-        if conf_success:
-            for line in conf_stdout.split("\n"):
-                line = line.strip()
-                if line and "/etc/" in line and Path(line).exists():
-                    config_files.append(line)
+        config_files = [path for path in status.conffiles(package) if Path(path).exists()]
 
         return PackageSnapshot(
             package_name=package_name,
-            version=version,
-            status=status,
-            dependencies=dependencies[:10],  # Limit to first 10
+            version=package.version,
+            status=package.state,
+            dependencies=list(package.depends[:10]),  # Limit to first 10
             config_files=config_files[:20],  # Limit to first 20
         )
 
-    def _create_snapshot(self, packages: list[str]) -> list[PackageSnapshot]:
-        """Create snapshot of package states"""
-        snapshots = []
+    def _create_snapshot(
+        self, packages: list[str], state: Mapping[str, DpkgPackage] | None = None
+    ) -> list[PackageSnapshot]:
+        """Create snapshot of package states
 
-        for package in packages:
-            snapshot = self._get_package_info(package)
-            if snapshot:
-                snapshots.append(snapshot)
+        All packages are looked up in one read of the dpkg status database
+        (or in ``state``, a previously captured one).
+        """
+        status = get_status_index()
+        if state is None:
+            state = status.packages()
 
-        return snapshots
+        return [self._package_snapshot(package, state.get(package), status) for package in packages]
+
+    def _start_before_snapshot(self, install_id: str, packages: list[str]):
+        """Snapshot the package states in the background, while the installation runs.
+
+        The dpkg state is captured before returning; building the snapshot
+        from it and storing it in the record happens in a thread.
+        """
+        load_state = get_status_index().capture()
+
+        def run():
+            try:
+                snapshot = self._create_snapshot(packages, load_state())
+                with self._pool.get_connection() as conn:
+                    conn.execute(
+                        "UPDATE installations SET before_snapshot = ? WHERE id = ?",
+                        (json.dumps([asdict(s) for s in snapshot]), install_id),
+                    )
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Failed to store snapshot of {install_id}: {e}")
+
+        # Not a daemon thread: the snapshot is stored even if the CLI exits first
+        thread = threading.Thread(target=run, name=f"snapshot-{install_id}")
+        with self._snapshot_lock:
+            self._snapshot_threads[install_id] = thread
+        thread.start()
+
+    def _wait_for_snapshots(self, install_id: str | None = None):
+        """Wait for background snapshots (of one installation, or all)."""
+        with self._snapshot_lock:
+            if install_id is None:
+                threads = list(self._snapshot_threads.values())
+                self._snapshot_threads.clear()
+            else:
+                thread = self._snapshot_threads.pop(install_id, None)
+                threads = [thread] if thread else []
+        for thread in threads:
+            thread.join()
 
     def _extract_packages_from_commands(self, commands: list[str]) -> list[str]:
         """Extract package names from installation commands"""
@@ -271,9 +352,6 @@ class InstallationHistory:
         if not packages:
             logger.warning("No packages found in installation record")
 
-        # Create before snapshot
-        before_snapshot = self._create_snapshot(packages)
-
         # Generate ID
         install_id = self._generate_id(packages)
 
@@ -294,7 +372,7 @@ class InstallationHistory:
                         operation_type.value,
                         json.dumps(packages),
                         InstallationStatus.IN_PROGRESS.value,
-                        json.dumps([asdict(s) for s in before_snapshot]),
+                        None,  # before_snapshot - stored by the snapshot thread
                         None,  # after_snapshot - will be updated
                         json.dumps(commands),
                         None,  # error_message
@@ -302,9 +380,13 @@ class InstallationHistory:
                         None,  # duration
                     ),
                 )
+                self.package_index.update(conn, install_id, timestamp, packages)
 
             conn.commit()
 
+            # Create before snapshot
+            self._start_before_snapshot(install_id, packages)
+
             logger.info(f"Installation {install_id} recorded")
             return install_id
         except Exception as e:
@@ -315,13 +397,15 @@ class InstallationHistory:
         self, install_id: str, status: InstallationStatus, error_message: str | None = None
     ):
         """Update installation record after completion"""
+        self._wait_for_snapshots(install_id)
         try:
             with self._pool.get_connection() as conn:
                 cursor = conn.cursor()
 
                 # Get packages from record
                 cursor.execute(
-                    "SELECT packages, timestamp FROM installations WHERE id = ?", (install_id,)
+                    "SELECT packages, timestamp, commands_executed FROM installations WHERE id = ?",
+                    (install_id,),
                 )
                 result = cursor.fetchone()
 
@@ -330,65 +414,241 @@ class InstallationHistory:
                     return
 
                 packages = json.loads(result[0])
-            start_time = datetime.datetime.fromisoformat(result[1])
-            duration = (datetime.datetime.now() - start_time).total_seconds()
+                start_time = datetime.datetime.fromisoformat(result[1])
+                duration = (datetime.datetime.now() - start_time).total_seconds()
 
-            # Create after snapshot
-            after_snapshot = self._create_snapshot(packages)
+                # Create after snapshot
+                after_snapshot = self._create_snapshot(packages)
 
-            # Update record
-            cursor.execute(
-                """
-                UPDATE installations
-                SET status = ?,
-                    after_snapshot = ?,
-                    error_message = ?,
-                    duration_seconds = ?
-                WHERE id = ?
-            """,
-                (
-                    status.value,
-                    json.dumps([asdict(s) for s in after_snapshot]),
-                    error_message,
-                    duration,
-                    install_id,
-                ),
-            )
+                # Update record
+                cursor.execute(
+                    """
+                    UPDATE installations
+                    SET status = ?,
+                        after_snapshot = ?,
+                        error_message = ?,
+                        duration_seconds = ?
+                    WHERE id = ?
+                """,
+                    (
+                        status.value,
+                        json.dumps([asdict(s) for s in after_snapshot]),
+                        error_message,
+                        duration,
+                        install_id,
+                    ),
+                )
 
-            conn.commit()
+                outcome = self._outcome(
+                    {
+                        "id": install_id,
+                        "packages": result[0],
+                        "commands_executed": result[2],
+                        "status": status.value,
+                        "duration_seconds": duration,
+                        "error_message": error_message,
+                    }
+                )
+                if outcome:
+                    self.stats.record(conn, outcome)
+
+                conn.commit()
 
             logger.info(f"Installation {install_id} updated: {status.value}")
         except Exception as e:
             logger.error(f"Failed to update installation: {e}")
             raise
 
+    @staticmethod
+    def _outcome(row: Mapping) -> Outcome | None:
+        """Outcome of a finished installation row, for the statistics tables."""
+        if row["status"] not in (InstallationStatus.SUCCESS.value, InstallationStatus.FAILED.value):
+            return None
+        return Outcome(
+            record_id=row["id"],
+            packages=json.loads(row["packages"]) if row["packages"] else [],
+            commands=json.loads(row["commands_executed"]) if row["commands_executed"] else [],
+            success=row["status"] == InstallationStatus.SUCCESS.value,
+            duration=row["duration_seconds"],
+            error_message=row["error_message"],
+        )
+
+    def record_commands(self, install_id: str, commands: list[str]):
+        """Store the commands of an installation recorded before its plan was known.
+
+        Used for pipelined installs, where commands are generated while the
+        installation runs. No package snapshot was taken before those commands
+        ran, so automatic rollback is disabled for the record.
+        """
+        packages = self._extract_packages_from_commands(commands)
+        try:
+            with self._pool.get_connection() as conn:
+                conn.execute(
+                    """
+                    UPDATE installations
+                    SET packages = ?, commands_executed = ?, rollback_available = 0
+                    WHERE id = ?
+                """,
+                    (json.dumps(packages), json.dumps(commands), install_id),
+                )
+                row = conn.execute(
+                    "SELECT timestamp FROM installations WHERE id = ?", (install_id,)
+                ).fetchone()
+                if row:
+                    self.package_index.update(conn, install_id, row[0], packages)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to record commands: {e}")
+            raise
+
+    def save_checkpoint(self, install_id: str, step_index: int, step: dict):
+        """Persist the state of one coordinator step.
+
+        Args:
+            install_id: Installation the step belongs to
+            step_index: Zero-based position of the step in the plan
+            step: Step state as returned by ``InstallationStep.to_dict``
+        """
+        try:
+            with self._pool.get_connection() as conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO install_checkpoints
+                    (install_id, step_index, command, description, status, output,
+                     error, return_code, start_time, end_time, packages)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                    (
+                        install_id,
+                        step_index,
+                        step["command"],
+                        step.get("description"),
+                        step.get("status", "pending"),
+                        step.get("output"),
+                        step.get("error"),
+                        step.get("return_code"),
+                        step.get("start_time"),
+                        step.get("end_time"),
+                        json.dumps(step.get("packages") or []),
+                    ),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint: {e}")
+            raise
+
+    def get_checkpoints(self, install_id: str) -> list[dict]:
+        """Return the checkpointed steps of an installation in plan order."""
+        try:
+            with self._pool.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT command, description, status, output, error, return_code,
+                           start_time, end_time, packages
+                    FROM install_checkpoints
+                    WHERE install_id = ?
+                    ORDER BY step_index
+                """,
+                    (install_id,),
+                )
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Failed to get checkpoints: {e}")
+            return []
+
+        return [
+            {
+                "command": row[0],
+                "description": row[1],
+                "status": row[2],
+                "output": row[3] or "",
+                "error": row[4] or "",
+                "return_code": row[5],
+                "start_time": row[6],
+                "end_time": row[7],
+                "packages": json.loads(row[8]) if row[8] else [],
+            }
+            for row in rows
+        ]
+
+    def save_timing(self, install_id: str, report: dict):
+        """Store the timing report of an installation run.
+
+        Args:
+            install_id: Installation the run belongs to
+            report: Report as returned by ``TimingReport.to_dict``
+        """
+        try:
+            with self._pool.get_connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO install_timing (install_id, report) VALUES (?, ?)",
+                    (install_id, json.dumps(report)),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to save timing report: {e}")
+            raise
+
+    def get_timing(self, install_id: str) -> dict | None:
+        """Return the stored timing report of an installation, if any."""
+        try:
+            with self._pool.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT report FROM install_timing WHERE install_id = ?", (install_id,)
+                )
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Failed to get timing report: {e}")
+            return None
+
+        return json.loads(row[0]) if row else None
+
     def get_history(
-        self, limit: int = 50, status_filter: InstallationStatus | None = None
+        self,
+        limit: int = 50,
+        status_filter: InstallationStatus | None = None,
+        package: str | None = None,
     ) -> list[InstallationRecord]:
-        """Get installation history"""
+        """Get installation history
+
+        Args:
+            limit: Maximum number of records, newest first
+            status_filter: Only records with this status
+            package: Only records that touched this package
+        """
+        self._wait_for_snapshots()
         try:
             with self._pool.get_connection() as conn:
                 cursor = conn.cursor()
 
-                if status_filter:
-                    cursor.execute(
-                        """
-                        SELECT * FROM installations
-                        WHERE status = ?
-                        ORDER BY timestamp DESC
-                        LIMIT ?
-                """,
-                        (status_filter.value, limit),
-                    )
-                else:
-                    cursor.execute(
-                        """
-                        SELECT * FROM installations
-                        ORDER BY timestamp DESC
-                        LIMIT ?
-                """,
-                        (limit,),
+                query = "SELECT i.* FROM installations i"
+                conditions = []
+                params: list = []
+                order = "i.timestamp"
+
+                if package and self.package_index.ready(conn):
+                    # Newest entries of the package first, from the side table index
+                    query = (
+                        "SELECT i.* FROM installation_packages p "
+                        "CROSS JOIN installations i ON i.id = p.record_id"
                     )
+                    conditions.append("p.package = ?")
+                    params.append(package)
+                    order = "p.timestamp"
+                elif package:
+                    # Not indexed yet (backfill running): scan the JSON lists
+                    conditions.append("i.packages LIKE ?")
+                    params.append(f'%"{package}"%')
+
+                if status_filter:
+                    conditions.append("i.status = ?")
+                    params.append(status_filter.value)
+
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
+                cursor.execute(f"{query} ORDER BY {order} DESC LIMIT ?", (*params, limit))
 
                 records = []
                 for row in cursor.fetchall():
@@ -420,8 +680,72 @@ class InstallationHistory:
             logger.error(f"Failed to get history: {e}")
             return []
 
+    def search_text(self, query: str, limit: int = 20) -> list[SearchHit]:
+        """Installations whose commands or error message match ``query``, best first.
+
+        Args:
+            query: Free text; records must contain every term (``term*`` for a prefix)
+            limit: Maximum number of results
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        self._wait_for_snapshots()
+        with self._pool.get_connection() as conn:
+            rows = conn.execute(
+                self.text_index.search_sql("t.id", "t.timestamp", "t.operation_type", "t.packages"),
+                (match, limit),
+            ).fetchall()
+
+        hits = []
+        for install_id, timestamp, operation, packages, score, snippet in rows:
+            packages = json.loads(packages) if packages else []
+            hits.append(
+                SearchHit(
+                    source="installations",
+                    record_id=install_id,
+                    timestamp=timestamp,
+                    summary=f"{operation} {', '.join(packages)}".strip(),
+                    snippet=snippet,
+                    score=score,
+                )
+            )
+        return hits
+
+    def get_outcome_stats(
+        self, kind: str = "package", limit: int = 20, key: str | None = None
+    ) -> list[KeyStats]:
+        """Success rate, duration percentiles and failure categories of past installations
+
+        Read from the aggregate tables only (see cortex.utils.history_stats).
+
+        Args:
+            kind: "package", "pattern" (command pattern, e.g. "apt-get install") or "all"
+            limit: Maximum number of entries, most frequent first
+            key: Only this package or pattern
+        """
+        if kind not in HistoryStats.KINDS:
+            raise ValueError(f"Unknown statistics kind: {kind}")
+        with self._pool.get_connection() as conn:
+            if kind == "all" or key is not None:
+                stats = self.stats.get(conn, kind, "*" if kind == "all" else key)
+                return [stats] if stats else []
+            return self.stats.top(conn, kind, limit)
+
+    def estimate_plan(self, packages: list[str]) -> PlanEstimate | None:
+        """Expected duration and failure risk of installing ``packages``, from past runs
+
+        Returns:
+            The estimate, or None if none of the packages was installed before
+        """
+        with self._pool.get_connection() as conn:
+            return estimate_plan(
+                stats for stats in (self.stats.get(conn, "package", p) for p in packages) if stats
+            )
+
     def get_installation(self, install_id: str) -> InstallationRecord | None:
         """Get specific installation by ID"""
+        self._wait_for_snapshots(install_id)
         try:
             with self._pool.get_connection() as conn:
                 cursor = conn.cursor()
@@ -562,71 +886,170 @@ class InstallationHistory:
             )
             return (False, f"Rollback failed: {'; '.join(error_messages)}")
 
-    def export_history(self, filepath: str, format: str = "json"):
-        """Export history to file"""
-        history = self.get_history(limit=1000)
-
-        if format == "json":
-            data = [
-                {
-                    "id": r.id,
-                    "timestamp": r.timestamp,
-                    "operation": r.operation_type.value,
-                    "packages": r.packages,
-                    "status": r.status.value,
-                    "duration": r.duration_seconds,
-                    "error": r.error_message,
-                }
-                for r in history
-            ]
+    def iter_history(
+        self,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+        status_filter: InstallationStatus | None = None,
+        chunk_size: int = 1000,
+        include_archived: bool = False,
+    ) -> Iterator[dict]:
+        """Stream installation records in export form, oldest first.
+
+        Rows are fetched ``chunk_size`` at a time from one cursor, so the
+        export sees a consistent snapshot of the history while memory use
+        stays constant.
 
-            with open(filepath, "w") as f:
-                json.dump(data, f, indent=2)
+        Args:
+            since: Only records at or after this time
+            until: Only records before this time
+            status_filter: Only records with this status
+            chunk_size: Rows fetched per round trip
+            include_archived: Start with the records moved to the archive
+        """
+        if include_archived:
+            for row in self.archive.iter_records(
+                since.isoformat() if since else None, until.isoformat() if until else None
+            ):
+                if not status_filter or row["status"] == status_filter.value:
+                    yield self._export_record(row)
+
+        self._wait_for_snapshots()
+        conditions = []
+        params: list = []
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since.isoformat())
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until.isoformat())
+        if status_filter:
+            conditions.append("status = ?")
+            params.append(status_filter.value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._pool.get_connection() as conn:
+            cursor = conn.execute(
+                f"""
+                SELECT id, timestamp, operation_type, packages, status,
+                       duration_seconds, error_message
+                FROM installations {where}
+                ORDER BY timestamp
+            """,
+                params,
+            )
+            columns = [column[0] for column in cursor.description]
+            while rows := cursor.fetchmany(chunk_size):
+                for row in rows:
+                    yield self._export_record(dict(zip(columns, row)))
+
+    @staticmethod
+    def _export_record(row: Mapping) -> dict:
+        """Export form of an installations row (live or archived)."""
+        return {
+            "id": row["id"],
+            "timestamp": row["timestamp"],
+            "operation": row["operation_type"],
+            "packages": json.loads(row["packages"]) if row["packages"] else [],
+            "status": row["status"],
+            "duration": row["duration_seconds"],
+            "error": row["error_message"],
+        }
+
+    def export_history(
+        self,
+        filepath: str,
+        format: str = "json",
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+        status_filter: InstallationStatus | None = None,
+        compression: str | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """Export history to file, streaming records so any size fits in memory
 
-        elif format == "csv":
-            import csv
+        Args:
+            filepath: Output file
+            format: json, ndjson, csv or parquet (see cortex.history_export)
+            since, until, status_filter, include_archived: As for ``iter_history``
+            compression: gzip or zstd (default: from a .gz/.zst suffix)
 
-            with open(filepath, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(
-                    ["ID", "Timestamp", "Operation", "Packages", "Status", "Duration", "Error"]
-                )
+        Returns:
+            Number of records exported
+        """
+        count = write_records(
+            self.iter_history(since, until, status_filter, include_archived=include_archived),
+            filepath,
+            format,
+            compression or compression_for(filepath),
+        )
+        logger.info(f"Exported {count} records to {filepath}")
+        return count
 
-                for r in history:
-                    writer.writerow(
-                        [
-                            r.id,
-                            r.timestamp,
-                            r.operation_type.value,
-                            ", ".join(r.packages),
-                            r.status.value,
-                            r.duration_seconds or "",
-                            r.error_message or "",
-                        ]
-                    )
+    def cleanup_old_records(self, days: int = 90, archive: bool = True):
+        """Move records older than ``days`` out of the live database
 
-        logger.info(f"History exported to {filepath}")
+        Records are moved to monthly archive segments (see
+        cortex.history_retention), whole months at a time, unless
+        ``archive`` is False. The freed space is then returned to the file
+        system by a background incremental vacuum.
 
-    def cleanup_old_records(self, days: int = 90):
-        """Remove records older than specified days"""
+        Returns:
+            Number of records removed
+        """
         cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
-        cutoff_str = cutoff.isoformat()
+        # Pending snapshots update records that may be archived
+        self._wait_for_snapshots()
 
         try:
             with self._pool.get_connection() as conn:
-                cursor = conn.cursor()
-
-                cursor.execute("DELETE FROM installations WHERE timestamp < ?", (cutoff_str,))
-
-                deleted = cursor.rowcount
+                if archive:
+                    deleted = archive_rows(conn, "installations", self.archive, cutoff)
+                else:
+                    deleted = conn.execute(
+                        "DELETE FROM installations WHERE timestamp < ?", (cutoff.isoformat(),)
+                    ).rowcount
+
+                # Per-run details of removed installations
+                for table in ("install_checkpoints", "install_timing"):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE install_id NOT IN (SELECT id FROM installations)"
+                    )
+                self.package_index.delete_orphans(conn)
+                self.stats.delete_orphans(conn)
                 conn.commit()
 
-                logger.info(f"Deleted {deleted} old records")
+                logger.info(f"Removed {deleted} old records")
+                self._compact(conn)
             return deleted
         except Exception as e:
             logger.error(f"Failed to cleanup records: {e}")
             return 0
 
+    def _compact(self, conn: sqlite3.Connection):
+        """Return free pages to the file system, converting old databases first."""
+        try:
+            rewritten = enable_incremental_vacuum(conn)
+        except sqlite3.OperationalError as e:
+            # VACUUM needs the database to itself; try again next cleanup
+            logger.warning(f"Could not enable incremental vacuum: {e}")
+            return
+
+        if rewritten:
+            # VACUUM renumbers the implicit rowids the full-text index is keyed
+            # on, and those unfinished backfills are tracking
+            self.text_index.rebuild(conn)
+            backfill = [
+                index for index in (self.package_index, self.stats) if not index.ready(conn)
+            ]
+            for index in backfill:
+                index.restart_backfill(conn)
+            conn.commit()
+            for index in backfill:
+                index.start_backfill(self._pool.get_connection)
+        else:
+            start_incremental_vacuum(self._pool.get_connection, name="vacuum-history")
+
 
 # CLI Interface
 if __name__ == "__main__":
@@ -655,11 +1078,22 @@ if __name__ == "__main__":
     # Export
     export_parser = subparsers.add_parser("export", help="Export history")
     export_parser.add_argument("file", help="Output file")
-    export_parser.add_argument("--format", choices=["json", "csv"], default="json")
+    export_parser.add_argument("--format", choices=FORMATS, default="json")
+    export_parser.add_argument(
+        "--compress", choices=["gzip", "zstd"], help="Default: from a .gz/.zst suffix"
+    )
+    export_parser.add_argument("--since", help="Only records at or after (ISO date)")
+    export_parser.add_argument("--until", help="Only records before (ISO date)")
+    export_parser.add_argument(
+        "--status", choices=["success", "failed", "rolled_back", "in_progress"]
+    )
 
     # Cleanup
     cleanup_parser = subparsers.add_parser("cleanup", help="Clean old records")
-    cleanup_parser.add_argument("--days", type=int, default=90, help="Delete older than")
+    cleanup_parser.add_argument("--days", type=int, default=90, help="Archive older than")
+    cleanup_parser.add_argument(
+        "--no-archive", action="store_true", help="Delete old records instead of archiving"
+    )
 
     args = parser.parse_args()
 
@@ -734,12 +1168,20 @@ if __name__ == "__main__":
                 exit_code = 1
 
         elif args.command == "export":
-            history.export_history(args.file, args.format)
-            print(f"✅ History exported to {args.file}")
+            count = history.export_history(
+                args.file,
+                args.format,
+                since=datetime.datetime.fromisoformat(args.since) if args.since else None,
+                until=datetime.datetime.fromisoformat(args.until) if args.until else None,
+                status_filter=InstallationStatus(args.status) if args.status else None,
+                compression=args.compress,
+            )
+            print(f"✅ Exported {count} records to {args.file}")
 
         elif args.command == "cleanup":
-            deleted = history.cleanup_old_records(args.days)
-            print(f"✅ Deleted {deleted} records older than {args.days} days")
+            deleted = history.cleanup_old_records(args.days, archive=not args.no_archive)
+            action = "Deleted" if args.no_archive else f"Archived to {history.archive.directory}"
+            print(f"✅ {action}: {deleted} records older than {args.days} days")
 
         else:
             parser.print_help()
@@ -6,13 +6,15 @@ Manages LLM models as first-class system services using systemd.
 """
 
 import json
-import sqlite3
 import subprocess
 from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+from cortex.utils.db_pool import get_connection_pool
+from cortex.utils.db_schema import migrate
+
 CORTEX_DB_PATH = Path.home() / ".cortex/models.db"
 CORTEX_SERVICE_DIR = Path.home() / ".config/systemd/user"
 
@@ -40,42 +42,51 @@ class ModelConfig:
 
 
 class ModelDatabase:
-    def __init__(self):
-        CORTEX_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Schema versions, oldest first (see cortex.utils.db_schema)
+    MIGRATIONS = [
+        [
+            """
+            CREATE TABLE IF NOT EXISTS models (
+                name TEXT PRIMARY KEY,
+                config TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        ],
+    ]
+
+    def __init__(self, db_path: Path | None = None):
+        self.db_path = db_path or CORTEX_DB_PATH
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._pool = get_connection_pool(self.db_path, pool_size=2)
         self._init_db()
 
     def _init_db(self):
-        with sqlite3.connect(CORTEX_DB_PATH) as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS models (
-                    name TEXT PRIMARY KEY,
-                    config TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            """
-            )
+        with self._pool.get_connection() as conn:
+            migrate(conn, self.MIGRATIONS)
 
     def save_model(self, config: ModelConfig):
-        with sqlite3.connect(CORTEX_DB_PATH) as conn:
+        with self._pool.get_connection() as conn:
             conn.execute(
                 "INSERT OR REPLACE INTO models VALUES (?, ?, ?)",
                 (config.name, json.dumps(config.to_dict()), datetime.utcnow().isoformat()),
             )
+            conn.commit()
 
     def get_model(self, name: str) -> ModelConfig | None:
-        with sqlite3.connect(CORTEX_DB_PATH) as conn:
+        with self._pool.get_connection() as conn:
             row = conn.execute("SELECT config FROM models WHERE name = ?", (name,)).fetchone()
             return ModelConfig.from_dict(json.loads(row[0])) if row else None
 
     def list_models(self) -> list[ModelConfig]:
-        with sqlite3.connect(CORTEX_DB_PATH) as conn:
+        with self._pool.get_connection() as conn:
             rows = conn.execute("SELECT config FROM models").fetchall()
             return [ModelConfig.from_dict(json.loads(r[0])) for r in rows]
 
     def delete_model(self, name: str):
-        with sqlite3.connect(CORTEX_DB_PATH) as conn:
+        with self._pool.get_connection() as conn:
             conn.execute("DELETE FROM models WHERE name = ?", (name,))
+            conn.commit()
 
 
 class ServiceGenerator:
@@ -0,0 +1,155 @@
+"""
+Incremental extraction of commands from a streamed LLM response.
+
+``CommandInterpreter._parse_commands`` needs the complete response before
+it can return anything. ``IncrementalCommandExtractor`` is fed the response
+chunk by chunk and returns each command as soon as its JSON string literal
+is complete, so the first steps of a plan can start running while the model
+is still generating the rest.
+
+Both response shapes accepted by ``_parse_commands`` are understood::
+
+    {"commands": ["cmd1", "cmd2"]}
+    {"commands": [{"command": "cmd1"}, {"command": "cmd2"}]}
+
+as well as a bare ``["cmd1", "cmd2"]`` array. Text before the array
+(markdown fences, explanations) is skipped.
+"""
+
+import json
+import re
+
+# Start of the command array: the value of a "commands" key, or a bare
+# top-level array at the beginning of the response (optionally fenced)
+_ARRAY_START = re.compile(
+    r"""["']commands["']\s*:\s*\[|\A\s*(?:```(?:json)?\s*)?\[""",
+)
+
+
+class IncrementalCommandExtractor:
+    """Streaming parser for the command array of an LLM response.
+
+    Usage:
+        extractor = IncrementalCommandExtractor()
+        for chunk in stream:
+            for command in extractor.feed(chunk):
+                run(command)
+        extractor.close()
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        # Nesting inside the current array element: 0 means between elements
+        self._depth = 0
+        # Inside an object element: the next string is a key (True) or value
+        self._expect_key = False
+        self._key: str | None = None
+        self.commands: list[str] = []
+
+    @property
+    def done(self) -> bool:
+        """True once the closing bracket of the command array was seen."""
+        return self._done
+
+    def feed(self, chunk: str) -> list[str]:
+        """Consume the next piece of the response.
+
+        Returns:
+            Commands completed by this chunk, in order
+        """
+        if self._done or not chunk:
+            return []
+
+        self._buffer += chunk
+        emitted: list[str] = []
+
+        if not self._in_array:
+            match = _ARRAY_START.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        while self._pos < len(self._buffer) and not self._done:
+            char = self._buffer[self._pos]
+
+            if char == '"':
+                end = self._string_end(self._pos)
+                if end is None:
+                    break  # literal continues in a later chunk
+                literal = self._buffer[self._pos : end + 1]
+                try:
+                    value = json.loads(literal)
+                except json.JSONDecodeError:
+                    # Invalid escape sequence: keep the text as written
+                    value = literal[1:-1]
+                self._pos = end + 1
+                command = self._on_string(value)
+                if command:
+                    emitted.append(command)
+                continue
+
+            if char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._expect_key = True
+                    self._key = None
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    if char == "]":
+                        self._done = True
+                else:
+                    self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._expect_key = False
+            elif char == "," and self._depth == 1:
+                self._expect_key = True
+
+            self._pos += 1
+
+        # Drop consumed text so the buffer does not grow with the response
+        self._buffer = self._buffer[self._pos :]
+        self._pos = 0
+
+        self.commands.extend(emitted)
+        return emitted
+
+    def close(self) -> list[str]:
+        """Signal the end of the response.
+
+        Returns:
+            All commands extracted from the response
+        """
+        self._done = True
+        return list(self.commands)
+
+    def _string_end(self, start: int) -> int | None:
+        """Index of the quote closing the string literal starting at ``start``."""
+        index = start + 1
+        while index < len(self._buffer):
+            char = self._buffer[index]
+            if char == "\\":
+                index += 2
+                continue
+            if char == '"':
+                return index
+            index += 1
+        return None
+
+    def _on_string(self, value: str) -> str | None:
+        if self._depth == 0:
+            # Plain string element
+            return value or None
+
+        if self._depth == 1:
+            # Key or value of an object element
+            if self._expect_key:
+                self._key = value
+                return None
+            if self._key == "command":
+                return value or None
+
+        return None
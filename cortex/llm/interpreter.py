@@ -1,9 +1,13 @@
 import json
 import os
 import sqlite3
+from collections.abc import Iterator
 from enum import Enum
 from typing import TYPE_CHECKING, Any, Optional
 
+from cortex.command_safety import SafetyEngine
+from cortex.llm.command_stream import IncrementalCommandExtractor
+
 if TYPE_CHECKING:
     from cortex.semantic_cache import SemanticCache
 
@@ -15,6 +19,19 @@ class APIProvider(Enum):
     FAKE = "fake"
 
 
+# Substrings that make a generated command unsafe (case-insensitive)
+_UNSAFE_COMMANDS = SafetyEngine.from_literals(
+    [
+        "rm -rf /",
+        "dd if=",
+        "mkfs.",
+        "> /dev/sda",
+        "fork bomb",
+        ":(){ :|:& };:",
+    ]
+)
+
+
 class CommandInterpreter:
     """Interprets natural language commands into executable shell commands using LLM APIs.
 
@@ -298,23 +315,10 @@ Respond with ONLY this JSON format (no explanations):
             raise ValueError(f"Failed to parse LLM response: {str(e)}")
 
     def _validate_commands(self, commands: list[str]) -> list[str]:
-        dangerous_patterns = [
-            "rm -rf /",
-            "dd if=",
-            "mkfs.",
-            "> /dev/sda",
-            "fork bomb",
-            ":(){ :|:& };:",
-        ]
-
-        validated = []
-        for cmd in commands:
-            cmd_lower = cmd.lower()
-            if any(pattern in cmd_lower for pattern in dangerous_patterns):
-                continue
-            validated.append(cmd)
-
-        return validated
+        return [cmd for cmd in commands if _UNSAFE_COMMANDS.is_safe(cmd)]
+
+    def _cache_system_prompt(self, validate: bool) -> str:
+        return self._get_system_prompt() + f"\n\n[cortex-cache-validate={bool(validate)}]"
 
     def parse(self, user_input: str, validate: bool = True) -> list[str]:
         """Parse natural language input into shell commands.
@@ -333,9 +337,7 @@ Respond with ONLY this JSON format (no explanations):
         if not user_input or not user_input.strip():
             raise ValueError("User input cannot be empty")
 
-        cache_system_prompt = (
-            self._get_system_prompt() + f"\n\n[cortex-cache-validate={bool(validate)}]"
-        )
+        cache_system_prompt = self._cache_system_prompt(validate)
 
         if self.cache is not None:
             cached = self.cache.get_commands(
@@ -376,6 +378,120 @@ Respond with ONLY this JSON format (no explanations):
 
         return commands
 
+    def _stream_openai(self, user_input: str, simplified: bool = False) -> Iterator[str]:
+        """Yield response text chunks from an OpenAI-compatible API (also Ollama)."""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self._get_system_prompt(simplified=simplified)},
+                {"role": "user", "content": user_input},
+            ],
+            temperature=0.1 if simplified else 0.3,
+            max_tokens=300 if simplified else 1000,
+            stream=True,
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _stream_claude(self, user_input: str) -> Iterator[str]:
+        """Yield response text chunks from the Claude API."""
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=1000,
+            temperature=0.3,
+            system=self._get_system_prompt(),
+            messages=[{"role": "user", "content": user_input}],
+        ) as stream:
+            yield from stream.text_stream
+
+    def _stream_response(self, user_input: str) -> Iterator[str]:
+        try:
+            if self.provider == APIProvider.OPENAI:
+                yield from self._stream_openai(user_input)
+            elif self.provider == APIProvider.CLAUDE:
+                yield from self._stream_claude(user_input)
+            elif self.provider == APIProvider.OLLAMA:
+                yield from self._stream_openai(user_input, simplified=True)
+            elif self.provider == APIProvider.FAKE:
+                yield json.dumps({"commands": self._call_fake(user_input)})
+            else:
+                raise ValueError(f"Unsupported provider: {self.provider}")
+        except (ValueError, RuntimeError):
+            raise
+        except Exception as e:
+            raise RuntimeError(f"{self.provider.value} streaming API call failed: {str(e)}")
+
+    def _check_streamed_command(self, command: str, validate: bool) -> str:
+        if validate and not self._validate_commands([command]):
+            # Earlier commands may already be running, so an unsafe command
+            # cannot simply be dropped as in parse(): the plan is aborted.
+            raise ValueError(f"Generated command failed validation: {command}")
+        return command
+
+    def parse_stream(self, user_input: str, validate: bool = True) -> Iterator[str]:
+        """Parse natural language input into shell commands, streaming.
+
+        Commands are yielded one by one as soon as the model has finished
+        writing them, so callers can start executing early steps while later
+        ones are still being generated (see
+        ``InstallationCoordinator.execute_stream``).
+
+        Args:
+            user_input: Natural language description of desired action
+            validate: If True, validate commands for dangerous patterns
+
+        Yields:
+            Shell commands in plan order
+
+        Raises:
+            ValueError: If input is empty, the response cannot be parsed or a
+                command fails validation (no further commands are yielded)
+            RuntimeError: If the API call fails
+        """
+        if not user_input or not user_input.strip():
+            raise ValueError("User input cannot be empty")
+
+        cache_system_prompt = self._cache_system_prompt(validate)
+
+        if self.cache is not None:
+            cached = self.cache.get_commands(
+                prompt=user_input,
+                provider=self.provider.value,
+                model=self.model,
+                system_prompt=cache_system_prompt,
+            )
+            if cached is not None:
+                yield from cached
+                return
+
+        extractor = IncrementalCommandExtractor()
+        content: list[str] = []
+        for chunk in self._stream_response(user_input):
+            content.append(chunk)
+            for command in extractor.feed(chunk):
+                yield self._check_streamed_command(command, validate)
+
+        commands = extractor.close()
+        if not commands:
+            # Response shape the extractor does not understand: parse it whole
+            commands = self._parse_commands("".join(content))
+            for command in commands:
+                yield self._check_streamed_command(command, validate)
+
+        if self.cache is not None and commands:
+            try:
+                self.cache.put_commands(
+                    prompt=user_input,
+                    provider=self.provider.value,
+                    model=self.model,
+                    system_prompt=cache_system_prompt,
+                    commands=commands,
+                )
+            except (OSError, sqlite3.Error):
+                # Silently fail cache writes - not critical for operation
+                pass
+
     def parse_with_context(
         self, user_input: str, system_info: dict[str, Any] | None = None, validate: bool = True
     ) -> list[str]:
@@ -0,0 +1,153 @@
+"""
+Installation plan optimizer.
+
+LLM-generated plans often contain one ``apt install`` per package::
+
+    sudo apt install -y nginx
+    sudo apt install -y curl
+
+Each invocation repeats dependency calculation, trigger processing
+(man-db, ldconfig) and dpkg lock acquisition. The passes in this module
+rewrite a plan (the list of step dicts accepted by
+``InstallationCoordinator.from_plan``) so adjacent compatible apt/apt-get
+install, remove and purge steps run as one transaction, while keeping the
+package list and rollback commands of every original step.
+"""
+
+import re
+from typing import Any
+
+from cortex.apt_scheduler import AptCommand, parse_apt_command
+
+# apt actions that can safely be merged into a single invocation
+MERGEABLE_ACTIONS = ("install", "remove", "purge")
+
+# apt error lines that name the package responsible for a failed transaction
+_PACKAGE_ERROR_PATTERNS = [
+    r"Unable to locate package (?P<pkg>[^\s=]+)",
+    r"Package '?(?P<pkg>[^\s'=]+)'? has no installation candidate",
+    r"Version '[^']+' for '(?P<pkg>[^']+)' was not found",
+    r"^\s*(?P<pkg>[a-z0-9][a-z0-9.+-]+) : (?:Pre)?Depends:",
+    r"Couldn't find any package by (?:glob|regex) '(?P<pkg>[^']+)'",
+]
+
+_PACKAGE_ERROR_RES = [re.compile(p, re.MULTILINE) for p in _PACKAGE_ERROR_PATTERNS]
+
+
+def _package_name(spec: str) -> str:
+    """Strip version pins and release suffixes (``pkg=1.0``, ``pkg/jammy``)."""
+    return re.split(r"[=/]", spec, maxsplit=1)[0]
+
+
+def _merge_key(apt_cmd: AptCommand) -> tuple:
+    """Steps with the same key can be merged into one apt invocation."""
+    return (apt_cmd.sudo, apt_cmd.action, tuple(sorted(apt_cmd.options)))
+
+
+def _rollbacks(step: dict[str, Any]) -> list[str]:
+    rollback = step.get("rollback")
+    if not rollback:
+        return []
+    if isinstance(rollback, str):
+        return [rollback]
+    return list(rollback)
+
+
+def coalesce_apt_steps(plan: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Merge runs of adjacent, compatible apt steps into single steps.
+
+    Two apt steps are compatible when they use the same action
+    (install/remove/purge), the same sudo prefix and the same set of flags.
+    Only adjacent steps are merged so the relative order of apt and non-apt
+    work in the plan is unchanged.
+
+    Merged steps carry:
+        - ``packages``: package specs of all merged steps, de-duplicated
+        - ``rollback``: list of rollback commands of the merged steps, in order
+        - ``merged_commands``: the original commands, for reporting
+
+    Args:
+        plan: List of plan steps (dicts with ``command`` and optional
+            ``description`` and ``rollback`` keys)
+
+    Returns:
+        New plan list; the input is not modified
+    """
+    optimized: list[dict[str, Any]] = []
+    current: dict[str, Any] | None = None
+    current_cmd: AptCommand | None = None
+
+    def flush():
+        nonlocal current, current_cmd
+        if current is not None:
+            optimized.append(current)
+        current = None
+        current_cmd = None
+
+    for index, step in enumerate(plan):
+        command = step.get("command", "")
+        apt_cmd = parse_apt_command(command)
+
+        if not apt_cmd or apt_cmd.action not in MERGEABLE_ACTIONS or not apt_cmd.packages:
+            flush()
+            optimized.append(dict(step))
+            continue
+
+        description = step.get("description", f"Step {index + 1}")
+
+        if current is not None and current_cmd and _merge_key(current_cmd) == _merge_key(apt_cmd):
+            for pkg in apt_cmd.packages:
+                if pkg not in current_cmd.packages:
+                    current_cmd.packages.append(pkg)
+            current["command"] = current_cmd.to_command()
+            current["description"] = f"{current['description']}; {description}"
+            current["rollback"] = current["rollback"] + _rollbacks(step)
+            current["packages"] = list(current_cmd.packages)
+            current["merged_commands"].append(command)
+            continue
+
+        flush()
+        current_cmd = AptCommand(
+            tool=apt_cmd.tool,
+            action=apt_cmd.action,
+            packages=list(dict.fromkeys(apt_cmd.packages)),
+            options=list(apt_cmd.options),
+            sudo=apt_cmd.sudo,
+        )
+        current = {
+            **step,
+            "command": command,
+            "description": description,
+            "rollback": _rollbacks(step),
+            "packages": list(current_cmd.packages),
+            "merged_commands": [command],
+        }
+
+    flush()
+    return optimized
+
+
+def optimize_plan(plan: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Run all plan optimization passes."""
+    return coalesce_apt_steps(plan)
+
+
+def failed_packages(output: str, packages: list[str]) -> set[str]:
+    """Return the packages that apt output blames for a failed transaction.
+
+    Args:
+        output: Combined stdout/stderr of the apt command
+        packages: Package specs the step was responsible for
+
+    Returns:
+        Subset of ``packages`` (as given) named in apt error lines
+    """
+    if not output or not packages:
+        return set()
+
+    named: set[str] = set()
+    for regex in _PACKAGE_ERROR_RES:
+        for match in regex.finditer(output):
+            named.add(_package_name(match.group("pkg")))
+
+    return {pkg for pkg in packages if _package_name(pkg) in named}
@@ -4,9 +4,11 @@ Cortex Sandbox Module
 Provides sandboxed execution environments for safe package testing.
 
 - SandboxExecutor: Firejail-based command sandboxing
+- SandboxAuditLog: Searchable store of sandbox executions
 - DockerSandbox: Docker-based package testing environments
 """
 
+from cortex.sandbox.audit_log import SandboxAuditLog
 from cortex.sandbox.docker_sandbox import (
     DockerNotFoundError,
     DockerSandbox,
@@ -25,6 +27,7 @@ __all__ = [
     # Firejail sandbox
     "CommandBlocked",
     "ExecutionResult",
+    "SandboxAuditLog",
     "SandboxExecutor",
     # Docker sandbox
     "DockerNotFoundError",
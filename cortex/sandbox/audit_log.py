@@ -0,0 +1,125 @@
+"""
+Persistent, searchable audit log of sandboxed command executions.
+
+``SandboxExecutor`` writes a human-readable log file; this store keeps
+the same entries in SQLite, with a full-text index over the command,
+its error output and any security violation, for
+``cortex history search``.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any
+
+from cortex.utils.db_pool import SQLiteConnectionPool, get_connection_pool
+from cortex.utils.db_schema import Migration, migrate
+from cortex.utils.fts_index import FullTextIndex, SearchHit, fts_query
+
+logger = logging.getLogger(__name__)
+
+
+def default_audit_db_path() -> Path:
+    return Path.home() / ".cortex" / "sandbox_audit.db"
+
+
+class SandboxAuditLog:
+    """SQLite store of sandbox audit entries.
+
+    Usage:
+        audit = SandboxAuditLog()
+        audit.record(result.to_dict() | {"type": "execution"})
+        hits = audit.search_text("permission denied")
+    """
+
+    def __init__(self, db_path: str | Path | None = None):
+        self.db_path = Path(db_path) if db_path else default_audit_db_path()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.text_index = FullTextIndex(
+            "audit_entries_fts", "audit_entries", ["command", "stderr", "violation"]
+        )
+        self._pool: SQLiteConnectionPool = get_connection_pool(str(self.db_path), pool_size=2)
+        with self._pool.get_connection() as conn:
+            migrate(conn, self._migrations())
+
+    def _migrations(self) -> list[Migration]:
+        """Schema versions of the database, oldest first (see cortex.utils.db_schema)."""
+        return [
+            [
+                """
+                CREATE TABLE IF NOT EXISTS audit_entries (
+                    id INTEGER PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    command TEXT NOT NULL,
+                    exit_code INTEGER,
+                    stderr TEXT,
+                    violation TEXT,
+                    execution_time REAL
+                )
+                """,
+                """
+                CREATE INDEX IF NOT EXISTS idx_audit_timestamp
+                ON audit_entries(timestamp DESC)
+                """,
+            ],
+            self.text_index.create,
+        ]
+
+    def record(self, entry: dict[str, Any]):
+        """Store an audit entry (as built by ``SandboxExecutor``)."""
+        with self._pool.get_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO audit_entries
+                (timestamp, type, command, exit_code, stderr, violation, execution_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    entry["timestamp"],
+                    entry.get("type", "execution"),
+                    entry["command"],
+                    entry.get("exit_code"),
+                    entry.get("stderr") or None,
+                    entry.get("violation"),
+                    entry.get("execution_time"),
+                ),
+            )
+            conn.commit()
+
+    def get_entries(self, limit: int = 50) -> list[dict[str, Any]]:
+        """Most recent entries, newest first."""
+        with self._pool.get_connection() as conn:
+            cursor = conn.execute(
+                """
+                SELECT timestamp, type, command, exit_code, stderr, violation, execution_time
+                FROM audit_entries
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """,
+                (limit,),
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+    def search_text(self, query: str, limit: int = 20) -> list[SearchHit]:
+        """Entries whose command, error output or violation match ``query``, best first."""
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._pool.get_connection() as conn:
+            rows = conn.execute(
+                self.text_index.search_sql("t.id", "t.timestamp", "t.type", "t.exit_code"),
+                (match, limit),
+            ).fetchall()
+
+        return [
+            SearchHit(
+                source="audit",
+                record_id=str(entry_id),
+                timestamp=timestamp,
+                summary=f"{entry_type} (exit code {exit_code})",
+                snippet=snippet,
+                score=score,
+            )
+            for entry_id, timestamp, entry_type, exit_code, score, snippet in rows
+        ]
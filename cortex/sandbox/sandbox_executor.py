@@ -18,6 +18,7 @@ import os
 import re
 import shlex
 import shutil
+import sqlite3
 import subprocess
 import sys
 import time
@@ -29,7 +30,8 @@ except ImportError:  # pragma: no cover
 from datetime import datetime
 from typing import Any
 
-from cortex.validators import DANGEROUS_PATTERNS
+from cortex.command_safety import check_command
+from cortex.sandbox.audit_log import SandboxAuditLog
 
 try:
     import resource  # type: ignore
@@ -206,8 +208,15 @@ class SandboxExecutor:
         self.rollback_snapshots: dict[str, dict[str, Any]] = {}
         self.current_session_id: str | None = None
 
-        # Audit log
+        # Audit log (this run), persisted next to the log file for searches
         self.audit_log: list[dict[str, Any]] = []
+        try:
+            self.audit_store: SandboxAuditLog | None = SandboxAuditLog(
+                os.path.splitext(self.log_file)[0] + ".db"
+            )
+        except (sqlite3.Error, OSError) as e:
+            self.logger.warning(f"Audit entries will not be persisted: {e}")
+            self.audit_store = None
 
         # Verify firejail is available
         if not self.firejail_path:
@@ -274,9 +283,9 @@ class SandboxExecutor:
             Tuple of (is_valid, violation_reason)
         """
         # Check for dangerous patterns
-        for pattern in DANGEROUS_PATTERNS:
-            if re.search(pattern, command, re.IGNORECASE):
-                return False, f"Dangerous pattern detected: {pattern}"
+        pattern = check_command(command)
+        if pattern:
+            return False, f"Dangerous pattern detected: {pattern}"
 
         # Parse command
         try:
@@ -636,16 +645,25 @@ class SandboxExecutor:
         """Log command execution to audit log."""
         log_entry = result.to_dict()
         log_entry["type"] = "execution"
-        self.audit_log.append(log_entry)
+        self._append_audit_entry(log_entry)
         self.logger.info(f"Command executed: {result.command} (exit_code={result.exit_code})")
 
     def _log_security_event(self, result: ExecutionResult):
         """Log security violation."""
         log_entry = result.to_dict()
         log_entry["type"] = "security_violation"
-        self.audit_log.append(log_entry)
+        self._append_audit_entry(log_entry)
         self.logger.warning(f"Security violation: {result.command} - {result.violation}")
 
+    def _append_audit_entry(self, log_entry: dict[str, Any]):
+        self.audit_log.append(log_entry)
+        if self.audit_store is None:
+            return
+        try:
+            self.audit_store.record(log_entry)
+        except (sqlite3.Error, TimeoutError) as e:
+            self.logger.warning(f"Failed to persist audit entry: {e}")
+
     def get_audit_log(self, limit: int | None = None) -> list[dict[str, Any]]:
         """
         Get audit log entries.
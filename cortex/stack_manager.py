@@ -12,6 +12,7 @@ import threading
 from pathlib import Path
 from typing import Any
 
+from cortex.dependency_resolver import DependencyResolver, MultiPackageGraph
 from cortex.hardware_detection import has_nvidia_gpu
 
 
@@ -61,6 +62,25 @@ class StackManager:
         stack = self.find_stack(stack_id)
         return stack.get("packages", []) if stack else []
 
+    def resolve_stack(
+        self, stack_id: str, resolver: DependencyResolver | None = None
+    ) -> MultiPackageGraph | None:
+        """
+        Resolve the dependencies of all packages of a stack as one graph.
+
+        Args:
+            stack_id: The stack identifier.
+            resolver: Resolver to use (default: a new one).
+
+        Returns:
+            The merged dependency graph, or None if the stack has no packages.
+        """
+        packages = self.get_stack_packages(stack_id)
+        if not packages:
+            return None
+        resolver = resolver or DependencyResolver()
+        return resolver.resolve_many(packages)
+
     def suggest_stack(self, base_stack: str) -> str:
         """
         Suggest hardware-appropriate stack variant.
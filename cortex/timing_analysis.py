@@ -0,0 +1,228 @@
+"""
+Timing analysis for installation runs.
+
+Every coordinator step and parallel task records when it started and
+finished. This module turns those timestamps into a report that explains
+where the wall time of a run went:
+
+* the critical path: the chain of dependent steps with the largest total
+  duration, i.e. the lower bound on wall time however wide the run is
+* parallel efficiency: summed step time divided by wall time (1.0 for a
+  perfectly packed sequential run, above 1.0 when steps overlap)
+* idle gaps: stretches of the run during which no step was executing
+* the slowest individual steps
+"""
+
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+# Gaps shorter than this are scheduling noise and not reported
+DEFAULT_MIN_GAP = 0.1
+
+# Number of steps listed in TimingReport.slowest_steps
+DEFAULT_SLOWEST = 5
+
+
+@dataclass
+class StepTiming:
+    """Timing of one step, relative to the start of the run."""
+
+    name: str
+    description: str
+    status: str
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class IdleGap:
+    """Interval of the run during which nothing was executing."""
+
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class TimingReport:
+    """Result of :func:`analyze_timing`."""
+
+    wall_time: float
+    total_step_time: float
+    parallel_efficiency: float
+    critical_path: list[str]
+    critical_path_time: float
+    steps: list[StepTiming] = field(default_factory=list)
+    idle_gaps: list[IdleGap] = field(default_factory=list)
+    slowest_steps: list[str] = field(default_factory=list)
+
+    @property
+    def idle_time(self) -> float:
+        return sum(gap.duration for gap in self.idle_gaps)
+
+    def step(self, name: str) -> StepTiming | None:
+        for step in self.steps:
+            if step.name == name:
+                return step
+        return None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "TimingReport":
+        return cls(
+            wall_time=data["wall_time"],
+            total_step_time=data["total_step_time"],
+            parallel_efficiency=data["parallel_efficiency"],
+            critical_path=list(data.get("critical_path", [])),
+            critical_path_time=data.get("critical_path_time", 0.0),
+            steps=[StepTiming(**step) for step in data.get("steps", [])],
+            idle_gaps=[IdleGap(**gap) for gap in data.get("idle_gaps", [])],
+            slowest_steps=list(data.get("slowest_steps", [])),
+        )
+
+
+def _critical_path(
+    steps: dict[str, StepTiming], dependencies: dict[str, list[str]]
+) -> tuple[list[str], float]:
+    """Longest duration-weighted path through the dependency DAG.
+
+    Steps are visited in start order. A dependency always starts before its
+    dependents, so every predecessor is finalized before it is used. Edges
+    that point forward in time (only possible with cyclic input) are ignored.
+    """
+    order = sorted(steps.values(), key=lambda s: (s.start, s.end))
+    position = {step.name: i for i, step in enumerate(order)}
+
+    best: dict[str, float] = {}
+    previous: dict[str, str | None] = {}
+    for step in order:
+        best_dep, best_time = None, 0.0
+        for dep in dependencies.get(step.name, []):
+            if dep in best and position[dep] < position[step.name] and best[dep] > best_time:
+                best_dep, best_time = dep, best[dep]
+        best[step.name] = best_time + step.duration
+        previous[step.name] = best_dep
+
+    if not best:
+        return [], 0.0
+
+    name = max(best, key=lambda n: (best[n], -position[n]))
+    total = best[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    path.reverse()
+    return path, total
+
+
+def _idle_gaps(steps: Iterable[StepTiming], min_gap: float) -> list[IdleGap]:
+    gaps = []
+    covered_until = None
+    for step in sorted(steps, key=lambda s: s.start):
+        if covered_until is not None and step.start - covered_until >= min_gap:
+            gaps.append(IdleGap(start=covered_until, end=step.start))
+        covered_until = step.end if covered_until is None else max(covered_until, step.end)
+    return gaps
+
+
+def analyze_timing(
+    spans: Iterable[tuple[str, str, str, float | None, float | None]],
+    dependencies: dict[str, list[str]] | None = None,
+    min_gap: float = DEFAULT_MIN_GAP,
+    slowest: int = DEFAULT_SLOWEST,
+) -> TimingReport:
+    """Analyze the timing of a run.
+
+    Args:
+        spans: ``(name, description, status, start_time, end_time)`` per step,
+               with absolute timestamps. Steps that never ran (no start or
+               end time) are ignored.
+        dependencies: Mapping of step name to the names it depends on
+        min_gap: Minimum length of a reported idle gap, in seconds
+        slowest: Number of steps to list as slowest
+
+    Returns:
+        TimingReport with times relative to the first step's start
+    """
+    ran = [
+        (name, description, status, start, end)
+        for name, description, status, start, end in spans
+        if start is not None and end is not None
+    ]
+    if not ran:
+        return TimingReport(
+            wall_time=0.0,
+            total_step_time=0.0,
+            parallel_efficiency=0.0,
+            critical_path=[],
+            critical_path_time=0.0,
+        )
+
+    origin = min(start for _, _, _, start, _ in ran)
+    steps = {
+        name: StepTiming(
+            name=name,
+            description=description,
+            status=status,
+            start=start - origin,
+            end=max(end, start) - origin,
+        )
+        for name, description, status, start, end in ran
+    }
+
+    wall_time = max(step.end for step in steps.values())
+    total_step_time = sum(step.duration for step in steps.values())
+    critical_path, critical_path_time = _critical_path(steps, dependencies or {})
+    by_duration = sorted(steps.values(), key=lambda s: s.duration, reverse=True)
+
+    return TimingReport(
+        wall_time=wall_time,
+        total_step_time=total_step_time,
+        parallel_efficiency=total_step_time / wall_time if wall_time > 0 else 0.0,
+        critical_path=critical_path,
+        critical_path_time=critical_path_time,
+        steps=sorted(steps.values(), key=lambda s: s.start),
+        idle_gaps=_idle_gaps(steps.values(), min_gap),
+        slowest_steps=[step.name for step in by_duration[:slowest]],
+    )
+
+
+def analyze_coordinator_run(steps: list, **kwargs: Any) -> TimingReport:
+    """Timing report for the steps of an ``InstallationCoordinator`` run.
+
+    Coordinator steps run strictly in order, so each depends on the previous.
+    Steps restored from a checkpoint ran in an earlier run and are left out,
+    so the time between the two runs is not counted.
+    """
+    spans = []
+    dependencies: dict[str, list[str]] = {}
+    previous: str | None = None
+    for i, step in enumerate(steps):
+        if getattr(step, "resumed", False):
+            continue
+        name = f"Step {i + 1}"
+        spans.append((name, step.description, step.status.value, step.start_time, step.end_time))
+        dependencies[name] = [previous] if previous else []
+        previous = name
+    return analyze_timing(spans, dependencies, **kwargs)
+
+
+def analyze_parallel_run(tasks: list, **kwargs: Any) -> TimingReport:
+    """Timing report for the tasks returned by ``run_parallel_install``."""
+    spans = [
+        (task.name, task.description, task.status.value, task.start_time, task.end_time)
+        for task in tasks
+    ]
+    dependencies = {task.name: list(task.dependencies) for task in tasks}
+    return analyze_timing(spans, dependencies, **kwargs)
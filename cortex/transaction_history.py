@@ -19,6 +19,13 @@ from enum import Enum
 from pathlib import Path
 from typing import Any
 
+from cortex.dpkg_status import get_status_index
+from cortex.utils.db_pool import SQLiteConnectionPool, get_connection_pool
+from cortex.utils.db_schema import Migration, migrate
+from cortex.utils.fts_index import FullTextIndex, SearchHit, fts_query
+from cortex.utils.history_stats import HistoryStats, KeyStats, Outcome
+from cortex.utils.package_index import PackageIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -148,12 +155,37 @@ class TransactionHistory:
     def __init__(self, db_path: Path | None = None):
         self.db_path = db_path or Path.home() / ".cortex" / "transaction_history.db"
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # One row per transaction and package, for package searches
+        self.package_index = PackageIndex("transaction_packages", source="transactions")
+        # Full-text index of commands and errors, for `cortex history search`
+        self.text_index = FullTextIndex(
+            "transactions_fts", "transactions", ["command", "error_message"]
+        )
+        # Success rates and durations per package and command pattern
+        self.stats = HistoryStats("transaction", "transactions", outcome_of=self._outcome)
+        self._pool: SQLiteConnectionPool | None = None
         self._init_db()
 
     def _init_db(self):
-        """Initialize the database schema."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
+        """Initialize the connection pool and bring the schema up to date."""
+        self._pool = get_connection_pool(self.db_path, pool_size=5)
+
+        with self._pool.get_connection() as conn:
+            migrate(conn, self._migrations())
+            backfill = [
+                index
+                for index in (self.package_index, self.text_index, self.stats)
+                if not index.ready(conn)
+            ]
+
+        for index in backfill:
+            index.start_backfill(self._pool.get_connection)
+
+    def _migrations(self) -> list[Migration]:
+        """Schema versions of the database, oldest first (see cortex.utils.db_schema)."""
+        return [
+            # 1: transactions (IF NOT EXISTS: databases from before versioning have it)
+            [
                 """
                 CREATE TABLE IF NOT EXISTS transactions (
                     id TEXT PRIMARY KEY,
@@ -171,24 +203,23 @@ class TransactionHistory:
                     is_rollback_safe INTEGER,
                     rollback_warning TEXT
                 )
-            """
-            )
-
-            conn.execute(
+                """,
                 """
                 CREATE INDEX IF NOT EXISTS idx_timestamp
                 ON transactions(timestamp DESC)
-            """
-            )
-
-            conn.execute(
+                """,
                 """
                 CREATE INDEX IF NOT EXISTS idx_status
                 ON transactions(status)
-            """
-            )
-
-            conn.commit()
+                """,
+            ],
+            # 2: one row per transaction and package
+            self.package_index.create,
+            # 3: full-text index of commands and errors
+            self.text_index.create,
+            # 4: outcome statistics per package and command pattern
+            self.stats.create,
+        ]
 
     def _generate_id(self) -> str:
         """Generate a unique transaction ID."""
@@ -262,47 +293,20 @@ class TransactionHistory:
         # Update rollback safety
         self._assess_rollback_safety(transaction)
 
-        self._save_transaction(transaction)
+        self._save_transaction(transaction, count_outcome=True)
 
     def _capture_package_state(self, package: str) -> PackageState:
         """Capture the current state of a package."""
         state = PackageState(name=package)
 
         try:
-            # Check if installed and get version
-            result = subprocess.run(
-                ["dpkg-query", "-W", "-f=${Status}|${Version}", package],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode == 0:
-                parts = result.stdout.strip().split("|")
-                if len(parts) >= 2 and "installed" in parts[0]:
-                    state.installed = True
-                    state.version = parts[1]
-
-            # Get config files
-            if state.installed:
-                config_result = subprocess.run(
-                    ["dpkg-query", "-L", package], capture_output=True, text=True
-                )
-                if config_result.returncode == 0:
-                    for line in config_result.stdout.strip().split("\n"):
-                        if "/etc/" in line or line.endswith(".conf"):
-                            state.config_files.append(line)
-
-            # Get dependencies
-            dep_result = subprocess.run(
-                ["apt-cache", "depends", package, "--installed"], capture_output=True, text=True
-            )
-            if dep_result.returncode == 0:
-                for line in dep_result.stdout.strip().split("\n"):
-                    if "Depends:" in line:
-                        dep = line.split("Depends:")[-1].strip()
-                        if dep and not dep.startswith("<"):
-                            state.dependencies.append(dep)
+            package_info = get_status_index().get(package)
 
+            if package_info is not None and package_info.installed:
+                state.installed = True
+                state.version = package_info.version
+                state.config_files = list(package_info.conffiles)
+                state.dependencies = list(package_info.depends)
         except Exception as e:
             logger.warning(f"Error capturing state for {package}: {e}")
 
@@ -367,9 +371,14 @@ class TransactionHistory:
                 "Purge operations cannot fully restore configuration files."
             )
 
-    def _save_transaction(self, transaction: Transaction):
-        """Save transaction to database."""
-        with sqlite3.connect(self.db_path) as conn:
+    def _save_transaction(self, transaction: Transaction, count_outcome: bool = False):
+        """Save transaction to database.
+
+        Args:
+            transaction: Transaction to save
+            count_outcome: Also count its outcome in the statistics tables
+        """
+        with self._pool.get_connection() as conn:
             conn.execute(
                 """
                 INSERT OR REPLACE INTO transactions VALUES (
@@ -393,11 +402,26 @@ class TransactionHistory:
                     transaction.rollback_warning,
                 ),
             )
+            self.package_index.update(
+                conn, transaction.id, transaction.timestamp.isoformat(), transaction.packages
+            )
+            if count_outcome:
+                self.stats.record(
+                    conn,
+                    Outcome(
+                        record_id=transaction.id,
+                        packages=transaction.packages,
+                        commands=[transaction.command] if transaction.command else [],
+                        success=transaction.status == TransactionStatus.COMPLETED,
+                        duration=transaction.duration_seconds,
+                        error_message=transaction.error_message,
+                    ),
+                )
             conn.commit()
 
     def get_transaction(self, transaction_id: str) -> Transaction | None:
         """Get a specific transaction by ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._pool.get_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
             row = cursor.fetchone()
@@ -411,7 +435,7 @@ class TransactionHistory:
         self, limit: int = 10, status_filter: TransactionStatus | None = None
     ) -> list[Transaction]:
         """Get recent transactions."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._pool.get_connection() as conn:
             conn.row_factory = sqlite3.Row
 
             if status_filter:
@@ -435,33 +459,75 @@ class TransactionHistory:
         limit: int = 50,
     ) -> list[Transaction]:
         """Search transactions with filters."""
-        query = "SELECT * FROM transactions WHERE 1=1"
-        params = []
+        with self._pool.get_connection() as conn:
+            conn.row_factory = sqlite3.Row
 
-        if package:
-            query += " AND packages LIKE ?"
-            params.append(f'%"{package}"%')
+            if package and self.package_index.ready(conn):
+                # Walk the package's index entries newest first (CROSS JOIN
+                # keeps the side table as the outer loop)
+                query = (
+                    "SELECT t.* FROM transaction_packages p "
+                    "CROSS JOIN transactions t ON t.id = p.record_id WHERE p.package = ?"
+                )
+                params: list[Any] = [package]
+                timestamp = "p.timestamp"
+            else:
+                query = "SELECT t.* FROM transactions t WHERE 1=1"
+                params = []
+                timestamp = "t.timestamp"
+                if package:
+                    # Not indexed yet (backfill running): scan the JSON lists
+                    query += " AND t.packages LIKE ?"
+                    params.append(f'%"{package}"%')
 
-        if transaction_type:
-            query += " AND transaction_type = ?"
-            params.append(transaction_type.value)
+            if transaction_type:
+                query += " AND t.transaction_type = ?"
+                params.append(transaction_type.value)
 
-        if since:
-            query += " AND timestamp >= ?"
-            params.append(since.isoformat())
+            if since:
+                query += f" AND {timestamp} >= ?"
+                params.append(since.isoformat())
 
-        if until:
-            query += " AND timestamp <= ?"
-            params.append(until.isoformat())
+            if until:
+                query += f" AND {timestamp} <= ?"
+                params.append(until.isoformat())
 
-        query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
+            query += f" ORDER BY {timestamp} DESC LIMIT ?"
+            params.append(limit)
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.execute(query, params)
             return [self._row_to_transaction(row) for row in cursor]
 
+    def search_text(self, query: str, limit: int = 20) -> list[SearchHit]:
+        """Transactions whose command or error message match ``query``, best first.
+
+        Args:
+            query: Free text; records must contain every term (``term*`` for a prefix)
+            limit: Maximum number of results
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._pool.get_connection() as conn:
+            rows = conn.execute(
+                self.text_index.search_sql(
+                    "t.id", "t.timestamp", "t.transaction_type", "t.status", "t.packages"
+                ),
+                (match, limit),
+            ).fetchall()
+
+        return [
+            SearchHit(
+                source="transactions",
+                record_id=tx_id,
+                timestamp=timestamp,
+                summary=f"{tx_type} {', '.join(json.loads(packages))} ({status})",
+                snippet=snippet,
+                score=score,
+            )
+            for tx_id, timestamp, tx_type, status, packages, score, snippet in rows
+        ]
+
     def _row_to_transaction(self, row: sqlite3.Row) -> Transaction:
         """Convert a database row to a Transaction object."""
         return Transaction(
@@ -487,29 +553,64 @@ class TransactionHistory:
             rollback_warning=row["rollback_warning"],
         )
 
+    @staticmethod
+    def _outcome(row: dict[str, Any]) -> Outcome | None:
+        """Outcome of a finished transaction row, for the statistics tables."""
+        if row["status"] not in (TransactionStatus.COMPLETED.value, TransactionStatus.FAILED.value):
+            return None
+        return Outcome(
+            record_id=row["id"],
+            packages=json.loads(row["packages"]) if row["packages"] else [],
+            commands=[row["command"]] if row["command"] else [],
+            success=row["status"] == TransactionStatus.COMPLETED.value,
+            duration=row["duration_seconds"],
+            error_message=row["error_message"],
+        )
+
+    def get_outcome_stats(
+        self, kind: str = "package", limit: int = 20, key: str | None = None
+    ) -> list[KeyStats]:
+        """Success rate, duration percentiles and failure categories of completed transactions.
+
+        Read from the aggregate tables only (see cortex.utils.history_stats).
+
+        Args:
+            kind: "package", "pattern" (command pattern, e.g. "apt install") or "all"
+            limit: Maximum number of entries, most frequent first
+            key: Only this package or pattern
+        """
+        if kind not in HistoryStats.KINDS:
+            raise ValueError(f"Unknown statistics kind: {kind}")
+        with self._pool.get_connection() as conn:
+            if kind == "all" or key is not None:
+                stats = self.stats.get(conn, kind, "*" if kind == "all" else key)
+                return [stats] if stats else []
+            return self.stats.top(conn, kind, limit)
+
     def get_stats(self) -> dict[str, Any]:
         """Get transaction statistics."""
-        with sqlite3.connect(self.db_path) as conn:
-            total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
-
-            by_type = {}
-            for t in TransactionType:
-                count = conn.execute(
-                    "SELECT COUNT(*) FROM transactions WHERE transaction_type = ?", (t.value,)
-                ).fetchone()[0]
-                by_type[t.value] = count
-
-            by_status = {}
-            for s in TransactionStatus:
-                count = conn.execute(
-                    "SELECT COUNT(*) FROM transactions WHERE status = ?", (s.value,)
-                ).fetchone()[0]
-                by_status[s.value] = count
+        with self._pool.get_connection() as conn:
+            by_type = dict.fromkeys((t.value for t in TransactionType), 0)
+            by_type.update(
+                conn.execute(
+                    "SELECT transaction_type, COUNT(*) FROM transactions GROUP BY transaction_type"
+                ).fetchall()
+            )
+
+            by_status = dict.fromkeys((s.value for s in TransactionStatus), 0)
+            by_status.update(
+                conn.execute("SELECT status, COUNT(*) FROM transactions GROUP BY status").fetchall()
+            )
+
+            outcomes = self.stats.get(conn, "all", "*")
 
             return {
-                "total_transactions": total,
+                "total_transactions": sum(by_status.values()),
                 "by_type": by_type,
                 "by_status": by_status,
+                "success_rate": outcomes.success_rate if outcomes else None,
+                "p50_duration": outcomes.p50_duration if outcomes else None,
+                "p95_duration": outcomes.p95_duration if outcomes else None,
                 "db_size_kb": self.db_path.stat().st_size / 1024,
             }
 
@@ -11,6 +11,8 @@ import shlex
 import subprocess
 from dataclasses import dataclass
 
+from cortex.command_safety import SafetyEngine
+
 logger = logging.getLogger(__name__)
 
 # Dangerous patterns that should never be executed
@@ -49,6 +51,8 @@ DANGEROUS_PATTERNS = [
     r"export\s+LD_LIBRARY_PATH.*=/",
 ]
 
+_safety_engine = SafetyEngine(DANGEROUS_PATTERNS)
+
 # Commands that are allowed (allowlist for package management)
 ALLOWED_COMMAND_PREFIXES = [
     "apt",
@@ -148,9 +152,9 @@ def validate_command(command: str, strict: bool = True) -> tuple[bool, str | Non
     command = command.strip()
 
     # Check for dangerous patterns
-    for pattern in DANGEROUS_PATTERNS:
-        if re.search(pattern, command, re.IGNORECASE):
-            return False, f"Dangerous pattern detected: {pattern}"
+    pattern = _safety_engine.check(command)
+    if pattern:
+        return False, f"Dangerous pattern detected: {pattern}"
 
     # Check for shell metacharacters that could enable injection
     dangerous_chars = ["`", "$", "&&", "||", ";", "\n", "\r"]
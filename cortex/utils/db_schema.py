@@ -0,0 +1,68 @@
+"""
+Versioned schema migrations for Cortex Linux SQLite databases.
+
+The schema version of a database is kept in SQLite's ``user_version``
+header field. A store declares its schema as an ordered list of
+migrations; ``migrate()`` applies the ones a database has not seen yet,
+each in its own ``BEGIN IMMEDIATE`` transaction, so concurrent processes
+opening the same database apply every migration exactly once.
+
+Databases created before versioning have ``user_version`` 0, so the first
+migration of a store must be idempotent (``CREATE TABLE IF NOT EXISTS``).
+"""
+
+import logging
+import sqlite3
+from collections.abc import Callable, Sequence
+
+logger = logging.getLogger(__name__)
+
+# A migration is a list of SQL statements or a function applying it
+Migration = Sequence[str] | Callable[[sqlite3.Connection], None]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: Sequence[Migration]) -> int:
+    """Bring a database to the latest schema version.
+
+    Args:
+        conn: Connection to the database (with no open transaction)
+        migrations: Migration i (0-based) upgrades version i to i + 1
+
+    Returns:
+        The schema version of the database
+
+    Raises:
+        RuntimeError: If the database was written by a newer schema
+    """
+    target = len(migrations)
+    version = schema_version(conn)
+    if version > target:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than supported version {target}"
+        )
+
+    while version < target:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            version = schema_version(conn)
+            if version < target:
+                migration = migrations[version]
+                if callable(migration):
+                    migration(conn)
+                else:
+                    for statement in migration:
+                        conn.execute(statement)
+                version += 1
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.debug(f"Database schema at version {version}")
+
+    return version
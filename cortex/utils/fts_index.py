@@ -0,0 +1,183 @@
+"""
+Full-text indexes over history tables.
+
+``FullTextIndex`` keeps an FTS5 table in sync with text columns of a
+source table through triggers, so records are searchable by any word of
+a command or error message and results are ranked with bm25. The FTS
+rows share the rowids of their source rows.
+
+Like ``PackageIndex``, an index added to an existing database is filled
+in the background (see ``BackfilledIndex``); rows written meanwhile are
+indexed by the triggers.
+"""
+
+import re
+import sqlite3
+from dataclasses import dataclass
+
+from cortex.utils.package_index import BackfilledIndex
+
+# Terms without a word character have no tokens and are dropped
+_WORD = re.compile(r"\w")
+
+
+def fts_query(text: str, any_term: bool = False) -> str:
+    """Turn free text into an FTS5 query matching rows containing every term.
+
+    Each whitespace-separated term is quoted, so punctuation such as the
+    dashes of ``apt-get`` or ``--fix-broken`` is not parsed as query syntax
+    (the tokenizer splits such terms into a phrase). A trailing ``*`` keeps
+    its meaning of a prefix search. With ``any_term``, rows containing any
+    of the terms match (bm25 still ranks rows with more of them first).
+    """
+    terms = []
+    for term in text.split():
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*") if prefix else term
+        if not _WORD.search(term):
+            continue
+        quoted = '"' + term.replace('"', '""') + '"'
+        terms.append(quoted + "*" if prefix else quoted)
+    return (" OR " if any_term else " ").join(terms)
+
+
+@dataclass
+class SearchHit:
+    """A record matching a full-text query."""
+
+    source: str  # Store the record comes from, e.g. "installations"
+    record_id: str
+    timestamp: str
+    summary: str
+    snippet: str
+    score: float  # bm25, lower is better
+
+
+class FullTextIndex(BackfilledIndex):
+    """FTS5 table over text columns of a source table.
+
+    The source rowids must be stable: tables without an INTEGER PRIMARY
+    KEY get new rowids from ``VACUUM``, after which ``rebuild()`` must run.
+
+    Usage:
+        index = FullTextIndex("transactions_fts", "transactions", ["command", "error_message"])
+        index.create(conn)
+        rows = conn.execute(index.search_sql("t.id"), (fts_query("nginx"), 20))
+    """
+
+    def __init__(self, table: str, source: str, columns: list[str], id_column: str = "id"):
+        self.table = table
+        self.source = source
+        self.columns = columns
+        self.id_column = id_column
+
+    def create(self, conn: sqlite3.Connection):
+        """Create the FTS table and its triggers, scheduling a backfill.
+
+        Runs in the caller's transaction (e.g. a schema migration).
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)
+        ).fetchone()
+
+        columns = ", ".join(self.columns)
+        new_values = ", ".join(f"new.{column}" for column in self.columns)
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5({columns})")
+        # INSERT OR REPLACE deletes the old row without firing delete
+        # triggers, so drop its entry before the insert
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_before_insert
+            BEFORE INSERT ON {self.source} BEGIN
+                DELETE FROM {self.table} WHERE rowid IN (
+                    SELECT rowid FROM {self.source} WHERE {self.id_column} = new.{self.id_column}
+                );
+            END
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_after_insert
+            AFTER INSERT ON {self.source} BEGIN
+                INSERT INTO {self.table}(rowid, {columns}) VALUES (new.rowid, {new_values});
+            END
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_after_update
+            AFTER UPDATE OF {columns} ON {self.source} BEGIN
+                DELETE FROM {self.table} WHERE rowid = old.rowid;
+                INSERT INTO {self.table}(rowid, {columns}) VALUES (new.rowid, {new_values});
+            END
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {self.table}_after_delete
+            AFTER DELETE ON {self.source} BEGIN
+                DELETE FROM {self.table} WHERE rowid = old.rowid;
+            END
+        """
+        )
+        self._schedule_backfill(conn, new=not exists)
+
+    def rebuild(self, conn: sqlite3.Connection):
+        """Re-index every source row (e.g. after a VACUUM renumbered them)."""
+        columns = ", ".join(self.columns)
+        conn.execute(f"DELETE FROM {self.table}")
+        conn.execute(
+            f"INSERT INTO {self.table}(rowid, {columns}) SELECT rowid, {columns} FROM {self.source}"
+        )
+        conn.execute(
+            "UPDATE index_backfills SET last_rowid = target_rowid WHERE name = ?", (self.table,)
+        )
+
+    def search_sql(self, *select: str, where: str = "") -> str:
+        """Query for the best ``?`` matches of the ``?`` FTS query.
+
+        The source table is aliased ``t``; besides ``select``, each row has
+        the bm25 ``score`` (lower is better) and a ``snippet`` of the best
+        matching column with the matches in ``[...]``.
+        """
+        condition = f"AND ({where})" if where else ""
+        columns = ", ".join(select)
+        return f"""
+            SELECT {columns},
+                   bm25({self.table}) AS score,
+                   snippet({self.table}, -1, '[', ']', '...', 12) AS snippet
+            FROM {self.table}
+            CROSS JOIN {self.source} t ON t.rowid = {self.table}.rowid
+            WHERE {self.table} MATCH ? {condition}
+            ORDER BY score
+            LIMIT ?
+        """
+
+    def _index_batch(
+        self, conn: sqlite3.Connection, last_rowid: int, target_rowid: int, batch_size: int
+    ) -> int:
+        rowids = conn.execute(
+            f"""
+            SELECT rowid FROM {self.source}
+            WHERE rowid > ? AND rowid <= ?
+            ORDER BY rowid
+            LIMIT ?
+        """,
+            (last_rowid, target_rowid, batch_size),
+        ).fetchall()
+        if not rowids:
+            return target_rowid
+
+        # Rows rewritten since the index exists are already indexed
+        columns = ", ".join(self.columns)
+        conn.execute(
+            f"""
+            INSERT INTO {self.table}(rowid, {columns})
+            SELECT s.rowid, {", ".join(f"s.{column}" for column in self.columns)}
+            FROM {self.source} s
+            WHERE s.rowid > ? AND s.rowid <= ?
+              AND NOT EXISTS (SELECT 1 FROM {self.table} f WHERE f.rowid = s.rowid)
+        """,
+            (last_rowid, rowids[-1][0]),
+        )
+        return rowids[-1][0]
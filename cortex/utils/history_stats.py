@@ -0,0 +1,411 @@
+"""
+Materialized outcome statistics for history tables.
+
+Success rates, duration percentiles and failure categories per package
+and per command pattern used to be recomputed from the raw history rows.
+``HistoryStats`` keeps them in aggregate tables that are updated in the
+same transaction as the record they count, so reading them costs a few
+primary-key lookups whatever the size of the history.
+
+Durations are counted in logarithmic buckets (each 25% wider than the
+previous one), so p50 and p95 are maintained incrementally and reported
+as the upper bound of their bucket. Every counted record keeps a row in
+an outcomes table, so a record whose outcome is written again replaces
+its earlier contribution instead of being counted twice.
+
+Records written before the tables existed are counted by an online
+backfill (see ``BackfilledIndex``).
+"""
+
+import json
+import logging
+import math
+import re
+import sqlite3
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from cortex.utils.package_index import BackfilledIndex
+
+logger = logging.getLogger(__name__)
+
+# Duration buckets: bucket b holds durations up to _BUCKET_BASE * _BUCKET_GROWTH**b seconds
+_BUCKET_BASE = 0.1
+_BUCKET_GROWTH = 1.25
+
+_SUBCOMMAND = re.compile(r"^[a-z][a-z0-9-]*$")
+# Words before the tool: options of sudo/env and environment assignments
+_PREFIX = re.compile(r"^(-|\w+=)")
+
+
+def command_pattern(command: str) -> str | None:
+    """The tool and subcommand of a shell command, e.g. ``apt-get install``.
+
+    ``sudo``, environment assignments and options are skipped, so
+    ``sudo DEBIAN_FRONTEND=noninteractive apt-get install -y nginx`` and
+    ``apt-get install redis`` share a pattern.
+    """
+    words = command.split()
+    while words and (words[0] in ("sudo", "env") or _PREFIX.match(words[0])):
+        words.pop(0)
+    if not words:
+        return None
+    tool = words[0].rsplit("/", 1)[-1]
+    for word in words[1:]:
+        if word.startswith("-"):
+            continue
+        return f"{tool} {word}" if _SUBCOMMAND.match(word) else tool
+    return tool
+
+
+_error_parser = None
+
+
+def failure_category(error_message: str | None) -> str:
+    """Category of an error message (see ``cortex.error_parser.ErrorCategory``)."""
+    global _error_parser
+    if not error_message:
+        return "unknown"
+    if _error_parser is None:
+        from cortex.error_parser import ErrorParser
+
+        _error_parser = ErrorParser()
+    return _error_parser.parse_error(error_message).primary_category.value
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _BUCKET_BASE:
+        return 0
+    return math.ceil(math.log(seconds / _BUCKET_BASE, _BUCKET_GROWTH))
+
+
+@dataclass
+class Outcome:
+    """The result of a finished history record, as counted by ``HistoryStats``."""
+
+    record_id: str
+    packages: list[str]
+    commands: list[str]
+    success: bool
+    duration: float | None = None
+    error_message: str | None = None
+
+
+@dataclass
+class KeyStats:
+    """Aggregated outcomes of one package or command pattern."""
+
+    kind: str  # "package", "pattern" or "all"
+    key: str
+    attempts: int
+    successes: int
+    # Upper bounds of the median and 95th percentile bucket, in seconds
+    p50_duration: float | None = None
+    p95_duration: float | None = None
+    failure_categories: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def failures(self) -> int:
+        return self.attempts - self.successes
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "key": self.key,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": self.success_rate,
+            "p50_duration": self.p50_duration,
+            "p95_duration": self.p95_duration,
+            "failure_categories": self.failure_categories,
+        }
+
+
+@dataclass
+class PlanEstimate:
+    """Expected duration and failure risk of a plan, from past outcomes."""
+
+    duration: float | None  # Seconds, None without timed history
+    failure_risk: float  # Probability that the plan fails, 0.0 to 1.0
+    samples: int  # Past records the estimate is based on
+
+
+def estimate_plan(stats: Iterable[KeyStats]) -> PlanEstimate | None:
+    """Estimate a plan from the statistics of its packages.
+
+    A run takes as long as its slowest package usually took, and fails
+    if any package fails. Success rates are smoothed with one success and
+    one failure (Laplace), so rarely seen packages are neither certain
+    successes nor certain failures.
+    """
+    stats = [s for s in stats if s.attempts]
+    if not stats:
+        return None
+
+    durations = [s.p50_duration for s in stats if s.p50_duration is not None]
+    success = 1.0
+    for s in stats:
+        success *= (s.successes + 1) / (s.attempts + 2)
+    return PlanEstimate(
+        duration=max(durations) if durations else None,
+        failure_risk=1.0 - success,
+        samples=max(s.attempts for s in stats),
+    )
+
+
+class HistoryStats(BackfilledIndex):
+    """Aggregate outcome tables of a history table.
+
+    Usage:
+        stats = HistoryStats("installation", "installations", outcome_of=row_to_outcome)
+        stats.create(conn)
+        stats.record(conn, Outcome("id", ["nginx"], ["apt-get install nginx"], True, 12.5))
+        stats.get(conn, "package", "nginx").p95_duration
+    """
+
+    KINDS = ("package", "pattern", "all")
+
+    def __init__(
+        self,
+        prefix: str,
+        source: str,
+        outcome_of: Callable[[dict[str, Any]], Outcome | None],
+    ):
+        """
+        Args:
+            prefix: Prefix of the aggregate tables, e.g. "installation"
+            source: History table the records come from
+            outcome_of: Outcome of a source row (as a dict), None while unfinished
+        """
+        self.prefix = prefix
+        self.table = f"{prefix}_stats"
+        self.source = source
+        self.outcome_of = outcome_of
+
+    def create(self, conn: sqlite3.Connection):
+        """Create the aggregate tables, scheduling a backfill of existing records.
+
+        Runs in the caller's transaction (e.g. a schema migration).
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)
+        ).fetchone()
+
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                successes INTEGER NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.prefix}_durations (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (kind, key, bucket)
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.prefix}_failures (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                category TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (kind, key, category)
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.prefix}_outcomes (
+                record_id TEXT PRIMARY KEY,
+                keys TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                bucket INTEGER,
+                category TEXT
+            )
+        """
+        )
+        self._schedule_backfill(conn, new=not exists)
+
+    def record(self, conn: sqlite3.Connection, outcome: Outcome):
+        """Count the outcome of a record, replacing its earlier outcome if any.
+
+        Runs in the caller's transaction, so the record and the aggregates
+        are committed together.
+        """
+        previous = conn.execute(
+            f"SELECT keys, success, bucket, category FROM {self.prefix}_outcomes "
+            "WHERE record_id = ?",
+            (outcome.record_id,),
+        ).fetchone()
+        if previous:
+            keys, success, bucket, category = previous
+            self._apply(conn, [tuple(k) for k in json.loads(keys)], success, bucket, category, -1)
+
+        keys = [("all", "*")]
+        keys += [("package", p) for p in dict.fromkeys(outcome.packages)]
+        patterns = (command_pattern(c) for c in outcome.commands)
+        keys += [("pattern", p) for p in dict.fromkeys(patterns) if p]
+        bucket = _bucket(outcome.duration) if outcome.duration is not None else None
+        category = None if outcome.success else failure_category(outcome.error_message)
+
+        self._apply(conn, keys, outcome.success, bucket, category, 1)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.prefix}_outcomes VALUES (?, ?, ?, ?, ?)",
+            (outcome.record_id, json.dumps(keys), int(outcome.success), bucket, category),
+        )
+
+    def _apply(
+        self,
+        conn: sqlite3.Connection,
+        keys: list[tuple[str, str]],
+        success: bool,
+        bucket: int | None,
+        category: str | None,
+        sign: int,
+    ):
+        conn.executemany(
+            f"""
+            INSERT INTO {self.table} VALUES (?, ?, ?, ?)
+            ON CONFLICT (kind, key) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                successes = successes + excluded.successes
+        """,
+            [(kind, key, sign, sign * int(success)) for kind, key in keys],
+        )
+        if bucket is not None:
+            conn.executemany(
+                f"""
+                INSERT INTO {self.prefix}_durations VALUES (?, ?, ?, ?)
+                ON CONFLICT (kind, key, bucket) DO UPDATE SET count = count + excluded.count
+            """,
+                [(kind, key, bucket, sign) for kind, key in keys],
+            )
+        if category is not None:
+            conn.executemany(
+                f"""
+                INSERT INTO {self.prefix}_failures VALUES (?, ?, ?, ?)
+                ON CONFLICT (kind, key, category) DO UPDATE SET count = count + excluded.count
+            """,
+                [(kind, key, category, sign) for kind, key in keys],
+            )
+
+    def delete_orphans(self, conn: sqlite3.Connection):
+        """Forget the outcomes of deleted records; their counts are kept."""
+        conn.execute(
+            f"""
+            DELETE FROM {self.prefix}_outcomes
+            WHERE record_id NOT IN (SELECT id FROM {self.source})
+        """
+        )
+
+    def get(self, conn: sqlite3.Connection, kind: str, key: str) -> KeyStats | None:
+        """Statistics of one package (kind "package"), command pattern or "all"/"*"."""
+        row = conn.execute(
+            f"SELECT attempts, successes FROM {self.table} WHERE kind = ? AND key = ?",
+            (kind, key),
+        ).fetchone()
+        if not row or not row[0]:
+            return None
+        return self._key_stats(conn, kind, key, *row)
+
+    def top(self, conn: sqlite3.Connection, kind: str, limit: int = 20) -> list[KeyStats]:
+        """The ``limit`` most frequent keys of ``kind``."""
+        rows = conn.execute(
+            f"""
+            SELECT key, attempts, successes FROM {self.table}
+            WHERE kind = ? AND attempts > 0
+            ORDER BY attempts DESC, key
+            LIMIT ?
+        """,
+            (kind, limit),
+        ).fetchall()
+        return [self._key_stats(conn, kind, *row) for row in rows]
+
+    def _key_stats(
+        self, conn: sqlite3.Connection, kind: str, key: str, attempts: int, successes: int
+    ) -> KeyStats:
+        buckets = conn.execute(
+            f"""
+            SELECT bucket, count FROM {self.prefix}_durations
+            WHERE kind = ? AND key = ? AND count > 0
+            ORDER BY bucket
+        """,
+            (kind, key),
+        ).fetchall()
+        failures = conn.execute(
+            f"""
+            SELECT category, count FROM {self.prefix}_failures
+            WHERE kind = ? AND key = ? AND count > 0
+            ORDER BY count DESC, category
+        """,
+            (kind, key),
+        ).fetchall()
+        return KeyStats(
+            kind=kind,
+            key=key,
+            attempts=attempts,
+            successes=successes,
+            p50_duration=self._percentile(buckets, 0.5),
+            p95_duration=self._percentile(buckets, 0.95),
+            failure_categories=dict(failures),
+        )
+
+    @staticmethod
+    def _percentile(buckets: list[tuple[int, int]], q: float) -> float | None:
+        total = sum(count for _, count in buckets)
+        if not total:
+            return None
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= q * total:
+                break
+        return round(_BUCKET_BASE * _BUCKET_GROWTH**bucket, 2)
+
+    def _index_batch(
+        self, conn: sqlite3.Connection, last_rowid: int, target_rowid: int, batch_size: int
+    ) -> int:
+        cursor = conn.execute(
+            f"""
+            SELECT rowid, * FROM {self.source}
+            WHERE rowid > ? AND rowid <= ?
+            ORDER BY rowid
+            LIMIT ?
+        """,
+            (last_rowid, target_rowid, batch_size),
+        )
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+
+        for row in rows:
+            try:
+                outcome = self.outcome_of(dict(zip(columns, row)))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Skipping unreadable {self.source} record: {e}")
+                continue
+            if outcome is None:
+                continue
+            # Records finished since the tables exist are already counted
+            counted = conn.execute(
+                f"SELECT 1 FROM {self.prefix}_outcomes WHERE record_id = ?", (outcome.record_id,)
+            ).fetchone()
+            if not counted:
+                self.record(conn, outcome)
+        return rows[-1][0] if rows else target_rowid
@@ -0,0 +1,238 @@
+"""
+Normalized package index for history tables.
+
+The history databases store the packages of each record as a JSON list,
+which can only be searched with a ``LIKE`` scan of the whole table.
+``PackageIndex`` maintains a side table with one row per record and
+package, indexed by (package, timestamp), so "which operations touched
+package X" is an index range scan.
+
+Databases created before the side table existed are migrated online: the
+existing records are indexed in small batches, each in its own short
+write transaction, and the progress is stored so an interrupted backfill
+resumes where it stopped. Records written meanwhile are indexed on write.
+Until the backfill is complete, ``ready()`` is False and callers fall back
+to scanning the JSON column.
+"""
+
+import abc
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import Callable, Iterable
+from contextlib import AbstractContextManager
+
+logger = logging.getLogger(__name__)
+
+
+class BackfilledIndex(abc.ABC):
+    """Base of indexes over a source table that are backfilled online.
+
+    Subclasses create their index in ``create()``, call
+    ``_schedule_backfill()`` from it and index a range of source rows in
+    ``_index_batch()``.
+    """
+
+    table: str
+    source: str
+
+    def _schedule_backfill(self, conn: sqlite3.Connection, new: bool):
+        """Record the source rows that predate a newly created index."""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS index_backfills (
+                name TEXT PRIMARY KEY,
+                last_rowid INTEGER NOT NULL,
+                target_rowid INTEGER NOT NULL
+            )
+        """
+        )
+
+        if new:
+            # Records up to the current last row predate the index
+            target = conn.execute(f"SELECT MAX(rowid) FROM {self.source}").fetchone()[0] or 0
+            conn.execute(
+                "INSERT OR REPLACE INTO index_backfills VALUES (?, 0, ?)", (self.table, target)
+            )
+
+    def restart_backfill(self, conn: sqlite3.Connection):
+        """Index every source row again (e.g. after a VACUUM renumbered rowids)."""
+        conn.execute(
+            f"""
+            UPDATE index_backfills
+            SET last_rowid = 0, target_rowid = (SELECT IFNULL(MAX(rowid), 0) FROM {self.source})
+            WHERE name = ?
+        """,
+            (self.table,),
+        )
+
+    def ready(self, conn: sqlite3.Connection) -> bool:
+        """True once every record written before the index existed is indexed."""
+        row = conn.execute(
+            "SELECT last_rowid, target_rowid FROM index_backfills WHERE name = ?", (self.table,)
+        ).fetchone()
+        return row is None or row[0] >= row[1]
+
+    @abc.abstractmethod
+    def _index_batch(
+        self, conn: sqlite3.Connection, last_rowid: int, target_rowid: int, batch_size: int
+    ) -> int:
+        """Index up to ``batch_size`` rows after ``last_rowid``; return the last rowid done."""
+
+    def backfill(self, conn: sqlite3.Connection, batch_size: int = 1000) -> bool:
+        """Index the next batch of pre-existing records.
+
+        Returns:
+            True if the backfill is complete
+        """
+        # Read and index a batch atomically, so no record changes in between
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT last_rowid, target_rowid FROM index_backfills WHERE name = ?", (self.table,)
+        ).fetchone()
+        if row is None or row[0] >= row[1]:
+            conn.commit()
+            return True
+        last_rowid, target_rowid = row
+
+        last_rowid = self._index_batch(conn, last_rowid, target_rowid, batch_size)
+        conn.execute(
+            "UPDATE index_backfills SET last_rowid = ? WHERE name = ?", (last_rowid, self.table)
+        )
+        conn.commit()
+        return last_rowid >= target_rowid
+
+    def start_backfill(
+        self,
+        connect: Callable[[], AbstractContextManager[sqlite3.Connection]],
+        batch_size: int = 1000,
+    ) -> threading.Thread:
+        """Run the backfill in a background thread.
+
+        Args:
+            connect: Returns a context manager yielding a connection; one is
+                     taken per batch, so other writers get the database in between.
+        """
+
+        def run():
+            try:
+                done = False
+                while not done:
+                    with connect() as conn:
+                        done = self.backfill(conn, batch_size)
+                logger.debug(f"Backfill of {self.table} complete")
+            except (sqlite3.Error, TimeoutError) as e:
+                logger.warning(f"Backfill of {self.table} interrupted, resuming next time: {e}")
+
+        # Daemon thread: progress is committed per batch, an exit only pauses it
+        thread = threading.Thread(target=run, name=f"backfill-{self.table}", daemon=True)
+        thread.start()
+        return thread
+
+
+class PackageIndex(BackfilledIndex):
+    """Side table mapping the records of a history table to their packages.
+
+    Usage:
+        index = PackageIndex("transaction_packages", source="transactions")
+        index.create(conn)
+        index.update(conn, tx_id, timestamp, ["nginx"])
+        index.start_backfill(connect)  # existing databases
+    """
+
+    def __init__(
+        self,
+        table: str,
+        source: str,
+        id_column: str = "id",
+        packages_column: str = "packages",
+        timestamp_column: str = "timestamp",
+    ):
+        self.table = table
+        self.source = source
+        self.id_column = id_column
+        self.packages_column = packages_column
+        self.timestamp_column = timestamp_column
+
+    def create(self, conn: sqlite3.Connection):
+        """Create the side table, scheduling a backfill of existing records.
+
+        Runs in the caller's transaction (e.g. a schema migration).
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)
+        ).fetchone()
+
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                record_id TEXT NOT NULL,
+                package TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                PRIMARY KEY (record_id, package)
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.table}_package
+            ON {self.table}(package, timestamp DESC)
+        """
+        )
+        self._schedule_backfill(conn, new=not exists)
+
+    def update(
+        self,
+        conn: sqlite3.Connection,
+        record_id: str,
+        timestamp: str,
+        packages: Iterable[str],
+    ):
+        """Index the packages of a record (replacing its previous entries).
+
+        Runs in the caller's transaction, so the record and its index rows
+        are committed together.
+        """
+        conn.execute(f"DELETE FROM {self.table} WHERE record_id = ?", (record_id,))
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {self.table} VALUES (?, ?, ?)",
+            [(record_id, package, timestamp) for package in packages],
+        )
+
+    def delete_orphans(self, conn: sqlite3.Connection):
+        """Drop the entries of records deleted from the source table."""
+        conn.execute(
+            f"""
+            DELETE FROM {self.table}
+            WHERE record_id NOT IN (SELECT {self.id_column} FROM {self.source})
+        """
+        )
+
+    def _index_batch(
+        self, conn: sqlite3.Connection, last_rowid: int, target_rowid: int, batch_size: int
+    ) -> int:
+        records = conn.execute(
+            f"""
+            SELECT rowid, {self.id_column}, {self.timestamp_column}, {self.packages_column}
+            FROM {self.source}
+            WHERE rowid > ? AND rowid <= ?
+            ORDER BY rowid
+            LIMIT ?
+        """,
+            (last_rowid, target_rowid, batch_size),
+        ).fetchall()
+
+        entries = []
+        for _, record_id, timestamp, packages in records:
+            try:
+                names = json.loads(packages) if packages else []
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable packages of {self.source} {record_id}")
+                continue
+            entries.extend((record_id, name, timestamp) for name in dict.fromkeys(names))
+
+        # Records rewritten since the index exists are already indexed
+        conn.executemany(f"INSERT OR IGNORE INTO {self.table} VALUES (?, ?, ?)", entries)
+        return records[-1][0] if records else target_rowid
@@ -0,0 +1,286 @@
+"""
+Streaming command execution with bounded output buffers.
+
+Long installs (CUDA, texlive) print hundreds of thousands of lines. Running
+them with ``subprocess.run(capture_output=True)`` keeps all of that in memory
+and shows nothing until the command exits. This module runs commands with
+asyncio subprocesses, hands every line to a callback as it arrives and keeps
+only the first and last lines in memory. Once output overflows the buffer,
+the complete stream is written to a gzip-compressed log file instead.
+"""
+
+import asyncio
+import gzip
+import os
+import signal
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TextIO
+
+# Default number of lines kept at the start and end of a stream
+DEFAULT_HEAD_LINES = 200
+DEFAULT_TAIL_LINES = 800
+
+# asyncio StreamReader line limit; longer lines are read in chunks
+_READ_LIMIT = 1024 * 1024
+
+# Callback invoked per line: (stream_name, line_without_newline)
+LineCallback = Callable[[str, str], None]
+
+
+class OutputBuffer:
+    """Ring buffer for command output with head/tail retention.
+
+    The first ``head_lines`` lines and the last ``tail_lines`` lines are
+    kept. When a line would be dropped from the middle and ``spill_path`` is
+    set, everything seen so far plus all later lines are written to that
+    gzip file, so the full output stays available on disk.
+
+    Usage:
+        buf = OutputBuffer(head_lines=10, tail_lines=10, spill_path="/tmp/out.log.gz")
+        for line in lines:
+            buf.append(line)
+        text = buf.getvalue()
+        buf.close()
+    """
+
+    def __init__(
+        self,
+        head_lines: int = DEFAULT_HEAD_LINES,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        spill_path: str | Path | None = None,
+    ):
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.total_lines = 0
+        self.dropped_lines = 0
+        self._head: list[str] = []
+        self._tail: deque[str] = deque()
+        self._spill: TextIO | None = None
+        # True once the full output is being written to spill_path
+        self.spilled = False
+
+    @property
+    def truncated(self) -> bool:
+        """True if lines were dropped from memory."""
+        return self.dropped_lines > 0
+
+    def _open_spill(self):
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        self._spill = gzip.open(self.spill_path, "wt", encoding="utf-8")
+        self.spilled = True
+        self._spill.writelines(self._head)
+        self._spill.writelines(self._tail)
+
+    def append(self, line: str):
+        """Add one line (including its trailing newline, if any)."""
+        self.total_lines += 1
+
+        if self._spill is not None:
+            self._spill.write(line)
+
+        if len(self._head) < self.head_lines:
+            self._head.append(line)
+            return
+
+        if len(self._tail) >= self.tail_lines:
+            if self._spill is None and self.spill_path is not None:
+                self._open_spill()
+                self._spill.write(line)
+            if self._tail:
+                self._tail.popleft()
+            self.dropped_lines += 1
+            if self.tail_lines == 0:
+                return
+
+        self._tail.append(line)
+
+    def feed(self, text: str):
+        """Add a block of text, split into lines."""
+        for line in text.splitlines(keepends=True):
+            self.append(line)
+
+    def getvalue(self) -> str:
+        """Return the retained output, with a marker where lines were dropped."""
+        if not self.truncated:
+            return "".join(self._head) + "".join(self._tail)
+
+        marker = f"... [{self.dropped_lines} lines omitted"
+        if self.spill_path is not None:
+            marker += f", full output in {self.spill_path}"
+        marker += "] ...\n"
+
+        head = "".join(self._head)
+        if head and not head.endswith("\n"):
+            head += "\n"
+        return head + marker + "".join(self._tail)
+
+    def close(self):
+        """Flush and close the spill file, if one was opened."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+def bound_output(
+    text: str,
+    head_lines: int = DEFAULT_HEAD_LINES,
+    tail_lines: int = DEFAULT_TAIL_LINES,
+    spill_path: str | Path | None = None,
+) -> str:
+    """Apply head/tail retention to already captured output.
+
+    Text within the limits is returned unchanged.
+    """
+    if not text or text.count("\n") < head_lines + tail_lines:
+        return text
+
+    buffer = OutputBuffer(head_lines, tail_lines, spill_path)
+    try:
+        buffer.feed(text)
+        return buffer.getvalue()
+    finally:
+        buffer.close()
+
+
+def _descendants(pid: int) -> list[int]:
+    """PIDs of the children of ``pid``, recursively (Linux /proc; empty elsewhere)."""
+    children: dict[int, list[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                # The parent PID follows the parenthesized command name
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    found, pending = [], [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def _kill_process(process: asyncio.subprocess.Process):
+    """Kill a process and its children.
+
+    Commands share the terminal's session and process group (so sudo can
+    prompt), so the tree is walked instead of signalling a process group.
+    """
+    if process.returncode is not None:
+        return
+    if not hasattr(signal, "SIGKILL"):
+        process.kill()
+        return
+    # Collect the children before the shell dies and they are reparented
+    for pid in [process.pid, *_descendants(process.pid)]:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+async def _pump(
+    stream: asyncio.StreamReader,
+    name: str,
+    buffer: OutputBuffer,
+    on_line: LineCallback | None,
+):
+    while True:
+        try:
+            raw = await stream.readline()
+        except ValueError:
+            # Line longer than the reader limit: take what is buffered
+            raw = await stream.read(_READ_LIMIT)
+        if not raw:
+            break
+        line = raw.decode("utf-8", errors="replace")
+        buffer.append(line)
+        if on_line:
+            on_line(name, line.rstrip("\r\n"))
+
+
+async def stream_command(
+    command: str,
+    stdout: OutputBuffer,
+    stderr: OutputBuffer,
+    timeout: float | None = None,
+    on_line: LineCallback | None = None,
+) -> int:
+    """Run a shell command, streaming its output line by line.
+
+    Args:
+        command: Shell command to run (already validated by the caller)
+        stdout: Buffer receiving standard output
+        stderr: Buffer receiving standard error
+        timeout: Seconds before the command (and its children) are killed
+        on_line: Optional callback called with ("stdout"|"stderr", line)
+
+    Returns:
+        Process return code
+
+    Raises:
+        asyncio.TimeoutError: If the command exceeded ``timeout``
+    """
+    # shell=True semantics are required for pipes and redirects in plan steps.
+    # stdin and the controlling terminal are inherited, as with subprocess.run,
+    # so sudo can ask for a password and reuse the terminal's cached login.
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=_READ_LIMIT,
+    )
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                _pump(process.stdout, "stdout", stdout, on_line),
+                _pump(process.stderr, "stderr", stderr, on_line),
+                process.wait(),
+            ),
+            timeout=timeout,
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        _kill_process(process)
+        await process.wait()
+        raise
+    finally:
+        stdout.close()
+        stderr.close()
+
+    return process.returncode
+
+
+def run_streaming(
+    command: str,
+    stdout: OutputBuffer,
+    stderr: OutputBuffer,
+    timeout: float | None = None,
+    on_line: LineCallback | None = None,
+) -> int:
+    """Blocking wrapper around :func:`stream_command` for synchronous callers.
+
+    Works both with and without an event loop running in the current thread.
+    """
+    coro_args = (command, stdout, stderr, timeout, on_line)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(stream_command(*coro_args))
+
+    # Called from inside an event loop: run on a helper thread with its own loop
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(lambda: asyncio.run(stream_command(*coro_args))).result()
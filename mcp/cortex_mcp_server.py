@@ -22,6 +22,8 @@ except ImportError:
 
     sys.exit(1)
 
+from cortex.apt_index import get_apt_index
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("cortex-mcp")
 
@@ -166,7 +168,17 @@ class CortexMCPServer:
         result = await self._run_cortex(args)
         return {"mode": "dry_run" if dry_run else "execute", "request": request, **result}
 
+    def _index_search(self, query: str, limit: int) -> list[tuple[str, str]] | None:
+        apt_index = get_apt_index()
+        return apt_index.search(query, limit=limit) if apt_index.available else None
+
     async def _search_packages(self, query: str, limit: int = 10) -> dict:
+        # The first query may have to index the apt lists: keep the loop responsive
+        matches = await asyncio.to_thread(self._index_search, query, limit)
+        if matches is not None:
+            packages = [{"name": name, "description": desc} for name, desc in matches]
+            return {"query": query, "count": len(packages), "packages": packages}
+
         process = await asyncio.create_subprocess_exec(
             "apt-cache",
             "search",
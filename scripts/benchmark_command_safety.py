@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the command safety engine.
+
+Compares the per-command cost of validating large generated plans with the
+old per-rule loop (``re.search`` for every pattern) and with
+``cortex.command_safety.SafetyEngine`` (cold cache and warm cache).
+
+Usage:
+    python scripts/benchmark_command_safety.py
+    python scripts/benchmark_command_safety.py --commands 10000 --unique 0.5
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.command_safety import SafetyEngine  # noqa: E402
+from cortex.validators import DANGEROUS_PATTERNS  # noqa: E402
+
+TEMPLATES = [
+    "sudo apt-get update",
+    "sudo apt-get install -y {pkg}",
+    "sudo apt install -y --no-install-recommends {pkg} {pkg2}",
+    "pip3 install --upgrade {pkg}=={ver}",
+    "sudo systemctl enable --now {pkg}",
+    "curl -fsSL https://example.com/{pkg}.gpg | sudo gpg --dearmor -o /usr/share/keyrings/{pkg}.gpg",
+    'echo "deb [arch=amd64] https://example.com/{pkg} stable main" | sudo tee /etc/apt/sources.list.d/{pkg}.list',
+    "sudo usermod -aG {pkg} $USER",
+    "{pkg} --version",
+    "wget -q https://example.com/{pkg}-{ver}.tar.gz -O /tmp/{pkg}.tar.gz",
+    "sudo chmod 777 /opt/{pkg}",
+    "curl -sL https://example.com/install.sh | sudo bash",
+]
+
+PACKAGES = ["nginx", "docker.io", "postgresql", "redis", "nodejs", "python3-venv", "git", "cuda"]
+
+
+def make_plan(size: int, unique_ratio: float, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    distinct = max(1, int(size * unique_ratio))
+    pool = [
+        rng.choice(TEMPLATES).format(
+            pkg=rng.choice(PACKAGES) + (str(i) if i % 3 else ""),
+            pkg2=rng.choice(PACKAGES),
+            ver=f"{rng.randint(1, 9)}.{rng.randint(0, 20)}",
+        )
+        for i in range(distinct)
+    ]
+    return [pool[i % distinct] for i in range(size)]
+
+
+def loop_check(command: str) -> str | None:
+    for pattern in DANGEROUS_PATTERNS:
+        if re.search(pattern, command, re.IGNORECASE):
+            return pattern
+    return None
+
+
+def bench(label: str, check, plan: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for command in plan:
+            check(command)
+        best = min(best, time.perf_counter() - start)
+    per_command = best / len(plan) * 1e6
+    print(f"  {label:<28} {best * 1000:9.2f} ms total  {per_command:7.2f} us/command")
+    return per_command
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=10_000, help="Commands per plan")
+    parser.add_argument(
+        "--unique", type=float, default=0.3, help="Fraction of distinct command strings"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    plan = make_plan(args.commands, args.unique)
+    engine = SafetyEngine(DANGEROUS_PATTERNS)
+
+    # Both implementations must agree before timing them
+    mismatches = [cmd for cmd in plan if loop_check(cmd) != engine.check(cmd)]
+    if mismatches:
+        print(f"Verdict mismatch for {len(mismatches)} commands, e.g. {mismatches[0]!r}")
+        return 1
+
+    blocked = sum(1 for cmd in plan if engine.check(cmd))
+    print(
+        f"Plan: {len(plan)} commands, {len(set(plan))} distinct, {blocked} blocked, "
+        f"{len(DANGEROUS_PATTERNS)} rules"
+    )
+
+    baseline = bench("per-rule re.search loop", loop_check, plan, args.repeat)
+
+    def cold(command: str):
+        return engine._check(command)
+
+    uncached = bench("engine, no verdict cache", cold, plan, args.repeat)
+    engine.clear_cache()
+    cached = bench("engine, LRU verdict cache", engine.check, plan, args.repeat)
+
+    print(f"\nSpeedup: {baseline / uncached:.1f}x uncached, {baseline / cached:.1f}x cached")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ContextMemory.get_similar_interactions.
+
+Fills a context memory database with synthetic interactions, then
+compares the previous retrieval (one ``LIKE '%keyword%'`` scan per
+keyword, deduplicated by comparing entries) with the ranked FTS5 query.
+
+Usage:
+    python scripts/benchmark_context_memory_search.py
+    python scripts/benchmark_context_memory_search.py --entries 500000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.context_memory import ContextMemory  # noqa: E402
+
+WORDS = [f"lib{i}" for i in range(3000)] + [
+    "docker",
+    "nginx",
+    "postgresql",
+    "redis",
+    "python",
+    "development",
+    "server",
+    "database",
+    "container",
+]
+QUERIES = ["docker container", "set up nginx web server", "postgresql database for development"]
+
+
+def fill(memory: ContextMemory, entries: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    with memory._pool.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO memory_entries "
+            "(timestamp, category, context, action, result, success, confidence, frequency, metadata) "
+            "VALUES (?, 'package', ?, ?, ?, ?, 1.0, 1, ?)",
+            (
+                (
+                    (start + timedelta(minutes=10 * i)).isoformat(),
+                    "Install " + " ".join(rng.sample(WORDS, 4)),
+                    "install " + rng.choice(WORDS),
+                    "Success" if rng.random() < 0.9 else "E: Unable to locate package",
+                    rng.random() < 0.9,
+                    json.dumps({}),
+                )
+                for i in range(entries)
+            ),
+        )
+        conn.commit()
+
+
+def previous(memory: ContextMemory, context: str, limit: int):
+    """The retrieval before the FTS index, for comparison."""
+    with memory._pool.get_connection() as conn:
+        results = []
+        for keyword in memory._extract_keywords(context):
+            rows = conn.execute(
+                "SELECT * FROM memory_entries WHERE context LIKE ? OR action LIKE ? "
+                "ORDER BY timestamp DESC LIMIT ?",
+                (f"%{keyword}%", f"%{keyword}%", limit),
+            ).fetchall()
+            for row in rows:
+                entry = memory._row_to_memory_entry(row)
+                if entry not in results:
+                    results.append(entry)
+    return results[:limit]
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<24} {best * 1000:9.2f} ms")
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=100_000, help="Interactions in the DB")
+    parser.add_argument("--limit", type=int, default=50, help="Interactions returned")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = ContextMemory(str(Path(tmp) / "context_memory.db"))
+        fill(memory, args.entries)
+        print(f"Database: {args.entries} interactions")
+
+        for query in QUERIES:
+            print(f"\nSimilar to {query!r}:")
+            slow = bench(
+                "LIKE per keyword",
+                lambda q=query: previous(memory, q, args.limit),
+                args.repeat,
+            )
+            fast = bench(
+                "FTS5 bm25, ranked",
+                lambda q=query: memory.get_similar_interactions(q, args.limit),
+                args.repeat,
+            )
+            print(f"  speedup {slow / fast:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
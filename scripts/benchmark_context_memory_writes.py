@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ContextMemory.record_interaction as the memory grows.
+
+Records interactions into databases of increasing size and reports the
+time per insert, next to the 30-day ``GROUP BY action`` aggregate that
+every insert used to run for pattern detection.
+
+Usage:
+    python scripts/benchmark_context_memory_writes.py
+    python scripts/benchmark_context_memory_writes.py --sizes 1000 100000 500000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.context_memory import ContextMemory, MemoryEntry  # noqa: E402
+
+ACTIONS = [f"install lib{i}" for i in range(500)]
+
+
+def fill(memory: ContextMemory, entries: int, rng: random.Random):
+    """Entries spread over the last 30 days, as bulk rows (not via record_interaction)."""
+    now = datetime.now()
+    with memory._pool.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO memory_entries (timestamp, category, context, action, result, metadata) "
+            "VALUES (?, 'package', 'setup', ?, 'Success', '{}')",
+            (
+                (
+                    (now - timedelta(seconds=rng.randrange(30 * 86400))).isoformat(),
+                    rng.choice(ACTIONS),
+                )
+                for _ in range(entries)
+            ),
+        )
+        conn.commit()
+
+
+def previous_analysis(memory: ContextMemory):
+    """The aggregate each insert ran before the counters existed."""
+    with memory._pool.get_connection() as conn:
+        conn.execute(
+            "SELECT action, COUNT(*) as count FROM memory_entries "
+            "WHERE category = 'package' AND timestamp > datetime('now', '-30 days') "
+            "GROUP BY action HAVING count >= 3"
+        ).fetchall()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Memory sizes"
+    )
+    parser.add_argument("--inserts", type=int, default=200, help="Inserts measured per size")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'Entries':>10} {'insert':>12} {'old aggregate':>15}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = ContextMemory(str(Path(tmp) / "context_memory.db"))
+            fill(memory, size, rng)
+
+            start = time.perf_counter()
+            for _ in range(args.inserts):
+                memory.record_interaction(
+                    MemoryEntry(category="package", context="setup", action=rng.choice(ACTIONS))
+                )
+            insert = (time.perf_counter() - start) / args.inserts
+
+            start = time.perf_counter()
+            for _ in range(10):
+                previous_analysis(memory)
+            aggregate = (time.perf_counter() - start) / 10
+
+        print(f"{size:>10} {insert * 1000:>10.2f}ms {aggregate * 1000:>13.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the persistent dependency graph cache.
+
+Generates a synthetic apt package list and dpkg status file, then measures
+how long a fresh ``DependencyResolver`` (as created by every CLI run) takes
+to resolve a set of packages with an empty persistent cache (cold) and
+with the graphs persisted by an earlier run (warm).
+
+Usage:
+    python scripts/benchmark_dependency_cache.py
+    python scripts/benchmark_dependency_cache.py --packages 20000 --queries 200
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.apt_index import AptIndex  # noqa: E402
+from cortex.dependency_resolver import DependencyResolver  # noqa: E402
+from cortex.dpkg_status import DpkgStatus  # noqa: E402
+
+
+def write_system(root: Path, size: int, seed: int = 42) -> tuple[Path, Path]:
+    """Package list where package i depends on a few packages with higher numbers."""
+    rng = random.Random(seed)
+    lists = root / "lists"
+    lists.mkdir()
+    stanzas = []
+    for i in range(size):
+        count = min(rng.randint(0, 4), size - 1 - i)
+        deps = sorted(rng.sample(range(i + 1, size), count))
+        depends = ", ".join(f"pkg{d} (>= 1.0)" for d in deps)
+        stanza = f"Package: pkg{i}\nVersion: 1.{i}\nDescription: synthetic package {i}\n"
+        if depends:
+            stanza += f"Depends: {depends}\n"
+        stanzas.append(stanza)
+    (lists / "example.org_dists_stable_main_binary-amd64_Packages").write_text("\n".join(stanzas))
+
+    # The second half, which only the first half depends on, is installed
+    status = root / "status"
+    status.write_text(
+        "\n".join(
+            f"Package: pkg{i}\nStatus: install ok installed\nVersion: 1.{i}\n"
+            for i in range(size // 2, size)
+        )
+    )
+    return lists, status
+
+
+def run(label: str, make_resolver, names: list[str]) -> float:
+    start = time.perf_counter()
+    resolver = make_resolver()
+    for name in names:
+        resolver.resolve_dependencies(name)
+    elapsed = time.perf_counter() - start
+    per_package = elapsed / len(names) * 1000
+    print(f"  {label:<32} {elapsed * 1000:9.2f} ms total  {per_package:7.3f} ms/package")
+    return per_package
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packages", type=int, default=5000, help="Packages in the apt list")
+    parser.add_argument("--queries", type=int, default=100, help="Packages resolved per run")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        lists, status = write_system(root, args.packages)
+        cache_path = str(root / "cache.db")
+        names = [
+            f"pkg{i}"
+            for i in range(0, args.packages // 2, max(1, args.packages // 2 // args.queries))
+        ]
+        names = names[: args.queries]
+
+        # Build the apt index segments once so both runs measure resolution only
+        AptIndex(lists_dir=str(lists), index_dir=root / "index").refresh()
+
+        def make_resolver():
+            return DependencyResolver(
+                cache_path=cache_path,
+                apt_index=AptIndex(lists_dir=str(lists), index_dir=root / "index"),
+                dpkg_status=DpkgStatus(str(status)),
+            )
+
+        print(f"System: {args.packages} packages, {args.packages - args.packages // 2} installed")
+        print(f"Resolving {len(names)} packages with a new resolver per run")
+        cold = run("cold (empty persistent cache)", make_resolver, names)
+        warm = run("warm (graphs from earlier run)", make_resolver, names)
+
+    print(f"\nSpeedup: {cold / warm:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
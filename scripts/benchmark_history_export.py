@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark for exporting the installation history.
+
+Fills an installation database with synthetic records, then exports all
+of them the way ``export_history`` used to (load every record, then
+``json.dump``) and with the streaming exporter, reporting the time and
+the peak Python memory (tracemalloc) of each.
+
+Usage:
+    python scripts/benchmark_history_export.py
+    python scripts/benchmark_history_export.py --records 1000000 --format csv
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.installation_history import InstallationHistory  # noqa: E402
+
+
+def fill(history: InstallationHistory, records: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    with history._pool.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO installations (id, timestamp, operation_type, packages, status, "
+            "commands_executed, error_message, duration_seconds) "
+            "VALUES (?, ?, 'install', ?, ?, ?, ?, ?)",
+            (
+                (
+                    f"{i:016x}",
+                    (start + timedelta(seconds=90 * i)).isoformat(),
+                    json.dumps(packages),
+                    "failed" if failed else "success",
+                    json.dumps([f"sudo apt-get install -y {' '.join(packages)}"]),
+                    "E: Unable to locate package" if failed else None,
+                    rng.uniform(1, 120),
+                )
+                for i in range(records)
+                for packages in [[f"lib{rng.randrange(5000)}" for _ in range(rng.randint(1, 6))]]
+                for failed in [rng.random() < 0.1]
+            ),
+        )
+        conn.commit()
+
+
+def legacy_export(history: InstallationHistory, path: Path, limit: int) -> int:
+    """export_history before streaming, without its 1000-record cap."""
+    data = [
+        {
+            "id": r.id,
+            "timestamp": r.timestamp,
+            "operation": r.operation_type.value,
+            "packages": r.packages,
+            "status": r.status.value,
+            "duration": r.duration_seconds,
+            "error": r.error_message,
+        }
+        for r in history.get_history(limit=limit)
+    ]
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return len(data)
+
+
+def run(label: str, fn) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<30} {elapsed:7.2f} s  peak {peak / 1e6:8.1f} MB  ({count} records)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=100_000, help="Installations in the DB")
+    parser.add_argument("--format", default="ndjson", help="Streaming export format")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        history = InstallationHistory(str(root / "history.db"))
+        fill(history, args.records)
+        print(f"Database: {args.records} installations")
+
+        run(
+            "load all + json.dump",
+            lambda: legacy_export(history, root / "legacy.json", args.records),
+        )
+        run(
+            f"streaming {args.format}",
+            lambda: history.export_history(str(root / f"export.{args.format}"), args.format),
+        )
+        run(
+            f"streaming {args.format} + gzip",
+            lambda: history.export_history(str(root / f"export.{args.format}.gz"), args.format),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
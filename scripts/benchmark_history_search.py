@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark for package lookups in the transaction history.
+
+Fills a transaction database with synthetic records, then measures
+"which transactions touched package X" answered by scanning the JSON
+``packages`` column and by the normalized ``transaction_packages`` index,
+plus the time the online backfill of a pre-index database takes.
+
+Usage:
+    python scripts/benchmark_history_search.py
+    python scripts/benchmark_history_search.py --records 500000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.transaction_history import TransactionHistory  # noqa: E402
+from cortex.utils.package_index import PackageIndex  # noqa: E402
+
+PACKAGES = [f"lib{i}" for i in range(5000)] + ["nginx", "docker.io", "postgresql", "redis"]
+
+
+def fill(path: Path, records: int, seed: int = 42):
+    """Transactions table without the package index, as written by older versions."""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    TransactionHistory(path)  # current schema
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("DROP TABLE transaction_packages")
+        conn.execute("DROP TABLE index_backfills")
+        # Only the package index is measured here (see benchmark_history_text_search.py)
+        for trigger in ("before_insert", "after_insert", "after_update", "after_delete"):
+            conn.execute(f"DROP TRIGGER transactions_fts_{trigger}")
+        conn.execute("DROP TABLE transactions_fts")
+        conn.executemany(
+            "INSERT INTO transactions VALUES (?, 'install', ?, ?, 'completed', '{}', '{}', "
+            "'', 'root', 1.0, NULL, '[]', 1, NULL)",
+            (
+                (
+                    f"tx_{i:08d}",
+                    json.dumps(rng.sample(PACKAGES, rng.randint(1, 6))),
+                    (start + timedelta(seconds=90 * i)).isoformat(),
+                )
+                for i in range(records)
+            ),
+        )
+        conn.commit()
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<34} {best * 1000:9.2f} ms  ({len(result)} transactions)")
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=300_000, help="Transactions in the DB")
+    parser.add_argument("--package", default="nginx", help="Package to look up")
+    parser.add_argument("--limit", type=int, default=50, help="Transactions returned")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transactions.db"
+        fill(path, args.records)
+        print(f"Database: {args.records} transactions, {path.stat().st_size / 1e6:.1f} MB")
+
+        with closing(sqlite3.connect(path)) as conn:
+            index = PackageIndex("transaction_packages", source="transactions")
+            index.create(conn)
+            conn.commit()
+
+            def scan():
+                return conn.execute(
+                    "SELECT id FROM transactions WHERE packages LIKE ? "
+                    "ORDER BY timestamp DESC LIMIT ?",
+                    (f'%"{args.package}"%', args.limit),
+                ).fetchall()
+
+            def scan_all():
+                return conn.execute(
+                    "SELECT id FROM transactions WHERE packages LIKE ?", (f'%"{args.package}"%',)
+                ).fetchall()
+
+            print(f"\nLookup of {args.package!r}:")
+            scanned = bench(f"JSON LIKE scan, latest {args.limit}", scan, args.repeat)
+            scanned_all = bench("JSON LIKE scan, all", scan_all, args.repeat)
+
+            start = time.perf_counter()
+            while not index.backfill(conn, batch_size=1000):
+                pass
+            print(f"\nOnline backfill: {time.perf_counter() - start:.2f} s (1000 records/batch)\n")
+
+            def indexed():
+                return conn.execute(
+                    "SELECT t.id FROM transaction_packages p "
+                    "CROSS JOIN transactions t ON t.id = p.record_id WHERE p.package = ? "
+                    "ORDER BY p.timestamp DESC LIMIT ?",
+                    (args.package, args.limit),
+                ).fetchall()
+
+            def indexed_all():
+                return conn.execute(
+                    "SELECT record_id FROM transaction_packages WHERE package = ?",
+                    (args.package,),
+                ).fetchall()
+
+            fast = bench(f"package index, latest {args.limit}", indexed, args.repeat)
+            fast_all = bench("package index, all", indexed_all, args.repeat)
+
+    print(f"\nSpeedup: {scanned / fast:.0f}x latest, {scanned_all / fast_all:.0f}x all")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for per-package outcome statistics of the installation history.
+
+Fills an installation database with synthetic finished records, then
+measures the success rate and p50/p95 duration of one package computed
+from the raw rows and read from the aggregate tables maintained by
+``HistoryStats``, plus the cost the aggregates add to each write.
+
+Usage:
+    python scripts/benchmark_history_stats.py
+    python scripts/benchmark_history_stats.py --records 500000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.installation_history import InstallationHistory  # noqa: E402
+
+PACKAGES = [f"lib{i}" for i in range(2000)] + ["nginx", "docker.io", "postgresql", "redis"]
+
+
+def outcomes(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    for i in range(count):
+        packages = rng.sample(PACKAGES, rng.randint(1, 4))
+        if rng.random() < 0.05:
+            packages.append("nginx")
+        yield {
+            "id": f"inst_{i:08d}",
+            "packages": json.dumps(packages),
+            "commands_executed": json.dumps([f"sudo apt-get install -y {' '.join(packages)}"]),
+            "status": "success" if rng.random() < 0.9 else "failed",
+            "duration_seconds": rng.lognormvariate(3, 1),
+            "error_message": "E: Could not get lock /var/lib/dpkg/lock",
+        }
+
+
+def raw_stats(conn: sqlite3.Connection, package: str) -> tuple[float, float, float]:
+    """What a report computes without aggregates: scan, parse and sort."""
+    durations, successes = [], 0
+    for packages, status, duration in conn.execute(
+        "SELECT packages, status, duration_seconds FROM installations "
+        "WHERE status IN ('success', 'failed')"
+    ):
+        if package in json.loads(packages):
+            durations.append(duration)
+            successes += status == "success"
+    durations.sort()
+    return (
+        successes / len(durations),
+        durations[len(durations) // 2],
+        durations[int(len(durations) * 0.95)],
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=200_000, help="Installations in the DB")
+    parser.add_argument("--package", default="nginx", help="Package to report on")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "history.db"
+        history = InstallationHistory(str(path))
+
+        with closing(sqlite3.connect(path)) as conn:
+            start = time.perf_counter()
+            for row in outcomes(args.records):
+                conn.execute(
+                    "INSERT INTO installations (id, timestamp, operation_type, packages, status, "
+                    "commands_executed, error_message, duration_seconds) "
+                    "VALUES (:id, '2024-01-01', 'install', :packages, :status, "
+                    ":commands_executed, :error_message, :duration_seconds)",
+                    row,
+                )
+            conn.commit()
+            plain = time.perf_counter() - start
+
+            conn.execute("DELETE FROM installations")
+            conn.commit()
+            start = time.perf_counter()
+            for row in outcomes(args.records):
+                conn.execute(
+                    "INSERT INTO installations (id, timestamp, operation_type, packages, status, "
+                    "commands_executed, error_message, duration_seconds) "
+                    "VALUES (:id, '2024-01-01', 'install', :packages, :status, "
+                    ":commands_executed, :error_message, :duration_seconds)",
+                    row,
+                )
+                history.stats.record(conn, history._outcome(row))
+            conn.commit()
+            counted = time.perf_counter() - start
+            print(f"Database: {args.records} installations, {path.stat().st_size / 1e6:.1f} MB")
+            print(
+                f"Write cost of the aggregates: {(counted - plain) / args.records * 1e6:.0f} us "
+                "per installation"
+            )
+
+            best_raw = best_agg = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                rate, p50, p95 = raw_stats(conn, args.package)
+                best_raw = min(best_raw, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                stats = history.stats.get(conn, "package", args.package)
+                best_agg = min(best_agg, time.perf_counter() - start)
+
+        print(f"\nStatistics of {args.package!r}:")
+        print(f"  raw rows    {best_raw * 1000:9.2f} ms  {rate:.1%}, p50 {p50:.1f}s, p95 {p95:.1f}s")
+        print(
+            f"  aggregates  {best_agg * 1000:9.2f} ms  {stats.success_rate:.1%}, "
+            f"p50 <= {stats.p50_duration:.1f}s, p95 <= {stats.p95_duration:.1f}s"
+        )
+        print(f"\nSpeedup: {best_raw / best_agg:.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
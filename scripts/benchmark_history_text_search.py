@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark for full-text search of the transaction history.
+
+Fills a transaction database with synthetic commands and error messages
+(indexed by the FTS5 triggers as they are written), then measures
+``cortex history search`` style queries answered by ``LIKE`` scans of the
+text columns and by the ``transactions_fts`` index with bm25 ranking.
+
+Usage:
+    python scripts/benchmark_history_text_search.py
+    python scripts/benchmark_history_text_search.py --records 2000000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.transaction_history import TransactionHistory  # noqa: E402
+from cortex.utils.fts_index import fts_query  # noqa: E402
+
+PACKAGES = [f"lib{i}" for i in range(5000)] + ["nginx", "docker.io", "postgresql", "redis"]
+ERRORS = [
+    "E: Unable to locate package {pkg}",
+    "E: Could not get lock /var/lib/dpkg/lock-frontend",
+    "dpkg: error processing package {pkg} (--configure)",
+    "E: Sub-process /usr/bin/dpkg returned an error code (1)",
+    "Failed to fetch http://archive.ubuntu.com/ubuntu/pool/main/{pkg}.deb 404 Not Found",
+]
+
+
+def fill(path: Path, records: int, seed: int = 42) -> float:
+    """Write ``records`` transactions through the FTS triggers; returns the seconds taken."""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+
+    def rows():
+        for i in range(records):
+            packages = rng.sample(PACKAGES, rng.randint(1, 4))
+            error = None
+            if rng.random() < 0.1:
+                error = rng.choice(ERRORS).format(pkg=packages[0])
+            yield (
+                f"tx_{i:08d}",
+                json.dumps(packages),
+                (start + timedelta(seconds=90 * i)).isoformat(),
+                "failed" if error else "completed",
+                f"sudo apt-get install -y {' '.join(packages)}",
+                error,
+            )
+
+    began = time.perf_counter()
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executemany(
+            "INSERT INTO transactions VALUES (?, 'install', ?, ?, ?, '{}', '{}', "
+            "?, 'root', 1.0, ?, '[]', 1, NULL)",
+            rows(),
+        )
+        conn.commit()
+    return time.perf_counter() - began
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<28} {best * 1000:9.2f} ms  ({len(result)} results)")
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=1_000_000, help="Transactions in the DB")
+    parser.add_argument("--limit", type=int, default=20, help="Results per query")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "transactions.db"
+        history = TransactionHistory(path)
+        elapsed = fill(path, args.records)
+        print(
+            f"Database: {args.records} transactions, {path.stat().st_size / 1e6:.1f} MB, "
+            f"written in {elapsed:.1f} s with FTS triggers"
+        )
+
+        with closing(sqlite3.connect(path)) as conn:
+            for words in ("locate postgresql", "lock-frontend", "nginx"):
+                terms = words.split()
+
+                def scan(terms=terms):
+                    condition = " AND ".join(
+                        "(command LIKE ? OR error_message LIKE ?)" for _ in terms
+                    )
+                    params = [f"%{term}%" for term in terms for _ in range(2)]
+                    return conn.execute(
+                        f"SELECT id FROM transactions WHERE {condition} "
+                        "ORDER BY timestamp DESC LIMIT ?",
+                        (*params, args.limit),
+                    ).fetchall()
+
+                def search(words=words):
+                    return conn.execute(
+                        history.text_index.search_sql("t.id"), (fts_query(words), args.limit)
+                    ).fetchall()
+
+                print(f"\nQuery {words!r}:")
+                scanned = bench("LIKE scan", scan, args.repeat)
+                indexed = bench("FTS5 + bm25", search, args.repeat)
+                print(f"  speedup {scanned / indexed:.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
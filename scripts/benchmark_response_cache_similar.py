@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ResponseCache.get_similar.
+
+Fills a response cache with synthetic queries, then compares the previous
+lookup (word overlap against the 100 most used entries, scored in Python)
+with the IDF-weighted query over the inverted term index, and reports the
+cost the index adds to each put.
+
+Usage:
+    python scripts/benchmark_response_cache_similar.py
+    python scripts/benchmark_response_cache_similar.py --entries 500000
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.graceful_degradation import ResponseCache, query_terms  # noqa: E402
+
+WORDS = ["install", "setup", "configure", "remove", "update", "the", "for", "with", "server"]
+PACKAGES = [f"lib{i}" for i in range(5000)] + ["docker", "nginx", "postgresql", "redis"]
+QUERIES = ["install docker", "configure nginx web server", "setup postgresql for development"]
+
+
+def fill(cache: ResponseCache, entries: int, seed: int = 42):
+    """Bulk rows through SQL; the triggers and postings are filled alongside."""
+    rng = random.Random(seed)
+    with cache._pool.get_connection() as conn:
+        for i in range(entries):
+            query = " ".join(rng.sample(WORDS, 2) + rng.sample(PACKAGES, 2) + [str(i)])
+            query_hash = hashlib.sha256(query.encode()).hexdigest()
+            conn.execute(
+                "INSERT INTO response_cache (query_hash, query, response, hit_count) "
+                "VALUES (?, ?, 'sudo apt install ...', ?)",
+                (query_hash, query, rng.randrange(100)),
+            )
+            conn.executemany(
+                "INSERT INTO response_cache_terms VALUES (?, ?)",
+                [(term, query_hash) for term in query_terms(query)],
+            )
+        conn.commit()
+
+
+def previous(cache: ResponseCache, query: str, limit: int):
+    """The lookup before the term index, for comparison."""
+    keywords = set(query.lower().split())
+    results = []
+    with cache._pool.get_connection() as conn:
+        for (cached,) in conn.execute(
+            "SELECT query FROM response_cache ORDER BY hit_count DESC LIMIT 100"
+        ):
+            overlap = len(keywords & set(cached.lower().split()))
+            if overlap:
+                results.append((overlap, cached))
+    results.sort(reverse=True)
+    return results[:limit]
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<28} {best * 1000:9.2f} ms")
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=100_000, help="Cached responses")
+    parser.add_argument("--limit", type=int, default=5, help="Responses returned")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (best is kept)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(Path(tmp) / "response_cache.db")
+        fill(cache, args.entries)
+        print(f"Cache: {args.entries} entries")
+
+        start = time.perf_counter()
+        for i in range(200):
+            cache.put(f"install extra package {i}", "sudo apt install extra")
+        print(f"put with postings: {(time.perf_counter() - start) / 200 * 1000:.2f} ms")
+
+        for query in QUERIES:
+            print(f"\nSimilar to {query!r}:")
+            bench("overlap, top 100 by hits", lambda q=query: previous(cache, q, args.limit), 1)
+            bench(
+                "inverted index, IDF ranked",
+                lambda q=query: cache.get_similar(q, args.limit),
+                args.repeat,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark for concurrent writes to the transaction history.
+
+Runs begin/complete cycles from several threads against the pooled,
+WAL-mode ``TransactionHistory`` and against the previous storage (a new
+connection per operation on a rollback-journal database), and reports the
+transactions recorded per second. Package state capture is stubbed out so
+only the database work is measured.
+
+Usage:
+    python scripts/benchmark_transaction_history.py
+    python scripts/benchmark_transaction_history.py --threads 8 --transactions 200
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cortex.transaction_history import (  # noqa: E402
+    PackageState,
+    TransactionHistory,
+    TransactionType,
+)
+
+
+class PerOperationConnections:
+    """Connection source of the previous storage: one connection per operation."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    @contextmanager
+    def get_connection(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            yield conn
+
+
+def legacy_history(db_path: Path) -> TransactionHistory:
+    history = TransactionHistory(db_path)
+    history._pool.close_all()
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("PRAGMA journal_mode=DELETE")
+    history._pool = PerOperationConnections(db_path)
+    return history
+
+
+def run(label: str, history: TransactionHistory, threads: int, per_thread: int) -> float:
+    history._capture_package_state = lambda pkg: PackageState(name=pkg)
+    errors = []
+
+    def worker(n: int):
+        try:
+            for i in range(per_thread):
+                tx = history.begin_transaction(
+                    TransactionType.INSTALL, [f"pkg{n}-{i}", "libc6"], f"apt install pkg{n}-{i}"
+                )
+                history.complete_transaction(tx, success=True)
+        except Exception as e:  # noqa: BLE001 - reported below
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    rate = threads * per_thread / elapsed
+    print(f"  {label:<36} {elapsed * 1000:9.1f} ms  {rate:8.0f} transactions/s")
+    if errors:
+        print(f"    {len(errors)} threads failed, first error: {errors[0]}")
+    return rate
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent writers")
+    parser.add_argument("--transactions", type=int, default=100, help="Transactions per thread")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        print(f"{args.threads} threads x {args.transactions} transactions (begin + complete)")
+        legacy = run(
+            "per-operation connections, rollback",
+            legacy_history(root / "legacy.db"),
+            args.threads,
+            args.transactions,
+        )
+        pooled = run(
+            "pooled connections, WAL",
+            TransactionHistory(root / "pooled.db"),
+            args.threads,
+            args.transactions,
+        )
+
+    print(f"\nSpeedup: {pooled / legacy:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
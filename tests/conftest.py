@@ -3,6 +3,8 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import pytest
+
 """Pytest configuration.
 
 Some tests in this repository import implementation modules as if they were top-level
@@ -22,3 +24,17 @@ for path in (repo_root / "src", repo_root / "cortex"):
     path_str = str(path)
     if path.exists() and path_str not in sys.path:
         sys.path.insert(0, path_str)
+
+
+@pytest.fixture(autouse=True)
+def _no_background_apt(monkeypatch):
+    """Never start real apt-get processes from speculative prefetching in tests."""
+    monkeypatch.setattr("cortex.apt_prefetch._privilege_prefix", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_dependency_cache(monkeypatch, tmp_path):
+    """Keep the persistent dependency graph cache out of the user's home directory."""
+    monkeypatch.setattr(
+        "cortex.dependency_cache.default_cache_path", lambda: tmp_path / "dependency_cache.db"
+    )
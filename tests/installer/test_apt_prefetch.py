@@ -0,0 +1,122 @@
+"""Tests for speculative apt index refresh and package prefetch."""
+
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+from cortex.apt_prefetch import AptPrefetcher, install_commands
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses POSIX shell stubs")
+
+# Stub apt-get that records its arguments; "update" is slow so ordering is visible
+STUB_APT = """#!/bin/sh
+case "$1" in
+  update) sleep 0.3; echo "update" >> "$STUB_LOG";;
+  *) echo "$*" >> "$STUB_LOG";;
+esac
+exit 0
+"""
+
+
+@pytest.fixture
+def stub_apt(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "apt-get"
+    script.write_text(STUB_APT)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    log_file = tmp_path / "apt.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setenv("STUB_LOG", str(log_file))
+    # Undo the test-wide guard: run the stub without sudo
+    monkeypatch.setattr("cortex.apt_prefetch._privilege_prefix", lambda: [])
+    return log_file
+
+
+def lists_dir(tmp_path, age):
+    path = tmp_path / "lists"
+    path.mkdir(exist_ok=True)
+    index = path / "archive_ubuntu_jammy_main_binary-amd64_Packages"
+    index.write_text("")
+    mtime = time.time() - age
+    os.utime(index, (mtime, mtime))
+    return str(path)
+
+
+class TestInstallCommands:
+    def test_finds_installs_in_chained_steps(self):
+        found = install_commands(
+            [
+                "sudo apt update && sudo apt install -y nginx curl",
+                "sudo apt-get install --no-install-recommends git",
+                "sudo apt remove -y vim",
+                "curl -fsSL https://example.com | sh",
+            ]
+        )
+
+        assert [cmd.packages for cmd in found] == [["nginx", "curl"], ["git"]]
+
+
+class TestAptPrefetcher:
+    def test_nothing_runs_without_privileges(self, tmp_path):
+        prefetcher = AptPrefetcher(lists_dir=lists_dir(tmp_path, age=10**6))
+
+        assert not prefetcher.available
+        assert not prefetcher.refresh_index()
+        assert prefetcher.prefetch(["sudo apt install -y nginx"]) == []
+        prefetcher.wait()
+
+    def test_fresh_lists_are_not_refreshed(self, tmp_path, stub_apt):
+        prefetcher = AptPrefetcher(lists_dir=lists_dir(tmp_path, age=10), max_age=3600)
+
+        assert prefetcher.index_age() < 3600
+        assert not prefetcher.refresh_index()
+
+    def test_refresh_then_single_download(self, tmp_path, stub_apt):
+        prefetcher = AptPrefetcher(lists_dir=lists_dir(tmp_path, age=7200), max_age=3600)
+
+        assert prefetcher.refresh_index()
+        packages = prefetcher.prefetch(
+            ["sudo apt install -y nginx", "sudo apt-get install --no-install-recommends nginx git"]
+        )
+        prefetcher.wait()
+
+        assert packages == ["nginx", "git"]
+        lines = stub_apt.read_text().splitlines()
+        assert lines[0] == "update"
+        assert len(lines) == 2
+        assert lines[1].startswith("install")
+        assert "--download-only" in lines[1]
+        assert "--no-install-recommends" in lines[1]
+        assert lines[1].endswith("nginx git")
+
+    def test_plan_without_installs_is_ignored(self, tmp_path, stub_apt):
+        prefetcher = AptPrefetcher(lists_dir=lists_dir(tmp_path, age=10))
+
+        assert prefetcher.prefetch(["echo hello", "sudo apt update"]) == []
+        prefetcher.wait()
+        assert not stub_apt.exists()
+
+    def test_prefetch_does_not_wait_for_the_refresh(self, tmp_path, stub_apt):
+        """The interpreter can exit while the refresh runs; the download follows it."""
+        prefetcher = AptPrefetcher(lists_dir=lists_dir(tmp_path, age=7200), max_age=3600)
+        threads = threading.active_count()
+
+        assert prefetcher.refresh_index()
+        start = time.monotonic()
+        assert prefetcher.prefetch(["sudo apt install -y nginx"]) == ["nginx"]
+
+        assert time.monotonic() - start < 0.25
+        assert threading.active_count() == threads
+        # Not waited on: the detached shell starts the download after the refresh
+        deadline = time.monotonic() + 5
+        while len(stub_apt.read_text().splitlines() if stub_apt.exists() else []) < 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert stub_apt.read_text().splitlines()[0] == "update"
+        prefetcher.wait()
@@ -0,0 +1,182 @@
+"""Tests for the dpkg/apt lock-aware scheduler."""
+
+import asyncio
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from cortex.apt_scheduler import (
+    AptLockScheduler,
+    is_lock_error,
+    needs_dpkg_lock,
+    parse_apt_command,
+)
+from cortex.install_parallel import TaskStatus, run_parallel_install
+
+# Stub apt-get: downloads are slow but lock-free; installs take a mkdir-based
+# lock and fail like dpkg does when it is already held.
+STUB_APT = """#!/bin/sh
+echo "$*" >> "$STUB_LOG"
+case "$*" in
+  *--download-only*) sleep 0.4; exit 0;;
+esac
+if ! mkdir "$STUB_LOCK" 2>/dev/null; then
+  echo "CONFLICT" >> "$STUB_LOG"
+  echo "E: Could not get lock /var/lib/dpkg/lock-frontend. It is held by process 1234" >&2
+  exit 100
+fi
+sleep 0.05
+rmdir "$STUB_LOCK"
+echo "Setting up $*"
+exit 0
+"""
+
+
+@pytest.fixture
+def stub_apt(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name in ("apt-get", "apt"):
+        script = bin_dir / name
+        script.write_text(STUB_APT)
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    sudo = bin_dir / "sudo"
+    sudo.write_text('#!/bin/sh\nexec "$@"\n')
+    sudo.chmod(sudo.stat().st_mode | stat.S_IEXEC)
+
+    log_file = tmp_path / "apt.log"
+    lock_dir = tmp_path / "dpkg.lock"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setenv("STUB_LOG", str(log_file))
+    monkeypatch.setenv("STUB_LOCK", str(lock_dir))
+    return {"log": log_file, "lock": lock_dir, "cache": tmp_path / "cache"}
+
+
+class TestAptCommandParsing:
+    def test_parse_simple_install(self):
+        cmd = parse_apt_command("sudo apt-get install -y nginx curl")
+        assert cmd is not None
+        assert cmd.sudo
+        assert cmd.tool == "apt-get"
+        assert cmd.action == "install"
+        assert cmd.packages == ["nginx", "curl"]
+        assert cmd.options == ["-y"]
+
+    def test_parse_options_before_action(self):
+        cmd = parse_apt_command("apt -o Dpkg::Options::=--force-confold -y install vim")
+        assert cmd is not None
+        assert cmd.action == "install"
+        assert cmd.packages == ["vim"]
+        assert cmd.options == ["-o", "Dpkg::Options::=--force-confold", "-y"]
+
+    def test_compound_commands_are_not_parsed(self):
+        assert parse_apt_command("apt-get update && apt-get install -y nginx") is None
+        assert parse_apt_command("apt-get install -y $(cat pkgs.txt)") is None
+        assert parse_apt_command("pip install requests") is None
+
+    def test_round_trip(self):
+        cmd = parse_apt_command("sudo apt install -y nginx")
+        assert parse_apt_command(cmd.to_command()) == cmd
+
+    def test_needs_dpkg_lock(self):
+        assert needs_dpkg_lock("sudo apt install -y nginx")
+        assert needs_dpkg_lock("apt-get -y remove nginx")
+        assert needs_dpkg_lock("apt-get update && apt-get install -y nginx")
+        assert needs_dpkg_lock("sudo dpkg -i package.deb")
+        assert not needs_dpkg_lock("apt-cache search nginx")
+        assert not needs_dpkg_lock("apt list --installed")
+        assert not needs_dpkg_lock("pip install requests")
+
+    def test_is_lock_error(self):
+        assert is_lock_error("E: Could not get lock /var/lib/dpkg/lock-frontend")
+        assert is_lock_error("E: Unable to acquire the dpkg frontend lock")
+        assert not is_lock_error("E: Unable to locate package foo")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="stub apt uses a POSIX shell script")
+class TestAptLockScheduler:
+    def test_parallel_apt_steps_do_not_collide(self, stub_apt):
+        async def run_test():
+            commands = [
+                "apt-get install -y pkg-a",
+                "apt-get install -y pkg-b",
+                "apt-get install -y pkg-c",
+            ]
+            scheduler = AptLockScheduler(cache_root=stub_apt["cache"], lock_wait=0.05)
+
+            start = time.time()
+            success, tasks = await run_parallel_install(
+                commands, timeout=10, apt_scheduler=scheduler
+            )
+            elapsed = time.time() - start
+
+            assert success
+            assert all(t.status == TaskStatus.SUCCESS for t in tasks)
+
+            log = stub_apt["log"].read_text()
+            assert "CONFLICT" not in log
+            assert log.count("--download-only") == 3
+            assert log.count("Dir::Cache::Archives=") == 6
+            # Three 0.4s downloads ran concurrently rather than back to back
+            assert elapsed < 1.1, f"apt prefetch took {elapsed}s, expected concurrency"
+
+        asyncio.run(run_test())
+
+    def test_waits_for_external_lock_holder(self, stub_apt):
+        async def run_test():
+            stub_apt["lock"].mkdir()
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.3, stub_apt["lock"].rmdir)
+
+            scheduler = AptLockScheduler(
+                cache_root=stub_apt["cache"], lock_wait=0.1, prefetch=False
+            )
+            success, tasks = await run_parallel_install(
+                ["sudo apt install -y pkg-a"], timeout=10, apt_scheduler=scheduler
+            )
+
+            assert success
+            assert tasks[0].status == TaskStatus.SUCCESS
+            assert "CONFLICT" in stub_apt["log"].read_text()
+
+        asyncio.run(run_test())
+
+    def test_gives_up_after_lock_retries(self, stub_apt):
+        async def run_test():
+            stub_apt["lock"].mkdir()
+            scheduler = AptLockScheduler(
+                cache_root=stub_apt["cache"], lock_retries=2, lock_wait=0.01, prefetch=False
+            )
+            success, tasks = await run_parallel_install(
+                ["apt-get install -y pkg-a"], timeout=10, apt_scheduler=scheduler
+            )
+
+            assert not success
+            assert tasks[0].status == TaskStatus.FAILED
+            assert "Could not get lock" in tasks[0].error
+            assert stub_apt["log"].read_text().count("CONFLICT") == 3
+
+        asyncio.run(run_test())
+
+    def test_non_apt_steps_run_alongside_apt(self, stub_apt):
+        async def run_test():
+            commands = [
+                "apt-get install -y pkg-a",
+                "python -c \"import time; time.sleep(0.3); print('side job')\"",
+            ]
+            scheduler = AptLockScheduler(cache_root=stub_apt["cache"], lock_wait=0.05)
+
+            start = time.time()
+            success, tasks = await run_parallel_install(
+                commands, timeout=10, apt_scheduler=scheduler
+            )
+            elapsed = time.time() - start
+
+            assert success
+            assert "side job" in tasks[1].output
+            assert elapsed < 0.8
+
+        asyncio.run(run_test())
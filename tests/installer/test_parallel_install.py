@@ -1,6 +1,7 @@
 """Tests for parallel installation execution."""
 
 import asyncio
+import os
 import time
 
 import pytest
@@ -8,6 +9,16 @@ import pytest
 from cortex.install_parallel import TaskStatus, run_parallel_install
 
 
+def _process_alive(pid: int) -> bool:
+    """True if pid exists and is not a zombie waiting to be reaped."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            state = f.read().rsplit(")", 1)[1].split()[0]
+    except FileNotFoundError:
+        return False
+    return state != "Z"
+
+
 class TestParallelExecution:
     """Test parallel execution of installation tasks."""
 
@@ -296,3 +307,103 @@ class TestParallelExecutionIntegration:
             assert tasks[2].status == TaskStatus.SUCCESS
 
         asyncio.run(run_test())
+
+    def test_line_callback_streams_output(self):
+        """Verify that output lines are streamed when a line callback is given."""
+
+        async def run_test():
+            commands = ["python -c \"print('first'); print('second')\""]
+            lines = []
+
+            success, tasks = await run_parallel_install(
+                commands,
+                timeout=10,
+                line_callback=lambda task, stream, line: lines.append((task.name, stream, line)),
+            )
+
+            assert success
+            assert ("Task 1", "stdout", "first") in lines
+            assert ("Task 1", "stdout", "second") in lines
+            assert "second" in tasks[0].output
+
+        asyncio.run(run_test())
+
+    def test_max_concurrency_limits_running_tasks(self):
+        """Verify that no more than max_concurrency tasks overlap."""
+
+        async def run_test():
+            commands = ['python -c "import time; time.sleep(0.2)"'] * 4
+
+            success, tasks = await run_parallel_install(commands, timeout=10, max_concurrency=2)
+
+            assert success
+            # Count tasks running at the moment each task started
+            for task in tasks:
+                running = [t for t in tasks if t.start_time <= task.start_time < t.end_time]
+                assert len(running) <= 2
+
+        asyncio.run(run_test())
+
+    def test_invalid_max_concurrency_raises_error(self):
+        async def run_test():
+            with pytest.raises(ValueError):
+                await run_parallel_install(["echo hi"], max_concurrency=0)
+
+        asyncio.run(run_test())
+
+    def test_failure_skips_transitive_dependents(self):
+        """Verify that a failure skips the whole dependent chain."""
+
+        async def run_test():
+            commands = ['python -c "exit(1)"', "echo b", "echo c", "echo d"]
+            dependencies = {1: [0], 2: [1], 3: []}
+
+            success, tasks = await run_parallel_install(
+                commands, dependencies=dependencies, timeout=10
+            )
+
+            assert not success
+            assert tasks[1].status == TaskStatus.SKIPPED
+            assert tasks[2].status == TaskStatus.SKIPPED
+            assert tasks[3].status == TaskStatus.SUCCESS
+
+        asyncio.run(run_test())
+
+    def test_dependency_cycle_is_skipped(self):
+        """Verify that tasks in a dependency cycle are skipped instead of hanging."""
+
+        async def run_test():
+            commands = ["echo a", "echo b", "echo c"]
+            dependencies = {0: [1], 1: [0], 2: []}
+
+            success, tasks = await run_parallel_install(
+                commands, dependencies=dependencies, timeout=10
+            )
+
+            assert not success
+            assert tasks[0].status == TaskStatus.SKIPPED
+            assert tasks[1].status == TaskStatus.SKIPPED
+            assert tasks[2].status == TaskStatus.SUCCESS
+
+        asyncio.run(run_test())
+
+    @pytest.mark.skipif(not os.path.isdir("/proc"), reason="requires /proc")
+    def test_timeout_kills_process(self, tmp_path):
+        """Verify that a timed out command's process is killed."""
+
+        async def run_test():
+            pid_file = tmp_path / "pid"
+            command = (
+                f"python -c \"import os, time; open(r'{pid_file}', 'w').write(str(os.getpid())); "
+                'time.sleep(30)"'
+            )
+
+            success, tasks = await run_parallel_install([command], timeout=1)
+
+            assert not success
+            assert "timed out" in tasks[0].error
+            pid = int(pid_file.read_text())
+            await asyncio.sleep(0.1)
+            assert not _process_alive(pid)
+
+        asyncio.run(run_test())
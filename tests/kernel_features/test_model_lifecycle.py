@@ -1,4 +1,4 @@
-from cortex.kernel_features.model_lifecycle import ModelConfig
+from cortex.kernel_features.model_lifecycle import ModelConfig, ModelDatabase
 
 
 def test_model_config_defaults():
@@ -13,3 +13,21 @@ def test_config_roundtrip():
     restored = ModelConfig.from_dict(data)
     assert restored.name == cfg.name
     assert restored.backend == cfg.backend
+
+
+def test_model_database_roundtrip(tmp_path):
+    db = ModelDatabase(tmp_path / "models.db")
+    db.save_model(ModelConfig("llama", "/models/llama", port=8001))
+
+    assert db.get_model("llama").port == 8001
+    assert [cfg.name for cfg in ModelDatabase(tmp_path / "models.db").list_models()] == ["llama"]
+    db.delete_model("llama")
+    assert db.get_model("llama") is None
+
+
+def test_model_database_uses_wal(tmp_path):
+    db = ModelDatabase(tmp_path / "models.db")
+
+    with db._pool.get_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(ModelDatabase.MIGRATIONS)
@@ -0,0 +1,209 @@
+"""Tests for the memory-mapped apt package list index."""
+
+import gzip
+import lzma
+import os
+
+import pytest
+
+from cortex.apt_index import AptIndex, compare_versions
+from cortex.dependency_resolver import DependencyResolver
+
+MAIN = """\
+Package: nginx
+Architecture: amd64
+Version: 1.22.1-9
+Depends: nginx-common (= 1.22.1-9), libc6 (>= 2.34) | libc6-udeb
+Recommends: ssl-cert
+Description: small, powerful, scalable web/proxy server
+ Nginx ("engine X") is a high-performance web and reverse proxy server.
+Description-md5: 04f6a2a1d1d8f1cce7a19a2b0f1d9c2f
+
+Package: postfix
+Architecture: amd64
+Version: 3.7.6-0+deb12u2
+Provides: mail-transport-agent, default-mta
+Description: High-performance mail transport agent
+
+Package: exim4-daemon-light
+Architecture: amd64
+Version: 4.96-15
+Provides: mail-transport-agent
+Description: lightweight Exim MTA (v4) daemon
+"""
+
+UPDATES = """\
+Package: nginx
+Architecture: amd64
+Version: 1.22.1-9+deb12u1
+Pre-Depends: init-system-helpers (>= 1.54~)
+Depends: nginx-common (= 1.22.1-9+deb12u1)
+Description: small, powerful, scalable web/proxy server
+
+Package: apache2
+Architecture: amd64
+Version: 2.4.62-1
+Description: Apache HTTP Server
+"""
+
+
+@pytest.fixture
+def lists_dir(tmp_path):
+    path = tmp_path / "lists"
+    path.mkdir()
+    (path / "deb.debian.org_debian_dists_bookworm_main_binary-amd64_Packages").write_text(MAIN)
+    with gzip.open(
+        path / "deb.debian.org_debian_dists_bookworm-updates_main_binary-amd64_Packages.gz", "wt"
+    ) as f:
+        f.write(UPDATES)
+    # Not a Packages list
+    (path / "deb.debian.org_debian_dists_bookworm_InRelease").write_text("Origin: Debian\n")
+    return path
+
+
+@pytest.fixture
+def index(lists_dir, tmp_path):
+    return AptIndex(lists_dir=str(lists_dir), index_dir=tmp_path / "index", check_interval=0)
+
+
+class TestCompareVersions:
+    @pytest.mark.parametrize(
+        "older,newer",
+        [
+            ("1.0", "1.1"),
+            ("1.9", "1.10"),
+            ("1.0~rc1", "1.0"),
+            ("1.22.1-9", "1.22.1-9+deb12u1"),
+            ("9.0", "1:1.0"),
+            ("1.0-1", "1.0-1ubuntu1"),
+            ("2.30", "2.30a"),
+        ],
+    )
+    def test_order(self, older, newer):
+        assert compare_versions(older, newer) < 0
+        assert compare_versions(newer, older) > 0
+
+    def test_equal(self):
+        assert compare_versions("1.0-1", "0:1.0-1") == 0
+        assert compare_versions("1.01", "1.1") == 0
+
+
+class TestAptIndex:
+    def test_get_returns_newest_version(self, index):
+        nginx = index.get("nginx")
+
+        assert nginx.version == "1.22.1-9+deb12u1"
+        assert nginx.depends == ("init-system-helpers", "nginx-common")
+        assert [pkg.version for pkg in index.versions("nginx")] == [
+            "1.22.1-9+deb12u1",
+            "1.22.1-9",
+        ]
+        assert index.versions("nginx")[1].recommends == ("ssl-cert",)
+        assert index.get("missing") is None
+
+    def test_providers(self, index):
+        assert index.providers("mail-transport-agent") == ["exim4-daemon-light", "postfix"]
+        assert index.providers("nginx") == []
+
+    def test_search(self, index):
+        assert index.search("WEB server") == [
+            ("nginx", "small, powerful, scalable web/proxy server")
+        ]
+        assert [name for name, _ in index.search("transport")] == ["postfix"]
+        assert [name for name, _ in index.search("a", limit=2)] == ["apache2", "exim4-daemon-light"]
+        assert index.search("  ") == []
+
+    def test_segments_are_reused(self, index, lists_dir, tmp_path):
+        assert index.refresh() == 2
+        assert index.refresh() == 0
+        reopened = AptIndex(lists_dir=str(lists_dir), index_dir=tmp_path / "index")
+
+        assert reopened.refresh() == 0
+        assert reopened.get("apache2").version == "2.4.62-1"
+
+    def test_only_changed_lists_are_rebuilt(self, index, lists_dir):
+        index.refresh()
+        main = lists_dir / "deb.debian.org_debian_dists_bookworm_main_binary-amd64_Packages"
+        main.write_text(MAIN + "\nPackage: git\nVersion: 1:2.39.5-0+deb12u1\nDescription: vcs\n")
+        stat = main.stat()
+        os.utime(main, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert index.refresh() == 1
+        assert index.get("git").version == "1:2.39.5-0+deb12u1"
+
+    def test_readers_keep_replaced_segments(self, index, lists_dir):
+        index.refresh()
+        segments = index._current_segments()
+        main = lists_dir / "deb.debian.org_debian_dists_bookworm_main_binary-amd64_Packages"
+        main.write_text(MAIN + "\nPackage: git\nVersion: 1:2.39.5-0+deb12u1\nDescription: vcs\n")
+        stat = main.stat()
+        os.utime(main, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        next(lists_dir.glob("*.gz")).unlink()
+
+        assert index.refresh() == 1
+        # A reader that took the segments before the refresh can still use them
+        assert sorted(p.version for s in segments for p in s.get("nginx")) == [
+            "1.22.1-9",
+            "1.22.1-9+deb12u1",
+        ]
+        assert index.get("git") is not None
+        assert index.get("apache2") is None
+
+    def test_removed_lists_are_dropped(self, index, lists_dir, tmp_path):
+        index.refresh()
+        for path in lists_dir.glob("*.gz"):
+            path.unlink()
+
+        index.refresh()
+        assert index.get("apache2") is None
+        assert len(list((tmp_path / "index").iterdir())) == 1
+
+    def test_xz_lists(self, tmp_path):
+        lists = tmp_path / "xz"
+        lists.mkdir()
+        with lzma.open(lists / "example.org_dists_stable_main_binary-amd64_Packages.xz", "wt") as f:
+            f.write(UPDATES)
+
+        index = AptIndex(lists_dir=str(lists), index_dir=tmp_path / "xz-index")
+        assert index.get("apache2").description == "Apache HTTP Server"
+
+    def test_corrupt_segment_is_rebuilt(self, index, lists_dir, tmp_path):
+        index.refresh()
+        for segment in (tmp_path / "index").iterdir():
+            segment.write_bytes(b"garbage")
+
+        reopened = AptIndex(lists_dir=str(lists_dir), index_dir=tmp_path / "index")
+        assert reopened.refresh() == 2
+        assert reopened.get("postfix") is not None
+
+    def test_no_lists(self, tmp_path):
+        index = AptIndex(lists_dir=str(tmp_path / "missing"), index_dir=tmp_path / "index")
+
+        assert not index.available
+        assert index.get("nginx") is None
+        assert index.search("nginx") == []
+
+
+class TestDependencyResolver:
+    def test_dependencies_come_from_the_index(self, index, monkeypatch):
+        monkeypatch.setattr("cortex.dependency_resolver.get_apt_index", lambda: index)
+        resolver = DependencyResolver()
+        resolver.installed_packages = set()
+
+        with monkeypatch.context() as m:
+            m.setattr("subprocess.run", lambda *a, **k: pytest.fail("apt-cache was run"))
+            deps = resolver.get_apt_dependencies("nginx")
+
+        assert [(dep.name, dep.reason) for dep in deps] == [
+            ("init-system-helpers", "Required dependency"),
+            ("nginx-common", "Required dependency"),
+        ]
+
+    def test_virtual_dependencies_resolve_to_a_provider(self, index, monkeypatch):
+        monkeypatch.setattr("cortex.dependency_resolver.get_apt_index", lambda: index)
+        resolver = DependencyResolver()
+        resolver.installed_packages = {"postfix"}
+
+        assert resolver._concrete_package(index, "mail-transport-agent") == "postfix"
+        resolver.installed_packages = set()
+        assert resolver._concrete_package(index, "mail-transport-agent") == "exim4-daemon-light"
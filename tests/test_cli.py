@@ -102,6 +102,23 @@ class TestCortexCLI(unittest.TestCase):
         self.assertEqual(result, 0)
         mock_interpreter.parse.assert_called_once_with("install docker")
 
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test-openai-key-123"}, clear=True)
+    @patch("cortex.cli.AptPrefetcher")
+    @patch("cortex.cli.CommandInterpreter")
+    def test_install_dry_run_prefetches_packages(self, mock_interpreter_class, mock_prefetcher):
+        mock_interpreter = Mock()
+        mock_interpreter.parse.return_value = ["apt update", "apt install docker"]
+        mock_interpreter_class.return_value = mock_interpreter
+        prefetcher = mock_prefetcher.return_value
+        prefetcher.prefetch.return_value = ["docker"]
+
+        result = self.cli.install("docker", dry_run=True)
+
+        self.assertEqual(result, 0)
+        prefetcher.refresh_index.assert_called_once()
+        prefetcher.prefetch.assert_called_once_with(["apt update", "apt install docker"])
+        prefetcher.wait.assert_not_called()
+
     @patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test-openai-key-123"}, clear=True)
     @patch("cortex.cli.CommandInterpreter")
     def test_install_no_execute(self, mock_interpreter_class):
@@ -134,6 +151,14 @@ class TestCortexCLI(unittest.TestCase):
         self.assertEqual(result, 0)
         mock_coordinator.execute.assert_called_once()
 
+    @patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test-openai-key-123"}, clear=True)
+    @patch("cortex.cli.CommandInterpreter")
+    def test_install_pipeline_requires_execute(self, mock_interpreter_class):
+        self.assertEqual(self.cli.install("docker", pipeline=True), 1)
+        self.assertEqual(self.cli.install("docker", dry_run=True, pipeline=True), 1)
+        self.assertEqual(self.cli.install("docker", execute=True, parallel=True, pipeline=True), 1)
+        mock_interpreter_class.assert_not_called()
+
     @patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test-openai-key-123"}, clear=True)
     @patch("cortex.cli.CommandInterpreter")
     @patch("cortex.cli.InstallationCoordinator")
@@ -210,7 +235,9 @@ class TestCortexCLI(unittest.TestCase):
         mock_install.return_value = 0
         result = main()
         self.assertEqual(result, 0)
-        mock_install.assert_called_once_with("docker", execute=False, dry_run=False, parallel=False)
+        mock_install.assert_called_once_with(
+            "docker", execute=False, dry_run=False, parallel=False, pipeline=False
+        )
 
     @patch("sys.argv", ["cortex", "install", "docker", "--execute"])
     @patch("cortex.cli.CortexCLI.install")
@@ -218,7 +245,9 @@ class TestCortexCLI(unittest.TestCase):
         mock_install.return_value = 0
         result = main()
         self.assertEqual(result, 0)
-        mock_install.assert_called_once_with("docker", execute=True, dry_run=False, parallel=False)
+        mock_install.assert_called_once_with(
+            "docker", execute=True, dry_run=False, parallel=False, pipeline=False
+        )
 
     @patch("sys.argv", ["cortex", "install", "docker", "--dry-run"])
     @patch("cortex.cli.CortexCLI.install")
@@ -226,7 +255,142 @@ class TestCortexCLI(unittest.TestCase):
         mock_install.return_value = 0
         result = main()
         self.assertEqual(result, 0)
-        mock_install.assert_called_once_with("docker", execute=False, dry_run=True, parallel=False)
+        mock_install.assert_called_once_with(
+            "docker", execute=False, dry_run=True, parallel=False, pipeline=False
+        )
+
+    @patch("sys.argv", ["cortex", "install", "--resume", "abc123", "--skip-verify"])
+    @patch("cortex.cli.CortexCLI.resume_install")
+    def test_main_install_resume(self, mock_resume):
+        mock_resume.return_value = 0
+        result = main()
+        self.assertEqual(result, 0)
+        mock_resume.assert_called_once_with("abc123", verify=False)
+
+    @patch("cortex.cli.InstallationHistory")
+    def test_history_shows_timing(self, mock_history_class):
+        from cortex.installation_history import InstallationStatus, InstallationType
+        from cortex.timing_analysis import analyze_timing
+
+        mock_history = mock_history_class.return_value
+        mock_history.get_installation.return_value = Mock(
+            id="abc123",
+            timestamp="2024-01-01T00:00:00",
+            operation_type=InstallationType.INSTALL,
+            status=InstallationStatus.SUCCESS,
+            duration_seconds=3.0,
+            packages=["nginx"],
+            error_message=None,
+            commands_executed=[],
+            rollback_available=True,
+        )
+        mock_history.get_timing.return_value = analyze_timing(
+            [("Step 1", "update", "success", 0.0, 1.0), ("Step 2", "install", "success", 2.0, 3.0)],
+            {"Step 2": ["Step 1"]},
+        ).to_dict()
+
+        with patch("builtins.print") as mock_print:
+            result = self.cli.history(show_id="abc123", timing=True)
+
+        self.assertEqual(result, 0)
+        output = "\n".join(str(call.args[0]) for call in mock_print.call_args_list if call.args)
+        self.assertIn("Critical path (2.00s)", output)
+        self.assertIn("Idle gaps", output)
+        mock_history.get_timing.assert_called_once_with("abc123")
+
+    @patch("sys.argv", ["cortex", "history", "search", "unable", "to", "locate", "--limit", "5"])
+    @patch("cortex.cli.CortexCLI.history_search")
+    def test_main_history_search(self, mock_search):
+        mock_search.return_value = 0
+        result = main()
+        self.assertEqual(result, 0)
+        mock_search.assert_called_once_with("unable to locate", limit=5, sources=None)
+
+    @patch("sys.argv", ["cortex", "history", "search", "--fix-broken", "--limit", "5"])
+    @patch("cortex.cli.CortexCLI.history_search")
+    def test_main_history_search_dashed_query(self, mock_search):
+        mock_search.return_value = 0
+        result = main()
+        self.assertEqual(result, 0)
+        mock_search.assert_called_once_with("--fix-broken", limit=5, sources=None)
+
+    @patch("sys.argv", ["cortex", "history", "abc123", "--timing"])
+    @patch("cortex.cli.CortexCLI.history")
+    def test_main_history_show_shorthand(self, mock_history):
+        mock_history.return_value = 0
+        result = main()
+        self.assertEqual(result, 0)
+        mock_history.assert_called_once_with(show_id="abc123", timing=True)
+
+    @patch("sys.argv", ["cortex", "history", "abc123", "junk"])
+    @patch("cortex.cli.CortexCLI.history")
+    def test_main_history_rejects_extra_arguments(self, mock_history):
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            main()
+        mock_history.assert_not_called()
+
+    @patch(
+        "sys.argv",
+        ["cortex", "history", "export", "out.csv.gz", "--format", "csv", "--status", "failed"],
+    )
+    @patch("cortex.cli.CortexCLI.history_export")
+    def test_main_history_export(self, mock_export):
+        mock_export.return_value = 0
+        result = main()
+        self.assertEqual(result, 0)
+        mock_export.assert_called_once_with(
+            "out.csv.gz", format="csv", status="failed", since=None, until=None, compression=None
+        )
+
+    @patch("sys.argv", ["cortex", "history", "stats", "--package", "nginx"])
+    @patch("cortex.cli.CortexCLI.history_stats")
+    def test_main_history_stats(self, mock_stats):
+        mock_stats.return_value = 0
+        result = main()
+        self.assertEqual(result, 0)
+        mock_stats.assert_called_once_with(limit=20, package="nginx")
+
+    @patch("cortex.cli.InstallationHistory")
+    def test_history_stats_reads_aggregates(self, mock_history_class):
+        from cortex.utils.history_stats import KeyStats
+
+        def outcome_stats(kind="package", limit=20, key=None):
+            if kind == "all":
+                return [KeyStats("all", "*", 4, 3, 12.0, 40.0)]
+            return [KeyStats(kind, "nginx", 4, 3, 12.0, 40.0, {"lock_error": 1})]
+
+        mock_history_class.return_value.get_outcome_stats.side_effect = outcome_stats
+
+        with patch("builtins.print") as mock_print:
+            result = self.cli.history_stats()
+
+        self.assertEqual(result, 0)
+        output = "\n".join(str(call.args[0]) for call in mock_print.call_args_list if call.args)
+        self.assertIn("4 installations, 75% successful, p50 12.0s, p95 40.0s", output)
+        self.assertIn("lock_error 1", output)
+
+    @patch("cortex.history_search.search_history")
+    def test_history_search_prints_snippets(self, mock_search):
+        from cortex.utils.fts_index import SearchHit
+
+        mock_search.return_value = [
+            SearchHit(
+                source="installations",
+                record_id="abc123",
+                timestamp="2024-01-01T00:00:00",
+                summary="install nginx",
+                snippet="E: [Unable] to locate package",
+                score=-1.5,
+            )
+        ]
+
+        with patch("builtins.print") as mock_print:
+            result = self.cli.history_search("unable")
+
+        self.assertEqual(result, 0)
+        output = "\n".join(str(call.args[0]) for call in mock_print.call_args_list if call.args)
+        self.assertIn("abc123", output)
+        self.assertIn("[Unable] to locate", output)
 
     def test_spinner_animation(self):
         initial_idx = self.cli.spinner_idx
@@ -0,0 +1,146 @@
+"""Tests for the shared command safety engine."""
+
+import re
+
+import pytest
+
+from cortex.command_safety import SafetyEngine, check_command, required_literal
+from cortex.validators import DANGEROUS_PATTERNS
+
+
+def loop_check(patterns, command):
+    """Reference implementation: the per-rule loop the engine replaces."""
+    for pattern in patterns:
+        if re.search(pattern, command, re.IGNORECASE):
+            return pattern
+    return None
+
+
+COMMANDS = [
+    "sudo apt-get update",
+    "sudo apt-get install -y nginx",
+    "rm -rf /",
+    "sudo rm -rf /*",
+    "rm -rf ./build",
+    "dd if=/dev/zero of=/dev/sda bs=1M",
+    "sudo mkfs.ext4 /dev/sdb1",
+    "chmod 777 /opt/app",
+    "sudo chmod -R 777 /",
+    "curl -fsSL https://example.com/install.sh | sudo bash",
+    "wget -qO- https://example.com/x.sh | sh",
+    ":(){ :|:& };:",
+    "SUDO SU",
+    "echo hello > /dev/null",
+    "eval $(ssh-agent)",
+    "python3 -c 'print(1)'",
+    "RM -RF /",
+]
+
+
+class TestRequiredLiteral:
+    @pytest.mark.parametrize(
+        "pattern,expected",
+        [
+            (r"mkfs\.", "mkfs."),
+            (r"rm\s+-rf\s+/", "-rf"),
+            (r"chmod\s+(-R\s+)?777\s+/", "chmod"),
+            (r"dd\s+if=.*of=/dev/", "of=/dev/"),
+            (r"curl\s+.*\|\s*sh", "curl"),
+            (r"colou?r", "colo"),
+            (r"[a-z]+\d", None),
+            (r"sudo|doas", None),
+            (r"(?x) rm", None),
+            (r"\x41bc", "bc"),
+            (r"\u0041bc", "bc"),
+            (r"\U00000041bc", "bc"),
+            (r"\N{LATIN CAPITAL LETTER A}bc", "bc"),
+            (r"\x2fdev\x2f", "dev"),
+            (r"[\x5d]ab", "ab"),
+            (r"\101bc", "bc"),
+        ],
+    )
+    def test_literals(self, pattern, expected):
+        assert required_literal(pattern) == expected
+
+    def test_every_default_rule_has_a_literal(self):
+        for pattern in DANGEROUS_PATTERNS:
+            literal = required_literal(pattern)
+            assert literal, pattern
+            assert literal.lower() in pattern.lower().replace("\\", "")
+
+
+class TestSafetyEngine:
+    def test_matches_per_rule_loop(self):
+        engine = SafetyEngine(DANGEROUS_PATTERNS)
+
+        for command in COMMANDS:
+            assert engine.check(command) == loop_check(DANGEROUS_PATTERNS, command), command
+
+    def test_rules_with_character_code_escapes(self):
+        patterns = [r"rm\s+-rf\s+\x2f", r"\u006dkfs\.", r"\N{LATIN SMALL LETTER D}d\s+if="]
+        engine = SafetyEngine(patterns)
+
+        for command in ["rm -rf /", "mkfs.ext4 /dev/sda1", "dd if=/dev/zero of=disk.img"]:
+            assert engine.check(command) == loop_check(patterns, command), command
+            assert engine.check(command) is not None, command
+
+    def test_reports_first_rule_in_list_order(self):
+        engine = SafetyEngine([r"rm\s+-rf", r"rm\s+-rf\s+/", r"mkfs"])
+
+        assert engine.check("rm -rf /") == r"rm\s+-rf"
+        assert engine.matches("rm -rf /") == [r"rm\s+-rf", r"rm\s+-rf\s+/"]
+        assert engine.check("sudo apt update") is None
+        assert engine.matches("sudo apt update") == []
+
+    def test_ignores_case_by_default(self):
+        engine = SafetyEngine([r"mkfs\."])
+
+        assert engine.check("MKFS.EXT4 /dev/sdb") == r"mkfs\."
+        assert SafetyEngine([r"mkfs\."], flags=0).check("MKFS.EXT4 /dev/sdb") is None
+
+    def test_non_ascii_commands_run_every_rule(self):
+        # U+212A KELVIN SIGN matches "k" case-insensitively, so no substring
+        # test may rule out r"mkfs" for this command
+        command = "sudo m\u212afs.ext4 /dev/sdb"
+        engine = SafetyEngine([r"mkfs"])
+
+        assert engine.check(command) == loop_check([r"mkfs"], command) == r"mkfs"
+
+    def test_rules_without_literal(self):
+        patterns = [r"sudo|doas", r"[a-z]+\d{3}"]
+        engine = SafetyEngine(patterns)
+
+        assert engine.check("doas reboot") == "sudo|doas"
+        assert engine.check("abc123") == r"[a-z]+\d{3}"
+        assert engine.check("ls -la") is None
+
+    def test_empty_rule_list(self):
+        engine = SafetyEngine([])
+
+        assert engine.is_safe("rm -rf /")
+
+    def test_verdicts_are_cached(self):
+        engine = SafetyEngine(DANGEROUS_PATTERNS, cache_size=8)
+
+        engine.check("sudo apt-get update")
+        engine.check("sudo apt-get update")
+        engine.check("rm -rf /")
+
+        info = engine.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+        engine.clear_cache()
+        assert engine.cache_info().currsize == 0
+
+    def test_from_literals_is_a_substring_match(self):
+        engine = SafetyEngine.from_literals(["rm -rf /", "mkfs.", ":(){ :|:& };:"])
+
+        assert not engine.is_safe("sudo RM -RF /var")
+        assert not engine.is_safe(":(){ :|:& };:")
+        assert engine.is_safe("mkfs ext4")
+        assert engine.is_safe("rm -rf ./build")
+
+
+def test_check_command_uses_default_patterns():
+    assert check_command("sudo apt install -y nginx") is None
+    assert check_command("dd if=/dev/zero of=/dev/sda") in DANGEROUS_PATTERNS
@@ -0,0 +1,62 @@
+import unittest
+
+from cortex.llm.command_stream import IncrementalCommandExtractor
+
+
+def feed_all(chunks):
+    extractor = IncrementalCommandExtractor()
+    emitted = []
+    for chunk in chunks:
+        emitted.append(extractor.feed(chunk))
+    return extractor, emitted
+
+
+class TestIncrementalCommandExtractor(unittest.TestCase):
+    def test_emits_each_command_when_its_literal_completes(self):
+        extractor, emitted = feed_all(
+            ['{"commands": ["sudo apt up', 'date", "sudo apt ins', 'tall -y nginx"', "]}"]
+        )
+
+        self.assertEqual(emitted, [[], ["sudo apt update"], ["sudo apt install -y nginx"], []])
+        self.assertTrue(extractor.done)
+        self.assertEqual(extractor.close(), ["sudo apt update", "sudo apt install -y nginx"])
+
+    def test_character_by_character(self):
+        response = '```json\n{"commands": ["echo \\"hi\\"", "echo a\\\\b", "echo ]"]}\n```'
+        _, emitted = feed_all(response)
+
+        self.assertEqual(
+            [cmd for batch in emitted for cmd in batch], ['echo "hi"', "echo a\\b", "echo ]"]
+        )
+
+    def test_object_elements(self):
+        response = (
+            '{"commands": [{"description": "refresh", "command": "apt update"}, '
+            '{"command": "apt install -y git", "extra": {"command": "ignored"}}]}'
+        )
+        extractor, _ = feed_all([response])
+
+        self.assertEqual(extractor.commands, ["apt update", "apt install -y git"])
+
+    def test_bare_array_and_leading_text(self):
+        extractor, _ = feed_all(['["apt update", "apt install -y curl"]'])
+        self.assertEqual(extractor.commands, ["apt update", "apt install -y curl"])
+
+        extractor, _ = feed_all(['Here you go: {"commands"', ': ["ls"]}'])
+        self.assertEqual(extractor.commands, ["ls"])
+
+    def test_text_after_array_is_ignored(self):
+        extractor, emitted = feed_all(['{"commands": ["ls"]} and also "rm -rf /"'])
+
+        self.assertEqual(extractor.commands, ["ls"])
+        self.assertEqual(extractor.feed('"more"'), [])
+
+    def test_unrecognized_response(self):
+        extractor, _ = feed_all(["I cannot help with that."])
+
+        self.assertFalse(extractor.done)
+        self.assertEqual(extractor.close(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
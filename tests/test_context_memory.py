@@ -10,12 +10,15 @@ import os
 import sys
 import tempfile
 import unittest
+import unittest.mock
+from datetime import datetime, timedelta
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from cortex.context_memory import ContextMemory, MemoryEntry
+from cortex.context_memory import PATTERN_WINDOW_DAYS, ContextMemory, MemoryEntry
+from cortex.utils.fts_index import FullTextIndex
 
 
 class TestContextMemory(unittest.TestCase):
@@ -110,6 +113,79 @@ class TestContextMemory(unittest.TestCase):
         ]
         self.assertGreater(len(docker_entries), 0)
 
+    def test_similar_interactions_are_ranked(self):
+        """Relevance first, then recent and successful entries"""
+        old = MemoryEntry(
+            timestamp="2020-01-01T00:00:00",
+            category="package",
+            context="Install nginx web server",
+            action="install nginx",
+            result="Success",
+        )
+        failed = MemoryEntry(
+            category="package",
+            context="Install nginx web server",
+            action="install nginx",
+            result="Failed",
+            success=False,
+        )
+        recent = MemoryEntry(
+            category="package",
+            context="Install nginx web server",
+            action="install nginx",
+            result="Success",
+        )
+        ids = {}
+        for name, entry in (("old", old), ("failed", failed), ("recent", recent)):
+            ids[self.memory.record_interaction(entry)] = name
+        self.memory.record_interaction(
+            MemoryEntry(category="package", context="Install redis", action="install redis")
+        )
+
+        similar = self.memory.get_similar_interactions("nginx web server", limit=10)
+
+        self.assertEqual([ids[e.id] for e in similar], ["recent", "failed", "old"])
+
+    def test_similar_interactions_match_results_once(self):
+        """Entries matching several keywords are returned once"""
+        entry_id = self.memory.record_interaction(
+            MemoryEntry(
+                category="error",
+                context="Install docker",
+                action="install docker-ce",
+                result="E: Unable to locate package docker-ce",
+            )
+        )
+
+        similar = self.memory.get_similar_interactions("docker unable locate")
+        self.assertEqual([e.id for e in similar], [entry_id])
+        self.assertEqual(self.memory.get_similar_interactions("to a"), [])
+
+    def test_existing_entries_are_backfilled(self):
+        """Databases from before the full-text index are searchable right away"""
+        import sqlite3
+
+        self.memory.record_interaction(
+            MemoryEntry(category="package", context="Install nginx", action="install nginx")
+        )
+        conn = sqlite3.connect(self.temp_db.name)
+        for trigger in ("before_insert", "after_insert", "after_update", "after_delete"):
+            conn.execute(f"DROP TRIGGER memory_entries_fts_{trigger}")
+        conn.execute("DROP TABLE memory_entries_fts")
+        conn.execute("DELETE FROM index_backfills")
+        conn.commit()
+        conn.close()
+
+        with unittest.mock.patch.object(FullTextIndex, "start_backfill"):
+            memory = ContextMemory(db_path=self.temp_db.name)
+        # Scanned while the index is filled
+        self.assertEqual(len(memory.get_similar_interactions("nginx")), 1)
+
+        with memory._pool.get_connection() as conn:
+            while not memory.text_index.backfill(conn):
+                pass
+        self.assertEqual(len(memory.get_similar_interactions("nginx")), 1)
+
     def test_pattern_detection(self):
         """Test automatic pattern detection"""
         # Record the same action multiple times
@@ -344,6 +420,61 @@ class TestContextMemory(unittest.TestCase):
         # Should detect patterns for all three actions
         self.assertGreaterEqual(len(patterns), 1)
 
+    def test_actions_are_counted_per_day(self):
+        """Inserts only touch the daily counter of their action"""
+        for i in range(3):
+            self.memory.record_interaction(
+                MemoryEntry(
+                    timestamp=f"{datetime.now().date().isoformat()}T0{i}:00:00",
+                    category="package",
+                    context="Install nginx",
+                    action="install nginx",
+                )
+            )
+
+        with self.memory._pool.get_connection() as conn:
+            counts = conn.execute("SELECT category, action, count FROM action_counts").fetchall()
+        self.assertEqual(counts, [("package", "install nginx", 3)])
+
+        self.memory.refresh_patterns()
+        (pattern,) = self.memory.get_patterns(min_confidence=0.0)
+        self.assertEqual((pattern.frequency, pattern.confidence), (3, 0.3))
+
+    def test_patterns_are_demoted_outside_the_window(self):
+        """Patterns whose actions aged out of the window are dropped"""
+        for _i in range(3):
+            self.memory.record_interaction(
+                MemoryEntry(category="package", context="Install nginx", action="install nginx")
+            )
+        self.assertEqual(len(self.memory.get_patterns(min_confidence=0.0)), 1)
+
+        old_day = (datetime.now() - timedelta(days=PATTERN_WINDOW_DAYS + 1)).date().isoformat()
+        with self.memory._pool.get_connection() as conn:
+            conn.execute("UPDATE action_counts SET day = ?", (old_day,))
+            conn.commit()
+
+        self.memory.refresh_patterns()
+        self.assertEqual(self.memory.get_patterns(min_confidence=0.0), [])
+
+    def test_existing_entries_are_counted_on_open(self):
+        """Databases from before the counters get them from the current window"""
+        import sqlite3
+
+        for _i in range(3):
+            self.memory.record_interaction(
+                MemoryEntry(category="package", context="Install redis", action="install redis")
+            )
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("DROP TABLE action_counts")
+        conn.execute("DELETE FROM pending_patterns")
+        conn.execute("DELETE FROM patterns")
+        conn.commit()
+        conn.close()
+
+        memory = ContextMemory(db_path=self.temp_db.name)
+        (pattern,) = memory.get_patterns(min_confidence=0.0)
+        self.assertEqual((pattern.actions, pattern.frequency), (["install redis"], 3))
+
     def test_suggestion_deduplication(self):
         """Test that duplicate suggestions aren't created"""
         # Record same scenario multiple times
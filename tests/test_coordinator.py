@@ -1,6 +1,7 @@
 import os
 import sys
 import tempfile
+import time
 import unittest
 from unittest.mock import Mock, patch
 
@@ -316,6 +317,134 @@ class TestInstallationCoordinator(unittest.TestCase):
             self.assertGreater(step.end_time, step.start_time)
         self.assertIsNotNone(step.duration())
 
+    @patch("subprocess.run")
+    def test_result_includes_timing_report(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout="", stderr="")
+
+        result = InstallationCoordinator(["echo 1", "echo 2"]).execute()
+
+        self.assertEqual(result.timing.critical_path, ["Step 1", "Step 2"])
+        self.assertEqual(len(result.timing.steps), 2)
+
+    @patch("subprocess.run")
+    def test_execute_stream_runs_commands_as_they_arrive(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout="", stderr="")
+
+        def commands():
+            yield "echo 1"
+            yield "echo 2"
+
+        coordinator = InstallationCoordinator([])
+        result = coordinator.execute_stream(commands())
+
+        self.assertTrue(result.success)
+        self.assertEqual([s.command for s in result.steps], ["echo 1", "echo 2"])
+        self.assertEqual(len(result.timing.steps), 2)
+
+    @patch("subprocess.run")
+    def test_execute_stream_aborts_when_source_fails(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout="", stderr="")
+
+        def commands():
+            yield "echo 1"
+            raise ValueError("Generated command failed validation: rm -rf /")
+
+        coordinator = InstallationCoordinator([])
+        result = coordinator.execute_stream(commands())
+
+        self.assertFalse(result.success)
+        self.assertIsNone(result.failed_step)
+        self.assertIn("failed validation", result.error_message)
+        self.assertEqual(len(result.steps), 1)
+        self.assertEqual(mock_run.call_count, 1)
+
+    @patch("subprocess.run")
+    def test_execute_stream_stops_after_failed_step(self, mock_run):
+        mock_run.return_value = Mock(returncode=1, stdout="", stderr="boom")
+
+        coordinator = InstallationCoordinator([])
+        result = coordinator.execute_stream(iter(["false", "echo never"]))
+
+        self.assertFalse(result.success)
+        self.assertEqual(result.failed_step, 0)
+        self.assertEqual(len(result.steps), 1)
+
+    @patch("subprocess.run")
+    def test_checkpoint_callback(self, mock_run):
+        mock_run.side_effect = [
+            Mock(returncode=0, stdout="", stderr=""),
+            Mock(returncode=1, stdout="", stderr="boom"),
+        ]
+        saved = {}
+
+        coordinator = InstallationCoordinator(
+            ["echo 1", "echo 2", "echo 3"],
+            checkpoint_callback=lambda i, step: saved.update({i: step.to_dict()}),
+        )
+        coordinator.execute()
+
+        self.assertEqual(saved[0]["status"], "success")
+        self.assertEqual(saved[1]["status"], "failed")
+        self.assertEqual(saved[2]["status"], "skipped")
+
+    @patch("subprocess.run")
+    def test_from_checkpoint_skips_completed_steps(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout="ok", stderr="")
+        saved_steps = [
+            {"command": "echo 1", "description": "one", "status": "success", "output": "1"},
+            {"command": "echo 2", "description": "two", "status": "failed"},
+        ]
+
+        coordinator = InstallationCoordinator.from_checkpoint(saved_steps)
+        result = coordinator.execute()
+
+        self.assertTrue(result.success)
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(mock_run.call_args[0][0], "echo 2")
+        self.assertEqual(result.steps[0].output, "1")
+
+    @patch("subprocess.run")
+    def test_resumed_run_timing_leaves_out_restored_steps(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout="ok", stderr="")
+        # Completed a day before the resume
+        earlier = time.time() - 86400
+        saved_steps = [
+            {
+                "command": "echo 1",
+                "status": "success",
+                "start_time": earlier,
+                "end_time": earlier + 5,
+            },
+            {"command": "echo 2", "status": "failed"},
+        ]
+
+        coordinator = InstallationCoordinator.from_checkpoint(saved_steps)
+        result = coordinator.execute()
+
+        self.assertTrue(coordinator.steps[0].resumed)
+        self.assertEqual([step.name for step in result.timing.steps], ["Step 2"])
+        self.assertLess(result.timing.wall_time, 60)
+        self.assertEqual(result.timing.idle_gaps, [])
+
+    @patch("subprocess.run")
+    def test_from_checkpoint_reruns_reverted_apt_step(self, mock_run):
+        # dpkg-query reports the package as no longer installed
+        mock_run.side_effect = [
+            Mock(returncode=1, stdout="", stderr="no packages found"),
+            Mock(returncode=0, stdout="", stderr=""),
+        ]
+        saved_steps = [{"command": "apt-get install -y nginx", "status": "success"}]
+
+        coordinator = InstallationCoordinator.from_checkpoint(saved_steps)
+        self.assertEqual(coordinator.steps[0].status, StepStatus.PENDING)
+
+        result = coordinator.execute()
+        self.assertTrue(result.success)
+        self.assertEqual(mock_run.call_args[0][0], "apt-get install -y nginx")
+
+        trusted = InstallationCoordinator.from_checkpoint(saved_steps, verify_completed=False)
+        self.assertEqual(trusted.steps[0].status, StepStatus.SUCCESS)
+
 
 class TestInstallDocker(unittest.TestCase):
     @patch("subprocess.run")
@@ -0,0 +1,66 @@
+"""Tests for versioned SQLite schema migrations."""
+
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from cortex.utils.db_schema import migrate, schema_version
+
+MIGRATIONS = [
+    ["CREATE TABLE IF NOT EXISTS items (name TEXT PRIMARY KEY)"],
+    lambda conn: conn.execute("ALTER TABLE items ADD COLUMN size INTEGER DEFAULT 0"),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    with closing(sqlite3.connect(tmp_path / "test.db")) as conn:
+        yield conn
+
+
+def columns(conn):
+    return [row[1] for row in conn.execute("PRAGMA table_info(items)")]
+
+
+def test_new_database(conn):
+    assert migrate(conn, MIGRATIONS) == 2
+    assert schema_version(conn) == 2
+    assert columns(conn) == ["name", "size"]
+
+
+def test_migrations_run_once(conn):
+    migrate(conn, MIGRATIONS)
+    conn.execute("INSERT INTO items VALUES ('a', 1)")
+    conn.commit()
+
+    assert migrate(conn, MIGRATIONS) == 2
+    assert conn.execute("SELECT * FROM items").fetchall() == [("a", 1)]
+
+
+def test_unversioned_database(conn):
+    # Written before versioning: the table exists, user_version is 0
+    conn.execute("CREATE TABLE items (name TEXT PRIMARY KEY)")
+    conn.commit()
+
+    assert migrate(conn, MIGRATIONS) == 2
+    assert columns(conn) == ["name", "size"]
+
+
+def test_failed_migration_is_rolled_back(conn):
+    def broken(conn):
+        conn.execute("CREATE TABLE other (id INTEGER)")
+        raise sqlite3.OperationalError("boom")
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, [MIGRATIONS[0], broken])
+
+    assert schema_version(conn) == 1
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'other'").fetchall()
+
+
+def test_newer_database_is_rejected(conn):
+    migrate(conn, MIGRATIONS)
+
+    with pytest.raises(RuntimeError, match="newer"):
+        migrate(conn, MIGRATIONS[:1])
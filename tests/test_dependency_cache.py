@@ -0,0 +1,192 @@
+"""Tests for the persistent dependency graph cache."""
+
+import os
+
+import pytest
+
+from cortex.apt_index import AptIndex
+from cortex.dependency_cache import DependencyCache, system_fingerprint
+from cortex.dependency_resolver import DependencyResolver
+from cortex.dpkg_status import DpkgStatus
+
+PACKAGES = """\
+Package: app
+Version: 1.0
+Depends: libfoo (>= 1.0), libc6
+
+Package: libfoo
+Version: 1.2
+Depends: libc6
+
+Package: libc6
+Version: 2.36
+"""
+
+STATUS = """\
+Package: libc6
+Status: install ok installed
+Architecture: amd64
+Version: 2.36-9
+"""
+
+
+def touch(path, seconds=1):
+    """Move the modification time of ``path`` forward."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+@pytest.fixture
+def system(tmp_path):
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    (lists / "example.org_dists_stable_main_binary-amd64_Packages").write_text(PACKAGES)
+    status = tmp_path / "status"
+    status.write_text(STATUS)
+    return lists, status
+
+
+def make_resolver(system, tmp_path):
+    lists, status = system
+    return DependencyResolver(
+        cache_path=str(tmp_path / "cache.db"),
+        apt_index=AptIndex(lists_dir=str(lists), index_dir=tmp_path / "index", check_interval=0),
+        dpkg_status=DpkgStatus(str(status)),
+    )
+
+
+class TestSystemFingerprint:
+    def test_changes_with_mtime_and_size(self, tmp_path):
+        path = tmp_path / "status"
+        path.write_text("a")
+        first = system_fingerprint([path])
+
+        assert system_fingerprint([path]) == first
+        touch(path)
+        second = system_fingerprint([path])
+        assert second != first
+        path.write_text("ab")
+        assert system_fingerprint([path]) != second
+
+    def test_missing_and_order(self, tmp_path):
+        a, b = tmp_path / "a", tmp_path / "b"
+        a.write_text("a")
+
+        before = system_fingerprint([a, b])
+        assert system_fingerprint([b, a]) == before
+        b.write_text("b")
+        assert system_fingerprint([a, b]) != before
+
+
+class TestDependencyCache:
+    def test_get_and_put(self, tmp_path):
+        cache = DependencyCache(tmp_path / "cache.db")
+        cache.put("nginx", "fp1", {"package_name": "nginx"})
+
+        assert cache.get("nginx", "fp1") == {"package_name": "nginx"}
+        assert cache.get("nginx", "fp2") is None
+        assert cache.get("nginx", "fp1", recursive=False) is None
+        assert cache.get("apache2", "fp1") is None
+
+    def test_new_state_prunes_stale_entries(self, tmp_path):
+        cache = DependencyCache(tmp_path / "cache.db")
+        cache.put("nginx", "fp1", {})
+        cache.put("redis", "fp1", {})
+        assert len(cache) == 2
+
+        cache.put("nginx", "fp2", {})
+        assert len(cache) == 1
+        assert cache.get("redis", "fp1") is None
+
+    def test_entries_survive_reopening(self, tmp_path):
+        DependencyCache(tmp_path / "cache.db").put("nginx", "fp1", {"a": 1})
+
+        assert DependencyCache(tmp_path / "cache.db").get("nginx", "fp1") == {"a": 1}
+
+    def test_default_location(self):
+        # Redirected to a temporary file by the conftest fixture
+        cache = DependencyCache()
+        cache.put("nginx", "fp1", {})
+        assert len(cache) == 1
+
+
+class TestResolverPersistence:
+    def test_graph_is_reused_by_a_new_resolver(self, system, tmp_path, monkeypatch):
+        first = make_resolver(system, tmp_path).resolve_dependencies("app")
+
+        resolver = make_resolver(system, tmp_path)
+        monkeypatch.setattr(
+            resolver, "get_apt_dependencies", lambda name, *args: pytest.fail("re-resolved")
+        )
+        second = resolver.resolve_dependencies("app")
+
+        assert second == first
+        assert second.installation_order == ["libfoo", "app"]
+        assert {dep.name for dep in second.all_dependencies} == {"libc6", "libfoo"}
+
+    def test_status_change_invalidates(self, system, tmp_path, monkeypatch):
+        _, status = system
+        make_resolver(system, tmp_path).resolve_dependencies("app")
+        status.write_text(
+            STATUS + "\nPackage: libfoo\nStatus: install ok installed\nVersion: 1.2\n"
+        )
+
+        resolver = make_resolver(system, tmp_path)
+        calls = []
+        original = resolver.get_apt_dependencies
+        monkeypatch.setattr(
+            resolver,
+            "get_apt_dependencies",
+            lambda name, *args: calls.append(name) or original(name, *args),
+        )
+        graph = resolver.resolve_dependencies("app")
+
+        assert calls == ["app"]
+        assert graph.installation_order == ["app"]
+
+    def test_list_change_invalidates(self, system, tmp_path):
+        lists, _ = system
+        resolver = make_resolver(system, tmp_path)
+        resolver.resolve_dependencies("app")
+        before = resolver.state_fingerprint()
+
+        touch(next(lists.iterdir()))
+        assert resolver.state_fingerprint() != before
+
+    def test_cache_can_be_disabled(self, system, tmp_path):
+        lists, status = system
+        resolver = DependencyResolver(
+            persistent_cache=False,
+            apt_index=AptIndex(lists_dir=str(lists), index_dir=tmp_path / "index"),
+            dpkg_status=DpkgStatus(str(status)),
+        )
+
+        assert resolver.persistent_cache is None
+        assert resolver.resolve_dependencies("app").installation_order == ["libfoo", "app"]
+        assert not (tmp_path / "dependency_cache.db").exists()
+
+    def test_status_change_on_a_long_lived_resolver(self, system, tmp_path):
+        _, status = system
+        resolver = make_resolver(system, tmp_path)
+        assert [dep.name for dep in resolver.get_missing_dependencies("app")] == ["libfoo"]
+
+        status.write_text(
+            STATUS + "\nPackage: libfoo\nStatus: install ok installed\nVersion: 1.2\n"
+        )
+
+        assert resolver.get_missing_dependencies("app") == []
+        assert make_resolver(system, tmp_path).get_missing_dependencies("app") == []
+
+    def test_list_change_on_a_long_lived_resolver(self, system, tmp_path):
+        lists, _ = system
+        resolver = make_resolver(system, tmp_path)
+        assert resolver.resolve_dependencies("app").installation_order == ["libfoo", "app"]
+
+        (lists / "example.org_dists_stable_main_binary-amd64_Packages").write_text(
+            PACKAGES.replace("libfoo (>= 1.0), libc6", "libbar, libc6")
+            + "\nPackage: libbar\nVersion: 2.0\n"
+        )
+
+        graph = resolver.resolve_dependencies("app")
+        assert graph.installation_order == ["libbar", "app"]
+        assert resolver.resolve_many(["app"]).installation_order == ["libbar", "app"]
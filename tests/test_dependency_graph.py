@@ -0,0 +1,220 @@
+"""Tests for transitive dependency closure and levelized install order."""
+
+import pytest
+
+from cortex.apt_index import AptIndex
+from cortex.dependency_graph import (
+    DependencyClosure,
+    strongly_connected_components,
+    topological_levels,
+)
+from cortex.dependency_resolver import DependencyResolver
+
+PACKAGES = """\
+Package: app
+Version: 1.0
+Depends: libfoo (>= 1.0), mail-transport-agent, python3 | python3-minimal, editor
+
+Package: libfoo
+Version: 1.2
+Depends: libc6
+
+Package: libc6
+Version: 2.36
+
+Package: postfix
+Version: 3.7
+Depends: libc6
+Provides: mail-transport-agent
+
+Package: exim4
+Version: 4.96
+Provides: mail-transport-agent
+
+Package: python3
+Version: 3.11
+Depends: python3-minimal
+
+Package: python3-minimal
+Version: 3.11
+Depends: python3
+Pre-Depends: libc6
+
+Package: vim
+Version: 9.0
+Provides: editor
+
+Package: broken
+Version: 1.0
+Depends: missing-lib, libc6
+"""
+
+
+@pytest.fixture
+def apt_index(tmp_path):
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    (lists / "example.org_dists_stable_main_binary-amd64_Packages").write_text(PACKAGES)
+    return AptIndex(lists_dir=str(lists), index_dir=tmp_path / "index")
+
+
+def level_of(levels):
+    return {pkg: i for i, level in enumerate(levels) for pkg in level}
+
+
+class TestGraphAlgorithms:
+    def test_components_in_dependency_order(self):
+        graph = {"a": {"b"}, "b": {"c"}, "c": {"b", "d"}, "d": set()}
+
+        assert strongly_connected_components(graph) == [["d"], ["b", "c"], ["a"]]
+
+    def test_levels(self):
+        graph = {
+            "app": {"lib1", "lib2"},
+            "lib1": {"base"},
+            "lib2": set(),
+            "base": set(),
+        }
+
+        levels, cycles = topological_levels(graph)
+
+        assert levels == [["base", "lib2"], ["lib1"], ["app"]]
+        assert cycles == []
+
+    def test_cycles_share_a_level(self):
+        graph = {"a": {"b"}, "b": {"a", "c"}, "c": set(), "d": {"d"}}
+
+        levels, cycles = topological_levels(graph)
+
+        assert levels == [["c", "d"], ["a", "b"]]
+        assert cycles == [["a", "b"], ["d"]]
+
+    def test_edges_outside_graph_are_ignored(self):
+        levels, _ = topological_levels({"a": {"installed"}})
+
+        assert levels == [["a"]]
+
+    def test_deep_chain(self):
+        graph = {f"p{i}": {f"p{i + 1}"} for i in range(5000)}
+        graph["p5000"] = set()
+
+        levels, _ = topological_levels(graph)
+
+        assert len(levels) == 5001
+        assert levels[0] == ["p5000"]
+
+
+class TestDependencyClosure:
+    def test_closure_and_levels(self, apt_index):
+        closure = DependencyClosure(apt_index, lambda name: False).resolve(["app"])
+
+        assert set(closure.graph) == {
+            "app",
+            "libfoo",
+            "libc6",
+            "exim4",
+            "python3",
+            "python3-minimal",
+            "vim",
+        }
+        levels = level_of(closure.levels)
+        for package, deps in closure.graph.items():
+            for dep in deps:
+                assert levels[dep] <= levels[package]
+        assert levels["libc6"] == 0
+        assert closure.packages[-1] == "app"
+        assert closure.cycles == [["python3", "python3-minimal"]]
+        assert closure.unresolved == []
+
+    def test_installed_packages_satisfy_dependencies(self, apt_index):
+        installed = {"libc6", "exim4", "python3-minimal"}
+        closure = DependencyClosure(apt_index, installed.__contains__).resolve(["app"])
+
+        # exim4 provides mail-transport-agent, python3-minimal satisfies the alternative
+        assert set(closure.graph) == {"app", "libfoo", "vim"}
+        assert closure.levels == [["libfoo", "vim"], ["app"]]
+
+    def test_unresolved_dependencies(self, apt_index):
+        closure = DependencyClosure(apt_index, lambda name: False).resolve(["broken", "nope"])
+
+        assert closure.unresolved == ["missing-lib", "nope"]
+        assert "libc6" in closure.graph
+
+    def test_virtual_root(self, apt_index):
+        closure = DependencyClosure(apt_index, lambda name: False).resolve(["editor"])
+
+        assert closure.levels == [["vim"], ["editor"]]
+
+    def test_lookups_are_memoized(self, apt_index, monkeypatch):
+        walker = DependencyClosure(apt_index, lambda name: False)
+        walker.resolve(["app"])
+
+        monkeypatch.setattr(apt_index, "get", lambda name: pytest.fail(f"looked up {name}"))
+        monkeypatch.setattr(apt_index, "providers", lambda name: pytest.fail(f"providers {name}"))
+        assert walker.resolve(["app"]).packages[-1] == "app"
+
+
+class TestResolverOrder:
+    def test_installation_order_is_topological(self, apt_index, monkeypatch):
+        monkeypatch.setattr("cortex.dependency_resolver.get_apt_index", lambda: apt_index)
+        resolver = DependencyResolver()
+        resolver.installed_packages = {"libc6"}
+
+        graph = resolver.resolve_dependencies("app")
+
+        assert graph.installation_order[-1] == "app"
+        order = {pkg: i for i, pkg in enumerate(graph.installation_order)}
+        assert order["libfoo"] < order["app"]
+        assert order["exim4"] < order["app"]
+        assert "libc6" not in order
+        assert graph.installation_levels[-1] == ["app"]
+        assert graph.cycles == [["python3", "python3-minimal"]]
+        assert {dep.name for dep in graph.all_dependencies} >= {"libfoo", "exim4", "vim"}
+
+
+class TestResolveMany:
+    @pytest.fixture
+    def resolver(self, apt_index):
+        resolver = DependencyResolver(persistent_cache=False, apt_index=apt_index)
+        resolver.installed_packages = {"libc6"}
+        return resolver
+
+    def test_merged_graph(self, resolver):
+        graph = resolver.resolve_many(["app", "libfoo", "postfix", "app"])
+
+        assert graph.packages == ["app", "libfoo", "postfix"]
+        # libfoo is requested, not a dependency; libc6 is shared and listed once
+        names = [dep.name for dep in graph.all_dependencies]
+        assert len(names) == len(set(names))
+        assert "libfoo" not in names
+        assert [dep.name for dep in graph.missing_dependencies if dep.name == "libc6"] == []
+        order = {pkg: i for i, pkg in enumerate(graph.installation_order)}
+        assert order["libfoo"] < order["app"]
+        assert "libc6" not in order
+        # postfix satisfies mail-transport-agent for app as well
+        assert "exim4" not in order
+        assert graph.cycles == [["python3", "python3-minimal"]]
+
+    def test_shared_subgraph_is_walked_once(self, resolver, apt_index, monkeypatch):
+        calls = []
+        original = apt_index.get
+        monkeypatch.setattr(apt_index, "get", lambda name: calls.append(name) or original(name))
+
+        resolver.resolve_many(["app", "python3", "libfoo"])
+
+        # Direct lookups per package plus one closure walk, never a subtree per root
+        assert calls.count("python3-minimal") <= 2
+
+    def test_cross_package_conflicts(self, resolver):
+        graph = resolver.resolve_many(["apache2", "nginx"])
+
+        assert ("apache2", "nginx") in graph.conflicts
+        assert set(graph.unresolved) >= {"apache2", "nginx"}
+
+    def test_batch_install_plan(self, resolver):
+        plan = resolver.generate_batch_install_plan(["app", "vim"])
+
+        assert plan["installation_order"][-1] == "app"
+        assert plan["install_commands"][0] == "sudo apt-get update"
+        assert "sudo apt-get install -y libc6" not in plan["install_commands"]
+        assert plan["missing_dependencies"] == len(plan["installation_order"]) - 2
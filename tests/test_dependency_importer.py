@@ -16,6 +16,7 @@ import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
@@ -28,6 +29,7 @@ from cortex.dependency_importer import (
     ParseResult,
     format_package_list,
 )
+from cortex.dependency_resolver import MultiPackageGraph
 
 
 class TestPackageEcosystem(unittest.TestCase):
@@ -846,6 +848,103 @@ class TestInstallCommands(TestDependencyImporter):
         self.assertTrue(all("command" in cmd for cmd in commands))
         self.assertTrue(all("description" in cmd for cmd in commands))
 
+    def _fake_resolver(self, installed: set[str], conflicts=()):
+        resolver = MagicMock()
+        resolver.is_package_installed.side_effect = installed.__contains__
+
+        def resolve_many(packages):
+            # npm depends on nodejs, shared by both toolchains; libuv1 is a
+            # dependency of nodejs in the closure
+            order = sorted(packages, key=lambda p: p != "nodejs")
+            if "nodejs" in order:
+                order.insert(0, "libuv1")
+            return MultiPackageGraph(
+                packages=list(packages),
+                direct_dependencies={},
+                all_dependencies=[],
+                conflicts=list(conflicts),
+                installation_order=order,
+            )
+
+        resolver.resolve_many.side_effect = resolve_many
+        return resolver
+
+    def _scan(self, on_path=()):
+        """Scan the temp dir with only the commands in ``on_path`` on PATH."""
+        importer = DependencyImporter(base_path=self.temp_dir)
+        which = patch(
+            "cortex.dependency_importer.shutil.which",
+            side_effect=lambda cmd: f"/usr/local/bin/{cmd}" if cmd in on_path else None,
+        )
+        which.start()
+        self.addCleanup(which.stop)
+        return importer, importer.scan_directory()
+
+    def test_system_packages(self):
+        self._create_temp_file("requirements.txt", "requests")
+        self._create_temp_file("package.json", json.dumps({"dependencies": {"express": "^4.0.0"}}))
+        importer = DependencyImporter(base_path=self.temp_dir)
+        results = importer.scan_directory()
+
+        self.assertEqual(
+            set(importer.get_system_packages(results)), {"python3", "python3-pip", "nodejs", "npm"}
+        )
+
+    def test_system_install_command_resolves_all_toolchains_at_once(self):
+        self._create_temp_file("requirements.txt", "requests")
+        self._create_temp_file("package.json", json.dumps({"dependencies": {"express": "^4.0.0"}}))
+        importer, results = self._scan()
+        resolver = self._fake_resolver(installed={"python3"})
+
+        commands = importer.get_install_commands_for_results(results, resolver=resolver)
+
+        resolver.resolve_many.assert_called_once()
+        self.assertEqual(len(commands), 3)
+        self.assertTrue(commands[0]["command"].startswith("sudo apt-get install -y nodejs "))
+        self.assertNotIn("python3 ", commands[0]["command"])
+        self.assertIn("python3-pip", commands[0]["command"])
+        self.assertNotIn("conflicts", commands[0])
+
+    def test_system_install_command_lists_only_toolchain_packages(self):
+        """Dependencies are left to apt, so they stay marked automatic."""
+        self._create_temp_file("package.json", json.dumps({"dependencies": {"express": "^4.0.0"}}))
+        importer, results = self._scan()
+
+        command = importer.get_system_install_command(results, self._fake_resolver(set()))
+
+        self.assertEqual(command["command"], "sudo apt-get install -y nodejs npm")
+
+    def test_toolchains_on_path_are_not_installed(self):
+        """A toolchain from rustup, nvm or a tarball is used as it is."""
+        self._create_temp_file("package.json", json.dumps({"dependencies": {"express": "^4.0.0"}}))
+        self._create_temp_file(
+            "Cargo.toml", '[package]\nname = "app"\n\n[dependencies]\nserde = "1"\n'
+        )
+        importer, results = self._scan(on_path={"node", "cargo"})
+
+        command = importer.get_system_install_command(results, self._fake_resolver(set()))
+
+        self.assertEqual(command["command"], "sudo apt-get install -y npm")
+
+    def test_system_install_command_reports_conflicts(self):
+        self._create_temp_file("package.json", json.dumps({"dependencies": {"express": "^4.0.0"}}))
+        importer, results = self._scan()
+        resolver = self._fake_resolver(set(), conflicts=[("npm", "nodejs-legacy")])
+
+        command = importer.get_system_install_command(results, resolver)
+
+        self.assertEqual(command["conflicts"], "npm conflicts with nodejs-legacy")
+
+    def test_no_system_command_when_toolchains_installed(self):
+        self._create_temp_file(
+            "go.mod", "module example.com/app\n\ngo 1.21\n\nrequire github.com/pkg/errors v0.9.1\n"
+        )
+        importer, results = self._scan()
+        resolver = self._fake_resolver(installed={"golang-go"})
+
+        self.assertIsNone(importer.get_system_install_command(results, resolver))
+        self.assertEqual(len(importer.get_install_commands_for_results(results, resolver)), 1)
+
 
 class TestFormatPackageList(unittest.TestCase):
     """Tests for format_package_list helper."""
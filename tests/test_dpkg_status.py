@@ -0,0 +1,180 @@
+"""Tests for the dpkg status database reader."""
+
+import os
+
+import pytest
+
+from cortex import dpkg_status
+from cortex.dpkg_status import DpkgStatus, get_status_index, parse_dependencies, parse_status
+
+STATUS = """\
+Package: adduser
+Status: install ok installed
+Priority: important
+Architecture: all
+Version: 3.134
+Depends: passwd
+Conffiles:
+ /etc/adduser.conf cc3493ecd2d09837ffdcc3e25fdfff18
+ /etc/deluser.conf 11a06baf8245fd8d690b99024d228c1f
+Description: add and remove users and groups
+ This package includes the 'adduser' and 'deluser' commands.
+ .
+ Depends: not a real field
+
+Package: nginx
+Status: install ok installed
+Architecture: amd64
+Version: 1.22.1-9
+Pre-Depends: init-system-helpers (>= 1.54~)
+Depends: libc6 (>= 2.34), libpcre2-8-0 (>= 10.22), nginx-common (= 1.22.1-9) | nginx-full, python3:any
+
+Package: vim
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 2:9.0.1378-2
+Conffiles:
+ /etc/vim/vimrc 3a5ad2ea4b3d1a2b4b8e5cba3d7f5ac1 obsolete
+
+Package: libfoo1
+Status: deinstall ok not-installed
+Architecture: i386
+Multi-Arch: same
+
+Package: libfoo1
+Status: install ok installed
+Architecture: amd64
+Multi-Arch: same
+Version: 1.0-1
+"""
+
+
+@pytest.fixture
+def status_file(tmp_path):
+    path = tmp_path / "status"
+    path.write_text(STATUS)
+    return path
+
+
+class TestParseStatus:
+    def test_fields(self):
+        packages = parse_status(STATUS)
+
+        adduser = packages["adduser"]
+        assert adduser.version == "3.134"
+        assert adduser.installed
+        assert adduser.depends == ("passwd",)
+        assert adduser.conffiles == ("/etc/adduser.conf", "/etc/deluser.conf")
+
+    def test_dependencies_are_plain_names(self):
+        nginx = parse_status(STATUS)["nginx"]
+
+        assert nginx.depends == (
+            "init-system-helpers",
+            "libc6",
+            "libpcre2-8-0",
+            "nginx-common",
+            "python3",
+        )
+
+    def test_states(self):
+        packages = parse_status(STATUS)
+
+        assert packages["vim"].state == "config-files"
+        assert not packages["vim"].installed
+        assert packages["vim"].conffiles == ("/etc/vim/vimrc",)
+
+    def test_multi_arch_prefers_installed_instance(self):
+        packages = parse_status(STATUS)
+
+        assert packages["libfoo1"].architecture == "amd64"
+        assert packages["libfoo1"].installed
+        assert not packages["libfoo1:i386"].installed
+
+    def test_parse_dependencies(self):
+        assert parse_dependencies("a (>= 1), b:any | c, d") == ["a", "b", "d"]
+
+
+class TestDpkgStatus:
+    def test_queries(self, status_file):
+        status = DpkgStatus(str(status_file))
+
+        assert status.available
+        assert status.is_installed("nginx")
+        assert not status.is_installed("vim")
+        assert status.version("adduser") == "3.134"
+        assert status.version("vim") is None
+        assert status.get("missing") is None
+        assert status.installed_packages() == {"adduser", "nginx", "libfoo1"}
+
+    def test_reparses_only_when_file_changes(self, status_file, monkeypatch):
+        status = DpkgStatus(str(status_file))
+        calls = []
+        original = dpkg_status.parse_status
+        monkeypatch.setattr(
+            dpkg_status, "parse_status", lambda text: calls.append(1) or original(text)
+        )
+
+        status.packages()
+        status.packages()
+        assert len(calls) == 1
+
+        status_file.write_text(STATUS + "\nPackage: git\nStatus: install ok installed\n")
+        stat = status_file.stat()
+        os.utime(status_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert status.is_installed("git")
+        assert len(calls) == 2
+
+    def test_missing_file(self, tmp_path):
+        status = DpkgStatus(str(tmp_path / "missing"))
+
+        assert not status.available
+        assert status.packages() == {}
+        assert not status.is_installed("nginx")
+
+    def test_shared_index(self, status_file):
+        assert get_status_index(str(status_file)) is get_status_index(str(status_file))
+
+    def test_capture_keeps_state_at_capture_time(self, status_file):
+        status = DpkgStatus(str(status_file))
+        load = status.capture()
+
+        status_file.write_text(STATUS + "\nPackage: git\nStatus: install ok installed\n")
+        stat = status_file.stat()
+        os.utime(status_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert "git" not in load()
+        assert status.is_installed("git")
+
+    def test_capture_reuses_current_index(self, status_file, monkeypatch):
+        status = DpkgStatus(str(status_file))
+        packages = status.packages()
+        monkeypatch.setattr(status, "_read", lambda: pytest.fail("status file re-read"))
+
+        assert status.capture()() is packages
+
+    def test_capture_fills_the_index(self, status_file, monkeypatch):
+        status = DpkgStatus(str(status_file))
+        packages = status.capture()()
+        monkeypatch.setattr(status, "_read", lambda: pytest.fail("status file re-read"))
+
+        assert status.packages() is packages
+
+    def test_conffiles_from_info_dir(self, tmp_path):
+        path = tmp_path / "status"
+        path.write_text("Package: nginx\nStatus: install ok installed\nArchitecture: amd64\n")
+        (tmp_path / "info").mkdir()
+        (tmp_path / "info" / "nginx.conffiles").write_text("/etc/nginx/nginx.conf\n")
+        status = DpkgStatus(str(path))
+
+        assert status.conffiles(status.get("nginx")) == ("/etc/nginx/nginx.conf",)
+
+    def test_conffiles_from_status(self, status_file):
+        status = DpkgStatus(str(status_file), info_dir="/nonexistent")
+
+        assert status.conffiles(status.get("adduser")) == (
+            "/etc/adduser.conf",
+            "/etc/deluser.conf",
+        )
+        assert status.conffiles(status.get("nginx")) == ()
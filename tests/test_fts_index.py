@@ -0,0 +1,95 @@
+"""Tests for the trigger-maintained FTS5 index of history tables."""
+
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from cortex.utils.fts_index import FullTextIndex, fts_query
+
+
+@pytest.fixture
+def conn(tmp_path):
+    with closing(sqlite3.connect(tmp_path / "history.db")) as conn:
+        conn.execute("CREATE TABLE records (id TEXT PRIMARY KEY, command TEXT, error_message TEXT)")
+        yield conn
+
+
+@pytest.fixture
+def index():
+    return FullTextIndex("records_fts", "records", ["command", "error_message"])
+
+
+def search(conn, index, text):
+    return [row[0] for row in conn.execute(index.search_sql("t.id"), (fts_query(text), 10))]
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query("apt-get --fix-broken") == '"apt-get" "--fix-broken"'
+    assert fts_query('say "hi" lib*') == '"say" """hi""" "lib"*'
+    assert fts_query("  -- * ") == ""
+    assert fts_query("docker* nginx", any_term=True) == '"docker"* OR "nginx"'
+
+
+def test_triggers_keep_index_in_sync(conn, index):
+    index.create(conn)
+    conn.execute("INSERT INTO records VALUES ('a', 'apt-get install nginx', NULL)")
+    conn.execute("INSERT INTO records VALUES ('b', 'apt-get install redis', 'dpkg lock held')")
+    assert sorted(search(conn, index, "apt-get")) == ["a", "b"]
+
+    conn.execute("UPDATE records SET error_message = 'Unable to locate package' WHERE id = 'a'")
+    assert search(conn, index, "unable locate") == ["a"]
+
+    # REPLACE drops the old row without firing delete triggers
+    conn.execute("INSERT OR REPLACE INTO records VALUES ('b', 'pip install redis', NULL)")
+    assert search(conn, index, "lock") == []
+    assert search(conn, index, "pip") == ["b"]
+
+    conn.execute("DELETE FROM records WHERE id = 'a'")
+    assert search(conn, index, "nginx") == []
+    assert conn.execute("SELECT COUNT(*) FROM records_fts").fetchone()[0] == 1
+
+
+def test_ranking_and_snippets(conn, index):
+    index.create(conn)
+    conn.execute("INSERT INTO records VALUES ('once', 'apt-get install nginx curl wget', NULL)")
+    conn.execute("INSERT INTO records VALUES ('twice', 'systemctl restart nginx', 'nginx failed')")
+    conn.execute("INSERT INTO records VALUES ('none', 'apt-get install redis', NULL)")
+
+    rows = conn.execute(index.search_sql("t.id"), (fts_query("nginx"), 10)).fetchall()
+
+    assert [row[0] for row in rows] == ["twice", "once"]
+    assert rows[0][1] <= rows[1][1]
+    assert "[nginx]" in rows[0][2]
+
+
+def test_existing_rows_are_backfilled(conn, index):
+    conn.executemany(
+        "INSERT INTO records VALUES (?, ?, NULL)",
+        [(f"r{i}", f"apt-get install pkg{i}") for i in range(25)],
+    )
+    index.create(conn)
+    conn.commit()
+    assert not index.ready(conn)
+
+    # Written after the index exists: indexed by the trigger, skipped by the backfill
+    conn.execute("UPDATE records SET command = 'apt-get install pkg3 extra' WHERE id = 'r3'")
+    conn.commit()
+
+    while not index.backfill(conn, batch_size=10):
+        pass
+
+    assert index.ready(conn)
+    assert search(conn, index, "pkg7") == ["r7"]
+    assert search(conn, index, "pkg3") == ["r3"]
+    assert conn.execute("SELECT COUNT(*) FROM records_fts").fetchone()[0] == 25
+
+
+def test_rebuild(conn, index):
+    index.create(conn)
+    conn.execute("INSERT INTO records VALUES ('a', 'apt-get install nginx', NULL)")
+    conn.execute("DELETE FROM records_fts")
+
+    index.rebuild(conn)
+
+    assert search(conn, index, "nginx") == ["a"]
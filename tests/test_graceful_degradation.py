@@ -5,6 +5,8 @@ Issue: #257
 """
 
 import os
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import pytest
@@ -104,6 +106,73 @@ class TestResponseCache:
         # The test validates the method runs without error
         assert cleared >= 0
 
+    def test_get_similar_weights_rare_words(self, cache):
+        """A shared package name outweighs shared common words."""
+        for i in range(20):
+            cache.put(f"install package number {i}", f"sudo apt install pkg{i}")
+        cache.put("how do i configure postgresql", "sudo nano /etc/postgresql/main.conf")
+
+        similar = cache.get_similar("install postgresql", limit=3)
+
+        assert similar[0].query == "how do i configure postgresql"
+        assert len(similar) == 3
+        assert cache.get_similar("completely unrelated words") == []
+        assert cache.get_similar("???") == []
+
+    def test_get_similar_prunes_to_rare_terms(self, cache):
+        """Ranking the holders of rare terms gives the same top entries."""
+        for i in range(30):
+            cache.put(f"install server tools {i}", "response")
+        cache.put("install redis server", "sudo apt install redis-server")
+        cache.put("redis cli", "sudo apt install redis-tools")
+
+        with patch("cortex.graceful_degradation._CANDIDATE_POSTINGS", 2):
+            pruned = cache.get_similar("install redis server", limit=2)
+        full = cache.get_similar("install redis server", limit=2)
+
+        assert [s.query for s in pruned] == ["install redis server", "redis cli"]
+        assert [s.query for s in pruned] == [s.query for s in full]
+
+    def test_get_similar_considers_the_whole_cache(self, cache):
+        """Entries are found however rarely they were used."""
+        for i in range(150):
+            cache.put(f"popular query {i}", "response")
+            for _ in range(2):
+                cache.get(f"popular query {i}")
+        cache.put("install redis server", "sudo apt install redis-server")
+
+        assert cache.get_similar("redis")[0].response == "sudo apt install redis-server"
+
+    def test_replaced_and_removed_entries_leave_the_index(self, cache):
+        """Postings follow puts, replacements and deletions."""
+        cache.put("install docker", "old")
+        cache.put("Install Docker", "new")
+        assert [s.response for s in cache.get_similar("docker")] == ["new"]
+
+        cache.clear_old_entries(days=-1, archive=False)
+        assert cache.get_similar("docker") == []
+        assert cache.get_stats()["total_entries"] == 0
+
+    def test_existing_cache_is_indexed_on_open(self, tmp_path):
+        """Caches from before the term index are indexed when opened."""
+        import sqlite3
+
+        ResponseCache(tmp_path / "cache.db").put(
+            "install nginx web server", "sudo apt install nginx"
+        )
+        conn = sqlite3.connect(tmp_path / "cache.db")
+        for trigger in ("after_insert", "after_delete"):
+            conn.execute(f"DROP TRIGGER response_cache_terms_{trigger}")
+        conn.execute("DROP TABLE response_cache_terms")
+        conn.execute("DROP TABLE response_cache_size")
+        conn.commit()
+        conn.close()
+
+        cache = ResponseCache(tmp_path / "cache.db")
+        assert [s.query for s in cache.get_similar("nginx")] == ["install nginx web server"]
+        cache.put("install nginx extras", "sudo apt install nginx-extras")
+        assert len(cache.get_similar("nginx")) == 2
+
 
 class TestPatternMatcher:
     """Tests for the PatternMatcher class."""
@@ -313,6 +382,112 @@ class TestGracefulDegradation:
         assert cached.response == "cached response"
 
 
+def wait_for(condition, timeout=5.0):
+    """Poll ``condition`` until it holds or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestHealthMonitor:
+    """Tests for the background API health monitor."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        cache = ResponseCache(tmp_path / "test_cache.db")
+        manager = GracefulDegradation(cache=cache, health_check_interval=60, api_timeout=0.2)
+        with patch("cortex.graceful_degradation.HEALTH_BACKOFF_BASE", 0.01):
+            yield manager
+            manager.stop_health_monitor(timeout=5)
+
+    def test_degrades_and_recovers_without_queries(self, manager):
+        """Failed probes switch the mode before any query is made."""
+        healthy = threading.Event()
+        manager.start_health_monitor({"api": healthy.is_set})
+
+        assert wait_for(lambda: manager.current_mode == FallbackMode.PATTERN_MATCHING)
+        assert manager.get_status()["providers"]["api"]["consecutive_failures"] >= 3
+
+        healthy.set()
+        assert wait_for(lambda: manager.current_mode == FallbackMode.FULL_AI)
+        assert manager.get_status()["api_status"] == "available"
+
+    def test_healthiest_provider_sets_the_mode(self, manager):
+        """One provider down does not degrade while another answers."""
+        down = Mock(return_value=False)
+        manager.start_health_monitor({"down": down, "up": lambda: True})
+
+        assert wait_for(lambda: down.call_count >= 4)
+        status = manager.get_status()
+        assert manager.current_mode == FallbackMode.FULL_AI
+        assert status["monitor_running"] is True
+        assert status["providers"]["up"]["success_rate"] == 1.0
+        assert status["providers"]["down"]["status"] == "unavailable"
+
+    def test_hung_probe_counts_as_failure(self, manager):
+        """A probe not answering within api_timeout is a failure."""
+        release = threading.Event()
+        manager.start_health_monitor({"api": lambda: release.wait(10)})
+        try:
+            assert wait_for(lambda: manager.get_status()["providers"].get("api"))
+            assert manager.get_status()["providers"]["api"]["status"] == "unavailable"
+            assert manager.current_mode != FallbackMode.FULL_AI
+        finally:
+            release.set()
+
+    def test_llm_failure_triggers_a_probe(self, manager):
+        """A failed LLM call wakes the monitor instead of waiting the interval."""
+        probe = Mock(return_value=True)
+        manager.start_health_monitor({"api": probe})
+        assert wait_for(lambda: probe.call_count == 1)
+
+        manager.process_query("install docker", llm_fn=Mock(side_effect=Exception("API Error")))
+
+        assert wait_for(lambda: probe.call_count == 2)
+        assert wait_for(lambda: manager.current_mode == FallbackMode.FULL_AI)
+
+    def test_failing_llm_degrades_while_probes_pass(self, manager):
+        """Probes reporting healthy do not undo failed LLM calls."""
+        manager.start_health_monitor({"api": lambda: True})
+        assert wait_for(lambda: manager.get_status()["providers"].get("api"))
+        llm = Mock(side_effect=Exception("API Error"))
+
+        with patch("cortex.graceful_degradation.HEALTH_BACKOFF_BASE", 30):
+            for _ in range(6):
+                manager.process_query("install docker", llm_fn=llm)
+                time.sleep(0.05)
+
+        assert llm.call_count == 1
+        assert manager.current_mode == FallbackMode.CACHED_ONLY
+        assert manager.get_status()["llm_failures"] == 1
+
+    def test_llm_is_retried_after_backoff(self, manager):
+        """After the backoff the next query tries the LLM again."""
+        manager.start_health_monitor({"api": lambda: True})
+        llm = Mock(side_effect=[Exception("API Error"), "sudo apt install docker.io"])
+
+        manager.process_query("install docker", llm_fn=llm)
+        assert manager.current_mode != FallbackMode.FULL_AI
+        assert wait_for(lambda: manager.current_mode == FallbackMode.FULL_AI)
+
+        result = manager.process_query("install docker", llm_fn=llm)
+        assert result["source"] == "llm"
+        assert manager.get_status()["llm_failures"] == 0
+
+    def test_start_is_idempotent_and_stop_joins(self, manager):
+        """Starting twice keeps one monitor; stopping ends it."""
+        thread = manager.start_health_monitor({"api": lambda: True})
+        assert manager.start_health_monitor() is thread
+
+        manager.stop_health_monitor(timeout=5)
+
+        assert not thread.is_alive()
+        assert manager.get_status()["monitor_running"] is False
+
+
 class TestGlobalFunctions:
     """Tests for module-level convenience functions."""
 
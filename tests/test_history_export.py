@@ -0,0 +1,141 @@
+"""Tests for streaming history export."""
+
+import csv
+import gzip
+import json
+import subprocess
+import sys
+
+import pytest
+
+from cortex import history_export
+from cortex.history_export import compression_for, write_records
+
+
+def records(count):
+    for i in range(count):
+        yield {
+            "id": f"id{i}",
+            "timestamp": f"2024-01-01T00:00:{i % 60:02d}",
+            "operation": "install",
+            "packages": ["nginx", f"lib{i}"],
+            "status": "failed" if i % 2 else "success",
+            "duration": 1.5 if i % 2 else None,
+            "error": "E: Unable to locate package" if i % 2 else None,
+        }
+
+
+def test_json_array(tmp_path):
+    path = tmp_path / "history.json"
+
+    assert write_records(records(5), path, chunk_size=2) == 5
+
+    data = json.loads(path.read_text())
+    assert [r["id"] for r in data] == [f"id{i}" for i in range(5)]
+    assert data[1]["packages"] == ["nginx", "lib1"]
+
+
+def test_empty_json_array(tmp_path):
+    path = tmp_path / "history.json"
+
+    assert write_records([], path) == 0
+    assert json.loads(path.read_text()) == []
+
+
+def test_ndjson_gzip(tmp_path):
+    path = tmp_path / "history.ndjson.gz"
+
+    assert write_records(records(3), path, "ndjson", compression_for(path)) == 3
+
+    with gzip.open(path, "rt") as f:
+        lines = [json.loads(line) for line in f]
+    assert [r["status"] for r in lines] == ["success", "failed", "success"]
+
+
+def test_csv(tmp_path):
+    path = tmp_path / "history.csv"
+
+    write_records(records(2), path, "csv")
+
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["ID", "Timestamp", "Operation", "Packages", "Status", "Duration", "Error"]
+    assert rows[1][3] == "nginx, lib0"
+    assert rows[1][5:] == ["", ""]
+    assert rows[2][5:] == ["1.5", "E: Unable to locate package"]
+
+
+def test_records_are_written_per_chunk(tmp_path):
+    path = tmp_path / "history.ndjson"
+
+    def source():
+        yield from records(6)
+        raise RuntimeError("database went away")
+
+    with pytest.raises(RuntimeError):
+        write_records(source(), path, "ndjson", chunk_size=4)
+
+    # The first chunk was written before the second was read
+    assert len(path.read_text().splitlines()) == 4
+
+
+def test_compression_for():
+    assert compression_for("history.csv.gz") == "gzip"
+    assert compression_for("history.ndjson.zst") == "zstd"
+    assert compression_for("history.json") is None
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        write_records([], tmp_path / "history.xml", "xml")
+    with pytest.raises(ValueError):
+        write_records([], tmp_path / "history.json", compression="bz2")
+
+
+def test_missing_optional_libraries(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_export, "PYARROW_AVAILABLE", False)
+    monkeypatch.setattr(history_export, "ZSTD_AVAILABLE", False)
+
+    with pytest.raises(RuntimeError, match="pyarrow"):
+        write_records([], tmp_path / "history.parquet", "parquet")
+    with pytest.raises(RuntimeError, match="zstandard"):
+        write_records([], tmp_path / "history.json.zst", compression="zstd")
+    with pytest.raises(RuntimeError, match="zstandard"):
+        next(history_export.read_records(tmp_path / "history.ndjson.zst"))
+    assert not (tmp_path / "history.parquet").exists()
+    assert not (tmp_path / "history.json.zst").exists()
+
+
+def test_optional_libraries_are_imported_on_use():
+    """Importing the history does not pay for pyarrow or zstandard."""
+    code = (
+        "import sys, cortex.installation_history; "
+        "print(sorted(m for m in ('pyarrow', 'zstandard') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_zstd(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "history.ndjson.zst"
+
+    write_records(records(3), path, "ndjson", "zstd")
+
+    with open(path, "rb") as f:
+        text = zstandard.ZstdDecompressor().stream_reader(f).read().decode()
+    assert len(text.splitlines()) == 3
+
+
+def test_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "history.parquet"
+
+    write_records(records(5), path, "parquet", chunk_size=2)
+
+    table = pq.read_table(path)
+    assert table.num_rows == 5
+    assert table.column("packages").to_pylist()[0] == ["nginx", "lib0"]
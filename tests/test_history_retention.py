@@ -0,0 +1,201 @@
+"""Tests for history retention: monthly archive segments and incremental vacuum."""
+
+import os
+import sqlite3
+import stat
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from cortex.graceful_degradation import ResponseCache
+from cortex.history_retention import (
+    AUTO_VACUUM_INCREMENTAL,
+    MonthlyArchive,
+    archive_rows,
+    auto_vacuum,
+    default_archive_dir,
+    enable_incremental_vacuum,
+    start_incremental_vacuum,
+)
+from cortex.installation_history import InstallationHistory, InstallationStatus, InstallationType
+
+
+@pytest.fixture
+def conn(tmp_path):
+    with closing(sqlite3.connect(tmp_path / "live.db")) as conn:
+        conn.execute("CREATE TABLE records (id TEXT PRIMARY KEY, timestamp TEXT, payload TEXT)")
+        conn.executemany(
+            "INSERT INTO records VALUES (?, ?, ?)",
+            [
+                ("a", "2024-01-05T10:00:00", "x" * 100),
+                ("b", "2024-01-31T23:59:59", "y"),
+                ("c", "2024-02-10 08:00:00", "z"),
+                ("d", "2024-03-15T12:00:00", "w"),
+            ],
+        )
+        conn.commit()
+        yield conn
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return MonthlyArchive(tmp_path / "archive", "records")
+
+
+def live_ids(conn):
+    return [row[0] for row in conn.execute("SELECT id FROM records ORDER BY id")]
+
+
+def test_default_archive_dir(tmp_path):
+    assert default_archive_dir(tmp_path / "history.db") == tmp_path / "history-archive"
+
+
+def test_whole_months_before_cutoff_are_archived(conn, archive):
+    removed = archive_rows(conn, "records", archive, datetime(2024, 3, 20))
+
+    assert removed == 3
+    assert live_ids(conn) == ["d"]
+    assert [month for month, _ in archive.segments()] == ["2024-01", "2024-02"]
+    assert [row["id"] for row in archive.iter_records()] == ["a", "b", "c"]
+    assert next(archive.iter_records())["payload"] == "x" * 100
+
+
+def test_segments_are_read_only(conn, archive):
+    archive_rows(conn, "records", archive, datetime(2024, 3, 1))
+
+    for _, path in archive.segments():
+        assert not os.stat(path).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def test_rerun_archives_nothing(conn, archive):
+    archive_rows(conn, "records", archive, datetime(2024, 3, 1))
+
+    assert archive_rows(conn, "records", archive, datetime(2024, 3, 1)) == 0
+    assert len(archive.segments()) == 2
+
+
+def test_interrupted_run_is_not_archived_twice(conn, archive):
+    # A segment was written but its rows were never deleted
+    archive.write("2024-01", [{"id": "a", "timestamp": "2024-01-05T10:00:00", "payload": ""}])
+
+    assert archive_rows(conn, "records", archive, datetime(2024, 2, 1)) == 2
+
+    assert [row["id"] for row in archive.iter_records()] == ["a", "b"]
+    assert len(archive.segments()) == 2
+
+
+def test_iter_records_range(conn, archive):
+    archive_rows(conn, "records", archive, datetime(2024, 4, 1))
+
+    rows = archive.iter_records(since="2024-01-20", until="2024-03-15T12:00:00")
+
+    assert [row["id"] for row in rows] == ["b", "c"]
+
+
+def test_incremental_vacuum_shrinks_database(tmp_path):
+    path = tmp_path / "live.db"
+
+    @contextmanager
+    def connect():
+        with closing(sqlite3.connect(path)) as conn:
+            yield conn
+
+    with connect() as conn:
+        conn.execute("CREATE TABLE blobs (data BLOB)")
+        conn.executemany("INSERT INTO blobs VALUES (?)", [(b"x" * 4000,) for _ in range(500)])
+        conn.commit()
+
+        # An existing database is rewritten once
+        assert enable_incremental_vacuum(conn)
+        assert not enable_incremental_vacuum(conn)
+        assert auto_vacuum(conn) == AUTO_VACUUM_INCREMENTAL
+
+        conn.execute("DELETE FROM blobs")
+        conn.commit()
+        size = path.stat().st_size
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+    start_incremental_vacuum(connect, pages_per_step=50).join(timeout=10)
+
+    with connect() as conn:
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert path.stat().st_size < size
+
+
+class TestInstallationRetention:
+    @pytest.fixture
+    def history(self, tmp_path):
+        history = InstallationHistory(str(tmp_path / "history.db"))
+        for days, status in ((400, InstallationStatus.FAILED), (200, None), (0, None)):
+            install_id = history.record_installation(
+                InstallationType.INSTALL,
+                ["nginx"],
+                ["sudo apt-get install -y nginx"],
+                datetime.now() - timedelta(days=days),
+            )
+            if status:
+                history.update_installation(install_id, status, "E: Unable to locate package")
+        return history
+
+    def test_new_database_uses_incremental_vacuum(self, history):
+        with history._pool.get_connection() as conn:
+            assert auto_vacuum(conn) == AUTO_VACUUM_INCREMENTAL
+
+    def test_cleanup_archives_records(self, history):
+        assert history.cleanup_old_records(days=90) == 2
+
+        assert len(history.get_history()) == 1
+        assert len(history.archive.segments()) == 2
+        assert history.search_text("unable") == []
+
+        exported = list(history.iter_history(include_archived=True))
+        assert len(exported) == 3
+        assert exported[0]["error"] == "E: Unable to locate package"
+
+        failed = history.iter_history(
+            status_filter=InstallationStatus.FAILED, include_archived=True
+        )
+        assert [r["status"] for r in failed] == ["failed"]
+
+    def test_cleanup_without_archive(self, history):
+        assert history.cleanup_old_records(days=90, archive=False) == 2
+        assert history.archive.segments() == []
+
+    def test_old_database_is_converted(self, tmp_path):
+        path = tmp_path / "old.db"
+        with closing(sqlite3.connect(path)) as conn:
+            # Created before incremental vacuum
+            conn.execute("CREATE TABLE legacy (id INTEGER)")
+            conn.commit()
+        history = InstallationHistory(str(path))
+        install_id = history.record_installation(
+            InstallationType.INSTALL, ["nginx"], ["apt-get install nginx"], datetime.now()
+        )
+
+        history.cleanup_old_records(days=90)
+
+        with history._pool.get_connection() as conn:
+            assert auto_vacuum(conn) == AUTO_VACUUM_INCREMENTAL
+        # The full-text index was rebuilt for the renumbered rows
+        assert [hit.record_id for hit in history.search_text("nginx")] == [install_id]
+
+
+def test_response_cache_archives_old_entries(tmp_path):
+    cache = ResponseCache(tmp_path / "response_cache.db")
+    cache.put("install nginx", "sudo apt install nginx")
+    cache.put("install docker", "sudo apt install docker.io")
+    with cache._pool.get_connection() as conn:
+        conn.execute(
+            "UPDATE response_cache SET created_at = '2020-05-01 10:00:00' "
+            "WHERE query = 'install nginx'"
+        )
+        conn.commit()
+
+    assert cache.clear_old_entries(days=30) == 1
+
+    assert cache.get("install nginx") is None
+    assert cache.get("install docker") is not None
+    assert [row["query"] for row in cache.archive.iter_records(timestamp_column="created_at")] == [
+        "install nginx"
+    ]
@@ -0,0 +1,93 @@
+"""Tests for full-text search across the history stores."""
+
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from cortex.history_search import search_history
+from cortex.installation_history import InstallationHistory, InstallationStatus, InstallationType
+from cortex.sandbox.audit_log import SandboxAuditLog
+from cortex.transaction_history import PackageState, TransactionHistory, TransactionType
+
+
+@pytest.fixture
+def stores(tmp_path):
+    installations = InstallationHistory(db_path=str(tmp_path / "history.db"))
+    install_id = installations.record_installation(
+        InstallationType.INSTALL,
+        ["nginx"],
+        ["sudo apt-get install -y nginx"],
+        datetime.now(),
+    )
+    installations.update_installation(
+        install_id, InstallationStatus.FAILED, "E: Unable to locate package nginx-extras"
+    )
+
+    transactions = TransactionHistory(tmp_path / "transactions.db")
+    with patch.object(transactions, "_capture_package_state", lambda pkg: PackageState(pkg)):
+        tx = transactions.begin_transaction(
+            TransactionType.INSTALL, ["redis-server"], "apt install redis-server"
+        )
+        transactions.complete_transaction(tx, success=False, error_message="dpkg lock held")
+
+    audit = SandboxAuditLog(tmp_path / "sandbox_audit.db")
+    audit.record(
+        {
+            "timestamp": datetime.now().isoformat(),
+            "type": "execution",
+            "command": "apt-get install nginx",
+            "exit_code": 100,
+            "stderr": "Could not get lock /var/lib/dpkg/lock-frontend",
+        }
+    )
+    return {
+        "installation_history": installations,
+        "transaction_history": transactions,
+        "audit_log": audit,
+        "install_id": install_id,
+        "tx_id": tx.id,
+    }
+
+
+def search(stores, query, **kwargs):
+    return search_history(
+        query,
+        installation_history=stores["installation_history"],
+        transaction_history=stores["transaction_history"],
+        audit_log=stores["audit_log"],
+        **kwargs,
+    )
+
+
+def test_installation_search(stores):
+    hits = stores["installation_history"].search_text("unable locate")
+
+    assert [hit.record_id for hit in hits] == [stores["install_id"]]
+    assert hits[0].source == "installations"
+    assert hits[0].summary == "install nginx"
+    assert "[Unable]" in hits[0].snippet
+
+
+def test_transaction_search(stores):
+    hits = stores["transaction_history"].search_text("redis*")
+
+    assert [hit.record_id for hit in hits] == [stores["tx_id"]]
+    assert hits[0].summary == "install redis-server (failed)"
+
+
+def test_search_across_stores(stores):
+    hits = search(stores, "lock")
+
+    assert {hit.source for hit in hits} == {"transactions", "audit"}
+    assert all(hits[i].score <= hits[i + 1].score for i in range(len(hits) - 1))
+
+
+def test_search_sources_and_limit(stores):
+    assert {hit.source for hit in search(stores, "nginx")} == {"installations", "audit"}
+    assert [hit.source for hit in search(stores, "nginx", sources=["audit"])] == ["audit"]
+    assert len(search(stores, "nginx", limit=1)) == 1
+    assert search(stores, "--") == []
+
+    with pytest.raises(ValueError):
+        search(stores, "nginx", sources=["nope"])
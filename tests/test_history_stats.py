@@ -0,0 +1,205 @@
+"""Tests for the materialized outcome statistics of the history databases."""
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pytest
+
+from cortex.installation_history import InstallationHistory, InstallationStatus, InstallationType
+from cortex.transaction_history import TransactionHistory, TransactionType
+from cortex.utils.history_stats import (
+    HistoryStats,
+    KeyStats,
+    Outcome,
+    command_pattern,
+    estimate_plan,
+)
+
+
+def outcome_of(row):
+    return Outcome(row["id"], json.loads(row["packages"]), [], row["status"] == "ok")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    with closing(sqlite3.connect(tmp_path / "stats.db")) as conn:
+        conn.execute("CREATE TABLE runs (id TEXT PRIMARY KEY, packages TEXT, status TEXT)")
+        yield conn
+
+
+@pytest.fixture
+def stats(conn):
+    stats = HistoryStats("run", "runs", outcome_of=outcome_of)
+    stats.create(conn)
+    return stats
+
+
+@pytest.mark.parametrize(
+    "command, pattern",
+    [
+        ("sudo apt-get install -y nginx", "apt-get install"),
+        ("sudo DEBIAN_FRONTEND=noninteractive apt-get install redis", "apt-get install"),
+        ("pip3 install --upgrade torch", "pip3 install"),
+        ("/usr/bin/systemctl restart nginx", "systemctl restart"),
+        ("curl -fsSL https://example.com/key.gpg", "curl"),
+        ("sudo", None),
+    ],
+)
+def test_command_pattern(command, pattern):
+    assert command_pattern(command) == pattern
+
+
+def test_success_rate_and_failure_categories(conn, stats):
+    stats.record(conn, Outcome("1", ["nginx"], ["apt-get install nginx"], True, 10))
+    stats.record(conn, Outcome("2", ["nginx"], ["apt-get install nginx"], True, 12))
+    stats.record(
+        conn,
+        Outcome(
+            "3",
+            ["nginx", "redis"],
+            ["apt-get install nginx redis"],
+            False,
+            3,
+            "E: Could not get lock /var/lib/dpkg/lock",
+        ),
+    )
+
+    nginx = stats.get(conn, "package", "nginx")
+    assert (nginx.attempts, nginx.successes, nginx.failures) == (3, 2, 1)
+    assert nginx.success_rate == pytest.approx(2 / 3)
+    assert nginx.failure_categories == {"lock_error": 1}
+    assert stats.get(conn, "pattern", "apt-get install").attempts == 3
+    assert stats.get(conn, "all", "*").attempts == 3
+    assert [s.key for s in stats.top(conn, "package")] == ["nginx", "redis"]
+    assert stats.get(conn, "package", "docker") is None
+
+
+def test_duration_percentiles_within_a_bucket(conn, stats):
+    for i, seconds in enumerate([1.0] * 18 + [60.0, 120.0]):
+        stats.record(conn, Outcome(str(i), ["nginx"], [], True, seconds))
+
+    nginx = stats.get(conn, "package", "nginx")
+    assert 1.0 <= nginx.p50_duration <= 1.25
+    assert 60.0 <= nginx.p95_duration <= 75.0
+
+
+def test_rewritten_outcome_replaces_the_earlier_one(conn, stats):
+    stats.record(conn, Outcome("1", ["nginx"], [], False, 5, "No space left on device"))
+    stats.record(conn, Outcome("1", ["nginx"], [], True, 5))
+
+    nginx = stats.get(conn, "package", "nginx")
+    assert (nginx.attempts, nginx.successes, nginx.failure_categories) == (1, 1, {})
+
+
+def test_backfill_counts_existing_records_once(tmp_path):
+    with closing(sqlite3.connect(tmp_path / "runs.db")) as conn:
+        conn.execute("CREATE TABLE runs (id TEXT PRIMARY KEY, packages TEXT, status TEXT)")
+        conn.executemany(
+            "INSERT INTO runs VALUES (?, ?, ?)",
+            [(str(i), json.dumps(["nginx"]), "ok" if i % 4 else "failed") for i in range(8)],
+        )
+        stats = HistoryStats("run", "runs", outcome_of=outcome_of)
+        stats.create(conn)
+        conn.commit()
+        assert not stats.ready(conn)
+
+        # Written (and counted) while the backfill is pending
+        stats.record(conn, Outcome("0", ["nginx"], [], False))
+        conn.commit()
+        while not stats.backfill(conn, batch_size=3):
+            pass
+
+        nginx = stats.get(conn, "package", "nginx")
+        assert (nginx.attempts, nginx.successes) == (8, 6)
+
+
+def test_estimate_plan():
+    assert estimate_plan([]) is None
+
+    estimate = estimate_plan(
+        [
+            KeyStats("package", "nginx", 8, 8, p50_duration=10.0),
+            KeyStats("package", "redis", 2, 1, p50_duration=30.0),
+        ]
+    )
+    assert estimate.duration == 30.0
+    assert estimate.failure_risk == pytest.approx(1 - (9 / 10) * (2 / 4))
+    assert estimate.samples == 8
+
+
+class TestInstallationStats:
+    def test_update_installation_counts_outcomes(self, tmp_path):
+        history = InstallationHistory(str(tmp_path / "history.db"))
+        for status in (InstallationStatus.SUCCESS, InstallationStatus.FAILED):
+            install_id = history.record_installation(
+                InstallationType.INSTALL,
+                ["nginx"],
+                ["sudo apt-get install -y nginx"],
+                datetime.now() - timedelta(seconds=30),
+            )
+            history.update_installation(install_id, status, "E: Unable to locate package nginx")
+
+        (nginx,) = history.get_outcome_stats("package")
+        assert (nginx.key, nginx.attempts, nginx.successes) == ("nginx", 2, 1)
+        assert nginx.failure_categories == {"package_not_found": 1}
+        assert 30 <= nginx.p50_duration <= 40
+        assert history.get_outcome_stats("pattern", key="apt-get install")[0].attempts == 2
+
+        estimate = history.estimate_plan(["nginx", "unknown-package"])
+        assert estimate.failure_risk == pytest.approx(0.5)
+        assert history.estimate_plan(["unknown-package"]) is None
+
+    def test_statistics_survive_retention(self, tmp_path):
+        history = InstallationHistory(str(tmp_path / "history.db"))
+        install_id = history.record_installation(
+            InstallationType.INSTALL, ["nginx"], [], datetime(2020, 1, 1)
+        )
+        history.update_installation(install_id, InstallationStatus.SUCCESS)
+
+        assert history.cleanup_old_records(days=30) == 1
+        assert history.get_outcome_stats("package", key="nginx")[0].attempts == 1
+
+    def test_unknown_kind_is_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            InstallationHistory(str(tmp_path / "history.db")).get_outcome_stats("user")
+
+
+class TestTransactionStats:
+    def test_complete_transaction_counts_outcomes(self, tmp_path):
+        history = TransactionHistory(tmp_path / "tx.db")
+        for success in (True, True, False):
+            tx = history.begin_transaction(
+                TransactionType.INSTALL, ["nginx"], "sudo apt install nginx"
+            )
+            history.complete_transaction(tx, success=success, error_message="dpkg was interrupted")
+
+        stats = history.get_stats()
+        assert stats["success_rate"] == pytest.approx(2 / 3)
+        assert stats["p50_duration"] is not None
+        (pattern,) = history.get_outcome_stats("pattern")
+        assert (pattern.key, pattern.attempts) == ("apt install", 3)
+
+    def test_existing_transactions_are_backfilled(self, tmp_path, monkeypatch):
+        TransactionHistory(tmp_path / "tx.db")
+        with closing(sqlite3.connect(tmp_path / "tx.db")) as conn:
+            # A database from before the statistics tables (schema version 3)
+            for table in ("stats", "durations", "failures", "outcomes"):
+                conn.execute(f"DROP TABLE transaction_{table}")
+            conn.execute("PRAGMA user_version = 3")
+            conn.executemany(
+                "INSERT INTO transactions (id, transaction_type, packages, timestamp, status, "
+                "command) VALUES (?, 'install', ?, '2024-01-01T00:00:00', 'completed', '')",
+                [(f"tx_{i}", json.dumps(["nginx"] if i % 2 else ["redis"])) for i in range(10)],
+            )
+            conn.commit()
+
+        monkeypatch.setattr(HistoryStats, "start_backfill", lambda self, connect: None)
+        history = TransactionHistory(tmp_path / "tx.db")
+        with closing(sqlite3.connect(tmp_path / "tx.db")) as conn:
+            while not history.stats.backfill(conn):
+                pass
+
+        assert history.get_outcome_stats("package", key="nginx")[0].attempts == 5
+        assert history.get_stats()["success_rate"] == 1.0
@@ -7,6 +7,7 @@ import os
 import tempfile
 import unittest
 from datetime import datetime
+from unittest.mock import patch
 
 from cortex.installation_history import (
     InstallationHistory,
@@ -118,6 +119,66 @@ class TestInstallationHistory(unittest.TestCase):
             self.assertIsNotNone(snapshot.version)
             self.assertEqual(snapshot.package_name, "bash")
 
+    def test_package_snapshot_from_status_file(self):
+        """Test snapshots are read from the dpkg status file"""
+        with tempfile.TemporaryDirectory() as tmp:
+            status = os.path.join(tmp, "status")
+            with open(status, "w") as f:
+                f.write(
+                    "Package: nginx\nStatus: install ok installed\nVersion: 1.24.0\n"
+                    "Depends: libc6 (>= 2.34), nginx-common | nginx-full\n"
+                    "Conffiles:\n /etc/nginx/nginx.conf 0123456789abcdef\n"
+                )
+
+            with (
+                patch("cortex.dpkg_status.DPKG_STATUS_PATH", status),
+                patch("subprocess.run") as mock_run,
+            ):
+                snapshot = self.history._get_package_info("nginx")
+                missing = self.history._get_package_info("redis")
+
+        mock_run.assert_not_called()
+        self.assertEqual(snapshot.status, "installed")
+        self.assertEqual(snapshot.version, "1.24.0")
+        self.assertEqual(snapshot.dependencies, ["libc6", "nginx-common"])
+        self.assertEqual(missing.status, "not-installed")
+
+    def test_before_snapshot_is_taken_before_execution(self):
+        """Test the background snapshot reflects the state at record time"""
+        with tempfile.TemporaryDirectory() as tmp:
+            status = os.path.join(tmp, "status")
+            with open(status, "w") as f:
+                f.write("Package: libc6\nStatus: install ok installed\nVersion: 2.36\n")
+
+            with patch("cortex.dpkg_status.DPKG_STATUS_PATH", status):
+                install_id = self.history.record_installation(
+                    InstallationType.INSTALL,
+                    ["nginx", "libc6"],
+                    ["apt install nginx"],
+                    datetime.now(),
+                )
+                # The installation runs while the snapshot is built
+                with open(status, "a") as f:
+                    f.write("\nPackage: nginx\nStatus: install ok installed\nVersion: 1.24.0\n")
+                stat = os.stat(status)
+                os.utime(status, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+                self.history.update_installation(install_id, InstallationStatus.SUCCESS)
+
+        record = self.history.get_installation(install_id)
+        before = {s.package_name: s.status for s in record.before_snapshot}
+        after = {s.package_name: s.status for s in record.after_snapshot}
+        self.assertEqual(before, {"nginx": "not-installed", "libc6": "installed"})
+        self.assertEqual(after, {"nginx": "installed", "libc6": "installed"})
+
+    def test_snapshot_reads_status_once(self):
+        """Test all packages of a snapshot come from one status lookup"""
+        with patch("cortex.installation_history.get_status_index") as mock_index:
+            mock_index.return_value.packages.return_value = {}
+            snapshot = self.history._create_snapshot([f"pkg{i}" for i in range(50)])
+
+        self.assertEqual(len(snapshot), 50)
+        mock_index.return_value.packages.assert_called_once()
+
     def test_rollback_dry_run(self):
         """Test rollback dry run"""
         # Create a mock installation record
@@ -205,6 +266,44 @@ class TestInstallationHistory(unittest.TestCase):
             if os.path.exists(temp_export.name):
                 os.unlink(temp_export.name)
 
+    def test_export_is_not_truncated(self):
+        """Test exports stream every record, in chunks, with filters"""
+        with self.history._pool.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO installations (id, timestamp, operation_type, packages, status) "
+                "VALUES (?, ?, 'install', '[\"nginx\"]', ?)",
+                [
+                    (f"id{i:05d}", f"2024-01-{1 + i % 28:02d}T00:00:{i % 60:02d}", status)
+                    for i in range(2500)
+                    for status in ["failed" if i % 5 == 0 else "success"]
+                ],
+            )
+            conn.commit()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.ndjson.gz")
+            self.assertEqual(self.history.export_history(path, format="ndjson"), 2500)
+
+            count = self.history.export_history(
+                path,
+                format="ndjson",
+                since=datetime(2024, 1, 10),
+                until=datetime(2024, 1, 20),
+                status_filter=InstallationStatus.FAILED,
+            )
+
+            import gzip
+            import json
+
+            with gzip.open(path, "rt") as f:
+                exported = [json.loads(line) for line in f]
+
+        self.assertEqual(len(exported), count)
+        self.assertGreater(count, 0)
+        self.assertTrue(all(r["status"] == "failed" for r in exported))
+        self.assertTrue(all("2024-01-10" <= r["timestamp"] < "2024-01-20" for r in exported))
+        self.assertEqual(exported, sorted(exported, key=lambda r: r["timestamp"]))
+
     def test_cleanup_old_records(self):
         """Test cleaning up old records"""
         # Record installation
@@ -254,6 +353,35 @@ class TestInstallationHistory(unittest.TestCase):
         record = self.history.get_installation("nonexistent-id")
         self.assertIsNone(record)
 
+    def test_checkpoint_roundtrip(self):
+        """Test saving and updating per-step checkpoints"""
+        steps = [
+            {"command": "apt-get install -y nginx", "description": "nginx", "status": "pending"},
+            {"command": "systemctl start nginx", "description": "start", "status": "pending"},
+        ]
+        for i, step in enumerate(steps):
+            self.history.save_checkpoint("run-1", i, step)
+        self.history.save_checkpoint(
+            "run-1",
+            0,
+            {**steps[0], "status": "success", "return_code": 0, "packages": ["nginx"]},
+        )
+
+        saved = self.history.get_checkpoints("run-1")
+        self.assertEqual([s["status"] for s in saved], ["success", "pending"])
+        self.assertEqual(saved[0]["packages"], ["nginx"])
+        self.assertEqual(saved[1]["command"], "systemctl start nginx")
+
+        self.assertEqual(self.history.get_checkpoints("unknown"), [])
+
+    def test_timing_report_roundtrip(self):
+        """Test storing the timing report of a run"""
+        report = {"wall_time": 12.5, "critical_path": ["Step 1", "Step 2"]}
+        self.history.save_timing("run-1", report)
+
+        self.assertEqual(self.history.get_timing("run-1"), report)
+        self.assertIsNone(self.history.get_timing("unknown"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -97,6 +97,51 @@ class TestCommandInterpreter(unittest.TestCase):
         result = interpreter._call_openai("install docker")
         self.assertEqual(result, ["apt update"])
 
+    @patch("openai.OpenAI")
+    def test_parse_stream_yields_commands_incrementally(self, mock_openai):
+        def chunk(text):
+            c = Mock()
+            c.choices = [Mock()]
+            c.choices[0].delta.content = text
+            return c
+
+        yielded_before_end = []
+        chunks = ['{"commands": ["apt update", ', '"apt install -y docker.io"', "]}"]
+
+        def stream():
+            for i, text in enumerate(chunks):
+                if i == 2:
+                    yielded_before_end.extend(received)
+                yield chunk(text)
+
+        mock_client = Mock()
+        mock_client.chat.completions.create.return_value = stream()
+        interpreter = CommandInterpreter(api_key=self.api_key, provider="openai")
+        interpreter.client = mock_client
+        interpreter.cache = None
+
+        received = []
+        for command in interpreter.parse_stream("install docker"):
+            received.append(command)
+
+        self.assertEqual(received, ["apt update", "apt install -y docker.io"])
+        self.assertEqual(yielded_before_end, ["apt update", "apt install -y docker.io"])
+        self.assertTrue(mock_client.chat.completions.create.call_args.kwargs["stream"])
+
+    @patch.dict(
+        os.environ,
+        {"CORTEX_FAKE_COMMANDS": json.dumps({"commands": ["apt update", "rm -rf /", "ls"]})},
+    )
+    def test_parse_stream_aborts_on_unsafe_command(self):
+        interpreter = CommandInterpreter(api_key="fake", provider="fake", cache=Mock())
+        interpreter.cache.get_commands.return_value = None
+        stream = interpreter.parse_stream("install something")
+
+        self.assertEqual(next(stream), "apt update")
+        with self.assertRaises(ValueError):
+            next(stream)
+        interpreter.cache.put_commands.assert_not_called()
+
     @patch("openai.OpenAI")
     def test_call_openai_failure(self, mock_openai):
         mock_client = Mock()
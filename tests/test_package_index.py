@@ -0,0 +1,197 @@
+"""Tests for the normalized package index of the history databases."""
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pytest
+
+from cortex.installation_history import (
+    InstallationHistory,
+    InstallationStatus,
+    InstallationType,
+)
+from cortex.transaction_history import TransactionHistory, TransactionType
+from cortex.utils.package_index import BackfilledIndex, PackageIndex
+
+LEGACY_SCHEMA = """
+CREATE TABLE transactions (
+    id TEXT PRIMARY KEY, transaction_type TEXT NOT NULL, packages TEXT NOT NULL,
+    timestamp TEXT NOT NULL, status TEXT NOT NULL, before_state TEXT, after_state TEXT,
+    command TEXT, user TEXT, duration_seconds REAL, error_message TEXT,
+    rollback_commands TEXT, is_rollback_safe INTEGER, rollback_warning TEXT
+)
+"""
+
+
+def legacy_transactions_db(path, count):
+    """A transaction database written before the package index existed."""
+    start = datetime(2024, 1, 1)
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(LEGACY_SCHEMA)
+        conn.executemany(
+            "INSERT INTO transactions VALUES (?, 'install', ?, ?, 'completed', '{}', '{}', "
+            "'', 'root', 1.0, NULL, '[]', 1, NULL)",
+            [
+                (
+                    f"tx_{i:04d}",
+                    json.dumps(["nginx", f"pkg{i}"] if i % 2 else [f"pkg{i}"]),
+                    (start + timedelta(minutes=i)).isoformat(),
+                )
+                for i in range(count)
+            ],
+        )
+        conn.commit()
+
+
+def connect(path):
+    return lambda: closing(sqlite3.connect(path))
+
+
+@pytest.fixture
+def no_background_backfill(monkeypatch):
+    monkeypatch.setattr(PackageIndex, "start_backfill", lambda self, connect, batch_size=1000: None)
+
+
+class TestTransactionHistory:
+    def test_search_uses_the_index(self, tmp_path):
+        history = TransactionHistory(tmp_path / "tx.db")
+        nginx = history.begin_transaction(TransactionType.INSTALL, ["nginx", "libc6"])
+        history.begin_transaction(TransactionType.INSTALL, ["redis"])
+        removal = history.begin_transaction(TransactionType.REMOVE, ["nginx"])
+
+        assert [t.id for t in history.search(package="nginx")] == [removal.id, nginx.id]
+        assert [t.id for t in history.search(package="nginx-common")] == []
+        assert [
+            t.id for t in history.search(package="nginx", transaction_type=TransactionType.REMOVE)
+        ] == [removal.id]
+
+        with closing(sqlite3.connect(history.db_path)) as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT t.* FROM transaction_packages p "
+                "CROSS JOIN transactions t ON t.id = p.record_id WHERE p.package = ? "
+                "ORDER BY p.timestamp DESC LIMIT 10",
+                ("nginx",),
+            ).fetchall()
+        assert "idx_transaction_packages_package" in " ".join(row[-1] for row in plan)
+
+    def test_completed_transaction_stays_indexed(self, tmp_path):
+        history = TransactionHistory(tmp_path / "tx.db")
+        tx = history.begin_transaction(TransactionType.INSTALL, ["nginx"])
+        history.complete_transaction(tx, success=True)
+
+        assert [t.id for t in history.search(package="nginx")] == [tx.id]
+
+    def test_legacy_database_is_backfilled(self, tmp_path, no_background_backfill):
+        path = tmp_path / "tx.db"
+        legacy_transactions_db(path, 25)
+        history = TransactionHistory(path)
+
+        with closing(sqlite3.connect(path)) as conn:
+            assert not history.package_index.ready(conn)
+        # Not indexed yet: answered by scanning the JSON column
+        fallback = [t.id for t in history.search(package="nginx", limit=100)]
+        assert len(fallback) == 12
+
+        new = history.begin_transaction(TransactionType.INSTALL, ["nginx"])
+        with closing(sqlite3.connect(path)) as conn:
+            batches = 1
+            while not history.package_index.backfill(conn, batch_size=10):
+                batches += 1
+            assert history.package_index.ready(conn)
+        assert batches == 3
+
+        indexed = [t.id for t in history.search(package="nginx", limit=100)]
+        assert indexed == [new.id, *fallback]
+        since = datetime(2024, 1, 1, 0, 20)
+        assert [t.id for t in history.search(package="nginx", since=since)] == [
+            new.id,
+            "tx_0023",
+            "tx_0021",
+        ]
+
+    def test_background_backfill(self, tmp_path):
+        path = tmp_path / "tx.db"
+        legacy_transactions_db(path, 50)
+        with closing(sqlite3.connect(path)) as conn:
+            index = PackageIndex("transaction_packages", source="transactions")
+            index.create(conn)
+            conn.commit()
+
+        index.start_backfill(connect(path), batch_size=7).join()
+
+        with closing(sqlite3.connect(path)) as conn:
+            assert index.ready(conn)
+            count = conn.execute(
+                "SELECT COUNT(*) FROM transaction_packages WHERE package = 'nginx'"
+            ).fetchone()[0]
+        assert count == 25
+
+    def test_backfill_resumes(self, tmp_path):
+        path = tmp_path / "tx.db"
+        legacy_transactions_db(path, 30)
+        index = PackageIndex("transaction_packages", source="transactions")
+        with closing(sqlite3.connect(path)) as conn:
+            index.create(conn)
+            conn.commit()
+            index.backfill(conn, batch_size=10)
+
+        # A new process picks up after the committed batch
+        with closing(sqlite3.connect(path)) as conn:
+            index.create(conn)
+            assert conn.execute("SELECT last_rowid FROM index_backfills").fetchone()[0] == 10
+            assert index.backfill(conn, batch_size=100)
+            rows = conn.execute("SELECT COUNT(DISTINCT record_id) FROM transaction_packages")
+            assert rows.fetchone()[0] == 30
+
+
+class TestInstallationHistory:
+    def test_get_history_by_package(self, tmp_path):
+        history = InstallationHistory(str(tmp_path / "history.db"))
+        first = history.record_installation(
+            InstallationType.INSTALL, ["nginx", "curl"], [], datetime(2024, 1, 1)
+        )
+        history.record_installation(InstallationType.INSTALL, ["redis"], [], datetime(2024, 1, 2))
+        second = history.record_installation(
+            InstallationType.REMOVE, ["nginx"], [], datetime(2024, 1, 3)
+        )
+        history.update_installation(second, InstallationStatus.FAILED, "boom")
+
+        assert [r.id for r in history.get_history(package="nginx")] == [second, first]
+        assert [
+            r.id
+            for r in history.get_history(
+                package="nginx", status_filter=InstallationStatus.IN_PROGRESS
+            )
+        ] == [first]
+        assert len(history.get_history()) == 3
+
+    def test_recorded_commands_are_indexed(self, tmp_path):
+        history = InstallationHistory(str(tmp_path / "history.db"))
+        install_id = history.record_installation(InstallationType.INSTALL, [], [], datetime.now())
+        history.record_commands(install_id, ["sudo apt-get install -y nginx"])
+
+        assert [r.id for r in history.get_history(package="nginx")] == [install_id]
+
+    def test_cleanup_drops_index_rows(self, tmp_path):
+        history = InstallationHistory(str(tmp_path / "history.db"))
+        history.record_installation(
+            InstallationType.INSTALL, ["nginx"], [], datetime.now() - timedelta(days=400)
+        )
+
+        assert history.cleanup_old_records(days=90) == 1
+        assert history.get_history(package="nginx") == []
+        with closing(sqlite3.connect(history.db_path)) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM installation_packages").fetchone()[0] == 0
+
+
+def test_backfilled_index_requires_index_batch():
+    """Subclasses must say how a batch of source rows is indexed."""
+
+    class Incomplete(BackfilledIndex):
+        table = "incomplete_index"
+        source = "transactions"
+
+    with pytest.raises(TypeError, match="_index_batch"):
+        Incomplete()
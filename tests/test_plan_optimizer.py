@@ -0,0 +1,145 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from cortex.coordinator import InstallationCoordinator, InstallationStep, StepStatus
+from cortex.plan_optimizer import coalesce_apt_steps, failed_packages
+
+
+class TestCoalesceAptSteps(unittest.TestCase):
+    def test_adjacent_installs_are_merged(self):
+        plan = [
+            {"command": "sudo apt update", "description": "Update"},
+            {"command": "sudo apt install -y nginx", "description": "Install nginx"},
+            {"command": "sudo apt install -y curl", "description": "Install curl"},
+            {"command": "sudo apt install -y git nginx", "description": "Install git"},
+        ]
+
+        optimized = coalesce_apt_steps(plan)
+
+        self.assertEqual(len(optimized), 2)
+        self.assertEqual(optimized[0]["command"], "sudo apt update")
+        merged = optimized[1]
+        self.assertEqual(merged["command"], "sudo apt install -y nginx curl git")
+        self.assertEqual(merged["packages"], ["nginx", "curl", "git"])
+        self.assertEqual(len(merged["merged_commands"]), 3)
+        self.assertIn("Install curl", merged["description"])
+
+    def test_non_adjacent_installs_keep_order(self):
+        plan = [
+            {"command": "apt-get install -y a"},
+            {"command": "systemctl start a"},
+            {"command": "apt-get install -y b"},
+        ]
+
+        optimized = coalesce_apt_steps(plan)
+
+        self.assertEqual(
+            [s["command"] for s in optimized],
+            ["apt-get install -y a", "systemctl start a", "apt-get install -y b"],
+        )
+
+    def test_incompatible_flags_and_actions_not_merged(self):
+        plan = [
+            {"command": "apt-get install -y a"},
+            {"command": "apt-get install -y --no-install-recommends b"},
+            {"command": "apt-get remove -y c"},
+            {"command": "apt-get remove -y d"},
+            {"command": "sudo apt-get remove -y e"},
+        ]
+
+        optimized = coalesce_apt_steps(plan)
+
+        self.assertEqual([s["packages"] for s in optimized], [["a"], ["b"], ["c", "d"], ["e"]])
+
+    def test_apt_and_apt_get_with_same_flags_merge(self):
+        plan = [
+            {"command": "apt-get -y install a"},
+            {"command": "apt install -y b"},
+        ]
+
+        optimized = coalesce_apt_steps(plan)
+
+        self.assertEqual(len(optimized), 1)
+        self.assertEqual(optimized[0]["command"], "apt-get install -y a b")
+
+    def test_rollbacks_are_preserved_in_order(self):
+        plan = [
+            {"command": "apt install -y a", "rollback": "apt remove -y a"},
+            {"command": "apt install -y b"},
+            {"command": "apt install -y c", "rollback": ["apt remove -y c"]},
+        ]
+
+        optimized = coalesce_apt_steps(plan)
+
+        self.assertEqual(optimized[0]["rollback"], ["apt remove -y a", "apt remove -y c"])
+
+    def test_compound_commands_pass_through(self):
+        plan = [{"command": "apt-get update && apt-get install -y a"}]
+
+        self.assertEqual(coalesce_apt_steps(plan), plan)
+
+
+class TestFailedPackages(unittest.TestCase):
+    def test_unable_to_locate(self):
+        output = "E: Unable to locate package nosuchpkg"
+        self.assertEqual(failed_packages(output, ["nginx", "nosuchpkg"]), {"nosuchpkg"})
+
+    def test_unmet_dependencies_with_version_pin(self):
+        output = (
+            "The following packages have unmet dependencies:\n"
+            " libfoo-dev : Depends: libfoo1 (= 2.0) but 1.0 is to be installed\n"
+        )
+        self.assertEqual(failed_packages(output, ["libfoo-dev=2.0", "curl"]), {"libfoo-dev=2.0"})
+
+
+class TestCoordinatorOptimization(unittest.TestCase):
+    def test_optimize_merges_steps(self):
+        coordinator = InstallationCoordinator(
+            ["apt install -y a", "apt install -y b", "echo done"], optimize=True
+        )
+
+        self.assertEqual(len(coordinator.steps), 2)
+        self.assertEqual(coordinator.steps[0].packages, ["a", "b"])
+        self.assertEqual(coordinator.steps[1].packages, [])
+
+    def test_from_plan_optimize_keeps_rollbacks(self):
+        plan = [
+            {"command": "apt install -y a", "rollback": "apt remove -y a"},
+            {"command": "apt install -y b", "rollback": "apt remove -y b"},
+        ]
+
+        coordinator = InstallationCoordinator.from_plan(plan, optimize=True)
+
+        self.assertEqual(len(coordinator.steps), 1)
+        self.assertTrue(coordinator.enable_rollback)
+        self.assertEqual(coordinator.rollback_commands, ["apt remove -y a", "apt remove -y b"])
+
+    @patch("subprocess.run")
+    def test_package_attribution_on_failure(self, mock_run):
+        mock_run.return_value = Mock(
+            returncode=100, stdout="", stderr="E: Unable to locate package b"
+        )
+
+        coordinator = InstallationCoordinator(
+            ["apt install -y a", "apt install -y b", "apt install -y c"], optimize=True
+        )
+        result = coordinator.execute()
+
+        self.assertFalse(result.success)
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertEqual(
+            result.steps[0].package_results(),
+            {"a": "skipped", "b": "failed", "c": "skipped"},
+        )
+        summary = coordinator.get_summary()
+        self.assertEqual(summary["steps"][0]["packages"]["b"], "failed")
+
+    def test_package_results_success(self):
+        step = InstallationStep(command="apt install -y a b", description="x", packages=["a", "b"])
+        step.status = StepStatus.SUCCESS
+
+        self.assertEqual(step.package_results(), {"a": "success", "b": "success"})
+
+
+if __name__ == "__main__":
+    unittest.main()
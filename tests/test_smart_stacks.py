@@ -1,6 +1,10 @@
+from unittest.mock import patch
+
 import pytest
 
 import cortex.stack_manager as stack_manager
+from cortex.cli import CortexCLI
+from cortex.dependency_resolver import MultiPackageGraph
 from cortex.stack_manager import StackManager
 
 
@@ -13,3 +17,74 @@ def test_suggest_stack_ml_gpu_and_cpu(monkeypatch: pytest.MonkeyPatch) -> None:
 
     monkeypatch.setattr(stack_manager, "has_nvidia_gpu", lambda: True)
     assert manager.suggest_stack("ml") == "ml"
+
+
+def test_resolve_stack_uses_one_merged_graph(monkeypatch: pytest.MonkeyPatch) -> None:
+    """All packages of a stack are resolved together."""
+    manager = StackManager()
+    calls = []
+
+    class Resolver:
+        def resolve_many(self, packages):
+            calls.append(packages)
+            return "graph"
+
+    assert manager.resolve_stack("webdev", Resolver()) == "graph"
+    assert calls == [["nodejs", "npm", "nginx", "postgresql"]]
+    assert manager.resolve_stack("missing", Resolver()) is None
+
+
+def _graph(levels, packages, unresolved=(), indexed=True) -> MultiPackageGraph:
+    return MultiPackageGraph(
+        packages=list(packages),
+        direct_dependencies={},
+        all_dependencies=[],
+        conflicts=[],
+        installation_order=[pkg for level in levels for pkg in level],
+        installation_levels=levels,
+        unresolved=list(unresolved),
+        indexed=indexed,
+    )
+
+
+def test_stack_install_runs_the_merged_graph() -> None:
+    """Apt-only stacks are installed from the graph, not an LLM plan."""
+    cli = CortexCLI()
+    graph = _graph([["libuv1", "nginx"], ["nodejs"], ["npm"]], ["nodejs", "npm", "nginx"])
+
+    with (
+        patch.object(CortexCLI, "_execute_multi_install", return_value=0) as execute,
+        patch.object(CortexCLI, "install") as install,
+    ):
+        assert cli._handle_stack_real_install({"name": "Web"}, graph.packages, graph) == 0
+
+    install.assert_not_called()
+    commands = [cmd["command"] for cmd in execute.call_args.args[0]]
+    assert commands == [
+        "sudo apt-get install -y libuv1 nginx",
+        "sudo apt-get install -y nodejs",
+        "sudo apt-get install -y npm",
+        "sudo apt-mark auto libuv1",
+    ]
+
+
+@pytest.mark.parametrize(
+    "graph",
+    [
+        _graph([["pytorch"]], ["pytorch"], unresolved=["pytorch"]),
+        _graph([["nginx"]], ["nginx"], indexed=False),
+        None,
+    ],
+)
+def test_stack_install_falls_back_to_llm_plan(graph) -> None:
+    """Stacks the apt lists cannot resolve are planned by the LLM."""
+    cli = CortexCLI()
+
+    with (
+        patch.object(CortexCLI, "_execute_multi_install") as execute,
+        patch.object(CortexCLI, "install", return_value=0) as install,
+    ):
+        assert cli._handle_stack_real_install({"name": "ML"}, ["pytorch", "nginx"], graph) == 0
+
+    execute.assert_not_called()
+    install.assert_called_once_with(software="pytorch nginx", execute=True, dry_run=False)
@@ -0,0 +1,198 @@
+"""Tests for streaming command execution and bounded output buffers."""
+
+import asyncio
+import gzip
+import os
+import sys
+import time
+
+import pytest
+
+from cortex.coordinator import InstallationCoordinator, StepStatus
+from cortex.utils.streaming import OutputBuffer, bound_output, run_streaming, stream_command
+
+PRINT_LINES = (
+    "python -c \"import sys; [print(f'line {i}') for i in range(50)]; "
+    "print('oops', file=sys.stderr)\""
+)
+
+
+class TestOutputBuffer:
+    def test_small_output_is_kept_verbatim(self):
+        buf = OutputBuffer(head_lines=5, tail_lines=5)
+        buf.feed("a\nb\nc\n")
+
+        assert buf.getvalue() == "a\nb\nc\n"
+        assert not buf.truncated
+
+    def test_head_and_tail_retention(self):
+        buf = OutputBuffer(head_lines=2, tail_lines=3)
+        for i in range(10):
+            buf.append(f"{i}\n")
+
+        value = buf.getvalue()
+        assert value.startswith("0\n1\n")
+        assert value.endswith("7\n8\n9\n")
+        assert "5 lines omitted" in value
+        assert buf.total_lines == 10
+        assert buf.dropped_lines == 5
+
+    def test_spill_contains_full_output(self, tmp_path):
+        spill = tmp_path / "logs" / "out.log.gz"
+        buf = OutputBuffer(head_lines=2, tail_lines=2, spill_path=spill)
+        lines = [f"line {i}\n" for i in range(100)]
+        for line in lines:
+            buf.append(line)
+        buf.close()
+
+        assert buf.spilled
+        assert str(spill) in buf.getvalue()
+        with gzip.open(spill, "rt", encoding="utf-8") as f:
+            assert f.read() == "".join(lines)
+
+    def test_no_spill_file_when_not_truncated(self, tmp_path):
+        spill = tmp_path / "out.log.gz"
+        buf = OutputBuffer(head_lines=5, tail_lines=5, spill_path=spill)
+        buf.feed("one\ntwo\n")
+        buf.close()
+
+        assert not buf.spilled
+        assert not spill.exists()
+
+    def test_bound_output_passthrough(self):
+        assert bound_output("short\n", head_lines=2, tail_lines=2) == "short\n"
+        bounded = bound_output("".join(f"{i}\n" for i in range(20)), head_lines=2, tail_lines=2)
+        assert bounded.count("\n") == 5
+
+
+class TestStreamCommand:
+    def test_lines_are_delivered_as_they_arrive(self):
+        seen = []
+        stdout, stderr = OutputBuffer(), OutputBuffer()
+
+        code = run_streaming(
+            PRINT_LINES, stdout, stderr, timeout=10, on_line=lambda s, l: seen.append((s, l))
+        )
+
+        assert code == 0
+        assert ("stdout", "line 0") in seen
+        assert ("stderr", "oops") in seen
+        assert stdout.total_lines == 50
+        assert "oops" in stderr.getvalue()
+
+    def test_timeout_kills_process(self):
+        stdout, stderr = OutputBuffer(), OutputBuffer()
+        start = time.time()
+
+        with pytest.raises(asyncio.TimeoutError):
+            run_streaming('python -c "import time; time.sleep(10)"', stdout, stderr, timeout=0.5)
+
+        assert time.time() - start < 5
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX sessions")
+    def test_child_keeps_session_and_terminal(self):
+        """sudo needs the terminal: the child shares our session and stdin."""
+        stdout = OutputBuffer()
+        probe = (
+            'python -c "import os; s = os.fstat(0); '
+            'print(os.getsid(0), os.getpgrp(), s.st_dev, s.st_ino)"'
+        )
+
+        assert run_streaming(probe, stdout, OutputBuffer(), timeout=10) == 0
+
+        stdin = os.fstat(0)
+        expected = [os.getsid(0), os.getpgrp(), stdin.st_dev, stdin.st_ino]
+        assert [int(v) for v in stdout.getvalue().split()] == expected
+
+    @pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+    def test_timeout_kills_child_processes(self, tmp_path):
+        """Commands spawned by the shell are killed with it."""
+        pid_file = tmp_path / "pid"
+        command = (
+            f"python -c \"import os, time; open(r'{pid_file}', 'w').write(str(os.getpid())); "
+            f'time.sleep(30)" & wait'
+        )
+
+        with pytest.raises(asyncio.TimeoutError):
+            run_streaming(command, OutputBuffer(), OutputBuffer(), timeout=1)
+
+        pid = int(pid_file.read_text())
+        for _ in range(50):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("child process survived the timeout")
+
+    def test_stream_command_inside_event_loop(self):
+        async def run_test():
+            stdout, stderr = OutputBuffer(), OutputBuffer()
+            code = await stream_command("exit 3", stdout, stderr, timeout=5)
+            assert code == 3
+            # The blocking wrapper also works while a loop is running
+            assert run_streaming("exit 0", OutputBuffer(), OutputBuffer(), timeout=5) == 0
+
+        asyncio.run(run_test())
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses POSIX shell commands")
+class TestCoordinatorStreaming:
+    def test_output_callback_receives_lines(self, tmp_path):
+        lines = []
+
+        coordinator = InstallationCoordinator(
+            [PRINT_LINES],
+            output_callback=lambda step, stream, line: lines.append((stream, line)),
+            output_log_dir=str(tmp_path),
+        )
+        result = coordinator.execute()
+
+        assert result.success
+        assert len([l for l in lines if l[0] == "stdout"]) == 50
+        assert "line 49" in result.steps[0].output
+        assert result.steps[0].return_code == 0
+
+    def test_large_output_spills_to_compressed_log(self, tmp_path):
+        command = "python -c \"[print('x' * 10) for _ in range(5000)]\""
+
+        coordinator = InstallationCoordinator(
+            [command], stream_output=True, output_log_dir=str(tmp_path)
+        )
+        result = coordinator.execute()
+
+        step = result.steps[0]
+        assert result.success
+        assert step.output_log is not None
+        assert step.output.count("\n") < 1100
+        with gzip.open(step.output_log, "rt") as f:
+            assert f.read().count("\n") == 5000
+
+    def test_errors_are_categorized_while_running(self, tmp_path):
+        command = (
+            'python -c "import sys; '
+            "print('E: Unable to locate package nosuchpkg', file=sys.stderr); sys.exit(100)\""
+        )
+
+        coordinator = InstallationCoordinator(
+            [command], stream_output=True, output_log_dir=str(tmp_path)
+        )
+        result = coordinator.execute()
+
+        step = result.steps[0]
+        assert step.status == StepStatus.FAILED
+        assert step.return_code == 100
+        assert step.error_category == "package_not_found"
+
+    def test_streaming_timeout(self, tmp_path):
+        coordinator = InstallationCoordinator(
+            ['python -c "import time; time.sleep(10)"'],
+            timeout=1,
+            stream_output=True,
+            output_log_dir=str(tmp_path),
+        )
+        result = coordinator.execute()
+
+        assert not result.success
+        assert "timed out" in result.steps[0].error
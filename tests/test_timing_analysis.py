@@ -0,0 +1,119 @@
+"""Tests for critical-path timing analysis of install runs."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from cortex.coordinator import StepStatus
+from cortex.install_parallel import ParallelTask, TaskStatus
+from cortex.timing_analysis import (
+    TimingReport,
+    analyze_coordinator_run,
+    analyze_parallel_run,
+    analyze_timing,
+)
+
+
+def task(name, start, end, deps=()):
+    return ParallelTask(
+        name=name,
+        command="true",
+        description=f"{name} desc",
+        dependencies=list(deps),
+        status=TaskStatus.SUCCESS,
+        start_time=start,
+        end_time=end,
+    )
+
+
+class TestAnalyzeTiming:
+    def test_empty_run(self):
+        report = analyze_timing([])
+
+        assert report.wall_time == 0.0
+        assert report.critical_path == []
+        assert report.parallel_efficiency == 0.0
+
+    def test_parallel_diamond(self):
+        # A -> (B, C) -> D with C being the long branch
+        tasks = [
+            task("A", 100.0, 102.0),
+            task("B", 102.0, 105.0, ["A"]),
+            task("C", 102.0, 112.0, ["A"]),
+            task("D", 112.0, 113.0, ["B", "C"]),
+        ]
+
+        report = analyze_parallel_run(tasks)
+
+        assert report.critical_path == ["A", "C", "D"]
+        assert report.critical_path_time == pytest.approx(13.0)
+        assert report.wall_time == pytest.approx(13.0)
+        assert report.total_step_time == pytest.approx(16.0)
+        assert report.parallel_efficiency == pytest.approx(16.0 / 13.0)
+        assert report.slowest_steps[0] == "C"
+        assert report.step("A").start == 0.0
+        assert report.idle_gaps == []
+
+    def test_idle_gaps_and_unrun_steps(self):
+        spans = [
+            ("one", "", "success", 0.0, 1.0),
+            ("two", "", "success", 4.0, 5.0),
+            ("three", "", "skipped", None, None),
+        ]
+
+        report = analyze_timing(spans, {"two": ["one"], "three": ["two"]})
+
+        assert [s.name for s in report.steps] == ["one", "two"]
+        assert len(report.idle_gaps) == 1
+        assert report.idle_gaps[0].start == 1.0
+        assert report.idle_gaps[0].duration == 3.0
+        assert report.idle_time == 3.0
+        assert report.critical_path == ["one", "two"]
+
+    def test_independent_steps_critical_path_is_longest_step(self):
+        report = analyze_timing([("a", "", "success", 0.0, 2.0), ("b", "", "success", 0.0, 5.0)])
+
+        assert report.critical_path == ["b"]
+        assert report.parallel_efficiency == pytest.approx(7.0 / 5.0)
+
+    def test_coordinator_steps_form_a_chain(self):
+        steps = [
+            SimpleNamespace(
+                description=f"s{i}", status=StepStatus.SUCCESS, start_time=i, end_time=i + 1
+            )
+            for i in range(3)
+        ]
+
+        report = analyze_coordinator_run(steps)
+
+        assert report.critical_path == ["Step 1", "Step 2", "Step 3"]
+        assert report.parallel_efficiency == pytest.approx(1.0)
+
+    def test_resumed_coordinator_steps_are_left_out(self):
+        steps = [
+            SimpleNamespace(
+                description="restored",
+                status=StepStatus.SUCCESS,
+                start_time=0.0,
+                end_time=5.0,
+                resumed=True,
+            ),
+            SimpleNamespace(
+                description="s2", status=StepStatus.SUCCESS, start_time=1000.0, end_time=1002.0
+            ),
+            SimpleNamespace(
+                description="s3", status=StepStatus.SUCCESS, start_time=1002.0, end_time=1003.0
+            ),
+        ]
+
+        report = analyze_coordinator_run(steps)
+
+        assert report.wall_time == pytest.approx(3.0)
+        assert report.critical_path == ["Step 2", "Step 3"]
+
+    def test_report_roundtrip(self):
+        report = analyze_parallel_run([task("A", 0.0, 1.0), task("B", 2.0, 4.0, ["A"])])
+
+        restored = TimingReport.from_dict(report.to_dict())
+
+        assert restored == report
@@ -148,6 +148,23 @@ class TestTransactionHistory:
         """Test that initialization creates the database."""
         assert history.db_path.exists()
 
+    def test_database_is_versioned_and_wal(self, history):
+        """Test the schema version and journal mode of the database."""
+        with history._pool.get_connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(history._migrations())
+
+    @patch("subprocess.run")
+    def test_reopen_keeps_transactions(self, mock_run, history):
+        """Test that reopening a database does not re-run migrations."""
+        mock_run.return_value = MagicMock(returncode=1, stdout="")
+        tx = history.begin_transaction(TransactionType.INSTALL, ["nginx"], "apt install nginx")
+        history.complete_transaction(tx, success=True)
+
+        reopened = TransactionHistory(history.db_path)
+
+        assert reopened.get_transaction(tx.id).status == TransactionStatus.COMPLETED
+
     def test_generate_id(self, history):
         """Test ID generation."""
         id1 = history._generate_id()
@@ -309,6 +326,29 @@ class TestTransactionHistory:
         assert any("install" in cmd for cmd in commands)
         assert any("nginx" in cmd for cmd in commands)
 
+    def test_capture_package_state_reads_dpkg_status(self, history, tmp_path, monkeypatch):
+        """Test package state comes from the dpkg status file."""
+        status = tmp_path / "status"
+        status.write_text(
+            "Package: nginx\nStatus: install ok installed\nVersion: 1.24.0\n"
+            "Depends: libc6 (>= 2.34), nginx-common\n"
+            "Conffiles:\n /etc/nginx/nginx.conf 0123456789abcdef\n\n"
+            "Package: vim\nStatus: deinstall ok config-files\nVersion: 2:9.0\n"
+        )
+        monkeypatch.setattr("cortex.dpkg_status.DPKG_STATUS_PATH", str(status))
+
+        with patch("subprocess.run") as mock_run:
+            nginx = history._capture_package_state("nginx")
+            vim = history._capture_package_state("vim")
+
+        mock_run.assert_not_called()
+        assert nginx.installed
+        assert nginx.version == "1.24.0"
+        assert nginx.dependencies == ["libc6", "nginx-common"]
+        assert nginx.config_files == ["/etc/nginx/nginx.conf"]
+        assert not vim.installed
+        assert vim.version is None
+
 
 class TestUndoManager:
     """Tests for UndoManager class."""
@@ -16,6 +16,7 @@ from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../.."))
 
+from cortex.sandbox.audit_log import SandboxAuditLog
 from cortex.sandbox.sandbox_executor import (
     CommandBlocked,
     ExecutionResult,
@@ -198,6 +199,15 @@ class TestSandboxExecutor(unittest.TestCase):
             self.assertIn("timestamp", entry)
             self.assertIn("type", entry)
 
+    def test_audit_entries_are_persisted(self):
+        """Test audit entries are stored in the database next to the log file."""
+        with contextlib.suppress(CommandBlocked):
+            self.executor.execute("rm -rf /", dry_run=False)
+
+        entries = SandboxAuditLog(os.path.join(self.temp_dir, "test_sandbox.db")).get_entries()
+        self.assertEqual([entry["command"] for entry in entries], ["rm -rf /"])
+        self.assertEqual(entries[0]["type"], "security_violation")
+
     def test_path_validation(self):
         """Test path validation."""
         # Commands accessing critical directories should be blocked